@@ -0,0 +1,36 @@
+"""
+Times translating one long `a + b + a + b + ...` expression, the kind generated code is full of.
+The time per term should stay about the same however many terms there are.
+
+    python benchmarks/deep_expressions.py [most terms]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import java_unparse, parse_python  # noqa: E402
+
+
+def source(terms):
+    return "a = int(input())\nb = 2\nx = " + " + ".join("a" if i % 2 else "b" for i in range(terms)) + "\nprint(x)\n"
+
+
+def main():
+    most_terms = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    terms = most_terms // 8
+    print(f"{'terms':>8} {'parse':>8} {'translate':>10} {'per term':>10}")
+    while terms <= most_terms:
+        text = source(terms)
+        start = time.perf_counter()
+        tree = parse_python(text)
+        parsed = time.perf_counter()
+        java_unparse(tree)
+        translated = time.perf_counter()
+        print(f"{terms:>8} {parsed - start:>7.2f}s {translated - parsed:>9.2f}s "
+              f"{(translated - start) / terms * 1e6:>8.1f}us")
+        terms *= 2
+
+
+if __name__ == '__main__':
+    main()
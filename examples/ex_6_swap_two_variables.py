@@ -14,3 +14,9 @@ y = temp
 
 print('The value of x after swapping: {}'.format(x))
 print('The value of y after swapping: {}'.format(y))
+
+# or swap them back without one
+x, y = y, x
+
+print('The value of x after swapping back: {}'.format(x))
+print('The value of y after swapping back: {}'.format(y))
@@ -1,18 +1,468 @@
+import argparse
 import ast
+import concurrent.futures
+import io
 import json
+import math
+import operator
+import os
 import re
+import sys
+import threading
 import copy
+import doctest
+import shlex
+import tokenize
 from uuid import uuid4
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 from typing import List, Dict, Set
 
 # Input
 EXAMPLE_FILE = 'examples/ex_17_class_stuff.py'
 DEBUG = False
+# Output modes
+BUFFERED_OUTPUT = False
+FAST_INPUT = False
+# Fold constants and drop dead code before translating
+OPTIMIZE = True
+# Count the calls and time of every function, reported to stderr at exit
+INSTRUMENT = False
+# How async functions run: 'futures' (CompletableFutures, each on a virtual thread of its own, where awaiting
+#  blocks it) or 'virtual-threads' (plain blocking calls). Both need Java 21
+ASYNC_MODE = 'futures'
+# Run every `for i in range(...)` loop whose iterations don't depend on each other in parallel,
+#  not just the ones marked with a `# parallel` comment
+PARALLEL_LOOPS = False
 
 # TODO
 #  - TODO list
 
+# Generated code can nest expressions thousands deep (a + b + c + ... is each + inside the next),
+#  deeper than Python can recurse, so anything that goes over a whole tree keeps a stack of its own
+
+# The node types CPython shares one instance of all over a tree
+_shared_node_types = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop)
+
+
+def _copy_tree(tree):
+    """copy.deepcopy for an AST"""
+    root = copy.copy(tree)
+    todo = [root]
+    while todo:
+        node = todo.pop()
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, ast.AST) and not isinstance(value, _shared_node_types):
+                value = copy.copy(value)
+                todo.append(value)
+            elif isinstance(value, list):
+                value = [copy.copy(item) if isinstance(item, ast.AST) and not isinstance(item, _shared_node_types)
+                         else item for item in value]
+                todo.extend(item for item in value if isinstance(item, ast.AST))
+            else:
+                continue
+            setattr(node, field, value)
+    return root
+
+
+def _dump_tree(tree):
+    """Something that compares equal for two ASTs when ast.dump would"""
+    dump = []
+    todo = [tree]
+    while todo:
+        value = todo.pop()
+        if isinstance(value, ast.AST):
+            dump.append(type(value).__name__)
+            todo.extend(reversed([getattr(value, field, None) for field in value._fields]))
+        elif isinstance(value, list):
+            dump.append(len(value))
+            todo.extend(reversed(value))
+        else:
+            dump.append(repr(value))
+    return dump
+
+
+def _fix_missing_locations(tree):
+    """ast.fix_missing_locations"""
+    todo = [(tree, 1, 0, 1, 0)]
+    while todo:
+        node, lineno, col_offset, end_lineno, end_col_offset = todo.pop()
+        if 'lineno' in node._attributes:
+            if not hasattr(node, 'lineno'):
+                node.lineno = lineno
+            else:
+                lineno = node.lineno
+        if 'end_lineno' in node._attributes:
+            if getattr(node, 'end_lineno', None) is None:
+                node.end_lineno = end_lineno
+            else:
+                end_lineno = node.end_lineno
+        if 'col_offset' in node._attributes:
+            if not hasattr(node, 'col_offset'):
+                node.col_offset = col_offset
+            else:
+                col_offset = node.col_offset
+        if 'end_col_offset' in node._attributes:
+            if getattr(node, 'end_col_offset', None) is None:
+                node.end_col_offset = end_col_offset
+            else:
+                end_col_offset = node.end_col_offset
+        todo.extend((child, lineno, col_offset, end_lineno, end_col_offset) for child in ast.iter_child_nodes(node))
+    return tree
+
+
+# How much stack the parser, and the unparser, can take up for each level an expression nests, at the very most
+_parser_stack_per_level = 2048
+_unparser_stack_per_level = 4096
+# How many Python frames the unparser can go down for each level the AST nests, at the very most
+_unparser_frames_per_level = 10
+
+
+def _run_with_room(function, depth, frames_per_level, stack_per_level):
+    """
+    function(), with recursion limit and stack enough to go *depth* levels down. Only when what there is
+    falls short does it run in a thread with both made big enough
+    """
+    recursion_limit = sys.getrecursionlimit()
+    frames = depth * frames_per_level + 200
+    if frames < recursion_limit // 2:
+        return function()
+    result = []
+
+    def run():
+        try:
+            result.append(function())
+        except BaseException as error:
+            result.append(error)
+
+    stack_size = threading.stack_size()
+    sys.setrecursionlimit(max(recursion_limit, recursion_limit + frames))
+    threading.stack_size(max(stack_size, 1 << 25, depth * stack_per_level))
+    try:
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(stack_size)
+        sys.setrecursionlimit(recursion_limit)
+    if isinstance(result[0], BaseException):
+        raise result[0]
+    return result[0]
+
+
+def _source_depth(source):
+    """
+    How deep *source* can nest, at the very most: the tokens of its longest logical line plus how far
+    that line is indented. Each level of an expression takes at least one token
+    """
+    depth = tokens = indents = 0
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(source).readline):
+            if token.type == tokenize.INDENT:
+                indents += 1
+            elif token.type == tokenize.DEDENT:
+                indents -= 1
+            elif token.type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                depth = max(depth, tokens + 4 * indents)
+                tokens = 0
+            elif token.type not in (tokenize.NL, tokenize.COMMENT):
+                tokens += 1
+    except (tokenize.TokenError, SyntaxError):
+        # ast.parse says what's wrong with it
+        return len(source)
+    return max(depth, tokens + 4 * indents)
+
+
+def _tree_depth(tree):
+    """How many levels *tree* nests"""
+    depth = 0
+    todo = [(tree, 1)]
+    while todo:
+        node, level = todo.pop()
+        depth = max(depth, level)
+        todo.extend((child, level + 1) for child in ast.iter_child_nodes(node))
+    return depth
+
+
+def parse_python(source):
+    """
+    ast.parse, with room for however deep *source* nests. CPython's parser recurses (in C) for every
+    level, as far as the recursion limit and the thread's stack let it
+    """
+    return _run_with_room(lambda: ast.parse(source), _source_depth(source), 1, _parser_stack_per_level)
+
+
+class _Optimizer(ast.NodeTransformer):
+    """Simplifies a module before it gets translated: folds constant expressions, fills in names
+    that only ever get one constant, and drops branches that can never run and variables nothing reads"""
+
+    # Don't fold anything into a constant bigger than this, in bits of an int or characters of a string.
+    #  Ints also have to fit in a Java long literal
+    max_constant_size = 256
+    _long_range = (-2 ** 63, 2 ** 63 - 1)
+    # Nor fill in strings longer than this everywhere they're used
+    max_propagated_string = 64
+
+    _binary_operators = {
+        ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+        ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+        ast.LShift: operator.lshift, ast.RShift: operator.rshift,
+        ast.BitOr: operator.or_, ast.BitXor: operator.xor, ast.BitAnd: operator.and_,
+    }
+    _unary_operators = {ast.Not: operator.not_, ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Invert: operator.invert}
+    _comparisons = {
+        ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+        ast.Gt: operator.gt, ast.GtE: operator.ge,
+        ast.In: lambda a, b: a in b, ast.NotIn: lambda a, b: a not in b,
+    }
+    _constant_types = (int, float, str, bool)
+
+    def optimize(self, tree):
+        tree = _copy_tree(tree)
+        for _ in range(8):
+            before = _dump_tree(tree)
+            tree = self.visit(tree)
+            self._propagate_constants(tree)
+            self._remove_unused_assignments(tree)
+            if _dump_tree(tree) == before:
+                break
+        self._fill_empty_bodies(tree)
+        return _fix_missing_locations(tree)
+
+    def visit(self, tree):
+        """
+        NodeTransformer.visit, but bottom up through a stack of its own rather than by recursing.
+        The visit_* methods get a node whose children are visited already, and return what replaces it
+        """
+        replacements = {}
+        todo = [(tree, False)]
+        while todo:
+            node, children_visited = todo.pop()
+            if not children_visited:
+                todo.append((node, True))
+                todo.extend((child, False) for child in ast.iter_child_nodes(node)
+                            if not isinstance(child, _shared_node_types))
+                continue
+            for field, value in ast.iter_fields(node):
+                if isinstance(value, list):
+                    new_values = []
+                    for item in value:
+                        if isinstance(item, ast.AST) and id(item) in replacements:
+                            item = replacements.pop(id(item))
+                            if item is None:
+                                continue
+                            if not isinstance(item, ast.AST):
+                                new_values.extend(item)
+                                continue
+                        new_values.append(item)
+                    value[:] = new_values
+                elif isinstance(value, ast.AST) and id(value) in replacements:
+                    new_node = replacements.pop(id(value))
+                    if new_node is None:
+                        delattr(node, field)
+                    else:
+                        setattr(node, field, new_node)
+            visitor = getattr(self, f"visit_{type(node).__name__}", None)
+            replacements[id(node)] = visitor(node) if visitor else node
+        return replacements[id(tree)]
+
+    # Folding
+
+    def _constant(self, value, node):
+        """A Constant for *value* in place of *node*, or *node* itself if the value is too big (or not finite)"""
+        if not isinstance(value, self._constant_types) \
+                or isinstance(value, int) and not self._long_range[0] <= value <= self._long_range[1] \
+                or isinstance(value, str) and len(value) > self.max_constant_size \
+                or isinstance(value, float) and not math.isfinite(value):
+            return node
+        return ast.copy_location(ast.Constant(value), node)
+
+    def _too_expensive(self, op, left, right):
+        """Whether working out `left op right` could take forever or eat all the memory"""
+        if isinstance(op, ast.Pow) and isinstance(left, int) and isinstance(right, int) and abs(left) > 1:
+            return right * abs(left).bit_length() > self.max_constant_size
+        if isinstance(op, ast.LShift) and isinstance(right, int):
+            return right > self.max_constant_size
+        if isinstance(op, ast.Mult) and isinstance(left, str) != isinstance(right, str):
+            count = right if isinstance(left, str) else left
+            return isinstance(count, int) and count > self.max_constant_size
+        return False
+
+    def visit_BinOp(self, node):
+        if isinstance(node.left, ast.Constant) and isinstance(node.right, ast.Constant) \
+                and type(node.op) in self._binary_operators \
+                and not self._too_expensive(node.op, node.left.value, node.right.value):
+            try:
+                value = self._binary_operators[type(node.op)](node.left.value, node.right.value)
+            except (ArithmeticError, TypeError, ValueError):
+                return node  # Leave it to blow up at runtime, like it would have
+            return self._constant(value, node)
+        return node
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.operand, ast.Constant):
+            try:
+                value = self._unary_operators[type(node.op)](node.operand.value)
+            except (ArithmeticError, TypeError, ValueError):
+                return node
+            return self._constant(value, node)
+        return node
+
+    def visit_Compare(self, node):
+        operands = [node.left] + node.comparators
+        if all(isinstance(operand, ast.Constant) for operand in operands) \
+                and all(type(op) in self._comparisons for op in node.ops):
+            try:
+                value = all(self._comparisons[type(op)](left.value, right.value)
+                            for op, left, right in zip(node.ops, operands, operands[1:]))
+            except TypeError:
+                return node
+            return self._constant(value, node)
+        return node
+
+    def visit_BoolOp(self, node):
+        values = list(node.values)
+        # Only constants in front decide anything: `x and False` still has to evaluate x
+        while len(values) > 1 and isinstance(values[0], ast.Constant):
+            if bool(values[0].value) != isinstance(node.op, ast.And):
+                return values[0]
+            values.pop(0)
+        if len(values) == 1:
+            return values[0]
+        node.values = values
+        return node
+
+    def visit_IfExp(self, node):
+        if isinstance(node.test, ast.Constant):
+            return node.body if node.test.value else node.orelse
+        return node
+
+    # Dead branches
+
+    def visit_If(self, node):
+        if isinstance(node.test, ast.Constant):
+            return node.body if node.test.value else node.orelse
+        return node
+
+    def visit_While(self, node):
+        if isinstance(node.test, ast.Constant) and not node.test.value:
+            return node.orelse
+        return node
+
+    # Propagation
+
+    @staticmethod
+    def _binding_counts(tree, keys):
+        """
+        How many places bind each (scope id, name) key (see _JavaUnparser._resolve_names), and the names
+        bound some other way: by classes, imports, except clauses and match patterns, or through global and nonlocal
+        """
+        counts = {}
+        others = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)) \
+                    or isinstance(node, (ast.arg, ast.FunctionDef, ast.AsyncFunctionDef)):
+                counts[keys[id(node)]] = counts.get(keys[id(node)], 0) + 1
+            elif isinstance(node, ast.ClassDef):
+                others.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                others.update(alias.asname or alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)) and node.name:
+                others.add(node.name)
+            elif isinstance(node, ast.MatchMapping) and node.rest:
+                others.add(node.rest)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                others.update(node.names)
+        return counts, others
+
+    def _propagate_constants(self, tree):
+        """
+        Replace variables that only ever get one constant with the constant itself, wherever they're read after
+        that. Only reads of that same variable, so not of a builtin, or of one of the same name somewhere else
+        """
+        keys = _JavaUnparser._resolve_names(tree)
+        counts, others = self._binding_counts(tree, keys)
+        constants = {}
+        for scope in ast.walk(tree):
+            # Class bodies make fields, which get read through self, so leave those be
+            if not isinstance(scope, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            for statement in scope.body:
+                if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+                        and isinstance(statement.targets[0], ast.Name) \
+                        and statement.targets[0].id not in others \
+                        and counts.get(key := keys[id(statement.targets[0])]) == 1 \
+                        and isinstance(statement.value, ast.Constant) \
+                        and isinstance(statement.value.value, self._constant_types) \
+                        and not (isinstance(statement.value.value, str)
+                                 and len(statement.value.value) > self.max_propagated_string):
+                    constants[key] = statement
+        if not constants:
+            return
+        loads = [node for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+                 and keys[id(node)] in constants]
+        for node in loads:
+            # Read before it's assigned (say, by a function defined further up): we can't be sure when that runs
+            statement = constants.get(keys[id(node)])
+            if statement and (node.lineno, node.col_offset) < (statement.end_lineno, statement.end_col_offset):
+                del constants[keys[id(node)]]
+        for node in loads:
+            if keys[id(node)] in constants:
+                # Mutating in place, since Name nodes get swapped out wherever they sit
+                node.__class__ = ast.Constant
+                node.value = constants[keys[id(node)]].value.value
+                node.kind = None
+                del node.id, node.ctx
+
+    # Unused variables
+
+    @staticmethod
+    def _is_pure(node, parameters, keys):
+        """
+        Whether evaluating *node* can't do anything but produce a value: constants, and the function's
+        *parameters* (keys), which are always bound, or tuples and lists of them. Arithmetic and comparisons
+        can raise (a // 0), and so can other names (before they're bound)
+        """
+        return all(isinstance(child, (ast.Constant, ast.Load, ast.Tuple, ast.List))
+                   or isinstance(child, ast.Name) and keys.get(id(child)) in parameters
+                   for child in ast.walk(node))
+
+    def _remove_unused_assignments(self, tree):
+        """
+        Drop assignments of pure values to a function's own variables that nothing reads. Not the module's, which
+        other modules can import
+        """
+        keys = _JavaUnparser._resolve_names(tree)
+        _, others = self._binding_counts(tree, keys)
+        parameters = {keys[id(node)] for node in ast.walk(tree) if isinstance(node, ast.arg)}
+        read = {keys[id(node)] for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+        for function in ast.walk(tree):
+            if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            todo = [function]
+            while todo:
+                node = todo.pop()
+                for field in ('body', 'orelse', 'finalbody'):
+                    statements = getattr(node, field, None)
+                    if not isinstance(statements, list):
+                        continue
+                    statements[:] = [statement for statement in statements
+                                     if not (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                                             and isinstance(statement.targets[0], ast.Name)
+                                             and keys[id(statement.targets[0])] == (id(function), statement.targets[0].id)
+                                             and keys[id(statement.targets[0])] not in read
+                                             and statement.targets[0].id not in others
+                                             and self._is_pure(statement.value, parameters, keys))]
+                # Not into functions or classes inside it, which have variables of their own
+                todo.extend(child for child in ast.iter_child_nodes(node)
+                            if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)))
+
+    @staticmethod
+    def _fill_empty_bodies(tree):
+        for node in ast.walk(tree):
+            if isinstance(getattr(node, 'body', None), list) and not node.body and not isinstance(node, ast.Module):
+                node.body.append(ast.Pass())
+
+
 class _JavaUnparser(ast._Unparser):
     """Methods in this class recursively traverse an AST and
     output source code for the abstract syntax; original formatting
@@ -29,9 +479,551 @@ class _JavaUnparser(ast._Unparser):
         'str': 'String.valueOf',
     }
 
+    # Stands in for java.util.Scanner in the fast input mode. Reads stdin in big chunks
+    #  and parses numbers straight out of the bytes instead of going through regexes
+    _fast_input_class = """final class FastInput {
+    private final java.io.InputStream in;
+    private final byte[] buffer = new byte[1 << 16];
+    private int length = 0;
+    private int position = 0;
+    private byte[] line = new byte[256];
+    private int last;
+
+    FastInput(java.io.InputStream in) {
+        this.in = in;
+    }
+
+    private int read() {
+        if (position == length) {
+            try {
+                length = in.read(buffer, 0, buffer.length);
+            } catch (java.io.IOException e) {
+                throw new java.io.UncheckedIOException(e);
+            }
+            position = 0;
+            if (length <= 0) {
+                length = 0;
+                return -1;
+            }
+        }
+        return buffer[position++] & 0xff;
+    }
+
+    private int skipBlanks(int c) {
+        while (c == ' ' || c == '\\t' || c == '\\r') {
+            c = read();
+        }
+        return c;
+    }
+
+    private int firstOfLine() {
+        int c = read();
+        if (c == -1) {
+            throw new java.util.NoSuchElementException("EOF when reading a line");
+        }
+        return c;
+    }
+
+    private long parseLong(int c) {
+        boolean negative = c == '-';
+        if (c == '-' || c == '+') {
+            c = read();
+        }
+        if (c < '0' || c > '9') {
+            throw new NumberFormatException("invalid literal for int()");
+        }
+        long value = 0;
+        while (c >= '0' && c <= '9') {
+            value = value * 10 + (c - '0');
+            c = read();
+        }
+        last = c;
+        return negative ? -value : value;
+    }
+
+    String nextLine() {
+        int c = firstOfLine();
+        int size = 0;
+        while (c != -1 && c != '\\n') {
+            if (size == line.length) {
+                line = java.util.Arrays.copyOf(line, size * 2);
+            }
+            line[size++] = (byte) c;
+            c = read();
+        }
+        if (size > 0 && line[size - 1] == '\\r') {
+            size--;
+        }
+        return new String(line, 0, size, java.nio.charset.StandardCharsets.UTF_8);
+    }
+
+    long nextLineAsLong() {
+        long value = parseLong(skipBlanks(firstOfLine()));
+        int c = skipBlanks(last);
+        if (c != '\\n' && c != -1) {
+            throw new NumberFormatException("invalid literal for int()");
+        }
+        return value;
+    }
+
+    int nextLineAsInt() {
+        return Math.toIntExact(nextLineAsLong());
+    }
+
+    double nextLineAsDouble() {
+        return Double.parseDouble(nextLine().strip());
+    }
+
+    java.util.List<String> nextLineTokens() {
+        java.util.List<String> tokens = new java.util.ArrayList<>();
+        java.util.StringTokenizer tokenizer = new java.util.StringTokenizer(nextLine());
+        while (tokenizer.hasMoreTokens()) {
+            tokens.add(tokenizer.nextToken());
+        }
+        return tokens;
+    }
+
+    java.util.List<Integer> nextLineInts() {
+        java.util.List<Integer> values = new java.util.ArrayList<>();
+        int c = skipBlanks(firstOfLine());
+        while (c != '\\n' && c != -1) {
+            values.add(Math.toIntExact(parseLong(c)));
+            c = skipBlanks(last);
+        }
+        return values;
+    }
+
+    java.util.List<Double> nextLineDoubles() {
+        java.util.List<Double> values = new java.util.ArrayList<>();
+        for (String token : nextLineTokens()) {
+            values.add(Double.parseDouble(token));
+        }
+        return values;
+    }
+}"""
+
+    # What asyncio's functions turn into in the futures async mode, where coroutines are CompletableFutures.
+    #  They run on virtual threads, so that await, which joins, parks one rather than tying up a pool's thread
+    _futures_coroutines_class = """final class Coroutines {
+    static final java.util.concurrent.ExecutorService executor = java.util.concurrent.Executors.newVirtualThreadPerTaskExecutor();
+
+    @SafeVarargs
+    static <T> java.util.concurrent.CompletableFuture<java.util.List<T>> gather(java.util.concurrent.CompletableFuture<? extends T>... futures) {
+        return java.util.concurrent.CompletableFuture.allOf(futures)
+                .thenApply(done -> java.util.Arrays.stream(futures).<T>map(java.util.concurrent.CompletableFuture::join).toList());
+    }
+
+    static java.util.concurrent.CompletableFuture<Void> sleep(double seconds) {
+        return java.util.concurrent.CompletableFuture.runAsync(() -> {}, java.util.concurrent.CompletableFuture.delayedExecutor(
+                (long) (seconds * 1e9), java.util.concurrent.TimeUnit.NANOSECONDS, executor));
+    }
+}"""
+
+    # And in the virtual threads async mode, where coroutines are plain blocking calls. gather runs each
+    #  task (see task) on a virtual thread of its own and waits for them all. create_task starts one
+    #  on its own, and awaiting what it gave joins it (awaiting anything else is just the value)
+    _virtual_threads_coroutines_class = """final class Coroutines {
+    static <T> java.util.concurrent.Callable<T> task(java.util.concurrent.Callable<T> task) {
+        return task;
+    }
+
+    static java.util.concurrent.Callable<Object> task(Runnable task) {
+        return java.util.concurrent.Executors.callable(task);
+    }
+
+    static <T> java.util.concurrent.Future<T> start(java.util.concurrent.Callable<T> task) {
+        java.util.concurrent.FutureTask<T> future = new java.util.concurrent.FutureTask<>(task);
+        Thread.ofVirtual().start(future);
+        return future;
+    }
+
+    static java.util.concurrent.Future<Object> start(Runnable task) {
+        return start(java.util.concurrent.Executors.callable(task));
+    }
+
+    static <T> T join(T value) {
+        return value;
+    }
+
+    static <T> T join(java.util.concurrent.Future<T> future) {
+        try {
+            return future.get();
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+            throw new java.util.concurrent.CancellationException("interrupted");
+        } catch (java.util.concurrent.ExecutionException e) {
+            throw e.getCause() instanceof RuntimeException cause ? cause : new java.util.concurrent.CompletionException(e.getCause());
+        }
+    }
+
+    @SafeVarargs
+    static <T> java.util.List<T> gather(java.util.concurrent.Callable<? extends T>... tasks) {
+        try (var executor = java.util.concurrent.Executors.newVirtualThreadPerTaskExecutor()) {
+            java.util.List<java.util.concurrent.Future<? extends T>> futures = new java.util.ArrayList<>();
+            for (var task : tasks) {
+                futures.add(executor.submit(task));
+            }
+            java.util.List<T> results = new java.util.ArrayList<>();
+            for (var future : futures) {
+                results.add(future.get());
+            }
+            return results;
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+            throw new java.util.concurrent.CancellationException("interrupted");
+        } catch (java.util.concurrent.ExecutionException e) {
+            throw e.getCause() instanceof RuntimeException cause ? cause : new java.util.concurrent.CompletionException(e.getCause());
+        }
+    }
+
+    static void sleep(double seconds) {
+        try {
+            Thread.sleep((long) (seconds * 1000));
+        } catch (InterruptedException e) {
+            Thread.currentThread().interrupt();
+            throw new java.util.concurrent.CancellationException("interrupted");
+        }
+    }
+}"""
+
+    # What the threads, pools, queues and semaphores of concurrent.futures, threading, multiprocessing and
+    #  queue need beyond their java.util.concurrent counterparts: futures of tasks, maps run on a pool, and
+    #  the waits that Java would have a checked InterruptedException or ExecutionException thrown out of
+    _concurrency_class = """final class Concurrency {
+    static <T> java.util.concurrent.CompletableFuture<T> submit(java.util.concurrent.ExecutorService pool, java.util.function.Supplier<T> task) {
+        return java.util.concurrent.CompletableFuture.supplyAsync(task, pool);
+    }
+
+    static java.util.concurrent.CompletableFuture<Void> submit(java.util.concurrent.ExecutorService pool, Runnable task) {
+        return java.util.concurrent.CompletableFuture.runAsync(task, pool);
+    }
+
+    static <T, R> java.util.List<R> map(java.util.concurrent.ExecutorService pool, java.util.function.Function<? super T, ? extends R> function,
+                                        Iterable<? extends T> items) {
+        java.util.List<java.util.concurrent.Callable<R>> tasks = new java.util.ArrayList<>();
+        for (T item : items) {
+            tasks.add(() -> function.apply(item));
+        }
+        java.util.List<R> results = new java.util.ArrayList<>();
+        try {
+            for (var future : pool.invokeAll(tasks)) {
+                results.add(future.get());
+            }
+        } catch (InterruptedException e) {
+            throw interrupted();
+        } catch (java.util.concurrent.ExecutionException e) {
+            throw e.getCause() instanceof RuntimeException cause ? cause : new java.util.concurrent.CompletionException(e.getCause());
+        }
+        return results;
+    }
+
+    static void close(java.util.concurrent.ExecutorService pool) {
+        pool.shutdown();
+        try {
+            while (!pool.awaitTermination(1, java.util.concurrent.TimeUnit.MINUTES)) {
+            }
+        } catch (InterruptedException e) {
+            pool.shutdownNow();
+            throw interrupted();
+        }
+    }
+
+    static void join(Thread thread) {
+        try {
+            thread.join();
+        } catch (InterruptedException e) {
+            throw interrupted();
+        }
+    }
+
+    static <T> void put(java.util.concurrent.BlockingQueue<T> queue, T item) {
+        try {
+            queue.put(item);
+        } catch (InterruptedException e) {
+            throw interrupted();
+        }
+    }
+
+    static <T> T take(java.util.concurrent.BlockingQueue<T> queue) {
+        try {
+            return queue.take();
+        } catch (InterruptedException e) {
+            throw interrupted();
+        }
+    }
+
+    static void acquire(java.util.concurrent.Semaphore semaphore) {
+        try {
+            semaphore.acquire();
+        } catch (InterruptedException e) {
+            throw interrupted();
+        }
+    }
+
+    private static java.util.concurrent.CancellationException interrupted() {
+        Thread.currentThread().interrupt();
+        return new java.util.concurrent.CancellationException("interrupted");
+    }
+}"""
+
+    # Loops known to run fewer times than this stay sequential. The ones that might not are left to ParallelLoops,
+    #  which goes by the same number once it knows
+    _parallel_min_trips = 10_000
+    _parallel_loops_class = """final class ParallelLoops {
+    static final int MIN_TRIPS = %d;
+
+    static java.util.stream.IntStream range(int start, int stop) {
+        var range = java.util.stream.IntStream.range(start, stop);
+        return (long) stop - start >= MIN_TRIPS ? range.parallel() : range;
+    }
+
+    static java.util.stream.LongStream range(long start, long stop) {
+        var range = java.util.stream.LongStream.range(start, stop);
+        return stop - start >= MIN_TRIPS ? range.parallel() : range;
+    }
+}""" % _parallel_min_trips
+
+    # 2-D NumPy arrays (of doubles), row after row in one array that loops over every element go straight through
+    _double_matrix_class = """final class DoubleMatrix {
+    final int rows, columns;
+    final double[] data;
+
+    DoubleMatrix(int rows, int columns) {
+        this(rows, columns, new double[rows * columns]);
+    }
+
+    DoubleMatrix(int rows, int columns, double[] data) {
+        this.rows = rows;
+        this.columns = columns;
+        this.data = data;
+    }
+
+    @Override
+    public String toString() {
+        var result = new StringBuilder("[");
+        for (int row = 0; row < rows; row++) {
+            result.append(row == 0 ? "" : ", ")
+                    .append(java.util.Arrays.toString(java.util.Arrays.copyOfRange(data, row * columns, (row + 1) * columns)));
+        }
+        return result.append("]").toString();
+    }
+
+    DoubleMatrix transpose() {
+        var result = new DoubleMatrix(columns, rows);
+        for (int row = 0; row < rows; row++) {
+            for (int column = 0; column < columns; column++) {
+                result.data[column * rows + row] = data[row * columns + column];
+            }
+        }
+        return result;
+    }
+}"""
+
+    # Where the instrument mode counts the calls and time of every Python function, by its index
+    #  in FUNCTIONS (filled in at the end, see _timed). Printed to stderr on the way out
+    _instrumented_functions_tag = 'INSTRUMENTED_FUNCTIONS'
+    _timings_class = """final class PythonTimings {
+    static final String[] FUNCTIONS = {%s};
+    static final java.util.concurrent.atomic.LongAdder[] CALLS = adders();
+    static final java.util.concurrent.atomic.LongAdder[] NANOS = adders();
+    static final java.util.concurrent.atomic.LongAccumulator[] MAX_NANOS = new java.util.concurrent.atomic.LongAccumulator[FUNCTIONS.length];
+
+    static {
+        for (int i = 0; i < FUNCTIONS.length; i++) {
+            MAX_NANOS[i] = new java.util.concurrent.atomic.LongAccumulator(Math::max, 0);
+        }
+        Runtime.getRuntime().addShutdownHook(new Thread(PythonTimings::report));
+    }
+
+    private static java.util.concurrent.atomic.LongAdder[] adders() {
+        java.util.concurrent.atomic.LongAdder[] adders = new java.util.concurrent.atomic.LongAdder[FUNCTIONS.length];
+        for (int i = 0; i < adders.length; i++) {
+            adders[i] = new java.util.concurrent.atomic.LongAdder();
+        }
+        return adders;
+    }
+
+    static void record(int function, long start) {
+        long nanos = System.nanoTime() - start;
+        CALLS[function].increment();
+        NANOS[function].add(nanos);
+        MAX_NANOS[function].accumulate(nanos);
+    }
+
+    static void report() {
+        System.err.println(String.format("%%10s %%14s %%12s  %%s", "calls", "total ms", "max ms", "function"));
+        for (int i = 0; i < FUNCTIONS.length; i++) {
+            long calls = CALLS[i].sum();
+            if (calls > 0) {
+                System.err.println(String.format("%%10d %%14.3f %%12.3f  %%s", calls, NANOS[i].sum() / 1e6,
+                        MAX_NANOS[i].get() / 1e6, FUNCTIONS[i]));
+            }
+        }
+    }
+}""" % _instrumented_functions_tag
+
+    # Stands in for a heapq heap that only ever holds ints, without boxing any of them
+    _long_heap_class = """final class LongHeap {
+    private long[] heap = new long[16];
+    private int size = 0;
+
+    void push(long value) {
+        if (size == heap.length) {
+            heap = java.util.Arrays.copyOf(heap, size * 2);
+        }
+        int index = size++;
+        while (index > 0) {
+            int parent = (index - 1) >>> 1;
+            if (heap[parent] <= value) {
+                break;
+            }
+            heap[index] = heap[parent];
+            index = parent;
+        }
+        heap[index] = value;
+    }
+
+    long pop() {
+        long top = peek();
+        long last = heap[--size];
+        int index = 0;
+        while (2 * index + 1 < size) {
+            int child = 2 * index + 1;
+            if (child + 1 < size && heap[child + 1] < heap[child]) {
+                child++;
+            }
+            if (last <= heap[child]) {
+                break;
+            }
+            heap[index] = heap[child];
+            index = child;
+        }
+        heap[index] = last;
+        return top;
+    }
+
+    long peek() {
+        if (size == 0) {
+            throw new java.util.NoSuchElementException();
+        }
+        return heap[0];
+    }
+
+    int size() {
+        return size;
+    }
+
+    boolean isEmpty() {
+        return size == 0;
+    }
+}"""
+
+    # The tuples of a heapq heap of tuples, which compare element by element, like Python's. Numbers of
+    #  different boxes compare by value, and tuples inside tuples compare the same way
+    _heap_tuples_class = """final class Tuples {
+    static java.util.List<Object> of(Object... elements) {
+        return java.util.Arrays.asList(elements);
+    }
+
+    static java.util.PriorityQueue<java.util.List<Object>> heap(java.util.Collection<java.util.List<Object>> tuples) {
+        java.util.PriorityQueue<java.util.List<Object>> heap = new java.util.PriorityQueue<>(Tuples::compare);
+        heap.addAll(tuples);
+        return heap;
+    }
+
+    static int compare(java.util.List<Object> a, java.util.List<Object> b) {
+        for (int i = 0; i < Math.min(a.size(), b.size()); i++) {
+            int order = compareElements(a.get(i), b.get(i));
+            if (order != 0) {
+                return order;
+            }
+        }
+        return Integer.compare(a.size(), b.size());
+    }
+
+    @SuppressWarnings("unchecked")
+    private static int compareElements(Object a, Object b) {
+        if (a instanceof java.util.List && b instanceof java.util.List) {
+            return compare((java.util.List<Object>) a, (java.util.List<Object>) b);
+        }
+        if (a instanceof Number x && b instanceof Number y && a.getClass() != b.getClass()) {
+            return Double.compare(x.doubleValue(), y.doubleValue());
+        }
+        return ((Comparable<Object>) a).compareTo(b);
+    }
+}"""
+
+    # A deque with a maxlen. Adding to a full one drops what's at the other end, like Python's does
+    _bounded_deque_class = """final class BoundedDeque<E> extends java.util.ArrayDeque<E> {
+    private final int maxlen;
+
+    BoundedDeque(int maxlen) {
+        this.maxlen = maxlen;
+    }
+
+    BoundedDeque(java.util.Collection<? extends E> elements, int maxlen) {
+        this.maxlen = maxlen;
+        addAll(elements);
+    }
+
+    @Override
+    public void addLast(E element) {
+        if (maxlen == 0) {
+            return;
+        }
+        if (size() == maxlen) {
+            pollFirst();
+        }
+        super.addLast(element);
+    }
+
+    @Override
+    public void addFirst(E element) {
+        if (maxlen == 0) {
+            return;
+        }
+        if (size() == maxlen) {
+            pollLast();
+        }
+        super.addFirst(element);
+    }
+}"""
+
+    # bisect's searches. Collections.binarySearch finds any one of several equal elements, where
+    #  bisect_left and bisect_right promise the first and last, so they search for themselves
+    _bisect_methods = {
+        'bisect_left': """<T extends Comparable<? super T>> int bisectLeft(java.util.List<? extends T> list, T value, int low, int high) {
+    while (low < high) {
+        int middle = (low + high) >>> 1;
+        if (list.get(middle).compareTo(value) < 0) {
+            low = middle + 1;
+        } else {
+            high = middle;
+        }
+    }
+    return low;
+}""",
+        'bisect_right': """<T extends Comparable<? super T>> int bisectRight(java.util.List<? extends T> list, T value, int low, int high) {
+    while (low < high) {
+        int middle = (low + high) >>> 1;
+        if (value.compareTo(list.get(middle)) < 0) {
+            high = middle;
+        } else {
+            low = middle + 1;
+        }
+    }
+    return low;
+}""",
+    }
+
     _lazy_scope_vars_tag = 'LAZY_SCOPE_VARS'
     _move_up_tag = 'MOVE_UP_LINE'
+    # Starts every line with the Python line it came from, until the end of _post_process
+    _source_line_tag = 'SOURCE_LINE'
     _type_replacmeent_tag_suffix = 'REPLACE_THIS_TYPE'
+    _boxed_type_replacement_tag_suffix = 'REPLACE_THIS_BOXED_TYPE'
+    # supply or run, for CompletableFuture.supplyAsync or runAsync, by whether the function returns anything
+    _async_kind_tag_suffix = 'ASYNC_KIND'
     _for_scope_prefix = 'for_'
     _class_scope_prefix = 'class_'
     _function_scope_prefix = 'func_'
@@ -62,32 +1054,68 @@ class _JavaUnparser(ast._Unparser):
             return self._python_to_java_types.get(node.id)
         elif isinstance(node, ast.Subscript):
             return f"{self._python_to_java_types.get(node.value.id)}<{self._process_type_hint(node.slice)}>"
-        print('WARNING, CANNOT PROCESS TYPE HINT', node)
+        elif self._qualified_name(node) == 'numpy.ndarray':
+            # Of doubles, for all the hint says
+            return 'double[]'
+        self._warn('WARNING, CANNOT PROCESS TYPE HINT', node)
+
+    _builtin_return_types = {'int': int, 'len': int, 'float': float, 'str': str, 'bool': bool}
 
     # Custom utility functions will be defined above __init__
     def _get_python_type(self, node):
+        if self._uses_numpy and (array_type := self._array_python_type(node)) is not None:
+            return array_type
         if isinstance(node, ast.Constant):
             return type(node.value)
         elif isinstance(node, ast.Name):
             type_from_scope = self._in_scope(node.id)
             if type_from_scope:
                 return type_from_scope
+        elif isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice) or isinstance(node, ast.Await):
+            return self._get_python_type(node.value)
+        elif isinstance(node, ast.Subscript) and self._get_python_type(node.value) == str:
+            return str
+        elif self._makes_dict(node):
+            return dict
+        elif isinstance(node, (ast.Set, ast.SetComp)) \
+                or isinstance(node, ast.Call) and self._dotted_name(node.func) == 'set' and not self._in_scope('set'):
+            return set
+        elif isinstance(node, ast.UnaryOp):
+            # Down to the bottom of - - x without recursing
+            while isinstance(node, ast.UnaryOp) and not isinstance(node.op, ast.Not):
+                node = node.operand
+            return bool if isinstance(node, ast.UnaryOp) else self._get_python_type(node)
+        elif isinstance(node, ast.Call) and self._is_random_module_call(node):
+            return {'randint': int, 'randrange': int, 'random': float, 'uniform': float}.get(self._random_function(node), object)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in self._builtin_return_types and not self._in_scope(node.func.id):
+            return self._builtin_return_types[node.func.id]
+        elif (indexed_type := self._indexed_type(node)) and indexed_type.split('<')[0] in self._indexed_python_types:
+            return self._indexed_python_types[indexed_type.split('<')[0]]
         if isinstance(node, ast.BinOp):
-            operator = self.binop[node.op.__class__.__name__]
-            # If it's a basic math operator...
-            if operator in ['+', '-', '*', '/', '%', '**', '//']:
-                # Then if the left or a right is a float, it's a float
-                left_type = self._get_python_type(node.left)
-                if left_type == float:
-                    return float
-                right_type = self._get_python_type(node.right)
-                if right_type == float:
-                    return float
-                # If either are ints and we're doing division, it's float also
-                if operator == '/' and int in [left_type, right_type]:
-                    return float
-                # Otherwise, let's assume the type is the type of the left
-                return left_type
+            # Down the left of a chain like a + b + c + ... and back up, rather than recursing through all of it
+            chain = self._left_chain(node)
+            python_type = self._get_python_type(chain[-1].left)
+            for part in reversed(chain):
+                python_type = self._binop_python_type(part, python_type)
+            return python_type
+        return object
+
+    def _binop_python_type(self, node, left_type):
+        operator = self.binop[node.op.__class__.__name__]
+        # If it's a basic math operator...
+        if operator in ['+', '-', '*', '/', '%', '**', '//']:
+            # Then if the left or a right is a float, it's a float
+            if left_type == float:
+                return float
+            right_type = self._get_python_type(node.right)
+            if right_type == float:
+                return float
+            # If either are ints and we're doing division, it's float also
+            if operator == '/' and int in [left_type, right_type]:
+                return float
+            # Otherwise, let's assume the type is the type of the left
+            return left_type
         return object
 
     # TODO: Going to need additional context to handle float vs double, etc...
@@ -109,9 +1137,21 @@ class _JavaUnparser(ast._Unparser):
     # Also support string versions for type hints
     _python_to_java_types.update({key.__name__: value for key, value in
                                   _python_to_java_types.items() if not isinstance(key, str) and hasattr(key, '__name__')})
-    _java_to_python_types = {value: key for key, value in _python_to_java_types.items()}
+    _java_to_python_types = {value: key for key, value in _python_to_java_types.items() if isinstance(key, type)}
+    # NumPy arrays (see _array_kind) go by the Java type they are
+    _array_java_types = {('double', 1): 'double[]', ('int', 1): 'int[]', ('boolean', 1): 'boolean[]',
+                         ('double', 2): 'DoubleMatrix'}
+    _python_to_java_types.update({java_type: java_type for java_type in _array_java_types.values()})
+    _java_to_python_types.update({java_type: java_type for java_type in _array_java_types.values()})
 
     def _get_java_type(self, node, python_type=None):
+        if isinstance(node, ast.Await):
+            # What the awaited call gives back, once it has
+            return self._get_java_type(node.value, python_type)
+        if self._uses_numpy and (reduction := self._array_reduction(node)) is not None:
+            return self._array_reduction_type(*reduction)
+        if python_type in (None, int) and (java_int_type := self._java_int_type(node)):
+            return java_int_type
         if isinstance(node, ast.Constant):
             # Must check booleans before ints
             if isinstance(node.value, bool):
@@ -121,10 +1161,32 @@ class _JavaUnparser(ast._Unparser):
                     return 'int'
                 else:
                     return 'long'
+        if python_type in (None, object) and (indexed_type := self._indexed_type(node)):
+            return indexed_type
         if python_type is None:
             python_type = self._get_python_type(node)
         return self._python_to_java_types.get(python_type, 'Object')
 
+    _indexed_python_types = {**_java_to_python_types, 'long': int}
+
+    def _indexed_type(self, node):
+        """
+        The Java type a call to a function or class imported from elsewhere in the package
+        makes, going by the symbol index, or None if there's no telling
+        """
+        if not self.symbol_index or not isinstance(node, ast.Call) \
+                or not (name := self._qualified_name(node.func)):
+            return None
+        symbol = self.symbol_index.lookup(name)
+        if symbol is None:
+            return None
+        kind, definition = symbol
+        if kind == 'class':
+            return name.split('.')[-1]
+        if definition['returns'] in ('void', 'Object'):
+            return None
+        return definition['returns']
+
     def _write_above(self, text):
         self.write(f"<{self._move_up_tag}>{text}</{self._move_up_tag}>")
 
@@ -132,22 +1194,75 @@ class _JavaUnparser(ast._Unparser):
         with self.delimit(f"<{self._move_up_tag}>", f"</{self._move_up_tag}>"):
             self.traverse(node)
 
+    def fill(self, text=""):
+        self.maybe_newline()
+        if self._python_line is not None:
+            self.write(f"<{self._source_line_tag}>{self._python_line}</{self._source_line_tag}>")
+        self.write("    " * self._indent + text)
+
+    def _source_line_tags(self, line):
+        """*line* without its source line tags, and the Python line the last of them says (or None)"""
+        tags = re.findall(rf'<{self._source_line_tag}>(\d+)</{self._source_line_tag}>', line)
+        return re.sub(rf'<{self._source_line_tag}>\d+</{self._source_line_tag}>', '', line), \
+            int(tags[-1]) if tags else None
+
+    def _move_up(self, source):
+        """Put whatever is tagged to be moved up on lines of its own, above the line it's in and indented like it"""
+        open_tag, close_tag = f"<{self._move_up_tag}>", f"</{self._move_up_tag}>"
+        lines = []
+        for line in source.split('\n'):
+            if open_tag not in line:
+                lines.append(line)
+                continue
+            start = re.match(rf'(<{self._source_line_tag}>\d+</{self._source_line_tag}>)?[^\S\r\n]*', line).group()
+            kept, moved, open_segments = [], [], []
+            for piece in re.split(f"({re.escape(open_tag)}|{re.escape(close_tag)})", line):
+                if piece == open_tag:
+                    open_segments.append([])
+                elif piece == close_tag:
+                    # Whatever was moved up out of this goes above it
+                    moved.append(''.join(open_segments.pop()))
+                else:
+                    (open_segments[-1] if open_segments else kept).append(piece)
+            lines.extend(start + segment for segment in moved)
+            lines.append(''.join(kept))
+        return '\n'.join(lines)
+
+    def _strip(self, source):
+        """source.strip(), minding the source line tags"""
+        lines = source.split('\n')
+        while lines and not self._source_line_tags(lines[0])[0].strip():
+            lines.pop(0)
+        while lines and not self._source_line_tags(lines[-1])[0].strip():
+            lines.pop()
+        if lines:
+            tag, rest = re.match(rf'((?:<{self._source_line_tag}>\d+</{self._source_line_tag}>)?)(.*)', lines[0]).groups()
+            lines[0] = tag + rest.lstrip()
+            lines[-1] = lines[-1].rstrip()
+        return '\n'.join(lines)
+
     def _post_process(self, source):
         # Move up all the lines that need moving up
-        source = re.sub(rf'[\n](.*?)<{self._move_up_tag}>(.*)</{self._move_up_tag}>', r'\2\n\1', '\n' + source)
-        # TODO: Probably a bad hackfix for overlap. May not work in all situations...
-        source = re.sub(rf'</{self._move_up_tag}><{self._move_up_tag}>', '\n', source)
-        source = source.strip()
-
-        # Update function return types and such
-        for replacement_tag, replacement in self._type_replacements.items():
-            source = source.replace(replacement_tag, replacement)
+        source = self._strip(self._move_up(source))
 
         # Lazy scope
         for scope in self.scopes:
             lazy_scope_tag = f"<{self._lazy_scope_vars_tag}>{scope}</{self._lazy_scope_vars_tag}>"
+            whitespace = re.search(rf'([^\S\r\n]*){lazy_scope_tag}', source) or ''
+            if whitespace != '':
+                whitespace = ' ' * (whitespace.regs[-1][1] - whitespace.regs[-1][0])
             lazy_scope = []
+            source_lines = []
             for java_type, node, value in self._lazy_scope.get(scope, []):
+                if java_type is None:
+                    # Hoisted declarations (see _hoist) are already complete lines
+                    first_line, *other_lines = node.split('\n')
+                    lazy_scope.append('\n'.join([first_line] + [f"{whitespace}{line}" if line else ''
+                                                                 for line in other_lines]))
+                    source_lines.append(None)
+                    continue
+                # Declared where it's first assigned
+                source_lines.append(getattr(node, 'lineno', None))
                 if isinstance(node, str):
                     target_str = node
                 elif isinstance(node, ast.Name):
@@ -161,17 +1276,99 @@ class _JavaUnparser(ast._Unparser):
                     lazy_scope[-1] += f" = {value}"
                 lazy_scope[-1] += ';'
             # Deduplicae and preserve order
-            lazy_scope = list(sorted(set(lazy_scope), key=lambda x: lazy_scope.index(x)))
-            whitespace = re.search(rf'([^\S\r\n]*){lazy_scope_tag}', source) or ''
-            if whitespace != '':
-                whitespace = ' ' * (whitespace.regs[-1][1] - whitespace.regs[-1][0])
+            first_source_lines = {}
+            for declaration, source_line in zip(lazy_scope, source_lines):
+                first_source_lines.setdefault(declaration, source_line)
+            lazy_scope = [declaration if source_line is None else
+                          f"<{self._source_line_tag}>{source_line}</{self._source_line_tag}>{declaration}"
+                          for declaration, source_line in first_source_lines.items()]
             lazy_scope = f'\n{whitespace}'.join(lazy_scope)
             # source = re.sub(rf'([^\S\r\n]*){lazy_scope_tag}', lazy_scope, source)
-            source = re.sub(rf'{lazy_scope_tag}', lazy_scope, source)
-        return source
+            source = re.sub(rf'{lazy_scope_tag}', lambda _: lazy_scope, source)
 
+        # Things hoisted outside of any class go at the very top
+        if self._preamble:
+            source = '\n'.join(self._preamble) + '\n\n' + source
 
-    def __init__(self):
+        # Update function return types and such (including the ones in hoisted declarations)
+        for boxed_tag, replacement_tag in self._boxed_type_replacements.items():
+            java_type = self._type_replacements.get(replacement_tag, 'Object')
+            self._type_replacements[boxed_tag] = self._boxed_java_types.get(java_type, java_type)
+        for kind_tag, replacement_tag in self._async_kinds.items():
+            self._type_replacements[kind_tag] = \
+                'run' if self._type_replacements.get(replacement_tag, replacement_tag) == 'void' else 'supply'
+        for replacement_tag, replacement in self._type_replacements.items():
+            source = source.replace(replacement_tag, replacement)
+
+        lines = []
+        self.line_map = []
+        for line in source.split('\n'):
+            line, source_line = self._source_line_tags(line)
+            lines.append(line)
+            self.line_map.append(source_line)
+        return '\n'.join(lines)
+
+    def _hoist(self, declaration):
+        """
+        Declare something once for the whole program: as a static member of the enclosing class,
+        or at the top of the output if there isn't one. Returns whether it went into a class.
+        """
+        for scope in reversed(self.current_scopes):
+            if scope.startswith(self._class_scope_prefix):
+                self._lazy_scope[scope].append((None, f"static {declaration}", None))
+                return True
+        if declaration not in self._preamble:
+            self._preamble.append(declaration)
+        return False
+
+    @contextmanager
+    def _timed(self, name):
+        """In the instrument mode, record the calls and time of the function body written inside as *name*"""
+        if not self.instrument:
+            yield
+            return
+        outer = self._timed_functions[-1] if self._timed_functions else self._current_class
+        qualified_name = f"{outer}.{name}" if outer else name
+        index = len(self._instrumented_functions)
+        self._instrumented_functions.append(qualified_name)
+        self._type_replacements[self._instrumented_functions_tag] = \
+            ', '.join(json.dumps(function) for function in self._instrumented_functions)
+        if self._timings_class not in self._preamble:
+            self._preamble.append(self._timings_class)
+        # Nested functions can't shadow the one of the function they're in
+        start = f"start_nanos{len(self._timed_functions) or ''}"
+        if start in self._program_names:
+            start = self._unique_name(start)
+        self.fill(f"long {start} = System.nanoTime();")
+        self.fill("try ")
+        self._timed_functions.append(qualified_name)
+        with self.block(begins_scope=False, ends_scope=False):
+            yield
+        self._timed_functions.pop()
+        self.write(" finally ")
+        with self.block(begins_scope=False, ends_scope=False):
+            self.fill(f"PythonTimings.record({index}, {start});")
+
+    def _stdout_writer(self):
+        """
+        The buffered stand-in for System.out used by the buffered output mode. There's the one, at the top
+        of the output, that classes print through too, so everything comes out in the order it was printed.
+        It flushes itself at exit too, so what's printed before an exception or System.exit isn't lost
+        """
+        name = 'stdout'
+        declaration = f"final java.io.PrintWriter {name} = " \
+                      f"new java.io.PrintWriter(new java.io.FileOutputStream(java.io.FileDescriptor.out)) {{{{\n" \
+                      f"    Runtime.getRuntime().addShutdownHook(new Thread(this::flush));\n" \
+                      f"}}}};"
+        if declaration not in self._preamble:
+            self._preamble.append(declaration)
+        self._flush_stdout_at_exit = True
+        return name
+
+
+    def __init__(self, buffered_output=False, fast_input=False, optimize=True, symbol_index=None, package=None,
+                 rules=None, instrument=False, async_mode=ASYNC_MODE, parallel_loops=PARALLEL_LOOPS, source=None,
+                 messages=None):
         # self._source = []
         # self._buffer = []
         # self._precedences = {}
@@ -190,8 +1387,93 @@ class _JavaUnparser(ast._Unparser):
         self.current_scopes = ['global']
         # Maps a string to be replaced later with the type to replace it with
         self._type_replacements = {}
+        # Maps a string to be replaced later with the boxed version of another replacement
+        self._boxed_type_replacements = {}
         self._current_class = None
         self._current_function = None
+        # Maps string accumulators of the loops being emitted to their StringBuilder
+        self._string_builders = {}
+        # Every helper variable name generated so far, so they never collide
+        self._generated_names = set()
+        # Declarations hoisted to the top of the output (see _hoist)
+        self._preamble = []
+        # Where warnings about what doesn't translate go, when not stdout (see _warn)
+        self.messages = messages
+        # Send print() through one buffered PrintWriter instead of System.out
+        self.buffered_output = buffered_output
+        self._flush_stdout_at_exit = False
+        # Read input() through one FastInput instead of a java.util.Scanner
+        self.fast_input = fast_input
+        # Time every function through PythonTimings, by its Python name, and the ones being timed right now
+        self.instrument = instrument
+        self._instrumented_functions = []
+        self._timed_functions = []
+        # How async functions run (see ASYNC_MODE), and {kind tag: the return type tag it depends on}
+        self.async_mode = async_mode
+        self._async_kinds = {}
+        # Run loops in parallel where that can't change what they do: all of them, or the lines the
+        #  source marks with `# parallel`. And {id(loop): how (see _parallel_plan)}
+        self.parallel_loops = parallel_loops
+        self._parallel_pragmas = self._pragma_lines(source, 'parallel')
+        self._parallel_loops = {}
+        # The assignments that declare a variable of the block they're in, rather than of the program
+        self._block_declarations = set()
+        # NumPy arrays, {name key: (element type, dimensions)} (see _array_kind), and {id(node): the Java for what
+        #  it makes}, for the arrays worked out ahead of the statement they're in (see _lower_arrays)
+        self._uses_numpy = False
+        self._arrays = {}
+        self._array_functions = {}
+        self._array_values = {}
+        self._has_main_method = False
+        # Run the module through _Optimizer first
+        self.optimize = optimize
+        # Set while writing a value that goes into a long, so int arithmetic gets widened before it overflows
+        self._long_context = False
+        # What each function's return range is filed under in _value_ranges, by function scope
+        self._function_return_keys = {}
+        # The integer type each function hinted to return an int returns, by function scope
+        self._hinted_int_types = {}
+        # Values known to fit the variable (or return type) they get assigned to
+        self._assigned_java_types = {}
+        # Nodes made up during translation that _name_keys knows about. Kept alive so their ids stay theirs
+        self._synthetic_nodes = []
+        # {id(sequence): the variable it was put in}, for sequences indexed from the end (see _write_sequence)
+        self._sequence_variables = {}
+        self._program_names = set()
+        # {id(the list a heap starts out as): what it's made as instead}
+        self._heap_constructions = {}
+        # {name key or self attribute: what of concurrent.futures, threading, ... it holds}
+        self._concurrency_objects = {}
+        # {(class scope or None, literal source): the set hoisted for probing it}
+        self._membership_sets = {}
+        # The records tuple returning functions return instead, by function scope (see _find_tuple_functions)
+        self._function_records = {}
+        # How calls and attributes get lowered (see RewriteRules)
+        self.rules = rules or RULES
+        # The line of the Python statement being translated, and after that, the one each line
+        #  of the translation came from (or None), by Java line (see SourceMap)
+        self._python_line = None
+        self.line_map = []
+        # What the rest of the package defines (see SymbolIndex), and the package relative imports start from
+        self.symbol_index = symbol_index
+        self.package = package
+        # {(class name or None, function name): its Java return type, or the tag standing in for it}
+        self._return_types = {}
+        # {id(node): (node, what _range_of and _java_int_type said about it)}, so a chain of operators
+        #  gets looked at once rather than once for every operator in it. Holding on to the node keeps its id its own
+        self._ranges = {}
+        self._java_int_types = {}
+        # {id(node): parent node} for the tree being translated
+        self._parent_nodes = {}
+
+    def _unique_name(self, base):
+        name = base
+        suffix = 0
+        while name in self._generated_names or name in self._program_names or self._in_scope(name):
+            suffix += 1
+            name = f"{base}{suffix}"
+        self._generated_names.add(name)
+        return name
 
     # def interleave(self, inter, f, seq):
     #     """Call f on each item in seq, calling inter() in between."""
@@ -226,6 +1508,10 @@ class _JavaUnparser(ast._Unparser):
     #     self.maybe_newline()
     #     self.write("    " * self._indent + text)
     #
+    def _warn(self, *parts):
+        """Say what didn't translate (or not quite), on stdout unless the unparser was given its own *messages*"""
+        print(*parts, file=self.messages or sys.stdout)
+
     def write(self, text):
         """Append a piece of text"""
         if DEBUG:
@@ -319,16 +1605,1223 @@ class _JavaUnparser(ast._Unparser):
         if isinstance(node, list):
             for item in node:
                 self.traverse(item)
+        elif id(node) in self._array_values:
+            # Worked out ahead of the statement
+            self.write(self._array_values[id(node)])
+        elif isinstance(node, ast.stmt) and getattr(node, 'lineno', None) is not None:
+            # Every line this writes is from this statement (see SourceMap)
+            outer_line, self._python_line = self._python_line, node.lineno
+            if not self._uses_numpy:
+                ast.NodeVisitor.visit(self, node)
+            else:
+                array_values = self._array_values.copy()
+                if not self._lower_arrays(node):
+                    ast.NodeVisitor.visit(self, node)
+                self._array_values = array_values
+            self._python_line = outer_line
         else:
             ast.NodeVisitor.visit(self, node)
 
+    _threading_modules = {'threading', 'concurrent', 'multiprocessing'}
+    _record_component_names = ['first', 'second', 'third', 'fourth']
+
+    def _find_tuple_functions(self, tree):
+        """
+        Find the functions that always return a tuple of the same size, and name a record for each to return instead.
+        Returns {id(function): (record name, component names, component type tags)}
+        """
+        records = {}
+        for function in ast.walk(tree):
+            if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            returns = [node for node in self._walk_body(function.body) if isinstance(node, ast.Return)]
+            if not returns or not all(isinstance(node.value, ast.Tuple) for node in returns) \
+                    or len({len(node.value.elts) for node in returns}) != 1 or len(returns[0].value.elts) < 2:
+                continue
+            size = len(returns[0].value.elts)
+            # Name the components after what gets returned, if it's always just variables
+            components = next(([element.id for element in node.value.elts] for node in returns
+                               if all(isinstance(element, ast.Name) and element.id != 'self'
+                                      for element in node.value.elts)
+                               and len({element.id for element in node.value.elts}) == size), None)
+            if components is None:
+                components = self._record_component_names[:size] if size <= len(self._record_component_names) \
+                    else [f"value{index}" for index in range(size)]
+            name = self._unique_name(''.join(part[:1].upper() + part[1:] for part in function.name.split('_')) + 'Result')
+            type_tags = [uuid4().hex + self._type_replacmeent_tag_suffix for _ in components]
+            self._type_replacements.update((tag, 'Object') for tag in type_tags)
+            records[id(function)] = (name, components, type_tags)
+        # Calls find them by name
+        names = [function.name for function in ast.walk(tree)
+                 if isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        self._tuple_functions_by_name = {function.name: records[id(function)] for function in ast.walk(tree)
+                                         if id(function) in records and names.count(function.name) == 1}
+        # What they return has to only be unpacked or indexed with constants, straight away or from a variable
+        #  that's only used that way. Anything else, like print(f()), wants the tuple
+        self._record_variables = {}
+        declined = self._find_record_uses(tree)
+        self._tuple_functions_by_name = {name: record for name, record in self._tuple_functions_by_name.items()
+                                         if name not in declined}
+        kept = list(self._tuple_functions_by_name.values())
+        self._record_variables = {key: record for key, record in self._record_variables.items() if record in kept}
+        return {key: record for key, record in records.items() if record in kept}
+
+    def _find_record_uses(self, tree):
+        """
+        Work out which variables hold what a tuple returning function returned (into _record_variables), and
+        return the names of the functions whose results are used as more than the elements of it
+        """
+        parents = self._parents(tree)
+        declined = set()
+        stored = {}
+        for node in ast.walk(tree):
+            parent = parents.get(id(node))
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in self._tuple_functions_by_name \
+                    and not (isinstance(parent, ast.Call) and parent.func is node):
+                # Passed around rather than called
+                declined.add(node.id)
+            elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                stored.setdefault(self._name_keys.get(id(node)), []).append(parent)
+            if not isinstance(node, ast.Call) or (record := self._called_record(node)) is None:
+                continue
+            name = node.func.id if isinstance(node.func, ast.Name) else node.func.attr
+            if self._is_record_element(node, parent, record) or isinstance(parent, ast.Assign) \
+                    and len(parent.targets) == 1 and isinstance(parent.targets[0], ast.Tuple) \
+                    and len(parent.targets[0].elts) == len(record[1]):
+                continue
+            if isinstance(parent, ast.Assign) and len(parent.targets) == 1 and isinstance(parent.targets[0], ast.Name) \
+                    and (key := self._name_keys.get(id(parent.targets[0]))) is not None \
+                    and self._record_variables.setdefault(key, record) == record:
+                continue
+            declined.add(name)
+        # The variables have to only ever be assigned those results, and then only be read for their elements
+        for key, record in list(self._record_variables.items()):
+            if any(not (isinstance(store, ast.Assign) and self._called_record(store.value) == record)
+                   for store in stored.get(key, [])) \
+                    or any(isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and self._name_keys.get(id(node)) == key
+                           and not self._is_record_element(node, parents.get(id(node)), record)
+                           and not (isinstance(parents.get(id(node)), ast.Assign)
+                                    and isinstance(parents[id(node)].targets[0], ast.Tuple)
+                                    and len(parents[id(node)].targets[0].elts) == len(record[1]))
+                           for node in ast.walk(tree)):
+                declined.update(function for function, each in self._tuple_functions_by_name.items() if each == record)
+                del self._record_variables[key]
+        return declined
+
+    def _is_record_element(self, node, parent, record):
+        """Whether *parent* gets one element of the record *node* is, like x[0] or f()[-1]"""
+        return isinstance(parent, ast.Subscript) and parent.value is node and isinstance(parent.ctx, ast.Load) \
+            and self._record_index(parent.slice, record) is not None
+
+    def _record_index(self, index, record):
+        """Which component of *record* the constant *index* gets, or None"""
+        size = len(record[1])
+        if (from_end := self._negative_index(index)) is not None:
+            return size - from_end if from_end <= size else None
+        if isinstance(index, ast.Constant) and type(index.value) is int and index.value < size:
+            return index.value
+        return None
+
+    def _record_of(self, node):
+        """The record *node* is, if it's a call of a tuple returning function or a variable holding what one returned"""
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            return self._record_variables.get(self._name_keys.get(id(node)))
+        return self._called_record(node)
+
+    def _called_record(self, node):
+        """The record returned by the function *node* calls, if it's one of the tuple returning ones"""
+        if not isinstance(node, ast.Call):
+            return None
+        if isinstance(node.func, ast.Name):
+            return self._tuple_functions_by_name.get(node.func.id)
+        if isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name) \
+                and self.NAME_TRANSLATIONS.get(node.func.value.id) == 'this':
+            return self._tuple_functions_by_name.get(node.func.attr)
+        return None
+
+    # Builtins that only read the sequences they're given, and don't hold on to them
+    _read_only_builtins = {'len', 'print', 'sum', 'min', 'max', 'sorted', 'any', 'all', 'list', 'set', 'tuple',
+                           'enumerate', 'reversed', 'str'}
+    # List methods that change the list
+    _mutating_list_methods = {'append', 'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse'}
+
+    @staticmethod
+    def _parents(tree):
+        """{id(node): parent node} for everything under *tree*"""
+        return {id(child): parent for parent in ast.walk(tree) for child in ast.iter_child_nodes(parent)}
+
+    def _is_read_only_use(self, node, parent):
+        """Whether *parent* only reads the sequence *node* evaluates to, without keeping or changing it"""
+        if isinstance(parent, (ast.For, ast.comprehension)):
+            return node is parent.iter
+        if isinstance(parent, ast.Call):
+            if node is parent.func:
+                return False
+            if isinstance(parent.func, ast.Name):
+                return parent.func.id in self._read_only_builtins
+            # ''.join(xs[1:]) and the like
+            return isinstance(parent.func, ast.Attribute) and isinstance(parent.func.value, ast.Constant) \
+                and isinstance(parent.func.value.value, str)
+        if isinstance(parent, ast.Subscript):
+            return node is parent.value and isinstance(parent.ctx, ast.Load)
+        if isinstance(parent, ast.Attribute):
+            return parent.attr not in self._mutating_list_methods
+        return isinstance(parent, (ast.Compare, ast.BinOp))
+
+    def _find_slice_views(self, tree, parents):
+        """
+        The slices that are only read where they're made, and can be views of what they slice instead of copies.
+        xs[:] is asked for because it's a copy, so it always is one
+        """
+        return {id(node) for node in ast.walk(tree)
+                if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice)
+                and isinstance(node.ctx, ast.Load) and id(node) in parents
+                and (node.slice.lower is not None or node.slice.upper is not None)
+                and self._is_read_only_use(node, parents[id(node)])
+                and not self._changed_while_viewed(node, parents)}
+
+    def _changed_while_viewed(self, node, parents):
+        """
+        Whether what the slice *node* slices could change while a loop is still going over the slice,
+        like `for x in xs[:]: xs.remove(x)`. A view would throw ConcurrentModificationException there
+        """
+        parent = parents[id(node)]
+        if isinstance(parent, ast.For):
+            looped = parent.body
+        elif isinstance(parent, ast.comprehension) and id(parent) in parents:
+            looped = [parents[id(parent)]]
+        else:
+            # Everything else is done with the slice before anything else runs
+            return False
+        sliced = ast.dump(node.value)
+        return any(ast.dump(other) == sliced and id(other) in parents
+                   and not self._is_read_only_use(other, parents[id(other)])
+                   for statement in looped for other in ast.walk(statement) if other is not node)
+
+    def _find_backtracking(self, tree, parents):
+        """
+        Find the recursive calls that pass `route + [x]` in the place of the caller's own `route` parameter.
+        They can push x onto route before the call and pop it after, instead of copying route each time,
+        as long as nothing else changes route, and the places it escapes take a copy.
+        Returns ({id(call): (parameter, pushed elements, argument index)}, {id(name) of the escaping reads})
+        """
+        calls = {}
+        escapes = set()
+        methods = {id(statement) for node in ast.walk(tree) if isinstance(node, ast.ClassDef)
+                   for statement in node.body if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef))
+                   and statement.args.args and statement.args.args[0].arg == 'self'}
+        for function in ast.walk(tree):
+            if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            is_method = id(function) in methods
+            parameters = [argument.arg for argument in function.args.args][1 if is_method else 0:]
+            body = list(self._walk_body(function.body))
+            # Closures could keep hold of the list
+            nested = [node for node in body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda))]
+            for index, parameter in enumerate(parameters):
+                if any(isinstance(node, ast.Name) and node.id == parameter
+                       for scope in nested for node in ast.walk(scope)):
+                    continue
+                pushes = {}
+                pushed = set()
+                for node in body:
+                    if not isinstance(node, ast.Call) or len(node.args) <= index \
+                            or not isinstance(parents.get(id(node)), (ast.Assign, ast.Expr, ast.Return)):
+                        continue
+                    if is_method:
+                        recursive = isinstance(node.func, ast.Attribute) and node.func.attr == function.name \
+                            and isinstance(node.func.value, ast.Name) and node.func.value.id == 'self'
+                    else:
+                        recursive = isinstance(node.func, ast.Name) and node.func.id == function.name
+                    argument = node.args[index]
+                    if recursive and isinstance(argument, ast.BinOp) and isinstance(argument.op, ast.Add) \
+                            and isinstance(argument.left, ast.Name) and argument.left.id == parameter \
+                            and isinstance(argument.right, ast.List) and argument.right.elts \
+                            and not any(isinstance(element, ast.Starred) for element in argument.right.elts):
+                        pushes[id(node)] = (parameter, argument.right.elts, index)
+                        pushed.add(id(argument.left))
+                if not pushes:
+                    continue
+                copies = set()
+                for node in body:
+                    if not isinstance(node, ast.Name) or node.id != parameter or id(node) in pushed:
+                        continue
+                    parent = parents[id(node)]
+                    if not isinstance(node.ctx, ast.Load) or isinstance(parent, ast.Subscript) and parent.value is node \
+                            and not isinstance(parent.ctx, ast.Load) or isinstance(parent, ast.Attribute) \
+                            and parent.attr in self._mutating_list_methods:
+                        # Something changes the list itself, so every call needs its own
+                        break
+                    if not self._is_read_only_use(node, parent):
+                        copies.add(id(node))
+                else:
+                    calls.update(pushes)
+                    escapes |= copies
+        return calls, escapes
+
+    # Imports, and the parts of the standard library with a Java counterpart
+
+    @staticmethod
+    def _resolve_imports(tree, package=None):
+        """
+        {name an import binds: the fully qualified name it stands for}. Relative imports
+        only resolve when it's known what *package* the module is in
+        """
+        imports = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        imports[alias.asname] = alias.name
+                    else:
+                        imports[alias.name.split('.')[0]] = alias.name.split('.')[0]
+            elif isinstance(node, ast.ImportFrom):
+                module = node.module
+                if node.level:
+                    parts = package.split('.') if package else []
+                    if len(parts) < node.level:
+                        continue
+                    module = '.'.join(parts[:len(parts) - node.level + 1] + ([node.module] if node.module else []))
+                for alias in node.names:
+                    if alias.name != '*':
+                        imports[alias.asname or alias.name] = f"{module}.{alias.name}"
+        return imports
+
+    def _qualified_name(self, node):
+        """What *node* names through the imports, like 'heapq.heappush' for `heappush` or `hq.heappush`, or None"""
+        # Down to the name at the bottom of a.b.c without recursing
+        attributes = []
+        while isinstance(node, ast.Attribute):
+            attributes.append(node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name) or not (module := self._imports.get(node.id)):
+            return None
+        return '.'.join([module, *reversed(attributes)])
+
+    # What a heapq heap can have done to it and still be a PriorityQueue
+    _heap_functions = {'heapq.heappush', 'heapq.heappop', 'heapq.heapify'}
+
+    def _find_heaps(self, tree, parents):
+        """
+        {name key: 'java.util.PriorityQueue', 'LongHeap' or 'Tuples'} for the lists only ever used as heaps, as
+        `h = []` (or any list, heapified right after), heappush, heappop, h[0], len(h) and truthiness.
+        Heaps of nothing but ints are LongHeaps, and heaps of tuples PriorityQueues of Tuples
+        """
+        heaps = {}
+        rejected = set()
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Name) or (key := self._name_keys.get(id(node))) is None or key in rejected:
+                continue
+            parent = parents.get(id(node))
+            uses = heaps.setdefault(key, {'stores': [], 'pushes': [], 'heapified': []})
+            if isinstance(node.ctx, ast.Store):
+                if isinstance(parent, ast.Assign) and parent.targets == [node] \
+                        and (isinstance(parent.value, ast.List) or self._dotted_name(getattr(parent.value, 'func', None)) == 'list'):
+                    uses['stores'].append(parent)
+                    continue
+            elif isinstance(parent, ast.Call) and parent.args and parent.args[0] is node \
+                    and self._qualified_name(parent.func) in self._heap_functions:
+                name = self._qualified_name(parent.func)
+                if name == 'heapq.heappush' and len(parent.args) == 2:
+                    uses['pushes'].append(parent.args[1])
+                    continue
+                if name == 'heapq.heappop' and len(parent.args) == 1:
+                    continue
+                if name == 'heapq.heapify' and isinstance(statement := parents.get(id(parent)), ast.Expr):
+                    # Only straight after the list is made, which is when it becomes the queue
+                    body = parents.get(id(statement))
+                    statements = next((each for each in (getattr(body, 'body', None), getattr(body, 'orelse', None))
+                                       if isinstance(each, list) and any(s is statement for s in each)), [])
+                    index = next(index for index, each in enumerate(statements) if each is statement)
+                    if index and isinstance(statements[index - 1], ast.Assign) \
+                            and self._name_keys.get(id(statements[index - 1].targets[0])) == key:
+                        uses['heapified'].append((statement, statements[index - 1]))
+                        continue
+            elif isinstance(parent, ast.Subscript) and parent.value is node and isinstance(parent.ctx, ast.Load) \
+                    and isinstance(parent.slice, ast.Constant) and parent.slice.value == 0 \
+                    or self._is_builtin_call_of(parent, 'len') or self._is_truth_test(node, parents):
+                continue
+            rejected.add(key)
+        found = {}
+        for key, uses in heaps.items():
+            heapified = {id(assign) for _, assign in uses['heapified']}
+            if key in rejected or not uses['stores'] or not all(id(store) in heapified or isinstance(store.value, ast.List)
+                                                                and not store.value.elts for store in uses['stores']):
+                continue
+            for statement, assign in uses['heapified']:
+                parent = parents[id(statement)]
+                for field in ('body', 'orelse'):
+                    statements = getattr(parent, field, None)
+                    if isinstance(statements, list) and any(each is statement for each in statements):
+                        statements[:] = [each for each in statements if each is not statement]
+            kind = 'LongHeap' if not heapified and uses['pushes'] \
+                and all(isinstance(self._range_of(push), tuple) for push in uses['pushes']) else 'java.util.PriorityQueue'
+            if any(isinstance(push, ast.Tuple) for push in uses['pushes']) \
+                    or any(isinstance(element, ast.Tuple) for store in uses['stores'] if isinstance(store.value, ast.List)
+                           for element in store.value.elts):
+                kind = 'Tuples'
+            for store in uses['stores']:
+                self._heap_constructions[id(store.value)] = kind
+            found[key] = kind
+        return found
+
+    @staticmethod
+    def _is_builtin_call_of(node, name):
+        return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name
+
+    @staticmethod
+    def _is_truth_test(node, parents):
+        """Whether *node* is only tested for truth, like the `q` of `while q:` or `if not q and x:`"""
+        child, parent = node, parents.get(id(node))
+        while isinstance(parent, ast.BoolOp) or isinstance(parent, ast.UnaryOp) and isinstance(parent.op, ast.Not):
+            child, parent = parent, parents.get(id(parent))
+        return isinstance(parent, (ast.If, ast.While, ast.IfExp, ast.Assert)) and parent.test is child
+
+    def _find_deques(self, tree):
+        """The name keys and self attributes that only ever hold a collections.deque"""
+        deques = set()
+        others = set()
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Assign) or len(node.targets) != 1 \
+                    or (key := self._dict_key(node.targets[0])) is None:
+                continue
+            if isinstance(node.value, ast.Call) and self._qualified_name(node.value.func) == 'collections.deque':
+                deques.add(key)
+            else:
+                others.add(key)
+        return deques - others
+
+    # Lists that are mostly probed with `in`. Ones nothing reads any other way become sets outright,
+    #  and the rest keep a set alongside them for the probes
+    _order_only_list_methods = {'sort', 'reverse'}
+
+    @staticmethod
+    def _in_loop(node, parents):
+        """Whether *node* runs over and over, in a loop or comprehension of the function it's in"""
+        while (node := parents.get(id(node))) is not None:
+            if isinstance(node, (ast.For, ast.AsyncFor, ast.While, ast.comprehension)):
+                return True
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+                return False
+        return False
+
+    @staticmethod
+    def _is_plain_read(node):
+        """Whether evaluating *node* twice is the same as once"""
+        return all(isinstance(child, (ast.Name, ast.Constant, ast.Attribute, ast.Subscript, ast.expr_context))
+                   or isinstance(child, ast.UnaryOp) and isinstance(child.op, ast.USub)
+                   for child in ast.walk(node))
+
+    def _find_membership_lists(self, tree, parents):
+        """{name key: (stores, appends, probes, whether anything else reads it)} for the lists worth a set"""
+        found = {}
+        rejected = set()
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Name) or (key := self._name_keys.get(id(node))) is None or key in rejected:
+                continue
+            uses = found.setdefault(key, ([], [], [], []))
+            stores, appends, probes, reads = uses
+            parent = parents.get(id(node))
+            grandparent = parents.get(id(parent))
+            if isinstance(node.ctx, ast.Store):
+                if isinstance(parent, ast.Assign) and parent.targets == [node] \
+                        and (isinstance(parent.value, ast.List) and not any(isinstance(element, ast.Starred)
+                                                                            for element in parent.value.elts)
+                             or isinstance(parent.value, ast.Call) and self._dotted_name(parent.value.func) == 'list'
+                             and len(parent.value.args) <= 1 and not parent.value.keywords):
+                    stores.append(parent)
+                    continue
+            elif isinstance(node.ctx, ast.Load):
+                if isinstance(parent, ast.Compare) and len(parent.ops) == 1 \
+                        and isinstance(parent.ops[0], (ast.In, ast.NotIn)) and parent.comparators[0] is node:
+                    probes.append(parent)
+                    continue
+                if isinstance(parent, ast.Attribute) and isinstance(grandparent, ast.Call) \
+                        and grandparent.func is parent and isinstance(parents.get(id(grandparent)), ast.Expr):
+                    if parent.attr == 'append' and len(grandparent.args) == 1 and not grandparent.keywords \
+                            and self._is_plain_read(grandparent.args[0]):
+                        appends.append(parents[id(grandparent)])
+                        continue
+                    if parent.attr in self._order_only_list_methods:
+                        reads.append(node)
+                        continue
+                elif parent is not None and self._is_read_only_use(node, parent) \
+                        and not isinstance(parent, ast.Attribute):
+                    reads.append(node)
+                    continue
+            rejected.add(key)
+        return {key: uses for key, uses in found.items() if key not in rejected and uses[0]
+                and any(self._in_loop(probe, parents) for probe in uses[2])}
+
+    @staticmethod
+    def _insert_after(parents, statement, new_statement):
+        parent = parents[id(statement)]
+        for field in ('body', 'orelse', 'finalbody'):
+            statements = getattr(parent, field, None)
+            if isinstance(statements, list) and any(each is statement for each in statements):
+                index = next(index for index, each in enumerate(statements) if each is statement)
+                statements.insert(index + 1, new_statement)
+                return
+
+    def _use_sets_for_membership(self, tree):
+        """Rewrite the lists that are mostly probed with `in`, so the probes go to a set"""
+        parents = self._parents(tree)
+        # Other modules can import what the module and its classes define, and expect a list
+        exported_scopes = {id(tree)} | {id(node) for node in ast.walk(tree) if isinstance(node, ast.ClassDef)}
+        for key, (stores, appends, probes, reads) in self._find_membership_lists(tree, parents).items():
+            name = stores[0].targets[0].id
+            if not reads and not (key[0] in exported_scopes and not name.startswith('_')):
+                # Nothing can tell it's not a list, so it doesn't need to be one
+                for store in stores:
+                    value = store.value
+                    store.value = ast.Set(elts=value.elts) if isinstance(value, ast.List) and value.elts \
+                        else ast.Call(func=ast.Name(id='set', ctx=ast.Load()),
+                                      args=value.args if isinstance(value, ast.Call) else [], keywords=[])
+                for append in appends:
+                    append.value.func.attr = 'add'
+                continue
+            # Its order (or duplicates) show, so it stays a list and gets a set to mirror it
+            mirror = self._unique_name(f"{name}Set")
+            for store in stores:
+                self._insert_after(parents, store, ast.Assign(
+                    targets=[ast.Name(id=mirror, ctx=ast.Store())],
+                    value=ast.Call(func=ast.Name(id='set', ctx=ast.Load()),
+                                   args=[ast.Name(id=name, ctx=ast.Load())], keywords=[])))
+            for append in appends:
+                self._insert_after(parents, append, ast.Expr(value=ast.Call(
+                    func=ast.Attribute(value=ast.Name(id=mirror, ctx=ast.Load()), attr='add', ctx=ast.Load()),
+                    args=append.value.args, keywords=[])))
+            for probe in probes:
+                probe.comparators = [ast.Name(id=mirror, ctx=ast.Load())]
+
+    # Dicts. Where they fill in missing keys by themselves, the factory they do it with is kept:
+    #  the callable for defaultdicts, and for Counters (which don't store what they fill in) the constant 0
+    _default_dicts = {'collections.defaultdict'}
+    _counters = {'collections.Counter'}
+
+    @staticmethod
+    def _dotted_name(node):
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+            return f"{node.value.id}.{node.attr}"
+        return node.id if isinstance(node, ast.Name) else None
+
+    def _dict_key(self, node):
+        """What identifies the variable or attribute *node* names, so everything naming it agrees on whether it's a dict"""
+        if isinstance(node, ast.Name):
+            return self._name_keys.get(id(node))
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 'self':
+            return 'self', node.attr
+        return None
+
+    def _makes_dict(self, node):
+        return isinstance(node, (ast.Dict, ast.DictComp)) or isinstance(node, ast.Call) \
+            and (self._qualified_name(node.func) in self._default_dicts | self._counters or self._is_builtin(node, 'dict'))
+
+    def _default_factory(self, node):
+        """What the dict *node* makes fills missing keys with, if anything"""
+        name = self._qualified_name(node.func) if isinstance(node, ast.Call) else None
+        if name in self._default_dicts and node.args:
+            return node.args[0]
+        if name in self._counters:
+            return ast.Constant(value=0)
+        return None
+
+    def _find_dicts(self, tree):
+        """{dict key: default factory or None} for the variables and attributes that only ever hold dicts"""
+        dicts = {}
+        others = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1:
+                target, value = node.targets[0], node.value
+            elif isinstance(node, ast.AnnAssign) and node.value is not None:
+                target, value = node.target, node.value
+            elif isinstance(node, ast.arg) and node.annotation is not None:
+                annotation = node.annotation.value if isinstance(node.annotation, ast.Subscript) else node.annotation
+                if isinstance(annotation, ast.Name) and annotation.id in ('dict', 'Dict') \
+                        and (key := self._name_keys.get(id(node))) is not None:
+                    dicts.setdefault(key, None)
+                continue
+            else:
+                continue
+            if (key := self._dict_key(target)) is None:
+                continue
+            if self._makes_dict(value):
+                dicts.setdefault(key, self._default_factory(value))
+            elif not (isinstance(value, ast.Constant) and value.value is None):
+                others.add(key)
+        return {key: factory for key, factory in dicts.items() if key not in others}
+
+    def _is_dict(self, node):
+        key = self._dict_key(node)
+        return key is not None and key in self._dicts
+
+    def _find_literal_collections(self, tree):
+        """{name key: elements} for the variables only ever assigned list, tuple or set literals"""
+        literals = {}
+        targets = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) \
+                    and isinstance(node.value, (ast.List, ast.Tuple, ast.Set)):
+                literals.setdefault(self._name_keys.get(id(node.targets[0])), []).extend(node.value.elts)
+                targets.add(id(node.targets[0]))
+        # Anything else storing to them could store anything
+        others = {self._name_keys.get(id(node)) for node in ast.walk(tree)
+                  if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store) and id(node) not in targets}
+        return {key: elements for key, elements in literals.items() if key is not None and key not in others}
+
+    # Element types hints like list[str] can give
+    _hinted_element_types = {'int': int, 'float': float, 'str': str, 'bool': bool}
+
+    def _find_hinted_elements(self, tree):
+        """{name key: element type} for the parameters hinted as list[str] and the like, that nothing reassigns"""
+        hinted = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.arg) and isinstance(node.annotation, ast.Subscript) \
+                    and self._dotted_name(node.annotation.value) in ('list', 'set', 'List', 'Set') \
+                    and isinstance(node.annotation.slice, ast.Name) \
+                    and node.annotation.slice.id in self._hinted_element_types:
+                hinted[self._name_keys.get(id(node))] = self._hinted_element_types[node.annotation.slice.id]
+        stored = {self._name_keys.get(id(node)) for node in ast.walk(tree)
+                  if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)}
+        return {key: element_type for key, element_type in hinted.items() if key is not None and key not in stored}
+
+    def _element_python_type(self, node):
+        """The Python type of every element iterating *node* gives, if they all have the same one, else None"""
+        if self._is_builtin(node, 'range'):
+            return int
+        if self._get_python_type(node) == str:
+            return str
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            elements = node.elts
+        elif isinstance(node, ast.Name) and self._name_keys.get(id(node)) in self._hinted_elements:
+            return self._hinted_elements[self._name_keys.get(id(node))]
+        elif isinstance(node, ast.Name) and self._name_keys.get(id(node)) in self._literal_collections:
+            elements = self._literal_collections[self._name_keys.get(id(node))]
+        else:
+            return None
+        types = {self._get_python_type(element) for element in elements}
+        if types and types <= {int, float}:
+            return float if float in types else int
+        return types.pop() if len(types) == 1 and object not in types else None
+
+    def _scan_module(self, node):
+        """Look over the whole program for things that change how parts of it get translated"""
+        self._threaded = False
+        self._seeded = False
+        self._module_id = id(node)
+        self._program_names = {child.id for child in ast.walk(node) if isinstance(child, ast.Name)} \
+            | {child.arg for child in ast.walk(node) if isinstance(child, ast.arg)}
+        self._imports = self._resolve_imports(node, self.package)
+        # Methods the program defines itself, which aren't the builtin ones of the same name
+        self._method_names = {child.name for child in ast.walk(node)
+                              if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))}
+        self._value_ranges = self._find_value_ranges(node)
+        self._tuple_records = self._find_tuple_functions(node)
+        self._use_sets_for_membership(node)
+        parents = self._parent_nodes = self._parents(node)
+        self._heaps = self._find_heaps(node, parents)
+        self._deques = self._find_deques(node)
+        self._concurrency_objects = self._find_concurrency_objects(node)
+        self._uses_numpy = any(name.split('.')[0] == 'numpy' for name in self._imports.values())
+        self._arrays = self._find_arrays(node) if self._uses_numpy else {}
+        self._parallel_loops = self._find_parallel_loops(node, parents)
+        self._slice_views = self._find_slice_views(node, parents)
+        self._backtracking_calls, self._escaping_names = self._find_backtracking(node, parents)
+        self._dicts = self._find_dicts(node)
+        self._literal_collections = self._find_literal_collections(node)
+        self._hinted_elements = self._find_hinted_elements(node)
+        # Reads of d[k] that an earlier lookup already got the value of, and the variable it's in
+        self._looked_up = {}
+        # And reads of d[k] that mustn't quietly give null for a missing key
+        self._checked_reads = set()
+        for child in ast.walk(node):
+            if isinstance(child, ast.Import):
+                self._threaded |= any(alias.name.split('.')[0] in self._threading_modules for alias in child.names)
+            elif isinstance(child, ast.ImportFrom):
+                self._threaded |= (child.module or '').split('.')[0] in self._threading_modules
+            elif isinstance(child, ast.Call) and self._random_function(child) == 'seed':
+                self._seeded = True
+
+    # Value ranges. Intervals are (low, high) tuples of ints, or of floats for the infinite ends
+    _int_range = (-2 ** 31, 2 ** 31 - 1)
+    _long_range = (-2 ** 63, 2 ** 63 - 1)
+    _big_integer = 'java.math.BigInteger'
+    # Nothing Python (or Java) can hold or iterate over has more elements than this. Java's lists and
+    #  strings are arrays underneath, and the JVM won't make one quite as long as Integer.MAX_VALUE
+    _max_collection_size = 2 ** 31 - 3
+    # Nor does anything we translate loop more often than this. Keeps counters of while loops
+    #  in a long, where giving up on them entirely would make them BigIntegers
+    _max_trip_count = 2 ** 40
+    # Past this, a bound is as good as infinite to us, and keeping it finite only risks overflowing floats
+    _huge = 2 ** 256
+    # A name nothing has been worked out for yet. Bigger ranges, and then None (not an integer), come after it
+    _unresolved = 'UNRESOLVED'
+
+    def _find_value_ranges(self, tree):
+        """
+        Work out the interval every integer variable stays in, wherever it gets assigned in the program,
+        along with what each function returns. Loops that grow a variable (`count += 1`, `total = total * i`)
+        are bounded by how often they can run. Anything that isn't an integer, or can't be bounded at all,
+        doesn't get an entry.
+        """
+        self._name_keys = self._resolve_names(tree)
+        bindings = self._collect_bindings(tree)
+        ranges = {key: self._unresolved for key in bindings}
+        for iteration in range(64):
+            changed = False
+            for key, sites in bindings.items():
+                old = ranges[key]
+                new = self._name_range(key, sites, ranges)
+                if new == old:
+                    continue
+                if iteration >= 16 and isinstance(old, tuple) and isinstance(new, tuple):
+                    # Variables feeding each other in a cycle (or a recursive function). Stop chasing them
+                    new = (-float('inf') if new[0] < old[0] else old[0], float('inf') if new[1] > old[1] else old[1])
+                ranges[key] = new
+                changed = True
+            if not changed:
+                break
+        return {key: value_range for key, value_range in ranges.items() if isinstance(value_range, tuple)}
+
+    _scope_nodes = (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)
+
+    @classmethod
+    def _resolve_names(cls, tree):
+        """
+        Work out which scope each name lives in, the way Python does: the function (or class, or module)
+        that binds it, else the closest one around it that does. Maps the id() of every Name, arg and
+        function definition to a (scope id, name) key.
+        """
+        local_names = {}
+        for scope in ast.walk(tree):
+            if not isinstance(scope, cls._scope_nodes):
+                continue
+            names = set()
+            declared_elsewhere = set()
+            todo = list(ast.iter_child_nodes(scope))
+            while todo:
+                node = todo.pop()
+                if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                    names.add(node.id)
+                elif isinstance(node, ast.arg):
+                    names.add(node.arg)
+                elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                    declared_elsewhere.update(node.names)
+                if isinstance(node, cls._scope_nodes):
+                    if not isinstance(node, ast.Lambda):
+                        names.add(node.name)
+                else:
+                    todo.extend(ast.iter_child_nodes(node))
+            local_names[id(scope)] = names - declared_elsewhere
+
+        def resolve(name, chain):
+            for scope in reversed(chain):
+                # Functions inside a class don't see the names in its body
+                if (scope is chain[-1] or not isinstance(scope, ast.ClassDef)) and name in local_names[id(scope)]:
+                    return id(scope), name
+            return id(tree), name
+
+        keys = {}
+        todo = [(tree, [tree])]
+        while todo:
+            node, chain = todo.pop()
+            if isinstance(node, ast.Name):
+                keys[id(node)] = resolve(node.id, chain)
+            elif isinstance(node, ast.arg):
+                keys[id(node)] = resolve(node.arg, chain)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                keys[id(node)] = resolve(node.name, chain)
+            inner_chain = chain + [node] if isinstance(node, cls._scope_nodes) and node is not tree else chain
+            todo.extend((child, inner_chain) for child in ast.iter_child_nodes(node))
+        return keys
+
+    def _collect_bindings(self, tree):
+        """
+        Everything each variable gets bound to (or each function returns), as (site, loops) pairs. The site is the
+        value, the for loop it counts for, the argument or function with the type hint it has, or None for anything
+        we don't understand. Loops are the loops around it.
+        """
+        values = {}
+        bindings = {}
+        todo = [(tree, (), None)]
+        while todo:
+            node, loops, return_key = todo.pop()
+            key = self._name_keys.get(id(node))
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    values[id(target)] = node.value
+                    if isinstance(target, ast.Tuple) and isinstance(node.value, ast.Tuple) \
+                            and len(target.elts) == len(node.value.elts):
+                        values.update((id(element), value) for element, value in zip(target.elts, node.value.elts))
+            elif isinstance(node, ast.AnnAssign) and node.value:
+                values[id(node.target)] = node.value
+            elif isinstance(node, ast.AugAssign):
+                values[id(node.target)] = ast.BinOp(left=node.target, op=node.op, right=node.value)
+            elif isinstance(node, (ast.For, ast.AsyncFor)):
+                if isinstance(node.target, ast.Tuple) and node.target.elts and self._is_call_to(node.iter, 'enumerate'):
+                    values[id(node.target.elts[0])] = node
+                else:
+                    values[id(node.target)] = node
+            elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                bindings.setdefault(key, []).append((values.get(id(node)), loops))
+            elif isinstance(node, ast.arg):
+                bindings.setdefault(key, []).append((node, ()))
+            elif isinstance(node, ast.Return) and return_key:
+                bindings.setdefault(return_key, []).append((node.value, loops))
+
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                # Loops around a definition don't run its body. A hinted return type is what it is,
+                #  whatever the return statements say
+                return_key = (key, 'return')
+                if node.returns and not (isinstance(node.returns, ast.Name) and node.returns.id == 'int'):
+                    # (An int hint doesn't say how big)
+                    bindings[return_key] = [(node, ())]
+                    return_key = None
+                todo.extend((child, (), return_key) for child in ast.iter_child_nodes(node))
+            elif isinstance(node, (ast.Lambda, ast.ClassDef)):
+                todo.extend((child, (), None) for child in ast.iter_child_nodes(node))
+            elif isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+                todo.extend((child, loops + (node,), return_key) for child in node.body)
+                todo.extend((child, loops, return_key) for child in ast.iter_child_nodes(node) if child not in node.body)
+            else:
+                todo.extend((child, loops, return_key) for child in ast.iter_child_nodes(node))
+        return bindings
+
+    @staticmethod
+    def _is_call_to(node, name):
+        return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name \
+            and not node.keywords
+
+    def _mentions(self, node, key):
+        return any(isinstance(child, ast.Name) and self._name_keys.get(id(child)) == key for child in ast.walk(node))
+
+    def _additive_step(self, node, key):
+        """If *node* is `name + step` (or `step + name`, `name - step`), return (step, sign)"""
+        if not isinstance(node, ast.BinOp) or not isinstance(node.op, (ast.Add, ast.Sub)):
+            return None
+        if isinstance(node.left, ast.Name) and self._name_keys.get(id(node.left)) == key \
+                and not self._mentions(node.right, key):
+            return node.right, 1 if isinstance(node.op, ast.Add) else -1
+        if isinstance(node.op, ast.Add) and isinstance(node.right, ast.Name) \
+                and self._name_keys.get(id(node.right)) == key and not self._mentions(node.left, key):
+            return node.left, 1
+        return None
+
+    def _name_range(self, key, sites, ranges):
+        """The range of the variable (or function) *key* given the ranges worked out for everything else so far"""
+        base = self._unresolved
+        recurrences = []
+        for site, loops in sites:
+            if site is None:
+                return None
+            if isinstance(site, (ast.arg, ast.FunctionDef, ast.AsyncFunctionDef)):
+                # Hinted as int means a Java int. Anything else could be anything
+                hint = site.annotation if isinstance(site, ast.arg) else site.returns
+                if not (isinstance(hint, ast.Name) and hint.id == 'int'):
+                    return None
+                value = self._int_range
+            elif isinstance(site, (ast.For, ast.AsyncFor)):
+                value = self._loop_counter_range(site, ranges)
+            elif self._mentions(site, key):
+                trips = self._trip_count(loops, ranges)
+                if trips == self._unresolved:
+                    return self._unresolved
+                recurrences.append((site, trips, loops))
+                continue
+            else:
+                value = self._eval_range(site, ranges)
+            base = self._join_ranges(base, value)
+            if base is None:
+                return None
+        if base == self._unresolved or not recurrences:
+            return base
+
+        if all(self._additive_step(site, key) for site, _, _ in recurrences):
+            # Counting up or down: at most the step, as many times as the loops around it run
+            low, high = base
+            for site, trips, _ in recurrences:
+                step, sign = self._additive_step(site, key)
+                step_range = self._eval_range(step, ranges)
+                if not isinstance(step_range, tuple):
+                    return step_range
+                if sign < 0:
+                    step_range = (-step_range[1], -step_range[0])
+                low += self._multiply_bounds(trips, min(step_range[0], 0))
+                high += self._multiply_bounds(trips, max(step_range[1], 0))
+            return self._clamp_range((low, high))
+
+        # Anything else, apply it once for every time it can run, unless that's too many times to try.
+        #  A short loop over a constant range gets its counter filled in as well, so `total *= i` comes to
+        #  a factorial rather than the biggest i to the power of the number of loops
+        trips = max(trips for _, trips, _ in recurrences)
+        loops = {loops for _, _, loops in recurrences}
+        counter_values = self._constant_counter_values(*loops) if len(loops) == 1 else None
+        counter_key = counter_values and self._name_keys.get(id(next(iter(loops))[0].target))
+        current = base
+        for step in range(len(counter_values) if counter_values else int(min(trips, 64))):
+            env = {**ranges, key: current}
+            if counter_values:
+                env[counter_key] = (counter_values[step], counter_values[step])
+            value = current
+            for site, _, _ in recurrences:
+                value = self._join_ranges(value, self._eval_range(site, env))
+                if not isinstance(value, tuple):
+                    return value
+            if value == current and not counter_values:
+                return current
+            current = value
+        if counter_values is not None:
+            return current
+        if trips <= 64:
+            return current
+        # Still growing, with no end in sight
+        return (-float('inf') if current[0] < base[0] else current[0],
+                float('inf') if current[1] > base[1] else current[1])
+
+    def _constant_counter_values(self, loops):
+        """Every value the counter of a single short loop over a constant range() takes, in order, else None"""
+        if len(loops) != 1 or not isinstance(loops[0], ast.For) or not isinstance(loops[0].target, ast.Name) \
+                or not self._is_call_to(loops[0].iter, 'range') or not 1 <= len(loops[0].iter.args) <= 3:
+            return None
+        arguments = self._range_arguments(loops[0].iter, {})
+        if not all(isinstance(argument, tuple) and argument[0] == argument[1] for argument in arguments) \
+                or arguments[2][0] == 0:
+            return None
+        values = range(*(low for low, _ in arguments))
+        return list(values) if len(values) <= 64 else None
+
+    def _loop_counter_range(self, loop, ranges):
+        """The range of what *loop* assigns to its target (or, for enumerate, the index)"""
+        if self._is_call_to(loop.iter, 'enumerate'):
+            return 0, self._max_collection_size - 1
+        if not self._is_call_to(loop.iter, 'range') or not 1 <= len(loop.iter.args) <= 3:
+            return None
+        start, stop, step = self._range_arguments(loop.iter, ranges)
+        for value in (start, stop, step):
+            if not isinstance(value, tuple):
+                return value
+        if step[0] > 0:
+            value_range = (start[0], stop[1] - 1)
+        elif step[1] < 0:
+            value_range = (stop[0] + 1, start[1])
+        else:
+            value_range = (min(start[0], stop[0]), max(start[1], stop[1]))
+        if value_range[0] > value_range[1]:
+            # Never runs, so it never assigns anything either
+            return self._unresolved
+        return value_range
+
+    def _range_arguments(self, call, ranges):
+        """The ranges of start, stop and step for a call to range()"""
+        arguments = [self._eval_range(argument, ranges) for argument in call.args]
+        if len(arguments) == 1:
+            return (0, 0), arguments[0], (1, 1)
+        if len(arguments) == 2:
+            return arguments[0], arguments[1], (1, 1)
+        return tuple(arguments)
+
+    def _trip_count(self, loops, ranges):
+        """How many times the innermost of *loops* can run a statement, all told"""
+        total = 1
+        for loop in loops:
+            trips = self._max_trip_count
+            if isinstance(loop, ast.While):
+                pass
+            elif self._is_call_to(loop.iter, 'range') and 1 <= len(loop.iter.args) <= 3:
+                start, stop, step = self._range_arguments(loop.iter, ranges)
+                if self._unresolved in (start, stop, step):
+                    return self._unresolved
+                if None not in (start, stop, step) and (step[0] > 0 or step[1] < 0):
+                    if step[0] > 0:
+                        distance, stride = stop[1] - start[0], step[0]
+                    else:
+                        distance, stride = start[1] - stop[0], -step[1]
+                    if distance != float('inf'):
+                        trips = max(min(-(-distance // stride), trips), 0)
+            else:
+                # Looping over a collection (or enumerate() of one)
+                trips = self._max_collection_size
+            total = self._multiply_bounds(total, trips)
+        return total
+
+    @classmethod
+    def _join_ranges(cls, a, b):
+        if a is None or b is None:
+            return None
+        if a == cls._unresolved:
+            return b
+        if b == cls._unresolved:
+            return a
+        return min(a[0], b[0]), max(a[1], b[1])
+
+    @classmethod
+    def _clamp_range(cls, value_range):
+        low, high = value_range
+        return (-float('inf') if low < -cls._huge else low, float('inf') if high > cls._huge else high)
+
+    @staticmethod
+    def _multiply_bounds(a, b):
+        # 0 * inf is nan, but a zero-width side of an interval stays zero however much it's scaled
+        return 0 if a == 0 or b == 0 else a * b
+
+    @staticmethod
+    def _floor_divide_bounds(a, b):
+        if abs(b) == float('inf'):
+            return a if abs(a) == float('inf') else (0 if (a >= 0) == (b > 0) else -1)
+        if abs(a) == float('inf'):
+            return a if b > 0 else -a
+        return a // b
+
+    def _eval_range(self, node, ranges, memo=None):
+        """
+        The range of an integer expression, given the *ranges* of names.
+        None if it isn't (known to be) an integer, or _unresolved if it depends on a name that is.
+        Whatever gets worked out along the way goes in *memo*, if there is one
+        """
+        if memo is not None and id(node) in memo:
+            return memo[id(node)][1]
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, int) and not isinstance(node.value, bool):
+                return node.value, node.value
+            return None
+        if isinstance(node, ast.Name):
+            return ranges.get(self._name_keys.get(id(node)))
+        if isinstance(node, ast.IfExp):
+            # Along a chain like a if p else b if q else c, rather than recursing through it
+            joined = self._eval_range(node.body, ranges, memo)
+            while isinstance(node.orelse, ast.IfExp):
+                node = node.orelse
+                joined = self._join_ranges(joined, self._eval_range(node.body, ranges, memo))
+            return self._join_ranges(joined, self._eval_range(node.orelse, ranges, memo))
+        if isinstance(node, ast.UnaryOp):
+            # And down a chain like - - x, and back up
+            operators = []
+            while isinstance(node, ast.UnaryOp):
+                operators.append(node.op)
+                node = node.operand
+            operand = self._eval_range(node, ranges, memo)
+            for operator in reversed(operators):
+                if not isinstance(operand, tuple):
+                    return operand
+                if isinstance(operator, ast.USub):
+                    operand = -operand[1], -operand[0]
+                elif isinstance(operator, ast.Invert):
+                    operand = -operand[1] - 1, -operand[0] - 1
+                elif not isinstance(operator, ast.UAdd):
+                    return None
+            return operand
+        if isinstance(node, ast.BinOp):
+            # Down the left of a chain like a + b + c + ... and back up, rather than recursing through all of it
+            chain = self._left_chain(node, lambda left: memo is None or id(left) not in memo)
+            left = self._eval_range(chain[-1].left, ranges, memo)
+            for part in reversed(chain):
+                right = self._eval_range(part.right, ranges, memo)
+                if left is None or right is None:
+                    left = None
+                elif self._unresolved in (left, right):
+                    left = self._unresolved
+                else:
+                    left = self._binop_range(part.op, left, right)
+                if memo is not None:
+                    memo[id(part)] = part, left
+            return left
+        if isinstance(node, ast.Call):
+            return self._call_range(node, ranges)
+        return None
+
+    def _binop_range(self, op, left, right):
+        everything = (-float('inf'), float('inf'))
+        if isinstance(op, ast.Add):
+            return self._clamp_range((left[0] + right[0], left[1] + right[1]))
+        if isinstance(op, ast.Sub):
+            return self._clamp_range((left[0] - right[1], left[1] - right[0]))
+        if isinstance(op, ast.Mult):
+            corners = [self._multiply_bounds(a, b) for a in left for b in right]
+            return self._clamp_range((min(corners), max(corners)))
+        if isinstance(op, ast.FloorDiv):
+            if right[0] > 0 or right[1] < 0:
+                corners = [self._floor_divide_bounds(a, b) for a in left for b in right]
+                return min(corners), max(corners)
+            # Dividing by anything from -1 to 1 (or by zero, which raises)
+            largest = max(abs(left[0]), abs(left[1]))
+            return -largest, largest
+        if isinstance(op, ast.Mod):
+            # Python's % takes the sign of the divisor
+            if right[0] > 0:
+                return 0, min(right[1] - 1, left[1]) if left[0] >= 0 else right[1] - 1
+            if right[1] < 0:
+                return right[0] + 1, 0
+            largest = max(abs(right[0]), abs(right[1])) - 1
+            return -largest, largest
+        if isinstance(op, ast.Pow):
+            if right[0] < 0:
+                return None  # A float
+            if right[1] > 64:
+                if left[0] >= 0 and left[1] <= 1:
+                    return 0, 1
+                return -float('inf') if left[0] < -1 else 0, float('inf')
+            bases = {left[0], left[1]} | ({0} if left[0] < 0 < left[1] else set())
+            exponents = {right[0], min(right[0] + 1, right[1]), max(right[1] - 1, right[0]), right[1]}
+            powers = [base ** int(exponent) if abs(base) != float('inf') or exponent else 1
+                      for base in bases for exponent in exponents]
+            powers = [power if abs(power) <= self._huge else float('inf') * (1 if power > 0 else -1)
+                      for power in powers]
+            return min(powers), max(powers)
+        if isinstance(op, (ast.LShift, ast.RShift)):
+            if right[0] < 0 or right[1] > 64:
+                return everything
+            scale = (2 ** right[0], 2 ** right[1])
+            return self._binop_range(ast.Mult() if isinstance(op, ast.LShift) else ast.FloorDiv(), left, scale)
+        if isinstance(op, ast.BitAnd):
+            if left[0] >= 0 or right[0] >= 0:
+                return 0, min(bound[1] for bound in (left, right) if bound[0] >= 0)
+            return everything
+        if isinstance(op, (ast.BitOr, ast.BitXor)):
+            if left[0] >= 0 and right[0] >= 0:
+                high = max(left[1], right[1])
+                return 0, high if high == float('inf') else 2 ** int(high).bit_length() - 1
+            return everything
+        return None
+
+    def _call_range(self, node, ranges):
+        function_key = self._name_keys.get(id(node.func))
+        if (function_key, 'return') in ranges:
+            return ranges[function_key, 'return']
+        arguments = [self._eval_range(argument, ranges) for argument in node.args]
+        random_function = self._random_function(node)
+        if random_function and arguments and all(isinstance(a, tuple) for a in arguments):
+            if random_function == 'randint' and len(arguments) == 2:
+                return arguments[0][0], arguments[1][1]
+            if random_function == 'randrange' and len(arguments) == 1:
+                return 0, arguments[0][1] - 1
+            if random_function == 'randrange' and len(arguments) == 2:
+                return arguments[0][0], arguments[1][1] - 1
+        indexed_type = self._indexed_type(node)
+        if indexed_type in ('int', 'long'):
+            return self._int_range if indexed_type == 'int' else self._long_range
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            return None
+        name = node.func.id
+        if name == 'len':
+            return 0, self._max_collection_size
+        if name == 'ord':
+            return 0, 0x10FFFF
+        if name == 'int' and len(arguments) == 1:
+            # Anything else gets parsed (or cast) into a Java int
+            return arguments[0] if arguments[0] is not None else self._int_range
+        if name == 'abs' and len(arguments) == 1:
+            if not isinstance(arguments[0], tuple):
+                return arguments[0]
+            low, high = arguments[0]
+            return 0 if low <= 0 <= high else min(abs(low), abs(high)), max(abs(low), abs(high))
+        if name in ('min', 'max') and len(arguments) >= 2:
+            if None in arguments:
+                return None
+            if self._unresolved in arguments:
+                return self._unresolved
+            pick = min if name == 'min' else max
+            return pick(low for low, _ in arguments), pick(high for _, high in arguments)
+        return None
+
+    @staticmethod
+    def _left_chain(node, continues=lambda left: True):
+        """The BinOp *node* and the ones down its left that *continues* says are part of the same chain, top first"""
+        chain = [node]
+        while isinstance(chain[-1].left, ast.BinOp) and continues(chain[-1].left):
+            chain.append(chain[-1].left)
+        return chain
+
+    def _range_of(self, node):
+        if id(node) not in self._ranges:
+            self._ranges[id(node)] = node, self._eval_range(node, self._value_ranges, self._ranges)
+        value_range = self._ranges[id(node)][1]
+        return value_range if isinstance(value_range, tuple) else None
+
+    def _is_non_negative(self, node):
+        value_range = self._range_of(node)
+        return value_range is not None and value_range[0] >= 0
+
+    def _java_int_type(self, node):
+        """'int', 'long' or 'java.math.BigInteger' for an integer expression, or None if it isn't one we know"""
+        if id(node) not in self._java_int_types:
+            # Working up from the bottom of a chain like a + b + c + ... or - - x, which the ones above it go by
+            if isinstance(node, ast.BinOp):
+                chain = self._left_chain(node, lambda left: id(left) not in self._java_int_types)
+            else:
+                chain = [node]
+                while isinstance(chain[-1], ast.UnaryOp) and isinstance(chain[-1].operand, ast.UnaryOp) \
+                        and id(chain[-1].operand) not in self._java_int_types:
+                    chain.append(chain[-1].operand)
+            for part in reversed(chain):
+                self._java_int_types[id(part)] = part, self._own_java_int_type(part)
+        return self._java_int_types[id(node)][1]
+
+    def _own_java_int_type(self, node):
+        value_range = self._range_of(node)
+        if value_range is None:
+            return None
+        if node in self._assigned_java_types:
+            return self._assigned_java_types[node]
+        if isinstance(node, (ast.BinOp, ast.UnaryOp)):
+            # Java can only get a BigInteger out of one going in
+            operands = [node.left, node.right] if isinstance(node, ast.BinOp) else [node.operand]
+            if any(self._java_int_type(operand) == self._big_integer for operand in operands):
+                return self._big_integer
+        return self._range_java_type(value_range)
+
+    def _range_java_type(self, value_range):
+        if self._int_range[0] <= value_range[0] and value_range[1] <= self._int_range[1]:
+            return 'int'
+        if self._long_range[0] <= value_range[0] and value_range[1] <= self._long_range[1]:
+            return 'long'
+        return self._big_integer
+
+    def _traverse_as(self, node, java_type):
+        """Traverse an expression that ends up in a *java_type*, working it out in that type if it's a bigger one"""
+        if java_type == self._big_integer:
+            self._write_big_integer(node)
+            return
+        if java_type in ('int', 'long'):
+            # Whatever it is on its own, the analysis already made room for it in there. Only it, and
+            #  the arithmetic it's part of, go by that
+            self._assigned_java_types[node] = java_type
+            part = node
+            while part is not None:
+                self._java_int_types.pop(id(part), None)
+                part = self._parent_nodes.get(id(part))
+                if not isinstance(part, (ast.BinOp, ast.UnaryOp)):
+                    break
+        outer_long_context = self._long_context
+        self._long_context = java_type == 'long'
+        self.traverse(node)
+        self._long_context = outer_long_context
+
     def visit(self, node):
         """Outputs a source code string that, if converted back to an ast
         (using ast.parse) will generate an AST equivalent to *node*"""
+        return _run_with_room(lambda: self._visit_module(node), _tree_depth(node), _unparser_frames_per_level,
+                              _unparser_stack_per_level)
+
+    def _visit_module(self, node):
         self._source = []
+        if self.optimize:
+            node = _Optimizer().optimize(node)
+        self._scan_module(node)
         self.traverse(node)
+        if self._flush_stdout_at_exit and not self._has_main_method:
+            self.fill(f"{self._stdout_writer()}.flush();")
         return self._post_process("".join(self._source))
 
+    def inferred_return_types(self):
+        """{(class name or None, function name): Java return type} for everything the last visit translated"""
+        return_types = {}
+        for key, java_type in self._return_types.items():
+            # Tags can be part of a type, like the one an async function's future is of
+            for tag, replacement in self._type_replacements.items():
+                java_type = java_type.replace(tag, replacement)
+            return_types[key] = java_type
+        return return_types
+
     #
     # def _write_docstring_and_traverse_body(self, node):
     #     if (docstring := self.get_raw_docstring(node)):
@@ -355,6 +2848,10 @@ class _JavaUnparser(ast._Unparser):
     #     self.traverse(node.returns)
     #
     def visit_Expr(self, node):
+        if id(node.value) in self._backtracking_calls:
+            with self._pushed_for(node.value):
+                self.visit_Expr(node)
+            return
         #   self.fill()
         #   self.set_precedence(ast._Precedence.YIELD, node.value)
         #   self.traverse(node.value)
@@ -388,21 +2885,82 @@ class _JavaUnparser(ast._Unparser):
         # self.write(" import ")
         # self.interleave(lambda: self.write(", "), self.traverse, node.names)
     #
+    @contextmanager
+    def _pushed_for(self, call, in_finally=False):
+        """Push what a recursive call would have appended to its own copy of a list, and pop it again after"""
+        parameter, elements, index = self._backtracking_calls.pop(id(call))
+        for element in elements:
+            self.fill(f"{parameter}.add(")
+            self.traverse(element)
+            self.write(");")
+        argument = call.args[index]
+        call.args[index] = argument.left
+        yield
+        call.args[index] = argument
+        self._backtracking_calls[id(call)] = (parameter, elements, index)
+        if in_finally:
+            self.write(" finally ")
+            with self.block():
+                self._write_pops(parameter, len(elements))
+        else:
+            self._write_pops(parameter, len(elements))
+
+    def _write_pops(self, parameter, count):
+        if count == 1:
+            self.fill(f"{parameter}.remove({parameter}.size() - 1);")
+        else:
+            self.fill(f"{parameter}.subList({parameter}.size() - {count}, {parameter}.size()).clear();")
+
     def visit_Assign(self, node):
+        if id(node.value) in self._backtracking_calls:
+            # Special case: `x = f(..., route + [y])`, backtracking over route
+            with self._pushed_for(node.value):
+                self.visit_Assign(node)
+            return
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) \
+                and node.targets[0].id in self._string_builders:
+            # Special case: `s = s + piece` on a string accumulator inside a loop
+            pieces = self._accumulated_pieces(node.targets[0].id, node.value)
+            if pieces is not None:
+                self._write_appends(self._string_builders[node.targets[0].id], pieces)
+                return
+        if len(node.targets) == 1 and isinstance(node.targets[0], (ast.Tuple, ast.List)):
+            self._unpacking_helper(node.targets[0], node.value)
+            return
+        if id(node) in self._block_declarations:
+            # Special case: A variable of its own for each iteration of a loop run in parallel
+            target, value = node.targets[0], node.value
+            python_type = self._get_python_type(value)
+            java_type = python_type == int and self._java_int_type(target) or self._get_java_type(value, python_type)
+            self.fill(f"{'var' if java_type == 'Object' else java_type} {target.id} = ")
+            self._traverse_as(value, java_type)
+            self.write(";")
+            self.scopes[self.current_scopes[-1]][target.id] = python_type
+            return
+        if self._is_reduction(node.value):
+            # Special case: sum, any and all loop over primitives, right before the assignment
+            self.visit_Assign(ast.Assign(targets=node.targets, value=self._reduction_loop(node.value)))
+            return
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) and self._is_builtin(node.value, 'sorted') \
+                and len(node.value.args) == 1 and {keyword.arg for keyword in node.value.keywords} <= {'key', 'reverse'}:
+            # Special case: Sorting a copy in place, rather than through a stream
+            sort = ast.Call(func=ast.Attribute(value=ast.Name(id=node.targets[0].id, ctx=ast.Load()), attr='sort',
+                                               ctx=ast.Load()), args=[], keywords=node.value.keywords)
+            self.visit_Assign(ast.Assign(targets=node.targets, value=ast.Call(
+                func=ast.Name(id='list', ctx=ast.Load()), args=node.value.args, keywords=[])))
+            self.visit_Expr(ast.Expr(value=sort))
+            return
+        if any(isinstance(target, ast.Subscript) for target in node.targets):
+            if len(node.targets) > 1:
+                # Java can't chain puts and sets, so give each target its own assignment
+                for target in node.targets:
+                    self.visit_Assign(ast.Assign(targets=[target], value=node.value))
+            else:
+                self._subscript_store_helper(node.targets[0], node.value)
+            return
         self.fill()
         for target in node.targets:
-            if isinstance(target, ast.Tuple):
-                if len(target.elts) == len(node.value.elts):
-                    for key, value in zip(target.elts, node.value.elts):
-                        fake_assign = copy.deepcopy(node)
-                        fake_assign.targets = [key]
-                        fake_assign.value = value
-                        self.visit_Assign(fake_assign)
-                    return
-                else:
-                    print("Unsupported ATM: Mismatched a, b = x")
-
-            elif isinstance(target, ast.Name):
+            if isinstance(target, ast.Name):
                 # TODO: Variable type changes
                 for scope in reversed(self.current_scopes):
                     # TODO: Is this really how scopes work?
@@ -412,7 +2970,9 @@ class _JavaUnparser(ast._Unparser):
                 else:
                     # TODO: Utilize type comment
                     python_type = self._get_python_type(node.value)
-                    java_type = self._get_java_type(node, python_type)
+                    # The name's range covers everything it gets assigned, not just this first value
+                    java_type = python_type == int and self._java_int_type(target) \
+                        or self._get_java_type(node.value, python_type)
                     self._assignment_type_context = python_type
                     if java_type == 'Object':
                         java_type = 'var'  # TODO: Worry about objects?
@@ -432,24 +2992,138 @@ class _JavaUnparser(ast._Unparser):
                 if len(self.current_scopes) == 1:
                     self.write(java_type + ' ')
                 self._add_to_scope(target.value.id, python_type, java_type, target, None, True)
-            elif isinstance(target, ast.Subscript):
-                node.targets = [target.value]
-                self.visit_Assign(node)
-                return
             self.traverse(target)
             self.write(" = ")
-        self.traverse(node.value)
+        self._traverse_as(node.value, self._java_int_type(node.targets[0]) if len(node.targets) == 1 else None)
         self.write(';')
         self._assignment_type_context = None
         # TODO: Leverage type comments?
         # if type_comment := self.get_type_comment(node):
         #     self.write(type_comment)
     #
-    # def visit_AugAssign(self, node):
-    #     self.fill()
-    #     self.traverse(node.target)
-    #     self.write(" " + self.binop[node.op.__class__.__name__] + "= ")
-    #     self.traverse(node.value)
+    @classmethod
+    def _same_place(cls, read, target):
+        """
+        Whether *read* reads what assigning *target* changes: the same name, or attribute of the same thing.
+        Any element of the same container might be the same element
+        """
+        if type(read) is not type(target):
+            return False
+        if isinstance(read, ast.Name):
+            return read.id == target.id
+        if isinstance(read, ast.Attribute):
+            return read.attr == target.attr and cls._same_place(read.value, target.value)
+        if isinstance(read, ast.Subscript):
+            return cls._same_place(read.value, target.value)
+        return False
+
+    def _unpacking_helper(self, target, value):
+        """`a, b = x, y`, and `a, b = f()` for functions returning a record"""
+        if isinstance(value, (ast.Tuple, ast.List)) and len(value.elts) == len(target.elts) \
+                and not any(isinstance(element, ast.Starred) for element in target.elts + value.elts):
+            # Python works out every value before assigning any of them. Assigning one after the other
+            #  is only the same if no value reads something assigned before it, so values that do get
+            #  worked out into a temporary first. `a, b = b, a` costs one int, not an array
+            values = list(value.elts)
+            assigned = []
+            for index, (element, element_value) in enumerate(zip(target.elts, value.elts)):
+                if any(self._same_place(node, target) for node in ast.walk(element_value) for target in assigned):
+                    python_type = self._get_python_type(element_value)
+                    java_type = self._get_java_type(element_value, python_type)
+                    temporary = self._unique_name(f"{element.id}Next" if isinstance(element, ast.Name) else 'next')
+                    self.fill(f"{'var' if java_type == 'Object' else java_type} {temporary} = ")
+                    self.traverse(element_value)
+                    self.write(';')
+                    self.scopes[self.current_scopes[-1]][temporary] = python_type
+                    values[index] = ast.Name(id=temporary, ctx=ast.Load())
+                    # It holds what the target will, so it has the same range
+                    self._name_keys[id(values[index])] = self._name_keys.get(id(element))
+                    self._synthetic_nodes.append(values[index])
+                assigned.append(element)
+            for element, element_value in zip(target.elts, values):
+                self.visit_Assign(ast.Assign(targets=[element], value=element_value))
+            return
+        record = self._record_of(value)
+        if record and len(record[1]) == len(target.elts):
+            # Special case: Unpacking what a function returned as a record, or a variable holding one
+            name, components, _ = record
+            if isinstance(value, ast.Name):
+                result = value.id
+            else:
+                result = self._unique_name(name[:1].lower() + name[1:])
+                self.fill(f"{name} {result} = ")
+                self.traverse(value)
+                self.write(';')
+            for element, component in zip(target.elts, components):
+                self.visit_Assign(ast.Assign(targets=[element], value=ast.Call(
+                    func=ast.Attribute(value=ast.Name(id=result, ctx=ast.Load()), attr=component, ctx=ast.Load()),
+                    args=[], keywords=[])))
+            return
+        if isinstance(value, ast.Await) and isinstance(value.value, ast.Call) \
+                and self._callee(value.value) == 'asyncio.gather' and len(value.value.args) == len(target.elts) \
+                and not any(isinstance(element, ast.Starred) for element in target.elts + value.value.args):
+            # Special case: The results of gather, which are a list, in the order of the awaitables
+            results = self._unique_name('results')
+            self.fill(f"var {results} = ")
+            self.traverse(value)
+            self.write(';')
+            for index, element in enumerate(target.elts):
+                self.visit_Assign(ast.Assign(targets=[element], value=ast.Call(
+                    func=ast.Attribute(value=ast.Name(id=results, ctx=ast.Load()), attr='get', ctx=ast.Load()),
+                    args=[ast.Constant(value=index)], keywords=[])))
+            return
+        if self._is_heap_tuple(value) and not any(isinstance(element, ast.Starred) for element in target.elts):
+            # Special case: A tuple out of a heap, which is a list of its elements
+            entry = self._unique_name('entry')
+            self.fill(f"var {entry} = ")
+            self.traverse(value)
+            self.write(';')
+            for index, element in enumerate(target.elts):
+                self.visit_Assign(ast.Assign(targets=[element], value=ast.Call(
+                    func=ast.Attribute(value=ast.Name(id=entry, ctx=ast.Load()), attr='get', ctx=ast.Load()),
+                    args=[ast.Constant(value=index)], keywords=[])))
+            return
+        if self.fast_input and (self._is_split_input(value) or self._is_map_over_split_input(value)) \
+                and not any(isinstance(element, ast.Starred) for element in target.elts):
+            # Special case: The values on a line of input, which FastInput reads into a list
+            values = self._unique_name('values')
+            self.fill(f"var {values} = ")
+            self.traverse(value)
+            self.write(';')
+            for index, element in enumerate(target.elts):
+                self.visit_Assign(ast.Assign(targets=[element], value=ast.Call(
+                    func=ast.Attribute(value=ast.Name(id=values, ctx=ast.Load()), attr='get', ctx=ast.Load()),
+                    args=[ast.Constant(value=index)], keywords=[])))
+            return
+        if isinstance(value, ast.Attribute) and value.attr == 'shape' and not isinstance(value.ctx, ast.Store) \
+                and (kind := self._array_kind(value.value)) is not None and len(target.elts) == kind[1]:
+            # Special case: The sizes of a NumPy array, along each axis
+            for index, element in enumerate(target.elts):
+                size = ast.Subscript(value=value, slice=ast.Constant(value=index), ctx=ast.Load())
+                self._synthetic_nodes.append(size)
+                self.visit_Assign(ast.Assign(targets=[element], value=size))
+            return
+        self._warn("Unsupported ATM: Mismatched a, b = x")
+
+    def visit_AugAssign(self, node):
+        operator = self.binop[node.op.__class__.__name__]
+        if isinstance(node.target, ast.Name) and node.target.id in self._string_builders and operator == '+':
+            # Special case: string accumulator inside a loop
+            self._write_appends(self._string_builders[node.target.id], [node.value])
+            return
+        if isinstance(node.target, ast.Subscript) \
+                or operator in ('//', '**') or self._java_int_type(node.target) == self._big_integer:
+            # Java doesn't have //= or **= (or any of them for BigIntegers, or through a get), so spell the whole
+            #  assignment out
+            self.visit_Assign(ast.Assign(targets=[node.target],
+                                         value=ast.BinOp(left=node.target, op=node.op, right=node.value)))
+            return
+        self.fill()
+        self.traverse(node.target)
+        self.write(f" {operator}= ")
+        # Worked out in the target's type, like the value of an assignment
+        self._traverse_as(node.value, self._java_int_type(node.target))
+        self.write(';')
     #
     # def visit_AnnAssign(self, node):
     #     self.fill()
@@ -462,15 +3136,47 @@ class _JavaUnparser(ast._Unparser):
     #         self.traverse(node.value)
     #
     def visit_Return(self, node):
+        if node.value is not None and self._is_reduction(node.value):
+            self.visit_Return(ast.Return(value=self._reduction_loop(node.value)))
+            return
+        if node.value is not None and id(node.value) in self._backtracking_calls:
+            # The pop has to happen after the call, but before returning what it returned
+            with self._pushed_for(node.value, in_finally=True):
+                self.fill("try ")
+                with self.block():
+                    self.visit_Return(node)
+            return
         self.fill("return")
         if node.value:
             self.write(" ")
-            self.traverse(node.value)
+            java_type = None
             for scope in reversed(self.current_scopes):
                 if scope.startswith(self._function_scope_prefix):
                     replacement_tag = scope + self._type_replacmeent_tag_suffix
-                    self._type_replacements[replacement_tag] = self._get_java_type(node.value)
+                    record = self._function_records.get(scope)
+                    if record and isinstance(node.value, ast.Tuple):
+                        # Special case: Returning a tuple, as a record
+                        name, _, type_tags = record
+                        self._type_replacements[replacement_tag] = name
+                        self.write(f"new {name}(")
+                        for index, (element, type_tag) in enumerate(zip(node.value.elts, type_tags)):
+                            if index:
+                                self.write(', ')
+                            if self._type_replacements[type_tag] == 'Object':
+                                self._type_replacements[type_tag] = self._get_java_type(element)
+                            self._traverse_as(element, self._type_replacements[type_tag])
+                        self.write(');')
+                        return
+                    java_type = self._hinted_int_types.get(scope)
+                    # Only there if the function wasn't given a type hint
+                    if replacement_tag in self._type_replacements:
+                        # Everything the function returns decides its type, when we know it
+                        value_range = self._value_ranges.get(self._function_return_keys.get(scope))
+                        java_type = self._range_java_type(value_range) if value_range \
+                            else self._get_java_type(node.value)
+                        self._type_replacements[replacement_tag] = java_type
                     break
+            self._traverse_as(node.value, java_type)
         self.write(';')
 
     def visit_Pass(self, node):
@@ -608,7 +3314,130 @@ class _JavaUnparser(ast._Unparser):
     def visit_AsyncFunctionDef(self, node):
         self._function_helper(node, "public", is_async=True)
 
-    def _function_helper(self, node, fill_suffix, is_async=False):
+    _cache_decorators = {'cache', 'lru_cache', 'functools.cache', 'functools.lru_cache'}
+
+    def _cache_decorator_name(self, decorator):
+        """'cache' or 'lru_cache' if *decorator* is one of functools' memoizing decorators, else None"""
+        function = decorator.func if isinstance(decorator, ast.Call) else decorator
+        name = ast.unparse(function)
+        return name.split('.')[-1] if name in self._cache_decorators else None
+
+    def _cache_size(self, decorator):
+        """How many results a cache decorator keeps, or None for all of them"""
+        if self._cache_decorator_name(decorator) == 'cache':
+            return None
+        if not isinstance(decorator, ast.Call):
+            return 128  # lru_cache's default
+        maxsize = decorator.args[0] if decorator.args else \
+            next((keyword.value for keyword in decorator.keywords if keyword.arg == 'maxsize'), ast.Constant(128))
+        return maxsize.value if isinstance(maxsize, ast.Constant) else None
+
+    _boxed_java_types = {'int': 'Integer', 'long': 'Long', 'double': 'Double', 'boolean': 'Boolean',
+                         'char': 'Character', 'float': 'Float', 'short': 'Short', 'byte': 'Byte', 'void': 'Void'}
+
+    def _cache_key(self, parameters):
+        """The type and expression of the key to cache a call with these (name, Java type) parameters under"""
+        if len(parameters) == 1:
+            name, java_type = parameters[0]
+            return self._boxed_java_types.get(java_type, java_type), name
+        if len(parameters) == 2 and all(java_type == 'int' for _, java_type in parameters):
+            # Two ints fit in one long, which is a lot cheaper to hash than a list of them
+            (first, _), (second, _) = parameters
+            return 'Long', f"((long) {first} << 32) | ({second} & 0xffffffffL)"
+        return 'java.util.List<Object>', f"java.util.Arrays.asList({', '.join(name for name, _ in parameters)})"
+
+    def _memoized_function_helper(self, node, cache_size):
+        """
+        Translate a function decorated with functools.cache/lru_cache into the function itself, renamed,
+        and a wrapper under the original name that keeps its results in a map. Bounded caches evict
+        the least recently used result, like lru_cache does. Functions that don't return anything only
+        need a set of the calls they've already made.
+        """
+        name = node.name
+        static = not self._current_class \
+            or any(isinstance(deco, ast.Name) and deco.id == 'staticmethod' for deco in node.decorator_list)
+        arguments = node.args.args if static else node.args.args[1:]
+        parameters = [(argument.arg, argument.annotation and self._process_type_hint(argument.annotation) or 'Object')
+                      for argument in arguments]
+        cache = self._unique_name(f"{name}Cache")
+        node.name = self._unique_name(f"{name}Uncached")
+        # Timed by the wrapper, so every call counts and not just the ones that miss the cache
+        scope = self._function_helper(node, "private", timed=False)
+
+        # What the function itself was widened to, if its hint was too narrow (see _hinted_int_types)
+        if node.returns and (return_type := self._hinted_int_types.get(scope)
+                             or self._process_type_hint(node.returns)):
+            boxed_type = self._boxed_java_types.get(return_type, return_type)
+        else:
+            return_type = scope + self._type_replacmeent_tag_suffix
+            boxed_type = scope + self._boxed_type_replacement_tag_suffix
+            self._boxed_type_replacements[boxed_type] = return_type
+        void = return_type == 'void' or not any(isinstance(child, (ast.Return, ast.Yield, ast.YieldFrom))
+                                                 and child.value is not None for child in self._walk_body(node.body))
+        if void:
+            return_type = 'void'
+        if self._current_function is None:
+            self._return_types[self._current_class, name] = return_type
+        key_type, key = self._cache_key(parameters)
+        value_type = 'Boolean' if void else boxed_type
+        map_type = f"java.util.Set<{key_type}>" if void else f"java.util.Map<{key_type}, {value_type}>"
+        if cache_size is None:
+            declaration = f"final {map_type} {cache} = new java.util.Hash{'Set' if void else 'Map'}<>();"
+        else:
+            # Access ordered, so the eldest entry is the least recently used
+            declaration = '\n'.join([
+                f"final {map_type} {cache} = "
+                f"{'java.util.Collections.newSetFromMap(' if void else ''}"
+                f"new java.util.LinkedHashMap<{f'{key_type}, Boolean' if void else ''}>(16, 0.75f, true) {{",
+                f"    @Override",
+                f"    protected boolean removeEldestEntry(java.util.Map.Entry<{key_type}, {value_type}> eldest) {{",
+                f"        return size() > {cache_size};",
+                f"    }}",
+                f"}}{')' if void else ''};",
+            ])
+        if static:
+            self._hoist(declaration)
+        else:
+            # One cache per instance, since self is part of every call
+            for outer_scope in reversed(self.current_scopes):
+                if outer_scope.startswith(self._class_scope_prefix):
+                    self._lazy_scope[outer_scope].append((None, declaration, None))
+                    break
+
+        names = {parameter for parameter, _ in parameters}
+        key_name = 'key' if 'key' not in names else self._unique_name('cacheKey')
+        cached_name = 'cached' if 'cached' not in names else self._unique_name('cachedResult')
+        self.maybe_newline()
+        self.fill(f"public{' static' if static else ''} {return_type} {name}"
+                  f"({', '.join(f'{java_type} {parameter}' for parameter, java_type in parameters)}) ")
+        call = f"{node.name}({', '.join(parameter for parameter, _ in parameters)})"
+        with self.block(), self._timed(name):
+            # Not computeIfAbsent: a recursive call would modify the map while it's computing
+            self.fill(f"{key_type} {key_name} = {key};")
+            if void:
+                self.fill(f"if (!{cache}.contains({key_name})) ")
+                with self.block():
+                    self.fill(f"{call};")
+                # Adding it again on a hit makes it the most recently used
+                self.fill(f"{cache}.add({key_name});")
+                return
+            self.fill(f"{boxed_type} {cached_name} = {cache}.get({key_name});")
+            # None is a result like any other, and gets cached too
+            self.fill(f"if ({cached_name} == null && !{cache}.containsKey({key_name})) ")
+            with self.block():
+                self.fill(f"{cached_name} = {call};")
+                self.fill(f"{cache}.put({key_name}, {cached_name});")
+            self.fill(f"return {cached_name};")
+
+    def _function_helper(self, node, fill_suffix, is_async=False, timed=True):
+        cache_decorators = [deco for deco in node.decorator_list if self._cache_decorator_name(deco)]
+        if cache_decorators and not is_async:
+            # Special case: functools.cache and lru_cache
+            node.decorator_list = [deco for deco in node.decorator_list if deco not in cache_decorators]
+            cache_size = self._cache_size(cache_decorators[0])
+            if cache_size != 0:
+                self._memoized_function_helper(node, cache_size)
+                return
         self.maybe_newline()
         # If we're not in a class, we'll treat it as static
         static = not self._current_class
@@ -619,8 +3448,9 @@ class _JavaUnparser(ast._Unparser):
             self.fill("@")
             self.traverse(deco)
         # TODO: Handle async
-        scope = 'public'
-        self.fill(scope)
+        self.fill(fill_suffix)
+        python_name = node.name
+        async_kind = None
         is_constructor = node.name == '__init__' and self._current_class
         if is_constructor:
             node.name = self._current_class
@@ -628,18 +3458,42 @@ class _JavaUnparser(ast._Unparser):
             # Starting the scope a little early to build replacement tag. If this bites me later,
             #   then I might need to use something else besides scope for that tag
             self._begin_scope(prefix=self._function_scope_prefix)
+            function_scope = self.current_scopes[-1]
+            record = self._tuple_records.get(id(node))
+            if record:
+                name, components, type_tags = record
+                self._function_records[function_scope] = record
+                self._hoist(f"record {name}({', '.join(f'{tag} {component}' for tag, component in zip(type_tags, components))}) {{}}")
+            self._function_return_keys[self.current_scopes[-1]] = (self._name_keys.get(id(node)), 'return')
             if not is_constructor:
                 # If they gave us a type hint, try to use it
                 type_hint = None
-                if node.returns:
+                if node.returns and not record:
                     type_hint = self._process_type_hint(node.returns)
-                if type_hint:
-                    self.write(type_hint)
-                else:
+                if type_hint == 'int' and (value_range := self._value_ranges.get(
+                        self._function_return_keys[function_scope])) and isinstance(value_range, tuple):
+                    # An int hint only says it's an integer, not that it fits in one
+                    type_hint = self._range_java_type(value_range)
+                    self._hinted_int_types[function_scope] = type_hint
+                if not type_hint:
                     # TODO: Figure out function return type
                     replacement_tag = self.current_scopes[-1] + self._type_replacmeent_tag_suffix
-                    self.write(replacement_tag)
                     self._type_replacements[replacement_tag] = 'void'
+                return_type = type_hint or replacement_tag
+                if is_async and self.async_mode == 'futures':
+                    # What it returns, it returns through the future it runs in (see _async_body)
+                    if type_hint:
+                        boxed_type = self._boxed_java_types.get(type_hint, type_hint)
+                        async_kind = 'run' if type_hint == 'void' else 'supply'
+                    else:
+                        boxed_type = function_scope + self._boxed_type_replacement_tag_suffix
+                        self._boxed_type_replacements[boxed_type] = replacement_tag
+                        async_kind = function_scope + self._async_kind_tag_suffix
+                        self._async_kinds[async_kind] = replacement_tag
+                    return_type = f"java.util.concurrent.CompletableFuture<{boxed_type}>"
+                self.write(return_type)
+                if self._current_function is None:
+                    self._return_types[self._current_class, node.name] = return_type
                 self.write(' ')
         with self.delimit("(", ") "):
             if not static:
@@ -648,36 +3502,342 @@ class _JavaUnparser(ast._Unparser):
                 self.NAME_TRANSLATIONS[this_var.arg] = 'this'
                 node.args.args[:] = node.args.args[1:]
             self.traverse(node.args)
-        with self.block(extra=self.get_type_comment(node), begins_scope=False):
+        with self.block(extra=self.get_type_comment(node), begins_scope=False), \
+                self._async_body(async_kind) if is_async else nullcontext():
             self.fill(f"<{self._lazy_scope_vars_tag}>{self.current_scopes[-1]}</{self._lazy_scope_vars_tag}>")
-            outer_function = self._current_function
-            outer_class = self._current_class
-            self._current_class = None
-            self._current_function = node.name
-            self._write_docstring_and_traverse_body(node)
-            self._current_function = outer_function
-            self._current_class = outer_class
-    #
-    # def visit_For(self, node):
-    #     self._for_helper("for ", node)
-    #
-    # def visit_AsyncFor(self, node):
-    #     self._for_helper("async for ", node)
-    #
-    def _for_helper(self, fill, node):
-        target = node.target
-        self.fill(f"<{self._lazy_scope_vars_tag}>{self.current_scopes[-1]}</{self._lazy_scope_vars_tag}>")
-        self._begin_scope(prefix=self._for_scope_prefix)
-        self.fill(fill)
-        loop_broke_var = 'loopBroke'
-        if node.orelse:
-            if self._loops_broken > 0:
-                loop_broke_var += str(self._loops_broken)
-            self._loop_break_vars_by_scope[self.current_scopes[-1]] = loop_broke_var
-            self._loops_broken += 1
-        with self.delimit("(", ")"):
-            try:
-                was_enumerate = False
+            with self._timed(python_name) if timed else nullcontext():
+                outer_function = self._current_function
+                outer_class = self._current_class
+                self._current_class = None
+                self._current_function = node.name
+                self._write_docstring_and_traverse_body(node)
+                self._current_function = outer_function
+                self._current_class = outer_class
+        return function_scope
+
+    @contextmanager
+    def _async_body(self, async_kind):
+        """
+        In the futures async mode, run the function body written inside in a CompletableFuture on a virtual
+        thread, and return that. Everything the body declares gets declared inside of it, so that the lambda
+        can change it
+        """
+        if self.async_mode != 'futures':
+            yield
+            return
+        self._hoist(self._futures_coroutines_class)
+        self.fill(f"return java.util.concurrent.CompletableFuture.{async_kind}Async(() -> ")
+        with self.block(begins_scope=False, ends_scope=False):
+            yield
+        self.write(", Coroutines.executor);")
+
+    def visit_Await(self, node):
+        if self.async_mode == 'futures':
+            # Waits for the future, blocking the virtual thread of the future awaiting it
+            self.set_precedence(ast._Precedence.ATOM, node.value)
+            self.traverse(node.value)
+            self.write(".join()")
+        elif not isinstance(node.value, ast.Call):
+            # Could be a task create_task started
+            self._hoist(self._virtual_threads_coroutines_class)
+            self.write("Coroutines.join(")
+            self.traverse(node.value)
+            self.write(")")
+        else:
+            # Calls block anyway
+            self.set_precedence(self.get_precedence(node), node.value)
+            self.traverse(node.value)
+
+    def visit_AsyncFor(self, node):
+        # Over the values, awaiting whatever the body awaits
+        self._for_helper("for ", node)
+
+    def visit_With(self, node):
+        self._with_helper(node.items, node.body)
+
+    def visit_AsyncWith(self, node):
+        self._with_helper(node.items, node.body)
+
+    def _with_helper(self, items, body):
+        """
+        A with statement, one item inside the other. Pools are closed, and locks and semaphores released,
+        in a finally. Anything else is a resource of a try-with-resources, closed like __exit__ would be
+        """
+        item, *items = items
+        kind = self._concurrency_kind(item.context_expr)
+        if kind in ('executor', 'lock', 'semaphore'):
+            self._hoist(self._concurrency_class)
+            name = item.optional_vars.id if isinstance(item.optional_vars, ast.Name) else None
+            if isinstance(item.context_expr, ast.Call) or name:
+                name = name or self._unique_name('pool' if kind == 'executor' else kind)
+                self.fill(f"{'' if self._in_scope(name) else 'var '}{name} = ")
+                self.traverse(item.context_expr)
+                self.write(";")
+                self.scopes[self.current_scopes[-1]].setdefault(name, object)
+            else:
+                self.set_precedence(ast._Precedence.ATOM, item.context_expr)
+                name = self._render(item.context_expr)
+            if kind != 'executor':
+                self.fill(f"{name}.lock();" if kind == 'lock' else f"Concurrency.acquire({name});")
+            self.fill("try ")
+            with self.block():
+                self._with_body(items, body)
+            self.write(" finally ")
+            with self.block():
+                self.fill({'executor': f"Concurrency.close({name});", 'lock': f"{name}.unlock();",
+                           'semaphore': f"{name}.release();"}[kind])
+            return
+        self._begin_scope()
+        self.fill("try ")
+        with self.delimit("(", ") "):
+            if isinstance(item.optional_vars, ast.Name):
+                name = item.optional_vars.id
+                self.scopes[self.current_scopes[-1]][name] = self._get_python_type(item.context_expr)
+            else:
+                name = self._unique_name('resource')
+            self.write(f"var {name} = ")
+            self.traverse(item.context_expr)
+        with self.block(begins_scope=False):
+            self._with_body(items, body)
+
+    def _with_body(self, items, body):
+        if items:
+            self._with_helper(items, body)
+        else:
+            self.traverse(body)
+
+    def _asyncio_helper(self, node):
+        """asyncio.run, gather, sleep and create_task, for how the async mode runs coroutines"""
+        function = self._callee(node).rpartition('.')[2]
+        futures = self.async_mode == 'futures'
+        if node.keywords or any(isinstance(argument, ast.Starred) for argument in node.args):
+            return False
+        # A future's already running, so a task is just that, and run waits for it. Blocking calls
+        #  get started on a virtual thread of their own
+        if len(node.args) == 1 and function == 'create_task' and not futures:
+            self._hoist(self._virtual_threads_coroutines_class)
+            self.write("Coroutines.start(() -> ")
+            self.traverse(node.args[0])
+            self.write(")")
+            return True
+        if len(node.args) == 1 and (function == 'run' or function == 'create_task' and futures):
+            self.set_precedence(ast._Precedence.ATOM if futures and function == 'run' else self.get_precedence(node),
+                                node.args[0])
+            self.traverse(node.args[0])
+            if futures and function == 'run':
+                self.write(".join()")
+            return True
+        if function not in ('gather', 'sleep') or function == 'sleep' and len(node.args) != 1:
+            return False
+        self._hoist(self._futures_coroutines_class if futures else self._virtual_threads_coroutines_class)
+        self.write(f"Coroutines.{function}(")
+        for index, argument in enumerate(node.args):
+            if index:
+                self.write(", ")
+            if function == 'gather' and not futures:
+                # Started by gather, each on a thread of its own, rather than here one after the other
+                self.write("Coroutines.task(() -> ")
+                if isinstance(argument, ast.Call):
+                    self.traverse(argument)
+                else:
+                    self.visit_Await(ast.Await(value=argument))
+                self.write(")")
+            elif function == 'sleep':
+                self._traverse_as(argument, 'double')
+            else:
+                self.traverse(argument)
+        self.write(")")
+        return True
+    #
+    # def visit_For(self, node):
+    #     self._for_helper("for ", node)
+    #
+    # def visit_AsyncFor(self, node):
+    #     self._for_helper("async for ", node)
+    #
+    @staticmethod
+    def _walk_body(statements):
+        """Like ast.walk over a list of statements, but without descending into
+        nested functions, classes and lambdas, which have scopes of their own"""
+        todo = list(reversed(statements))
+        while todo:
+            node = todo.pop()
+            yield node
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+                todo.extend(reversed(list(ast.iter_child_nodes(node))))
+
+    @staticmethod
+    def _accumulated_pieces(name, value):
+        """If *value* is `name + a + b + ...`, return [a, b, ...]"""
+        pieces = []
+        while isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add):
+            pieces.append(value.right)
+            value = value.left
+        if pieces and isinstance(value, ast.Name) and value.id == name:
+            return pieces[::-1]
+        return None
+
+    def _find_string_accumulators(self, body):
+        """
+        Find the strings a loop body only ever grows, with `s += piece` or `s = s + piece`.
+        Any other store to the name (resetting it, using it as a loop target...) rules it out.
+        """
+        accumulating_targets = set()
+        for node in self._walk_body(body):
+            if isinstance(node, ast.AugAssign) and isinstance(node.op, ast.Add) \
+                    and isinstance(node.target, ast.Name):
+                accumulating_targets.add(id(node.target))
+            elif isinstance(node, ast.Assign) and len(node.targets) == 1 \
+                    and isinstance(node.targets[0], ast.Name) \
+                    and self._accumulated_pieces(node.targets[0].id, node.value) is not None:
+                accumulating_targets.add(id(node.targets[0]))
+        accumulators = []
+        other_stores = set()
+        for node in self._walk_body(body):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                if id(node) in accumulating_targets:
+                    if node.id not in accumulators:
+                        accumulators.append(node.id)
+                else:
+                    other_stores.add(node.id)
+        return [name for name in accumulators
+                if name not in other_stores and name not in self._string_builders and self._in_scope(name) == str]
+
+    def _string_concat_parts(self, node):
+        """Split `a + b + c` into [a, b, c] if it's a string concatenation from the start"""
+        parts = []
+        value = node
+        while isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add):
+            parts.append(value.right)
+            value = value.left
+        parts.append(value)
+        if len(parts) > 1 and self._get_python_type(value) == str:
+            return parts[::-1]
+        return [node]
+
+    def _write_appends(self, builder, pieces):
+        self.fill(builder)
+        for piece in pieces:
+            for part in self._string_concat_parts(piece):
+                self.write('.append(')
+                self.traverse(part)
+                self.write(')')
+        self.write(';')
+
+    def _loop_broke_var(self):
+        """The flag a loop with an else sets when it breaks, for the loop whose scope was just begun"""
+        loop_broke_var = 'loopBroke'
+        if self._loops_broken > 0:
+            loop_broke_var += str(self._loops_broken)
+        self._loop_break_vars_by_scope[self.current_scopes[-1]] = loop_broke_var
+        self._loops_broken += 1
+        return loop_broke_var
+
+    def _parallel_for_helper(self, node, plan):
+        """
+        A loop over a range as a ParallelLoops stream, which runs it in parallel if it's long enough, with its
+        accumulator (if any) worked out from what every iteration contributes. Returns False, having written
+        nothing, if it's known to be too short, or its accumulator isn't a number the stream can reduce
+        """
+        declarations, reduction, marked = plan
+        target = node.target
+        counter_type = self._java_int_type(target) or 'int'
+        if self._in_scope(target.id) or counter_type not in ('int', 'long'):
+            return False
+        start, stop = (None, node.iter.args[0]) if len(node.iter.args) == 1 else node.iter.args[:2]
+        start_range = (0, 0) if start is None else self._range_of(start)
+        stop_range = self._range_of(stop)
+        if start_range and stop_range and stop_range[1] - start_range[0] < self._parallel_min_trips:
+            return False
+        if reduction:
+            accumulator, kind, element = reduction
+            python_type = self._in_scope(accumulator.id)
+            java_type = 'double' if python_type == float else python_type == int and (self._java_int_type(accumulator) or 'int')
+            # Adding doubles up in another order rounds them differently, so that has to be asked for
+            if java_type not in ('int', 'long', 'double') or java_type == 'double' and kind in ('+', '*') and not marked:
+                return False
+            element_type = 'double' if java_type == 'double' else 'long'
+
+        self.fill(f"<{self._lazy_scope_vars_tag}>{self.current_scopes[-1]}</{self._lazy_scope_vars_tag}>")
+        self._hoist(self._parallel_loops_class)
+        self.fill()
+        if reduction:
+            self.traverse(accumulator)
+            if kind in ('+', '*'):
+                self.write(f" {kind}= ")
+            else:
+                self.write(f" = {'(int) ' if java_type == 'int' else ''}Math.{kind}(")
+                self.traverse(accumulator)
+                self.write(", ")
+        self.write("ParallelLoops.range(")
+        if start is None:
+            self.write("0")
+        else:
+            self._traverse_as(start, counter_type)
+        self.write(", ")
+        self._traverse_as(stop, counter_type)
+        if reduction is None:
+            self.write(f").forEach({target.id} -> ")
+        elif element_type == ('long' if counter_type == 'long' else 'int'):
+            self.write(f").map({target.id} -> ")
+        else:
+            self.write(f").mapTo{element_type.capitalize()}({target.id} -> ")
+
+        # Its variables are the iteration's own, declared in the lambda
+        self._begin_scope(prefix=self._for_scope_prefix)
+        self.scopes[self.current_scopes[-1]][target.id] = int
+        statements = node.body[:-1] if reduction else node.body
+        self._block_declarations.update(id(statement) for statement in declarations)
+        if statements:
+            with self.block(begins_scope=False):
+                self.traverse(statements)
+                if reduction:
+                    self.fill("return ")
+                    self._traverse_as(element, element_type)
+                    self.write(";")
+        else:
+            self._traverse_as(element, element_type)
+            self.current_scopes.pop()
+        self._block_declarations.difference_update(id(statement) for statement in declarations)
+        self.write(")")
+
+        if reduction and kind == '+':
+            self.write(".sum()")
+        elif reduction and kind == '*':
+            left, right = self._unique_name('left'), self._unique_name('right')
+            self.write(f".reduce({'1.0' if element_type == 'double' else '1'}, ({left}, {right}) -> {left} * {right})")
+        elif reduction:
+            self.write(f".{kind}().orElse(")
+            self.traverse(accumulator)
+            self.write("))")
+        self.write(";")
+        return True
+
+    def _for_helper(self, fill, node):
+        if id(node) in self._parallel_loops and self._parallel_for_helper(node, self._parallel_loops[id(node)]):
+            return
+        target = node.target
+        self.fill(f"<{self._lazy_scope_vars_tag}>{self.current_scopes[-1]}</{self._lazy_scope_vars_tag}>")
+        # Strings grown inside the loop get a StringBuilder, rather than being copied on every iteration
+        accumulators = self._find_string_accumulators(node.body)
+        builders = {}
+        for name in accumulators:
+            builders[name] = self._unique_name(f"{name}Builder")
+            self.fill(f"StringBuilder {builders[name]} = new StringBuilder({name});")
+        if isinstance(node.iter, ast.Call) and isinstance(node.iter.func, ast.Name) and node.iter.func.id == 'enumerate' \
+                and node.iter.args and not isinstance(node.iter.args[0], ast.Name):
+            # The loop reads what it enumerates on every iteration, so work it out once beforehand
+            sequence = self._unique_name('sequence')
+            self.fill(f"var {sequence} = ")
+            self.traverse(node.iter.args[0])
+            self.write(';')
+            node.iter.args[0] = ast.Name(id=sequence, ctx=ast.Load())
+        self._begin_scope(prefix=self._for_scope_prefix)
+        self.fill(fill)
+        loop_broke_var = self._loop_broke_var() if node.orelse else None
+        with self.delimit("(", ")"):
+            try:
+                was_enumerate = False
                 if node.iter.func.id == 'enumerate':
                     was_enumerate = True
                     node.iter.func.id = 'range'
@@ -688,7 +3848,9 @@ class _JavaUnparser(ast._Unparser):
                         target = node.target.elts[0]
 
                     if not self._in_scope(target.id):
-                        self.write('int ')
+                        # A counter too big for a long would be too big to count to anyway
+                        self.write('long ' if self._java_int_type(target) in ('long', self._big_integer) else 'int ')
+                        self.scopes[self.current_scopes[-1]][target.id] = int
                     self.traverse(target)
 
                     start = step = None
@@ -733,6 +3895,9 @@ class _JavaUnparser(ast._Unparser):
                 if len(elts) == 1:
                     if not self._in_scope(node.target.id):
                         self.write('var ')
+                        if (element_type := self._element_python_type(node.iter)) is not None:
+                            # So that e.g. `if x:` knows what x is
+                            self.scopes[self.current_scopes[-1]][node.target.id] = element_type
                     self.traverse(node.target)
                     self.write(": ")
                 else:
@@ -747,9 +3912,17 @@ class _JavaUnparser(ast._Unparser):
                 self.traverse(node.target.elts[1])
                 self.write(" = ")
                 self.traverse(node.iter.args[0])
-                self.write("[i];")
+                self.write(".get(")
+                self.traverse(node.target.elts[0])
+                self.write(");")
 
+            # Only the body sees the builders; the loop header still reads the string itself
+            self._string_builders.update(builders)
             self.traverse(node.body)
+            for name in accumulators:
+                del self._string_builders[name]
+        for name in accumulators:
+            self.fill(f"{name} = {builders[name]}.toString();")
         if node.orelse:
             self.fill(f"if (!{loop_broke_var})")
             with self.block():
@@ -763,14 +3936,27 @@ class _JavaUnparser(ast._Unparser):
                 and isinstance(node.test.left, ast.Name) and node.test.left.id == '__name__' \
                 and isinstance(node.test.ops[0], ast.Eq) \
                 and isinstance(node.test.comparators[0], ast.Constant) and node.test.comparators[0].value == '__main__':
-            self.write("public static void main(String[] args)")
+            self.fill("public static void main(String[] args)")
+            self._has_main_method = True
             with self.block():
                 self.traverse(node.body)
+                if self.buffered_output:
+                    self.fill(f"{self._stdout_writer()}.flush();")
             return
 
+        lookup = None
+        if isinstance(node.test, ast.Compare) and len(node.test.ops) == 1 \
+                and isinstance(node.test.ops[0], ast.In) and self._is_dict(node.test.comparators[0]):
+            # Special case: `if k in d:` then reading d[k] looks it up once, and checks what it got for null
+            lookup = self._write_lookup(node.test.comparators[0], node.test.left, node.body)
         self.fill("if ")
         with self.delimit("(", ") "):
-            self.traverse(node.test)
+            if lookup is None:
+                self._write_condition(node.test)
+            else:
+                # Looking again only when it got null, which could still be a None that's there
+                self.write(f"{lookup} != null || ")
+                self._write_membership_check(node.test.comparators[0], node.test.left)
         with self.block():
             self.traverse(node.body)
         # collapse nested ifs into equivalent elifs.
@@ -778,7 +3964,7 @@ class _JavaUnparser(ast._Unparser):
             node = node.orelse[0]
             self.fill("else if ")
             with self.delimit("(", ") "):
-                self.traverse(node.test)
+                self._write_condition(node.test)
             with self.block():
                 self.traverse(node.body)
         # final else
@@ -787,15 +3973,34 @@ class _JavaUnparser(ast._Unparser):
             with self.block():
                 self.traverse(node.orelse)
     #
-    # def visit_While(self, node):
-    #     self.fill("while ")
-    #     self.traverse(node.test)
-    #     with self.block():
-    #         self.traverse(node.body)
-    #     if node.orelse:
-    #         self.fill("else")
-    #         with self.block():
-    #             self.traverse(node.orelse)
+    def visit_While(self, node):
+        self.fill(f"<{self._lazy_scope_vars_tag}>{self.current_scopes[-1]}</{self._lazy_scope_vars_tag}>")
+        self._begin_scope(prefix=self._for_scope_prefix)
+        loop_broke_var = self._loop_broke_var() if node.orelse else None
+        # NumPy arrays in the condition get worked out again every time round
+        lowered = self._uses_numpy and any(self._array_reduction(child) is not None
+                                           or not isinstance(child, ast.Name) and self._array_kind(child) is not None
+                                           for child in ast.walk(node.test))
+        self.fill("while ")
+        with self.delimit("(", ") "):
+            if lowered:
+                self.write("true")
+            else:
+                self._write_condition(node.test)
+        with self.block(begins_scope=False):
+            if lowered:
+                self._lower_expression(node.test)
+                self.fill("if (!(")
+                self._write_condition(node.test)
+                self.write("))")
+                with self.block():
+                    self.fill("break;")
+            self.traverse(node.body)
+        if node.orelse:
+            self.fill(f"if (!{loop_broke_var})")
+            with self.block():
+                self._add_to_scope(loop_broke_var, bool, 'boolean', loop_broke_var, 'false')
+                self.traverse(node.orelse)
     #
     # def visit_With(self, node):
     #     self.fill("with ")
@@ -850,6 +4055,20 @@ class _JavaUnparser(ast._Unparser):
     #     write("}")
     #
     def visit_Name(self, node):
+        if node.id in self._string_builders:
+            # Reading a string accumulator in the middle of its loop
+            self.write(f"{self._string_builders[node.id]}.toString()")
+            return
+        if id(node) in self._escaping_names:
+            # A list being backtracked over gets popped later, so whatever keeps it needs a copy
+            self.write(f"new java.util.ArrayList<>({node.id})")
+            return
+        if self.symbol_index and self._name_keys.get(id(node)) == (self._module_id, node.id) \
+                and (qualified_name := self._imports.get(node.id)) \
+                and self.symbol_index._module_of(qualified_name, self.symbol_index.modules):
+            # Something imported from another module of the package, which is only there by its full name
+            self.write(qualified_name)
+            return
         self.write(self.NAME_TRANSLATIONS.get(node.id, node.id))
 
     def _write_docstring(self, node):
@@ -883,6 +4102,8 @@ class _JavaUnparser(ast._Unparser):
         elif isinstance(value, str):
             # TODO: Better formatting for Java strings.
             self.write(json.dumps(value))
+        elif isinstance(value, int) and not self._int_range[0] <= value <= self._int_range[1]:
+            self.write(f"{value!r}L")
         else:
             self.write(repr(value))
     #
@@ -954,33 +4175,87 @@ class _JavaUnparser(ast._Unparser):
     #         self.set_precedence(_Precedence.TEST, node.orelse)
     #         self.traverse(node.orelse)
     #
-    # def visit_Set(self, node):
-    #     if not node.elts:
-    #         raise ValueError("Set node should have at least one item")
-    #     with self.delimit("{", "}"):
-    #         self.interleave(lambda: self.write(", "), self.traverse, node.elts)
+    def visit_IfExp(self, node):
+        # Java's ?: groups to the right like Python's if else, so a chain like a if p else b if q else c
+        #  is written along its elses without parentheses, or recursing
+        with self.require_parens(ast._Precedence.TEST, node):
+            while True:
+                self.set_precedence(ast._Precedence.TEST.next(), node.body, node.test)
+                self._write_condition(node.test)
+                self.write(" ? ")
+                self.traverse(node.body)
+                self.write(" : ")
+                if not isinstance(node.orelse, ast.IfExp):
+                    break
+                node = node.orelse
+            self.set_precedence(ast._Precedence.TEST, node.orelse)
+            self.traverse(node.orelse)
     #
-    # def visit_Dict(self, node):
-    #     def write_key_value_pair(k, v):
-    #         self.traverse(k)
-    #         self.write(": ")
-    #         self.traverse(v)
-    #
-    #     def write_item(item):
-    #         k, v = item
-    #         if k is None:
-    #             # for dictionary unpacking operator in dicts {**{'y': 2}}
-    #             # see PEP 448 for details
-    #             self.write("**")
-    #             self.set_precedence(_Precedence.EXPR, v)
-    #             self.traverse(v)
-    #         else:
-    #             write_key_value_pair(k, v)
+    def visit_Set(self, node):
+        # List.of, unlike Set.of, doesn't mind the same element twice
+        self.write("new java.util.HashSet<>(java.util.List.of(")
+        self.interleave(lambda: self.write(", "), self.traverse, node.elts)
+        self.write("))")
     #
-    #     with self.delimit("{", "}"):
-    #         self.interleave(
-    #             lambda: self.write(", "), write_item, zip(node.keys, node.values)
-    #         )
+    # Dict displays that could have the same key twice, or None in them. And setdefault, where a key
+    #  that's there with None is there, which it isn't for computeIfAbsent
+    _dicts_class = """final class Dicts {
+    static <K, V> java.util.Map.Entry<K, V> entry(K key, V value) {
+        return new java.util.AbstractMap.SimpleEntry<>(key, value);
+    }
+
+    @SafeVarargs
+    static <K, V> java.util.HashMap<K, V> of(java.util.Map.Entry<? extends K, ? extends V>... entries) {
+        java.util.HashMap<K, V> map = new java.util.HashMap<>();
+        for (var entry : entries) {
+            map.put(entry.getKey(), entry.getValue());
+        }
+        return map;
+    }
+
+    static <K, V> V setDefault(java.util.Map<K, V> map, K key, V value) {
+        if (map.containsKey(key)) {
+            return map.get(key);
+        }
+        map.put(key, value);
+        return value;
+    }
+}"""
+
+    def visit_Dict(self, node):
+        if not node.keys:
+            self.write("new java.util.HashMap<>()")
+            return
+        if None in node.keys:
+            self._warn("Unsupported ATM: Dict unpacking", ast.unparse(node))
+        pairs = [(key, value) for key, value in zip(node.keys, node.values) if key is not None]
+        constants = [part.value for pair in pairs for part in pair if isinstance(part, ast.Constant)]
+        if len(constants) < 2 * len(pairs) or None in constants or len(set(constants[::2])) < len(pairs):
+            # Map.of throws on a repeated key or a null, where a later key just replaces the earlier one and
+            #  None is a value like any other. Put them one at a time, like Python does
+            self._hoist(self._dicts_class)
+            self.write("Dicts.of(")
+            for index, (key, value) in enumerate(pairs):
+                self.write(", Dicts.entry(" if index else "Dicts.entry(")
+                self.traverse(key)
+                self.write(", ")
+                self.traverse(value)
+                self.write(")")
+            self.write(")")
+            return
+        # Map.of only goes up to 10 pairs
+        if len(pairs) <= 10:
+            self.write("new java.util.HashMap<>(java.util.Map.of(")
+            self.interleave(lambda: self.write(", "), self.traverse, [part for pair in pairs for part in pair])
+        else:
+            self.write("new java.util.HashMap<>(java.util.Map.ofEntries(")
+            for index, (key, value) in enumerate(pairs):
+                self.write(", java.util.Map.entry(" if index else "java.util.Map.entry(")
+                self.traverse(key)
+                self.write(", ")
+                self.traverse(value)
+                self.write(")")
+        self.write("))")
     #
     # def visit_Tuple(self, node):
     #     with self.delimit("(", ")"):
@@ -1006,6 +4281,34 @@ class _JavaUnparser(ast._Unparser):
     #         self.set_precedence(operator_precedence, node.operand)
     #         self.traverse(node.operand)
     #
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, (ast.USub, ast.Invert)) and self._java_int_type(node) == self._big_integer:
+            # Special case: BigInteger
+            self._write_big_integer(node.operand)
+            self.write('.negate()' if isinstance(node.op, ast.USub) else '.not()')
+            return
+        # A chain like `not not x` or `- - x` is written a level at a time, rather than by recursing
+        closing = 0
+        while True:
+            operator = '!' if isinstance(node.op, ast.Not) else self.unop[node.op.__class__.__name__]
+            precedence = ast._Precedence.NOT if operator == '!' else self.unop_precedence[operator]
+            if self.get_precedence(node) > precedence:
+                self.write("(")
+                closing += 1
+            self.write(operator)
+            operand = node.operand
+            # Java's ! binds tighter than Python's not, so whatever it applies to needs to be just as tight
+            self.set_precedence(ast._Precedence.FACTOR, operand)
+            if not isinstance(operand, ast.UnaryOp) or isinstance(operand.op, (ast.USub, ast.Invert)) \
+                    and self._java_int_type(operand) == self._big_integer:
+                break
+            if operator in '+-' and self.unop[operand.op.__class__.__name__] == operator:
+                # Not -- or ++
+                self.write(" ")
+            node = operand
+        self.traverse(operand)
+        self.write(")" * closing)
+    #
     # binop = {
     #     "Add": "+",
     #     "Sub": "-",
@@ -1040,8 +4343,80 @@ class _JavaUnparser(ast._Unparser):
     #
     # binop_rassoc = frozenset(("**",))
     #
+    _big_integer_methods = {'+': 'add', '-': 'subtract', '*': 'multiply', '//': 'divide', '%': 'mod', '**': 'pow',
+                            '&': 'and', '|': 'or', '^': 'xor', '<<': 'shiftLeft', '>>': 'shiftRight'}
+    _big_integer_constants = {0: 'ZERO', 1: 'ONE', 2: 'TWO', 10: 'TEN'}
+    # divide() truncates, and mod() throws for a negative divisor, where Python's // and % floor
+    _big_integers_class = """final class BigIntegers {
+    static java.math.BigInteger floorDiv(java.math.BigInteger dividend, java.math.BigInteger divisor) {
+        java.math.BigInteger[] quotientAndRemainder = dividend.divideAndRemainder(divisor);
+        return quotientAndRemainder[1].signum() * divisor.signum() < 0
+                ? quotientAndRemainder[0].subtract(java.math.BigInteger.ONE) : quotientAndRemainder[0];
+    }
+
+    static java.math.BigInteger floorMod(java.math.BigInteger dividend, java.math.BigInteger divisor) {
+        java.math.BigInteger remainder = dividend.remainder(divisor);
+        return remainder.signum() * divisor.signum() < 0 ? remainder.add(divisor) : remainder;
+    }
+}"""
+
+    def _write_big_integer(self, node):
+        """Write an integer expression as a BigInteger, converting it if it isn't one already"""
+        if isinstance(node, ast.Constant) and isinstance(node.value, int) and not isinstance(node.value, bool):
+            if node.value in self._big_integer_constants:
+                self.write(f"{self._big_integer}.{self._big_integer_constants[node.value]}")
+            elif self._long_range[0] <= node.value <= self._long_range[1]:
+                suffix = '' if self._int_range[0] <= node.value <= self._int_range[1] else 'L'
+                self.write(f"{self._big_integer}.valueOf({node.value}{suffix})")
+            else:
+                self.write(f'new {self._big_integer}("{node.value}")')
+        elif self._java_int_type(node) == self._big_integer:
+            self.set_precedence(ast._Precedence.ATOM, node)
+            self.traverse(node)
+        else:
+            self.write(f"{self._big_integer}.valueOf(")
+            self.set_precedence(ast._Precedence.TEST, node)
+            # Worked out in a long, which valueOf takes, so int arithmetic doesn't overflow on the way there
+            self._traverse_as(node, 'long')
+            self.write(')')
+
+    def _big_integer_binop(self, node, operator):
+        if operator == '//' and not (self._is_non_negative(node.left) and self._is_non_negative(node.right)) \
+                or operator == '%' and not self._is_non_negative(node.right):
+            # Special case: Flooring, which divide() and mod() only do for what isn't negative
+            self._hoist(self._big_integers_class)
+            self.write(f"BigIntegers.{'floorDiv' if operator == '//' else 'floorMod'}(")
+            self._write_big_integer(node.left)
+            self.write(', ')
+            self._write_big_integer(node.right)
+            self.write(')')
+            return
+        self._write_big_integer(node.left)
+        self.write(f".{self._big_integer_methods[operator]}(")
+        if operator in ('**', '<<', '>>'):
+            # These take a plain int
+            exact = self._java_int_type(node.right) != 'int'
+            self.set_precedence(ast._Precedence.TEST, node.right)
+            with self.delimit_if('Math.toIntExact(', ')', exact):
+                self.traverse(node.right)
+        else:
+            self._write_big_integer(node.right)
+        self.write(')')
+
     def visit_BinOp(self, node):
         operator = self.binop[node.op.__class__.__name__]
+        if operator in self._big_integer_methods and self._java_int_type(node) == self._big_integer:
+            # Special case: Too big for a long, so Java needs the method calls spelled out
+            self._big_integer_binop(node, operator)
+            return
+        if operator == '+' and (isinstance(node.left, ast.List) or isinstance(node.right, ast.List)):
+            # Special case: Concatenating lists makes a new one, like in Python
+            self.write("java.util.stream.Stream.concat(")
+            self._write_stream(node.left)
+            self.write(", ")
+            self._write_stream(node.right)
+            self.write(").collect(java.util.stream.Collectors.toCollection(java.util.ArrayList::new))")
+            return
         operator_precedence = self.binop_precedence[operator]
         with self.require_parens(operator_precedence, node):
             if operator in self.binop_rassoc:
@@ -1060,7 +4435,7 @@ class _JavaUnparser(ast._Unparser):
                 #  the goal of this project is to have as little "unnecessary" stuff
                 #  as possible, so this should be fixed.
                 if self._assignment_type_context == int:
-                    self.write("(int) ")
+                    self.write(f"({self._java_int_type(node) or 'int'}) ")
 
                 self.write('Math.pow(')
                 self.traverse(node.left)
@@ -1103,6 +4478,23 @@ class _JavaUnparser(ast._Unparser):
                         self.write(f"({self._python_to_java_types[possible_type_casts[0]]}) ")
                     self.traverse(node.right)
                 self.write(')')
+            elif operator in ('//', '%') and self._get_python_type(node.left) == int \
+                    and self._get_python_type(node.right) == int:
+                # Special case: Integer floor division and modulo
+                if self._is_non_negative(node.left) and self._is_non_negative(node.right):
+                    # Java truncates towards zero and Python floors, which only agree for non-negative operands.
+                    #  Plain / and % are the fastest thing the JIT gets, so use them when we know we can.
+                    self.traverse(node.left)
+                    self.write(' / ' if operator == '//' else ' % ')
+                    self.set_precedence(right_precedence, node.right)
+                    self.traverse(node.right)
+                else:
+                    self.write('Math.floorDiv(' if operator == '//' else 'Math.floorMod(')
+                    self.set_precedence(ast._Precedence.TEST, node.left, node.right)
+                    self.traverse(node.left)
+                    self.write(', ')
+                    self.traverse(node.right)
+                    self.write(')')
             elif operator == '/' or operator == '//':
                 if operator == '//':
                     delimiters = 'Math.floor(', ')'
@@ -1123,10 +4515,36 @@ class _JavaUnparser(ast._Unparser):
                     self.set_precedence(right_precedence, node.right)
                     self.traverse(node.right)
             else:
-                self.traverse(node.left)
-                self.write(f" {operator} ")
-                self.set_precedence(right_precedence, node.right)
-                self.traverse(node.right)
+                # The same goes for the operators down the left that are just as tight, like in a + b - c + ...,
+                #  which get written out here rather than recursing into each of them
+                chain = self._left_chain(node, lambda left: self.binop_precedence[self.binop[left.op.__class__.__name__]]
+                                         == operator_precedence and self._is_plain_binop(left))
+                for part in chain:
+                    if self._long_context and self.binop[part.op.__class__.__name__] in ('+', '-', '*', '<<') \
+                            and self._java_int_type(part) == 'long' \
+                            and self._java_int_type(part.left) == self._java_int_type(part.right) == 'int':
+                        # Java would work it out in an int, overflowing before it ever got widened
+                        self.write('(long) ')
+                self.set_precedence(left_precedence, chain[-1].left)
+                self.traverse(chain[-1].left)
+                for part in reversed(chain):
+                    self.write(f" {self.binop[part.op.__class__.__name__]} ")
+                    self.set_precedence(right_precedence, part.right)
+                    self.traverse(part.right)
+
+    def _is_plain_binop(self, node):
+        """Whether visit_BinOp writes *node* as just `left op right`, with none of its special cases"""
+        operator = self.binop[node.op.__class__.__name__]
+        if operator in self._big_integer_methods and self._java_int_type(node) == self._big_integer:
+            return False
+        if operator == '+' and (isinstance(node.left, ast.List) or isinstance(node.right, ast.List)):
+            return False
+        if operator in ('**', '/', '//') or operator in self.binop_rassoc:
+            return False
+        if operator == '%':
+            return not (isinstance(node.left, ast.Constant) and isinstance(node.left.value, str)) \
+                and not (self._get_python_type(node.left) == int and self._get_python_type(node.right) == int)
+        return True
     #
     # cmpops = {
     #     "Eq": "==",
@@ -1149,6 +4567,167 @@ class _JavaUnparser(ast._Unparser):
     #             self.write(" " + self.cmpops[o.__class__.__name__] + " ")
     #             self.traverse(e)
     #
+    def _write_stream(self, node):
+        if isinstance(node, ast.List):
+            self.write("java.util.stream.Stream.of(")
+            self.interleave(lambda: self.write(", "), self.traverse, node.elts)
+            self.write(")")
+        else:
+            self.set_precedence(ast._Precedence.ATOM, node)
+            self.traverse(node)
+            self.write(".stream()")
+
+    def visit_Compare(self, node):
+        if len(node.ops) == 1 and isinstance(node.ops[0], (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)) \
+                and self._big_integer in (self._java_int_type(node.left), self._java_int_type(node.comparators[0])):
+            # Special case: BigIntegers only compare through compareTo
+            with self.require_parens(ast._Precedence.CMP, node):
+                self._write_big_integer(node.left)
+                self.write('.compareTo(')
+                self._write_big_integer(node.comparators[0])
+                self.write(f") {self.cmpops[node.ops[0].__class__.__name__]} 0")
+            return
+        if len(node.ops) == 1 and isinstance(node.ops[0], (ast.In, ast.NotIn)) and self._is_dict(node.comparators[0]):
+            # Special case: Membership in a dict
+            with self.require_parens(ast._Precedence.NOT if isinstance(node.ops[0], ast.NotIn)
+                                     else ast._Precedence.ATOM, node):
+                if isinstance(node.ops[0], ast.NotIn):
+                    self.write("!")
+                self._write_membership_check(node.comparators[0], node.left)
+            return
+        if len(node.ops) == 1 and isinstance(node.ops[0], (ast.In, ast.NotIn)):
+            self._membership_helper(node.left, node.comparators[0], isinstance(node.ops[0], ast.NotIn), node)
+            return
+        if len(node.ops) == 1 and isinstance(node.ops[0], (ast.Eq, ast.NotEq)):
+            left, right = node.left, node.comparators[0]
+            if self._is_character(right) and self._is_single_character(left):
+                left, right = right, left
+            if self._is_character(left) and self._is_single_character(right):
+                # Special case: s[i] == "a" compares chars, without making a String out of s[i]
+                with self.require_parens(ast._Precedence.CMP, node):
+                    self._write_character(left)
+                    character = json.dumps(right.value)[1:-1].replace('\\"', '"').replace("'", "\\'")
+                    self.write(f" {self.cmpops[node.ops[0].__class__.__name__]} '{character}'")
+                return
+            if self._get_python_type(left) == str and self._get_python_type(right) == str:
+                # Special case: Strings are equal by value, and == would compare references
+                if isinstance(right, ast.Constant):
+                    left, right = right, left
+                with self.require_parens(ast._Precedence.NOT if isinstance(node.ops[0], ast.NotEq)
+                                         else ast._Precedence.ATOM, node):
+                    self.write("!" if isinstance(node.ops[0], ast.NotEq) else "")
+                    self.set_precedence(ast._Precedence.ATOM, left)
+                    self.traverse(left)
+                    self.write(".equals(")
+                    self.traverse(right)
+                    self.write(")")
+                return
+        super().visit_Compare(node)
+
+    def _write_membership_check(self, container, key):
+        """`key in container` for a dict, without getting the value"""
+        self.set_precedence(ast._Precedence.ATOM, container)
+        self.traverse(container)
+        self.write(".containsKey(")
+        self.traverse(key)
+        self.write(")")
+
+    # Past this many, a literal probed with `in` gets a set of its own, hoisted out, rather than a switch
+    _max_switch_labels = 16
+
+    def _membership_helper(self, element, container, negated, node):
+        """`element in container`, without scanning a list where it can be helped"""
+        literal = isinstance(container, (ast.Tuple, ast.List, ast.Set))
+        constants = literal and container.elts and all(isinstance(each, ast.Constant) and each.value is not None
+                                                       for each in container.elts)
+        if constants:
+            values = list(dict.fromkeys(each.value for each in container.elts))
+            element_type = self._get_python_type(element)
+            if element_type in (str, int) and all(type(value) is element_type for value in values) \
+                    and len(values) <= self._max_switch_labels \
+                    and (element_type == str or self._java_int_type(element) == 'int'):
+                # Special case: A handful of strings or ints is a switch
+                self.write("switch (")
+                self.traverse(element)
+                self.write(") { case ")
+                self.interleave(lambda: self.write(", "), self._write_constant, values)
+                # A String switch throws on null, unless it has a case for it (Java 21)
+                self.write(f" -> {str(not negated).lower()}; {'case null, ' if element_type == str else ''}"
+                           f"default -> {str(negated).lower()}; }}")
+                return
+            # Special case: Anything else constant gets a set, made once
+            owner = next((scope for scope in reversed(self.current_scopes)
+                          if scope.startswith(self._class_scope_prefix)), None)
+            source = ast.unparse(container)
+            if (owner, source) not in self._membership_sets:
+                base = f"{element.id.upper()}_VALUES" if isinstance(element, ast.Name) else 'VALUES'
+                name = self._unique_name(re.sub(r'\W', '_', base))
+                types = {type(value) for value in values}
+                java_type = self._python_to_java_types.get(types.pop(), 'Object') if len(types) == 1 else 'Object'
+                java_type = self._boxed_java_types.get(java_type, java_type)
+                self._hoist(f"final java.util.Set<{java_type}> {name} = java.util.Set.of("
+                            f"{', '.join(self._render(ast.Constant(value=value)) for value in values)});")
+                self._membership_sets[owner, source] = name
+            with self.require_parens(ast._Precedence.NOT if negated else ast._Precedence.ATOM, node):
+                self.write(f"{'!' if negated else ''}{self._membership_sets[owner, source]}.contains(")
+                self.traverse(element)
+                self.write(")")
+            return
+        if literal and container.elts and isinstance(element, ast.Name) \
+                and not any(isinstance(each, ast.Starred) for each in container.elts):
+            # Special case: A few things that aren't constants are compared with one at a time
+            with self.require_parens(ast._Precedence.AND if negated else ast._Precedence.OR, node):
+                for index, each in enumerate(container.elts):
+                    if index:
+                        self.write(" && " if negated else " || ")
+                    self.write("!java.util.Objects.equals(" if negated else "java.util.Objects.equals(")
+                    self.traverse(element)
+                    self.write(", ")
+                    self.traverse(each)
+                    self.write(")")
+            return
+        if isinstance(container, ast.Call) and self._dotted_name(container.func) == 'range' \
+                and not self._in_scope('range') and 1 <= len(container.args) <= 2 and self._is_plain_read(element):
+            # Special case: In a range with no step is between its ends
+            start, stop = container.args if len(container.args) == 2 else (ast.Constant(value=0), container.args[0])
+            with self.require_parens(ast._Precedence.OR if negated else ast._Precedence.AND, node):
+                for left, operator, right, joiner in (((element, '<', start, ' || '), (element, '>=', stop, ''))
+                                                      if negated else
+                                                      ((start, '<=', element, ' && '), (element, '<', stop, ''))):
+                    self.set_precedence(ast._Precedence.CMP.next(), left, right)
+                    self.traverse(left)
+                    self.write(f" {operator} ")
+                    self.traverse(right)
+                    self.write(joiner)
+            return
+        # Strings look for substrings, and collections for elements
+        with self.require_parens(ast._Precedence.NOT if negated else ast._Precedence.ATOM, node):
+            if negated:
+                self.write("!")
+            self.set_precedence(ast._Precedence.ATOM, container)
+            self.traverse(container)
+            self.write(".contains(")
+            self.traverse(element)
+            self.write(")")
+
+    def _render(self, node):
+        """What traversing *node* would write, as a string"""
+        source, self._source = self._source, []
+        try:
+            self.traverse(node)
+            return "".join(self._source)
+        finally:
+            self._source = source
+
+    def _is_character(self, node):
+        """Whether *node* indexes a string, which Java gives back as a char"""
+        return isinstance(node, ast.Subscript) and not isinstance(node.slice, ast.Slice) \
+            and self._get_python_type(node.value) == str
+
+    @staticmethod
+    def _is_single_character(node):
+        return isinstance(node, ast.Constant) and isinstance(node.value, str) and len(node.value) == 1
+    #
     boolops = {"And": "&&", "Or": "||"}
     boolop_precedence = {"&&": ast._Precedence.AND, "||": ast._Precedence.OR}
     #
@@ -1167,194 +4746,2941 @@ class _JavaUnparser(ast._Unparser):
     #         self.interleave(lambda: self.write(s), increasing_level_traverse, node.values)
     #
     def visit_Attribute(self, node):
-        self.set_precedence(ast._Precedence.ATOM, node.value)
-        self.traverse(node.value)
+        if self.rules.apply(self, node):
+            return
+        if (text := self._array_attribute(node)) is not None:
+            self.write(text)
+            return
+        # Down a chain like a.b.c.d to the first that's more than a plain attribute, and back up without recursing
+        chain = [node]
+        while isinstance(chain[-1].value, ast.Attribute) and not self._uses_numpy \
+                and (ast.Attribute, self._callee(chain[-1].value)) not in self.rules:
+            chain.append(chain[-1].value)
+        self.set_precedence(ast._Precedence.ATOM, chain[-1].value)
+        self.traverse(chain[-1].value)
         # Special case: 3.__abs__() is a syntax error, so if node.value
         # is an integer literal then we need to either parenthesize
         # it or add an extra space to get 3 .__abs__().
-        if isinstance(node.value, ast.Constant) and isinstance(node.value.value, int):
+        if isinstance(chain[-1].value, ast.Constant) and isinstance(chain[-1].value.value, int):
             self.write(" ")
-        self.write(".")
-
-        # Special cases
-        if isinstance(node.value, ast.Name):
-            # Special case: random
-            if node.value.id == 'random':
-                # TODO: What if random is in scope but isn't actually a random?
-                if not self._in_scope('random'):
-                    with self.delimit(f"<{self._move_up_tag}>", f"</{self._move_up_tag}>"):
-                        self.write('java.util.Random random = new java.util.Random();')
-                    self._add_to_scope('random', 'random', 'random', 'java.util.Random')  # TODO: Adding non-python type, smelly
-                if node.attr == 'randint':
-                    self.write('nextInt')
-                    return
-
-        self.write(node.attr)
+        for part in reversed(chain):
+            self.write(".")
+            self.write(part.attr)
     #
-    def visit_Call(self, node):
-        self.set_precedence(ast._Precedence.ATOM, node.func)
-        delimiter_1, delimiter_2 = "(", ")"
-
-        if isinstance(node.func, ast.Attribute) and node.func.attr == 'randint' and len(node.args) == 2:
-            # Special case: randint # TODO: Check to verify random is being called?
-            minimum, maximum = node.args
-            if isinstance(maximum, ast.Constant) and isinstance(minimum, ast.Constant):
-                bound = node.args[1].value - node.args[0].value
-                if minimum.value != 0:
-                    self.write(f"{minimum.value} + ")
-                self.traverse(node.func)
-                with self.delimit(delimiter_1, delimiter_2):
-                    self.write(str(bound))
-            else:
-                self.traverse(minimum)
+    def _print_helper(self, node):
+        keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+        sep, end, file = keywords.get('sep'), keywords.get('end'), keywords.get('file')
+        if isinstance(sep, ast.Constant) and sep.value is None:
+            sep = None
+        if isinstance(end, ast.Constant) and end.value is None:
+            end = None
+
+        if file is None or (isinstance(file, ast.Constant) and file.value is None) \
+                or ast.unparse(file) == 'sys.stdout':
+            stream = self._stdout_writer() if self.buffered_output else 'System.out'
+        elif ast.unparse(file) == 'sys.stderr':
+            stream = 'System.err'
+        else:
+            stream = None
+
+        if end is None or (isinstance(end, ast.Constant) and end.value == '\n'):
+            method, end = 'println', None
+        else:
+            method = 'print'
+            if isinstance(end, ast.Constant) and end.value == '' and node.args:
+                end = None
+        if stream is None:
+            self.set_precedence(ast._Precedence.ATOM, file)
+            self.traverse(file)
+            self.write(f".{method}(")
+        else:
+            self.write(f"{stream}.{method}(")
+
+        # Java only concatenates if there's a String on the left, which an empty sep doesn't provide
+        if node.args and isinstance(sep, ast.Constant) and sep.value == '' \
+                and self._get_python_type(node.args[0]) != str and (len(node.args) > 1 or end is not None):
+            self.write('"" + ')
+        for index, arg in enumerate(node.args):
+            if index:
+                if sep is None:
+                    self.write(' + " " + ')
+                elif not (isinstance(sep, ast.Constant) and sep.value == ''):
+                    self.write(' + ')
+                    self.traverse(sep)
+                    self.write(' + ')
+                else:
+                    self.write(' + ')
+            if len(node.args) > 1 or end is not None:
+                self.set_precedence(ast._Precedence.ARITH.next(), arg)
+            self.traverse(arg)
+        if end is not None:
+            if node.args:
                 self.write(' + ')
-                self.traverse(node.func)
-                with self.delimit(delimiter_1, delimiter_2):
-                    self.traverse(maximum)
-                    if not (isinstance(minimum, ast.Constant) and minimum.value == 0):
-                        self.write(" - ")
-                        self.traverse(minimum)
-            return
+                self.set_precedence(ast._Precedence.ARITH.next(), end)
+            self.traverse(end)
+        self.write(')')
 
-        if isinstance(node.func, ast.Name):
-            if node.func.id == 'input':
-                # Special case: input
-                # TODO: What if scanner is in scope but isn't actually a scanner?
-                if not self._in_scope('scanner'):
-                    with self.delimit(f"<{self._move_up_tag}>", f"</{self._move_up_tag}>"):
-                        self.write('java.util.Scanner scanner = new java.util.Scanner(System.in);')
-                    self._add_to_scope('scanner', 'scanner', 'scanner', 'java.util.Scanner')  # TODO: Adding non-python type, smelly
-
-                with self.delimit(f"<{self._move_up_tag}>", f"</{self._move_up_tag}>"):
-                    self.write("System.out.print")
-
-                    with self.delimit(delimiter_1, delimiter_2):
-                        comma = False
-                        for e in node.args:
-                            if comma:
-                                self.write(", ")
-                            else:
-                                comma = True
-                            self.traverse(e)
-                        for e in node.keywords:
-                            if comma:
-                                self.write(", ")
-                            else:
-                                comma = True
-                            self.traverse(e)
-                    self.write(';')
-                self.traverse(node.func)
-                self.write("()")
-                return
+        flush = keywords.get('flush')
+        if stream and stream != 'System.err' and self.buffered_output \
+                and not (flush is None or (isinstance(flush, ast.Constant) and not flush.value)):
+            self.write(f"; {stream}.flush()")
+        return True
 
-            if node.func.id == 'print' and len(node.args) > 1:
-                # Special case: print
-                # TODO: Handle keywords
-                self.traverse(node.func)
-                with self.delimit(delimiter_1, delimiter_2):
-                    plus = False
-                    for e in node.args:
-                        if plus:
-                            self.write(' + " " + ')
-                        else:
-                            plus = True
-                        self.traverse(e)
-                return
+    _random_functions = {'randint', 'randrange', 'random', 'uniform', 'choice', 'shuffle', 'seed'}
 
+    def _is_builtin(self, node, *names):
+        """Whether *node* calls one of the builtins *names*, and not something of the program's own"""
+        return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in names \
+            and not self._in_scope(node.func.id) and node.func.id not in self._method_names
 
-        # Special case: "somestring".format
-        if isinstance(node.func, ast.Attribute) \
-                and node.func.attr == 'format' \
-                and isinstance(node.func.value, ast.Constant) \
-                and isinstance(node.func.value.value, str):
-            self.write("String.format(")
-            # TODO: Optimize
-            # {0} -> %\1$s
-            string = node.func.value.value
-            match = re.search('{(\d+)}', string)
-            while match:
-                start, end = match.start(), match.end()
-                string = f"{string[:start+1]}{int(string[start+1:end-1])+1}{string[end-1:]}"
-                match = re.search('{(\d+)}', ' ' * end + string[end:])
-            # {} -> %s
-            string = string.replace('{}', '%s')
-            node.func.value.value = re.sub('{(\d+)}', r'%\1$s', string)
-            self.traverse(node.func.value)
+    def _builtin_helper(self, node):
+        """Builtins with a Java equivalent that doesn't need a helper of its own. Returns whether it handled *node*"""
+        keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+        if self._is_builtin(node, 'len') and len(node.args) == 1 and (kind := self._array_kind(node.args[0])):
+            # The rows of a 2-D NumPy array
+            self.write(f"{self._array_text(node.args[0])}.{'rows' if kind[1] == 2 else 'length'}")
+            return True
+        if self._is_builtin(node, 'len') and len(node.args) == 1:
+            self.set_precedence(ast._Precedence.ATOM, node.args[0])
+            self.traverse(node.args[0])
+            self.write(".length()" if self._get_python_type(node.args[0]) == str else ".size()")
+            return True
+        if self._is_builtin(node, 'list') and len(node.args) <= 1 and not keywords:
+            self.write("new java.util.ArrayList<>(")
+            if node.args:
+                self.traverse(node.args[0])
+            self.write(")")
+            return True
+        if self._is_builtin(node, 'min', 'max') and len(node.args) >= 2 and not keywords \
+                and any(self._java_int_type(argument) == self._big_integer for argument in node.args):
+            # Special case: BigIntegers have their own
+            self._write_big_integer(node.args[0])
+            for argument in node.args[1:]:
+                self.write(f".{node.func.id}(")
+                self._write_big_integer(argument)
+                self.write(")")
+            return True
+        if self._is_builtin(node, 'min', 'max') and len(node.args) >= 2 and not keywords:
+            # Special case: The smallest or biggest of a few, in pairs
+            for argument in node.args[:-1]:
+                self.write(f"Math.{node.func.id}(")
+                self.traverse(argument)
+                self.write(", ")
+            self.traverse(node.args[-1])
+            self.write(")" * (len(node.args) - 1))
+            return True
+        if self._is_builtin(node, 'sum', 'min', 'max', 'any', 'all') and len(node.args) == 1 \
+                and (not keywords or set(keywords) == {'default'} and node.func.id in ('min', 'max')):
+            self._write_reduction_stream(node.func.id, node.args[0], keywords.get('default'))
+            return True
+        if self._is_builtin(node, 'min', 'max') and len(node.args) == 1 and set(keywords) == {'key', 'default'} \
+                and not isinstance(node.args[0], ast.GeneratorExp) and not self._is_builtin(node.args[0], 'range'):
+            # Special case: What to give for nothing to compare, which Collections.max throws for
+            self.set_precedence(ast._Precedence.ATOM, node.args[0])
+            self.traverse(node.args[0])
+            self.write(f".stream().{node.func.id}(")
+            self._write_comparator(keywords['key'], None, self._element_python_type(node.args[0]))
+            self._write_or_else(keywords['default'])
+            return True
+        if self._is_builtin(node, 'min', 'max') and len(node.args) == 1 and set(keywords) == {'key'} \
+                and not isinstance(node.args[0], ast.GeneratorExp) and not self._is_builtin(node.args[0], 'range'):
+            self.write(f"java.util.Collections.{node.func.id}(")
+            self.traverse(node.args[0])
             self.write(", ")
-            delimiter_1 = ""  # Skip open parentheses
-        else:
-            # All other cases
-            self.traverse(node.func)
+            self._write_comparator(keywords['key'], None, self._element_python_type(node.args[0]))
+            self.write(")")
+            return True
+        if self._is_builtin(node, 'sorted') and len(node.args) == 1 and set(keywords) <= {'key', 'reverse'}:
+            self.set_precedence(ast._Precedence.ATOM, node.args[0])
+            self.traverse(node.args[0])
+            self.write(".stream().sorted(")
+            if keywords.get('key') is not None or self._is_true(keywords.get('reverse')):
+                self._write_comparator(keywords.get('key'), keywords.get('reverse'),
+                                       self._element_python_type(node.args[0]))
+            self.write(").collect(java.util.stream.Collectors.toCollection(java.util.ArrayList::new))")
+            return True
+        if isinstance(node.func, ast.Attribute) and node.func.attr == 'sort' and not node.args \
+                and set(keywords) <= {'key', 'reverse'} and 'sort' not in self._method_names:
+            # Special case: The comparator gets built once for the whole sort
+            self.set_precedence(ast._Precedence.ATOM, node.func.value)
+            self.traverse(node.func.value)
+            self.write(".sort(")
+            self._write_comparator(keywords.get('key'), keywords.get('reverse'),
+                                   self._element_python_type(node.func.value))
+            self.write(")")
+            return True
+        return False
 
-        with self.delimit(delimiter_1, delimiter_2):
-            comma = False
-            for e in node.args:
-                if comma:
-                    self.write(", ")
+    @staticmethod
+    def _is_true(node):
+        return isinstance(node, ast.Constant) and node.value is True
+
+    # Keys that are just a method of the elements
+    _method_references = {'str.lower': 'String::toLowerCase', 'str.upper': 'String::toUpperCase',
+                          'str.strip': 'String::strip', 'str.casefold': 'String::toLowerCase'}
+
+    # What elements of each type are in a list, where there's only the one it can be
+    _boxed_element_types = {str: 'String', float: 'Double', bool: 'Boolean'}
+
+    def _write_comparator(self, key, reverse, element_type=None):
+        """
+        A Comparator sorting by what *key* gives, comparing ints and floats as they are rather than boxed.
+        *element_type* is the Python type of what's being sorted, if known
+        """
+        if key is None:
+            self.write("java.util.Comparator.reverseOrder()" if self._is_true(reverse) else "null")
+            return
+        if self._dotted_name(key) in self._method_references:
+            self.write(f"java.util.Comparator.comparing({self._method_references[self._dotted_name(key)]})")
+            value = None
+        elif isinstance(key, ast.Lambda) and len(key.args.args) == 1:
+            parameter, value = key.args.args[0].arg, key.body
+        else:
+            parameter = self._lambda_parameter('value')
+            value = ast.Call(func=key, args=[ast.Name(id=parameter, ctx=ast.Load())], keywords=[])
+        if value is not None:
+            if element_type is not None:
+                # So that e.g. len of it knows it's a String
+                self.scopes[self.current_scopes[-1]].setdefault(parameter, element_type)
+            values = value.elts if isinstance(value, ast.Tuple) and value.elts else [value]
+            if len(values) > 1:
+                # A tuple compares by its first element, then its second, ... which is thenComparing.
+                #  Java can't tell what the elements are through the chain, so the lambdas say
+                if element_type in self._boxed_element_types:
+                    parameter = f"({self._boxed_element_types[element_type]} {parameter})"
                 else:
-                    comma = True
-                self.traverse(e)
-            for e in node.keywords:
-                if comma:
-                    self.write(", ")
+                    self._warn("Unsupported ATM: tuple keys of elements of unknown type", ast.unparse(key))
+            for index, value in enumerate(values):
+                method = {int: 'comparingInt', float: 'comparingDouble'}.get(self._get_python_type(value), 'comparing')
+                if method == 'comparingInt' and self._java_int_type(value) not in (None, 'int'):
+                    method = 'comparingLong'
+                if index:
+                    self.write(f".then{method[0].upper()}{method[1:]}(")
                 else:
-                    comma = True
-                self.traverse(e)
-    #
-    # def visit_Subscript(self, node):
-    #     def is_simple_tuple(slice_value):
-    #         # when unparsing a non-empty tuple, the parantheses can be safely
-    #         # omitted if there aren't any elements that explicitly requires
-    #         # parantheses (such as starred expressions).
-    #         return (
-    #                 isinstance(slice_value, Tuple)
-    #                 and slice_value.elts
-    #                 and not any(isinstance(elt, Starred) for elt in slice_value.elts)
-    #         )
-    #
-    #     self.set_precedence(_Precedence.ATOM, node.value)
-    #     self.traverse(node.value)
-    #     with self.delimit("[", "]"):
-    #         if is_simple_tuple(node.slice):
-    #             self.items_view(self.traverse, node.slice.elts)
-    #         else:
-    #             self.traverse(node.slice)
-    #
-    # def visit_Starred(self, node):
-    #     self.write("*")
-    #     self.set_precedence(_Precedence.EXPR, node.value)
-    #     self.traverse(node.value)
-    #
-    # def visit_Ellipsis(self, node):
-    #     self.write("...")
-    #
-    # def visit_Slice(self, node):
-    #     if node.lower:
-    #         self.traverse(node.lower)
-    #     self.write(":")
-    #     if node.upper:
-    #         self.traverse(node.upper)
-    #     if node.step:
-    #         self.write(":")
-    #         self.traverse(node.step)
-    #
-    def visit_arg(self, node):
-        type_hint = None
-        if node.annotation:
-            type_hint = self._process_type_hint(node.annotation)
-        if type_hint:
-            self.write(type_hint)
-            self.scopes[self.current_scopes[-1]][node.arg] = self._java_to_python_types.get(type_hint, 'Object')
+                    self.write(f"java.util.Comparator.{method}(")
+                self.write(f"{parameter} -> ")
+                self.set_precedence(ast._Precedence.TEST, value)
+                self.traverse(value)
+                self.write(")")
+        if reverse is not None and not (isinstance(reverse, ast.Constant) and not reverse.value):
+            if self._is_true(reverse):
+                self.write(".reversed()")
+            else:
+                self._warn("Unsupported ATM: reverse that isn't a constant", ast.unparse(reverse))
+
+    def _stream_source(self, node):
+        """
+        Write a stream over what *node* iterates. Generator expressions with one for get their
+        conditions filtered in, and a range is an IntStream. Returns the loop variable and what
+        each element becomes (the generator expression's), or Nones
+        """
+        element = target = None
+        if isinstance(node, ast.GeneratorExp) and len(node.generators) == 1 \
+                and isinstance(node.generators[0].target, ast.Name) and not node.generators[0].is_async:
+            generator = node.generators[0]
+            target, element, iterable = generator.target.id, node.elt, generator.iter
         else:
-            # TODO: Figure out function return type
-            self.write('Object')
-            self.scopes[self.current_scopes[-1]][node.arg] = self._java_to_python_types.get('Object', 'Object')
-        self.write(' ')
-        self.write(node.arg)
-    #
-    def visit_arguments(self, node):
-        first = True
-        # normal arguments
+            generator, iterable = None, node
+        if self._is_builtin(iterable, 'range') and 1 <= len(iterable.args) <= 2:
+            self.write("java.util.stream.IntStream.range(")
+            if len(iterable.args) == 1:
+                self.write("0, ")
+            self.interleave(lambda: self.write(", "), self.traverse, iterable.args)
+            self.write(")")
+            if target is not None:
+                self.scopes[self.current_scopes[-1]].setdefault(target, int)
+        else:
+            self.set_precedence(ast._Precedence.ATOM, iterable)
+            self.traverse(iterable)
+            self.write(".stream()")
+            if target is not None and (element_type := self._element_python_type(iterable)) is not None:
+                self.scopes[self.current_scopes[-1]].setdefault(target, element_type)
+        for condition in generator.ifs if generator else []:
+            self.write(f".filter({target} -> ")
+            self.set_precedence(ast._Precedence.TEST, condition)
+            self.traverse(condition)
+            self.write(")")
+        return target, element
+
+    def _write_or_else(self, default):
+        """End an Optional off with what *default* is, for min or max of nothing"""
+        self.write(").orElse(")
+        if isinstance(default, ast.Constant) and default.value is None:
+            self.write("null")
+        else:
+            self.set_precedence(ast._Precedence.TEST, default)
+            self.traverse(default)
+        self.write(")")
+
+    def _warn_unless_numbers(self, element, iterable):
+        if self._get_python_type(element) not in (int, float, bool):
+            self._warn("Unsupported ATM: sum of what might not be numbers, taken as longs", ast.unparse(iterable))
+
+    def _write_reduction_stream(self, reduction, iterable, default=None):
+        """
+        sum, min, max, any or all, over a primitive stream where the elements are numbers. The min or max
+        of anything else compares the elements as they are. *default* is min or max's, if it's given one
+        """
+        comprehension = isinstance(iterable, ast.GeneratorExp) and len(iterable.generators) == 1 \
+            and isinstance(iterable.generators[0].target, ast.Name)
+        if reduction in ('min', 'max') and not comprehension and not self._is_builtin(iterable, 'range') \
+                and self._element_python_type(iterable) not in (int, float):
+            if default is not None:
+                self.set_precedence(ast._Precedence.ATOM, iterable)
+                self.traverse(iterable)
+                self.write(f".stream().{reduction}(java.util.Comparator.naturalOrder()")
+                self._write_or_else(default)
+                return
+            self.write(f"java.util.Collections.{reduction}(")
+            self.traverse(iterable)
+            self.write(")")
+            return
+        target, element = self._stream_source(iterable)
+        if target is None:
+            target = self._lambda_parameter('value')
+            element = ast.Name(id=target, ctx=ast.Load())
+            if (element_type := self._element_python_type(iterable)) is not None:
+                self.scopes[self.current_scopes[-1]].setdefault(target, element_type)
+        if reduction in ('any', 'all'):
+            self.write(f".{reduction}Match({target} -> ")
+            # Truth as Python has it, so all(nums) is whether none of them are 0
+            self._write_condition(element)
+            self.write(")")
+            return
+        if reduction in ('min', 'max') and (self._get_python_type(element) not in (int, float, bool)
+                                            or isinstance(default, ast.Constant) and default.value is None):
+            # A boxed stream, which can give null for nothing too
+            self.write(f".map({target} -> ")
+            self.set_precedence(ast._Precedence.TEST, element)
+            self.traverse(element)
+            self.write(f").{reduction}(java.util.Comparator.naturalOrder()")
+            if default is None:
+                self.write(").get()")
+            else:
+                self._write_or_else(default)
+            return
+        if reduction == 'sum':
+            self._warn_unless_numbers(element, iterable)
+        java_type = 'Double' if self._get_python_type(element) == float else 'Long'
+        self.write(f".mapTo{java_type}({target} -> ")
+        self.set_precedence(ast._Precedence.TEST, element)
+        self.traverse(element)
+        self.write(f").{reduction}(")
+        if default is not None:
+            self._write_or_else(default)
+        elif reduction != 'sum':
+            self.write(f").getAs{java_type}()")
+        else:
+            self.write(")")
+
+    def _reduction_loop(self, call):
+        """
+        Work sum(...), any(...) or all(...) out in a plain loop ahead of the statement it's in, with a
+        primitive accumulator. Returns a name holding the result
+        """
+        reduction, iterable = call.func.id, call.args[0]
+        if isinstance(iterable, ast.GeneratorExp) and len(iterable.generators) == 1 \
+                and not iterable.generators[0].is_async:
+            generator = iterable.generators[0]
+            target, element, iterable, conditions = generator.target, iterable.elt, generator.iter, generator.ifs
+            # The comprehension's variables are its own, and mustn't write over a variable outside of it
+            renames = {name.id: self._unique_name(name.id) for name in ast.walk(target)
+                       if isinstance(name, ast.Name) and self._in_scope(name.id)}
+            for node in [target, element, *conditions]:
+                for name in ast.walk(node):
+                    if isinstance(name, ast.Name) and name.id in renames:
+                        name.id = renames[name.id]
+        else:
+            target = ast.Name(id=self._unique_name('value'), ctx=ast.Store())
+            element, conditions = ast.Name(id=target.id, ctx=ast.Load()), []
+        result = ast.Name(id=self._unique_name({'sum': 'total', 'any': 'found', 'all': 'every'}[reduction]),
+                          ctx=ast.Load())
+        if reduction == 'sum':
+            python_type = float if self._get_python_type(element) == float \
+                or len(call.args) > 1 and self._get_python_type(call.args[1]) == float else int
+            if python_type == int:
+                self._warn_unless_numbers(element, call.args[0])
+            self.fill(f"{'double' if python_type == float else 'long'} {result.id} = ")
+            if len(call.args) > 1:
+                self.traverse(call.args[1])
+            else:
+                self.write("0.0" if python_type == float else "0")
+            self.write(";")
+            body = [ast.AugAssign(target=ast.Name(id=result.id, ctx=ast.Store()), op=ast.Add(), value=element)]
+            if python_type == int:
+                # A long, since Python's sums don't overflow
+                self._name_keys[id(result)] = key = ('reduction', result.id)
+                self._value_ranges[key] = self._long_range
+                self._synthetic_nodes.append(result)
+        else:
+            python_type = bool
+            self.fill(f"boolean {result.id} = {str(reduction == 'all').lower()};")
+            # The first element that settles it is the last one looked at
+            conditions = conditions + [element if reduction == 'any' else ast.UnaryOp(op=ast.Not(), operand=element)]
+            body = [ast.Assign(targets=[ast.Name(id=result.id, ctx=ast.Store())],
+                               value=ast.Constant(value=reduction == 'any')), ast.Break()]
+        self.scopes[self.current_scopes[-1]][result.id] = python_type
+        if conditions:
+            body = [ast.If(test=conditions[0] if len(conditions) == 1 else ast.BoolOp(op=ast.And(), values=conditions),
+                           body=body, orelse=[])]
+        self.traverse(ast.copy_location(ast.For(target=target, iter=iterable, body=body, orelse=[], type_comment=None),
+                                         call))
+        return result
+
+    def _is_reduction(self, node):
+        return self._is_builtin(node, 'sum', 'any', 'all') and not node.keywords and id(node) not in self._array_values \
+            and 1 <= len(node.args) <= (2 if node.func.id == 'sum' else 1) \
+            and not (isinstance(node.args[0], ast.GeneratorExp) and len(node.args[0].generators) != 1)
+
+    def _is_random_module_call(self, node):
+        return self._random_function(node) is not None
+
+    def _random_function(self, node):
+        """Which function of the random module *node* calls, like 'randint', or None"""
+        module, _, function = (self._qualified_name(node.func) or '').rpartition('.')
+        if module != 'random' or function not in self._random_functions:
+            return None
+        if isinstance(node.func, ast.Attribute) and self._in_scope(node.func.value.id) not in (None, 'random'):
+            return None
+        return function
+
+    _random_generator_declaration = 'java.util.SplittableRandom random = new java.util.SplittableRandom();'
+    # Seeded threaded programs: a SplittableRandom isn't thread-safe, so each thread splits its own off
+    #  the seeded one. Which numbers a thread gets depends on the order the threads first draw in
+    _seeded_random_class = """final class SeededRandom {
+    private static java.util.SplittableRandom seeded = new java.util.SplittableRandom();
+    private static volatile int seeding;
+    private static final ThreadLocal<SeededRandom> own = new ThreadLocal<>();
+    private final int splitAt;
+    private final java.util.SplittableRandom generator;
+
+    private SeededRandom(int splitAt, java.util.SplittableRandom generator) {
+        this.splitAt = splitAt;
+        this.generator = generator;
+    }
+
+    static synchronized void seed(java.util.SplittableRandom generator) {
+        seeded = generator;
+        seeding++;
+    }
+
+    private static synchronized SeededRandom split() {
+        return new SeededRandom(seeding, seeded.split());
+    }
+
+    static java.util.SplittableRandom current() {
+        SeededRandom random = own.get();
+        if (random == null || random.splitAt != seeding) {
+            random = split();
+            own.set(random);
+        }
+        return random.generator;
+    }
+}"""
+    # random.choice of what isn't just a variable, which it reads once. Both generators are RandomGenerators
+    _random_choice_class = """final class RandomChoice {
+    static <T> T of(java.util.List<T> sequence, java.util.random.RandomGenerator generator) {
+        return sequence.get(generator.nextInt(sequence.size()));
+    }
+
+    static String of(String sequence, java.util.random.RandomGenerator generator) {
+        return String.valueOf(sequence.charAt(generator.nextInt(sequence.length())));
+    }
+}"""
+    _random_shuffle_class = """final class RandomShuffle {
+    // Collections.shuffle only takes a java.util.Random, which a SplittableRandom isn't. Fisher-Yates it is.
+    static void of(java.util.List<?> sequence, java.util.random.RandomGenerator generator) {
+        for (int i = sequence.size() - 1; i > 0; i--) {
+            java.util.Collections.swap(sequence, i, generator.nextInt(i + 1));
+        }
+    }
+}"""
+
+    def _random_generator(self):
+        """
+        Where random numbers come from. Threaded programs draw from their own thread's
+        ThreadLocalRandom, or from their own split of the seeded SplittableRandom when they are seeded.
+        Everything else shares one SplittableRandom for the whole program, classes included,
+        so that seeding it makes the whole run reproducible.
+        """
+        if self._threaded and not self._seeded:
+            return 'java.util.concurrent.ThreadLocalRandom.current()'
+        if self._threaded:
+            self._hoist(self._seeded_random_class)
+            return 'SeededRandom.current()'
+        if self._random_generator_declaration not in self._preamble:
+            self._preamble.append(self._random_generator_declaration)
+        return 'random'
+
+    def _random_helper(self, node):
+        """Special cases for the random module. Returns whether node was handled."""
+        function, args = self._random_function(node), node.args
+        arities = {'seed': (0, 1), 'random': (0,), 'randint': (2,), 'randrange': (1, 2), 'uniform': (2,),
+                   'choice': (1,), 'shuffle': (1,)}
+        if node.keywords or len(args) not in arities.get(function, ()):
+            return False
+        generator = self._random_generator()
+
+        if function == 'seed':
+            self.write('SeededRandom.seed(new java.util.SplittableRandom(' if self._threaded
+                       else 'random = new java.util.SplittableRandom(')
+            if args:
+                self.traverse(args[0])
+            self.write(')' * (2 if self._threaded else 1))
+        elif function == 'random':
+            self.write(f'{generator}.nextDouble()')
+        elif function in ('randint', 'randrange'):
+            # randint includes its upper bound, nextInt doesn't
+            minimum, maximum = (None, args[0]) if len(args) == 1 else args
+            maximum_range = self._range_of(maximum)
+            if function == 'randint' and (maximum_range is None or maximum_range[1] >= self._int_range[1]):
+                # Special case: One past it might not be an int
+                long_result = self._java_int_type(node) not in (None, 'int')
+                with self.require_parens(ast._Precedence.FACTOR, node) if not long_result else nullcontext():
+                    self.write(f"{'' if long_result else '(int) '}{generator}.nextLong(")
+                    self.traverse(minimum)
+                    self.write(', (long) ')
+                    self.set_precedence(ast._Precedence.FACTOR, maximum)
+                    self.traverse(maximum)
+                    self.write(' + 1)')
+                return True
+            self.write(f'{generator}.nextInt(')
+            if minimum is not None:
+                self.traverse(minimum)
+                self.write(', ')
+            if function == 'randrange':
+                self.traverse(maximum)
+            elif isinstance(maximum, ast.Constant) and isinstance(maximum.value, int):
+                self.write(str(maximum.value + 1))
+            else:
+                self.set_precedence(ast._Precedence.ARITH, maximum)
+                self.traverse(maximum)
+                self.write(' + 1')
+            self.write(')')
+        elif function == 'uniform':
+            minimum, maximum = args
+            with self.require_parens(ast._Precedence.ARITH, node):
+                if isinstance(minimum, ast.Constant) and isinstance(maximum, ast.Constant):
+                    if minimum.value:
+                        self.write(f'{minimum.value} + ')
+                    self.write(f'{maximum.value - minimum.value} * ')
+                else:
+                    self.set_precedence(ast._Precedence.ARITH, minimum)
+                    self.traverse(minimum)
+                    self.write(' + (')
+                    self.traverse(maximum)
+                    self.write(' - ')
+                    self.set_precedence(ast._Precedence.ARITH.next(), minimum)
+                    self.traverse(minimum)
+                    self.write(') * ')
+                self.write(f'{generator}.nextDouble()')
+        elif function == 'choice':
+            sequence = args[0]
+            is_string = self._get_python_type(sequence) == str
+            if not (isinstance(sequence, ast.Name)
+                    or isinstance(sequence, ast.Attribute) and isinstance(sequence.value, ast.Name)):
+                # Special case: Reading it twice would work it out twice
+                self._hoist(self._random_choice_class)
+                self.write('RandomChoice.of(')
+                self.traverse(sequence)
+                self.write(f', {generator})')
+                return True
+            self.set_precedence(ast._Precedence.ATOM, sequence)
+            sequence = self._render(sequence)
+            if is_string:
+                self.write(f'String.valueOf({sequence}.charAt({generator}.nextInt({sequence}.length())))')
+            else:
+                self.write(f'{sequence}.get({generator}.nextInt({sequence}.size()))')
+        else:
+            sequence = args[0]
+            if generator.startswith('java.util.concurrent.ThreadLocalRandom'):
+                self.write('java.util.Collections.shuffle(')
+            else:
+                self._hoist(self._random_shuffle_class)
+                self.write('RandomShuffle.of(')
+            self.traverse(sequence)
+            self.write(f', {generator})')
+        return True
+
+    def _write_prompt(self, node):
+        """Print the prompt of an input() call above the line reading it"""
+        stream = self._stdout_writer() if self.buffered_output else "System.out"
+        if node.args:
+            with self.delimit(f"<{self._move_up_tag}>", f"</{self._move_up_tag}>"):
+                self.write(f"{stream}.print(")
+                self.traverse(node.args[0])
+                self.write(');')
+        if self.buffered_output:
+            # Everything printed so far has to be visible before we block on stdin
+            self._write_above(f"{stream}.flush();")
+
+    def _stdin_reader(self):
+        """The FastInput reader used by the fast input mode"""
+        name = 'stdin'
+        self._hoist(self._fast_input_class)
+        self._hoist(f"final FastInput {name} = new FastInput(System.in);")
+        return name
+
+    @staticmethod
+    def _is_input(call):
+        return isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id == 'input'
+
+    @classmethod
+    def _is_split_input(cls, call):
+        return isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) \
+            and call.func.attr == 'split' and not call.args and not call.keywords \
+            and cls._is_input(call.func.value)
+
+    @classmethod
+    def _is_map_over_split_input(cls, call):
+        return isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id == 'map' \
+            and len(call.args) == 2 and isinstance(call.args[0], ast.Name) \
+            and call.args[0].id in ('int', 'float') and cls._is_split_input(call.args[1])
+
+    def _fast_input_helper(self, node):
+        """
+        Special cases for the shapes input() usually comes in, so that FastInput can
+        parse them straight out of its byte buffer. Returns whether node was handled.
+        """
+        if not self.fast_input:
+            return False
+        is_input, is_split_input, is_map_over_split_input = \
+            self._is_input, self._is_split_input, self._is_map_over_split_input
+
+        if isinstance(node.func, ast.Name) and node.func.id == 'list' and len(node.args) == 1 \
+                and (is_split_input(node.args[0]) or is_map_over_split_input(node.args[0])):
+            # These are lists already
+            node = node.args[0]
+
+        if isinstance(node.func, ast.Name) and node.func.id in ('int', 'float') \
+                and len(node.args) == 1 and is_input(node.args[0]):
+            # int(input())
+            input_call = node.args[0]
+            method = 'nextLineAsInt' if node.func.id == 'int' else 'nextLineAsDouble'
+        elif is_split_input(node):
+            # input().split()
+            input_call = node.func.value
+            method = 'nextLineTokens'
+        elif is_map_over_split_input(node):
+            # map(int, input().split())
+            input_call = node.args[1].func.value
+            method = 'nextLineInts' if node.args[0].id == 'int' else 'nextLineDoubles'
+        else:
+            return False
+        self._write_prompt(input_call)
+        self.write(f"{self._stdin_reader()}.{method}()")
+        return True
+
+    def visit_Call(self, node):
+        self.set_precedence(ast._Precedence.ATOM, node.func)
+        if id(node) in self._heap_constructions:
+            # What a heap starts out as can be made by any call at all
+            self._write_heap_construction(node)
+            return
+        if self.rules.apply(self, node):
+            return
+        self.traverse(node.func)
+        self._write_arguments(node)
+
+    def _write_arguments(self, node, delimiters=("(", ")")):
+        with self.delimit(*delimiters):
+            comma = False
+            for e in node.args:
+                if comma:
+                    self.write(", ")
+                else:
+                    comma = True
+                self.traverse(e)
+            for e in node.keywords:
+                if comma:
+                    self.write(", ")
+                else:
+                    comma = True
+                self.traverse(e)
+
+    def _callee(self, node):
+        """
+        What the call or attribute *node* stands for, for looking up the rules for it (see RewriteRules):
+        'random.randint' or 'math.pi' through the imports, 'print' for a builtin, or '.format' for a method
+        """
+        function = node.func if isinstance(node, ast.Call) else node
+        if name := self._qualified_name(function):
+            return name
+        if isinstance(node, ast.Call) and isinstance(function, ast.Name) and function.id not in self._method_names:
+            return function.id
+        if isinstance(node, ast.Call) and isinstance(function, ast.Attribute):
+            return f".{function.attr}"
+        return None
+
+    def _input_helper(self, node):
+        """input(), from a java.util.Scanner (or FastInput). Returns whether it handled *node*"""
+        if self.fast_input:
+            self._write_prompt(node)
+            self.write(f"{self._stdin_reader()}.nextLine()")
+            return True
+        # TODO: What if scanner is in scope but isn't actually a scanner?
+        if not self._in_scope('scanner'):
+            with self.delimit(f"<{self._move_up_tag}>", f"</{self._move_up_tag}>"):
+                self.write('java.util.Scanner scanner = new java.util.Scanner(System.in);')
+            self._add_to_scope('scanner', 'scanner', 'scanner', 'java.util.Scanner')  # TODO: Adding non-python type, smelly
+
+        self._write_prompt(node)
+        self.traverse(node.func)
+        self.write("()")
+        return True
+
+    def _format_helper(self, node):
+        """"somestring".format(...), through String.format. Returns whether it handled *node*"""
+        if not isinstance(node.func.value, ast.Constant) or not isinstance(node.func.value.value, str):
+            return False
+        self.write("String.format(")
+        # TODO: Optimize
+        # {0} -> %\1$s
+        string = node.func.value.value
+        match = re.search('{(\d+)}', string)
+        while match:
+            start, end = match.start(), match.end()
+            string = f"{string[:start+1]}{int(string[start+1:end-1])+1}{string[end-1:]}"
+            match = re.search('{(\d+)}', ' ' * end + string[end:])
+        # {} -> %s
+        string = string.replace('{}', '%s')
+        node.func.value.value = re.sub('{(\d+)}', r'%\1$s', string)
+        self.traverse(node.func.value)
+        self.write(", ")
+        self._write_arguments(node, ("", ")"))
+        return True
+
+    # What deque's methods are called on an ArrayDeque
+    _deque_methods = {'append': 'addLast', 'appendleft': 'addFirst', 'pop': 'removeLast', 'popleft': 'removeFirst',
+                      'extend': 'addAll', 'clear': 'clear', 'copy': 'clone', 'count': None, 'remove': 'removeFirstOccurrence'}
+
+    # What the constructors of concurrent.futures, threading, multiprocessing and queue make, as far
+    #  as what can be done with it goes. Processes are threads, since Java has no GIL to get around
+    _concurrency_constructors = {
+        'concurrent.futures.ThreadPoolExecutor': 'executor', 'concurrent.futures.ProcessPoolExecutor': 'executor',
+        'multiprocessing.Pool': 'executor', 'multiprocessing.pool.Pool': 'executor',
+        'multiprocessing.pool.ThreadPool': 'executor',
+        'threading.Thread': 'thread', 'multiprocessing.Process': 'thread',
+        'threading.Lock': 'lock', 'threading.RLock': 'lock', 'multiprocessing.Lock': 'lock', 'multiprocessing.RLock': 'lock',
+        'queue.Queue': 'queue', 'queue.SimpleQueue': 'queue', 'multiprocessing.Queue': 'queue',
+        'threading.Semaphore': 'semaphore', 'threading.BoundedSemaphore': 'semaphore',
+        'multiprocessing.Semaphore': 'semaphore',
+    }
+    # {(kind, method): what it is in Java}, with {0} for the object and {1} for the argument
+    _concurrency_methods = {
+        ('executor', 'shutdown'): 'Concurrency.close({0})', ('executor', 'close'): '{0}.shutdown()',
+        ('executor', 'join'): 'Concurrency.close({0})', ('executor', 'terminate'): '{0}.shutdownNow()',
+        ('thread', 'start'): '{0}.start()', ('thread', 'join'): 'Concurrency.join({0})',
+        ('thread', 'is_alive'): '{0}.isAlive()',
+        ('lock', 'acquire'): '{0}.lock()', ('lock', 'release'): '{0}.unlock()', ('lock', 'locked'): '{0}.isLocked()',
+        ('queue', 'put'): 'Concurrency.put({0}, {1})', ('queue', 'get'): 'Concurrency.take({0})',
+        ('queue', 'put_nowait'): '{0}.add({1})', ('queue', 'get_nowait'): '{0}.remove()',
+        ('queue', 'empty'): '{0}.isEmpty()', ('queue', 'qsize'): '{0}.size()',
+        ('queue', 'full'): '({0}.remainingCapacity() == 0)',
+        ('semaphore', 'acquire'): 'Concurrency.acquire({0})', ('semaphore', 'release'): '{0}.release()',
+        ('future', 'result'): '{0}.join()', ('future', 'done'): '{0}.isDone()', ('future', 'cancel'): '{0}.cancel(true)',
+    }
+    _available_processors = 'Runtime.getRuntime().availableProcessors()'
+
+    def _find_concurrency_objects(self, tree):
+        """
+        {name key or self attribute: kind (see _concurrency_constructors)} for what only ever holds one kind
+        of them. Parameters hold what their hint says, or else what every call passes them, thread targets included
+        """
+        kinds = {}
+        others = set()
+        functions = {}
+        calls = []
+        # {list key: what goes in it}, and [(loop target, what it loops over)]
+        contents, loops = {}, []
+        for node in ast.walk(tree):
+            bindings = []
+            if isinstance(node, ast.Assign) and len(node.targets) == 1:
+                bindings = [(node.targets[0], node.value)]
+                if isinstance(node.value, (ast.List, ast.ListComp)) and (key := self._dict_key(node.targets[0])):
+                    contents.setdefault(key, []).extend(
+                        node.value.elts if isinstance(node.value, ast.List) else [node.value.elt])
+            elif isinstance(node, (ast.With, ast.AsyncWith)):
+                bindings = [(item.optional_vars, item.context_expr) for item in node.items if item.optional_vars]
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                functions[self._name_keys.get(id(node))] = node
+                for argument in node.args.posonlyargs + node.args.args:
+                    kind = argument.annotation and self._concurrency_constructors.get(
+                        self._qualified_name(argument.annotation))
+                    if kind:
+                        kinds[self._name_keys.get(id(argument))] = kind
+            elif isinstance(node, ast.Call):
+                calls.append(node)
+                if isinstance(node.func, ast.Attribute) and node.func.attr == 'append' and len(node.args) == 1 \
+                        and (key := self._dict_key(node.func.value)):
+                    contents.setdefault(key, []).append(node.args[0])
+            elif isinstance(node, (ast.For, ast.AsyncFor)):
+                loops.append((node.target, node.iter))
+            for target, value in bindings:
+                if (key := self._dict_key(target)) is None:
+                    continue
+                kind = isinstance(value, ast.Call) and self._concurrency_constructors.get(self._qualified_name(value.func))
+                if kind and kinds.get(key, kind) == kind:
+                    kinds[key] = kind
+                else:
+                    others.add(key)
+        # {parameter key: the kinds of what each call passes it}
+        passed = {}
+        for call in calls:
+            keywords = {keyword.arg: keyword.value for keyword in call.keywords}
+            if self._concurrency_constructors.get(self._qualified_name(call.func)) == 'thread' \
+                    and isinstance(keywords.get('args'), (ast.Tuple, ast.List)):
+                function, arguments = keywords.get('target'), keywords['args'].elts
+            else:
+                function, arguments = call.func, call.args
+            function = isinstance(function, ast.Name) and functions.get(self._name_keys.get(id(function)))
+            if not function:
+                continue
+            for parameter, argument in zip(function.args.posonlyargs + function.args.args, arguments):
+                passed.setdefault(self._name_keys.get(id(parameter)), []).append(argument)
+        # Passed on from one function to the next, as far as that goes
+        changed = True
+        while changed:
+            changed = False
+            for key, arguments in passed.items():
+                argument_kinds = {self._concurrency_kind_in(argument, kinds) for argument in arguments}
+                if key not in kinds and key not in others and len(argument_kinds) == 1 and None not in argument_kinds:
+                    kinds[key] = argument_kinds.pop()
+                    changed = True
+        # What loops over a list of threads (or of futures) gets one of them each time
+        for target, iterable in loops:
+            if (key := self._dict_key(target)) is None:
+                continue
+            if isinstance(iterable, ast.Call) and self._qualified_name(iterable.func) \
+                    == 'concurrent.futures.as_completed' and len(iterable.args) == 1:
+                iterable = iterable.args[0]
+            elements = contents.get(self._dict_key(iterable)) if isinstance(iterable, ast.Name) else None
+            element_kinds = {self._concurrency_kind_in(element, kinds) for element in elements or []}
+            kind = element_kinds.pop() if len(element_kinds) == 1 else None
+            if kind and kinds.get(key, kind) == kind:
+                kinds[key] = kind
+            else:
+                others.add(key)
+        return {key: kind for key, kind in kinds.items() if key not in others}
+
+    def _concurrency_kind_in(self, node, kinds):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+                and node.func.attr in ('submit', 'apply_async') and kinds.get(self._dict_key(node.func.value)) == 'executor':
+            # See Concurrency.submit
+            return 'future'
+        if isinstance(node, ast.Call):
+            return self._concurrency_constructors.get(self._qualified_name(node.func))
+        return kinds.get(self._dict_key(node))
+
+    def _concurrency_kind(self, node):
+        """What *node* makes or holds of concurrent.futures, threading, multiprocessing and queue, if anything"""
+        return self._concurrency_kind_in(node, self._concurrency_objects)
+
+    # Parallel loops. What their iterations can call: builtins that only work out a value, and math
+    _parallel_safe_builtins = {'abs', 'min', 'max', 'len', 'int', 'float', 'bool', 'round', 'pow', 'divmod', 'range'}
+    # Nothing in them can leave the iteration early, or wait, or run somewhere else. Comprehensions and
+    #  generators become loops with variables of their own, which would be shared
+    _parallel_unsafe_nodes = (ast.Break, ast.Continue, ast.Return, ast.Yield, ast.YieldFrom, ast.Await, ast.Global,
+                              ast.Nonlocal, ast.Raise, ast.Try, ast.With, ast.AsyncWith, ast.AsyncFor, ast.FunctionDef,
+                              ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda, ast.Delete, ast.Import, ast.ImportFrom,
+                              ast.NamedExpr, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+    # Nor can the functions they call, which may have loops and locals of their own
+    _impure_nodes = (ast.Yield, ast.YieldFrom, ast.Await, ast.Global, ast.Nonlocal, ast.Delete, ast.Import,
+                     ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+    @staticmethod
+    def _pragma_lines(source, pragma):
+        """The lines of *source* a `# pragma` comment is about: its own, or the next if it's on a line by itself"""
+        lines = set()
+        if not source:
+            return lines
+        try:
+            for token in tokenize.generate_tokens(io.StringIO(source).readline):
+                if token.type == tokenize.COMMENT and token.string[1:].split()[:1] == [pragma]:
+                    lines.add(token.start[0] + (token.line.lstrip().startswith('#')))
+        except (tokenize.TokenError, SyntaxError):
+            pass
+        return lines
+
+    def _find_parallel_loops(self, tree, parents):
+        """{id(loop): its plan (see _parallel_plan)} for the loops asked to run in parallel, that can"""
+        loops = [node for node in ast.walk(tree) if isinstance(node, ast.For)
+                 and (self.parallel_loops or node.lineno in self._parallel_pragmas)]
+        if not loops:
+            return {}
+        # How often each name gets bound, and mentioned at all
+        bindings, uses = {}, {}
+        for node in ast.walk(tree):
+            if (key := self._name_keys.get(id(node))) is None:
+                continue
+            uses[key] = uses.get(key, 0) + 1
+            if not isinstance(node, ast.Name) or not isinstance(node.ctx, ast.Load):
+                bindings[key] = bindings.get(key, 0) + 1
+        function_scopes = {id(node) for node in ast.walk(tree) if isinstance(node, self._scope_nodes)
+                           and not isinstance(node, (ast.Module, ast.ClassDef))}
+        pure = self._find_pure_functions(tree, bindings)
+        fresh = self._find_fresh_lists(tree, parents)
+        plans = {}
+        for loop in loops:
+            plan = self._parallel_plan(loop, parents, bindings, uses, function_scopes, pure, fresh)
+            if plan is not None:
+                plans[id(loop)] = plan
+        return plans
+
+    def _find_pure_functions(self, tree, bindings):
+        """
+        {function key: the name keys it reads, or the functions it calls do} for the plain functions that can't
+        do anything but work out a value. They only call each other, and builtins that don't do any more either
+        """
+        functions = {self._name_keys.get(id(node)): node for node in ast.walk(tree)
+                     if isinstance(node, ast.FunctionDef) and not node.decorator_list}
+        # Until shown otherwise
+        pure = {key: [child for statement in function.body for child in ast.walk(statement)]
+                for key, function in functions.items() if bindings.get(key) == 1}
+        changed = True
+        while changed:
+            changed = False
+            for key, body in list(pure.items()):
+                if any(isinstance(child, self._impure_nodes)
+                       or isinstance(child, (ast.Subscript, ast.Attribute)) and not isinstance(child.ctx, ast.Load)
+                       or isinstance(child, ast.Call) and not self._is_pure_call(child, pure, bindings)
+                       for child in body):
+                    del pure[key]
+                    changed = True
+        reads = {key: {self._name_keys.get(id(child)) for child in body if isinstance(child, ast.Name)}
+                 for key, body in pure.items()}
+        changed = True
+        while changed:
+            changed = False
+            for key in reads:
+                for callee in reads[key] & reads.keys():
+                    if not reads[callee] <= reads[key]:
+                        reads[key] |= reads[callee]
+                        changed = True
+        return reads
+
+    def _is_pure_call(self, call, pure, bindings):
+        """Whether *call* can't do anything but work out a value, given the *pure* functions of the program"""
+        if isinstance(call.func, ast.Name):
+            key = self._name_keys.get(id(call.func))
+            return key in pure or call.func.id in self._parallel_safe_builtins and not bindings.get(key)
+        return (self._qualified_name(call.func) or '').startswith('math.')
+
+    @staticmethod
+    def _allocation_level(value):
+        """2 for a list made there with rows also made there, 1 for a list made there with rows that might not be, else 0"""
+        if isinstance(value, ast.ListComp):
+            return 2 if _JavaUnparser._allocation_level(value.elt) else 1
+        return int(isinstance(value, ast.List) or _JavaUnparser._is_builtin_call_of(value, 'list')
+                   or isinstance(value, ast.BinOp) and isinstance(value.op, ast.Mult)
+                   and isinstance(value.left if isinstance(value.left, ast.List) else value.right, ast.List))
+
+    def _find_fresh_lists(self, tree, parents):
+        """
+        {name key: allocation level (see _allocation_level)} for the variables that only ever get lists made
+        right where they're assigned, and aren't read but for an element (or its length). So nothing else
+        can be holding what they do, or with a 2, their rows
+        """
+        fresh = {}
+        for node in ast.walk(tree):
+            if (key := self._name_keys.get(id(node))) is None or isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            parent = parents.get(id(node))
+            level = 0
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                if isinstance(parent, ast.Assign) and len(parent.targets) == 1 and parent.targets[0] is node:
+                    level = self._allocation_level(parent.value)
+            elif isinstance(node, ast.Name):
+                if isinstance(parent, ast.Subscript) and parent.value is node:
+                    outer = parents.get(id(parent))
+                    level = 2 if isinstance(outer, ast.Subscript) and outer.value is parent \
+                        or self._is_builtin_call_of(outer, 'len') else 1
+                elif self._is_builtin_call_of(parent, 'len') or self._is_builtin_call_of(parent, 'print') \
+                        or isinstance(parent, ast.Return):
+                    level = 2
+            fresh[key] = min(fresh.get(key, 2), level)
+        return fresh
+
+    def _mention_count(self, node, key):
+        return sum(1 for child in ast.walk(node) if isinstance(child, ast.Name) and self._name_keys.get(id(child)) == key)
+
+    def _local_declarations(self, key, statements):
+        """
+        The assignments that can declare *key* as a variable of blocks in *statements*: the first statement of a
+        block to use it, if all it does is set it, when nothing after the block uses it. Loops over it declare it
+        themselves. None if it can't be made a variable of the blocks in there that way
+        """
+        declarations = []
+        for statement in statements:
+            mentions = self._mention_count(statement, key)
+            if not mentions:
+                continue
+            if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+                    and isinstance(statement.targets[0], ast.Name) and self._name_keys.get(id(statement.targets[0])) == key \
+                    and not self._mentions(statement.value, key):
+                # Everything after it in the block sees it
+                return declarations + [statement]
+            if isinstance(statement, ast.For) and isinstance(statement.target, ast.Name) \
+                    and self._name_keys.get(id(statement.target)) == key \
+                    and mentions == 1 + sum(self._mention_count(child, key) for child in statement.body):
+                # Its body sees it, and nothing after it does, unless it declares it again
+                continue
+            blocks = [block for block in (getattr(statement, 'body', None), getattr(statement, 'orelse', None))
+                      if isinstance(block, list) and any(self._mentions(child, key) for child in block)]
+            if len(blocks) != 1 or mentions != sum(self._mention_count(child, key) for child in blocks[0]):
+                return None
+            inner = self._local_declarations(key, blocks[0])
+            if inner is None:
+                return None
+            declarations += inner
+        return declarations
+
+    def _parallel_plan(self, loop, parents, bindings, uses, function_scopes, pure, fresh):
+        """
+        How *loop* can run its iterations in parallel, or None unless none of them can depend on another. An iteration
+        can set its own element of any list, and of a fresh list (see _find_fresh_lists), the elements of its own row.
+        It can have variables of its own, and its last statement can add or multiply into, or take the min or max into,
+        an accumulator. Beyond that it only reads, and only calls what does no more than that.
+        Returns ([the assignments declaring variables of the iteration], (accumulator, '+', '*', 'max' or 'min',
+        what goes into it) or None, whether the loop is marked with a `# parallel`)
+        """
+        iterator = loop.iter
+        if not isinstance(loop.target, ast.Name) or loop.orelse or not self._is_builtin_call_of(iterator, 'range') \
+                or bindings.get(self._name_keys.get(id(iterator.func))) or iterator.keywords \
+                or not 1 <= len(iterator.args) <= 3 or any(isinstance(arg, ast.Starred) for arg in iterator.args) \
+                or len(iterator.args) == 3 and not (isinstance(iterator.args[2], ast.Constant)
+                                                    and iterator.args[2].value == 1):
+            return None
+        index = self._name_keys.get(id(loop.target))
+        body = [child for statement in loop.body for child in ast.walk(statement)]
+        if any(isinstance(child, self._parallel_unsafe_nodes)
+               or isinstance(child, ast.Attribute) and not isinstance(child.ctx, ast.Load)
+               or isinstance(child, ast.Call) and not self._is_pure_call(child, pure, bindings) for child in body):
+            return None
+        inside = {}
+        for child in body:
+            if isinstance(child, ast.Name):
+                key = self._name_keys.get(id(child))
+                inside[key] = inside.get(key, 0) + 1
+
+        reduction = accumulator = None
+        last = loop.body[-1]
+        if isinstance(last, ast.AugAssign) and isinstance(last.target, ast.Name) \
+                and isinstance(last.op, (ast.Add, ast.Mult)):
+            reduction = last.target, '+' if isinstance(last.op, ast.Add) else '*', last.value
+        elif isinstance(last, ast.Assign) and len(last.targets) == 1 and isinstance(last.targets[0], ast.Name) \
+                and isinstance(last.value, ast.Call) and isinstance(last.value.func, ast.Name) \
+                and last.value.func.id in ('max', 'min') and not bindings.get(self._name_keys.get(id(last.value.func))) \
+                and len(last.value.args) == 2 and not last.value.keywords:
+            # max(total, x) or max(x, total)
+            key = self._name_keys.get(id(last.targets[0]))
+            first, second = last.value.args
+            if isinstance(first, ast.Name) and self._name_keys.get(id(first)) == key:
+                reduction = last.targets[0], last.value.func.id, second
+            elif isinstance(second, ast.Name) and self._name_keys.get(id(second)) == key:
+                reduction = last.targets[0], last.value.func.id, first
+        if reduction:
+            accumulator = self._name_keys.get(id(reduction[0]))
+            if accumulator == index or self._mentions(reduction[2], accumulator) \
+                    or inside[accumulator] != self._mention_count(last, accumulator):
+                return None
+
+        # What the iterations set
+        written, rows = set(), set()
+        declarations = []
+        temporaries = set()
+        for child in body:
+            if isinstance(child, ast.Subscript) and isinstance(child.ctx, ast.Store):
+                element = child
+                while isinstance(element.value, ast.Subscript):
+                    element = element.value
+                if not (isinstance(element.value, ast.Name) and isinstance(element.slice, ast.Name)
+                        and self._name_keys.get(id(element.slice)) == index):
+                    return None
+                written.add(self._name_keys.get(id(element.value)))
+                if element is not child:
+                    rows.add(self._name_keys.get(id(element.value)))
+            elif isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+                key = self._name_keys.get(id(child))
+                if key == accumulator or key in temporaries:
+                    continue
+                # A variable of its own, if nothing outside the loop sees it
+                if key == index or uses[key] != inside[key] \
+                        or (key_declarations := self._local_declarations(key, loop.body)) is None:
+                    return None
+                temporaries.add(key)
+                declarations += key_declarations
+
+        # And what they read
+        strays = False
+        for child in body:
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
+                key = self._name_keys.get(id(child))
+                parent = parents.get(id(child))
+                if key in written and not (isinstance(parent, ast.Subscript) and parent.value is child
+                                           and isinstance(parent.slice, ast.Name)
+                                           and self._name_keys.get(id(parent.slice)) == index
+                                           or self._is_builtin_call_of(parent, 'len')):
+                    return None
+                # Lambdas only see locals nothing assigns again
+                if key not in temporaries and key not in (index, accumulator) and key[0] in function_scopes \
+                        and bindings.get(key, 0) > 1:
+                    return None
+                strays |= key in pure
+            elif isinstance(child, ast.Subscript) and isinstance(child.ctx, ast.Load) \
+                    and not (isinstance(parent := parents.get(id(child)), ast.Subscript) and parent.value is child):
+                # Reading an element that might be another iteration's
+                element = child
+                while not (isinstance(element.slice, ast.Name) and self._name_keys.get(id(element.slice)) == index):
+                    if not isinstance(element.value, ast.Subscript):
+                        strays = True
+                        break
+                    element = element.value
+        called = set().union(*(pure[key] for key in inside if key in pure))
+        if called & (written | {accumulator}):
+            return None
+        # Which can only be an element of a list being written if that list could be another one
+        if any(fresh.get(key, 0) < (2 if key in rows else 1 if strays else 0) for key in written):
+            return None
+        return declarations, reduction, loop.lineno in self._parallel_pragmas
+
+
+    # NumPy arrays, of doubles, ints or booleans, are Java arrays of them, and 2-D ones (of doubles) DoubleMatrix.
+    #  What's made of them element by element is worked out in one loop, ahead of the statement using it
+    _numpy_dtypes = {'float': 'double', 'float64': 'double', 'float32': 'double', 'double': 'double',
+                     'int': 'int', 'int64': 'int', 'int32': 'int', 'bool': 'boolean', 'bool_': 'boolean'}
+    # The functions that work on each element on its own, by what they are for one
+    _numpy_math_functions = {'sqrt': 'Math.sqrt', 'exp': 'Math.exp', 'log': 'Math.log', 'log10': 'Math.log10',
+                             'sin': 'Math.sin', 'cos': 'Math.cos', 'tan': 'Math.tan', 'tanh': 'Math.tanh',
+                             'floor': 'Math.floor', 'ceil': 'Math.ceil', 'abs': 'Math.abs', 'absolute': 'Math.abs'}
+    _numpy_constructors = {'zeros', 'ones', 'empty', 'full'}
+    _numpy_like_constructors = {'zeros_like', 'ones_like', 'full_like', 'copy', 'array', 'asarray'}
+    # Reductions to a number, by the name NumPy (or the array's method) has for them
+    _numpy_reductions = {'sum': 'sum', 'prod': 'prod', 'mean': 'mean', 'max': 'max', 'amax': 'max', 'min': 'min',
+                         'amin': 'min', 'std': 'std', 'var': 'var', 'any': 'any', 'all': 'all',
+                         'count_nonzero': 'count_nonzero', 'linalg.norm': 'norm'}
+    _array_methods = {'sum', 'prod', 'mean', 'max', 'min', 'std', 'var', 'any', 'all'}
+    _array_reduction_names = {'sum': 'total', 'prod': 'product', 'mean': 'mean', 'max': 'maximum', 'min': 'minimum',
+                              'std': 'deviation', 'var': 'variance', 'any': 'found', 'all': 'every',
+                              'count_nonzero': 'count', 'norm': 'norm', 'dot': 'dot'}
+    # How tightly Java binds what elements are written with, up to whatever can't come apart
+    _element_operators = {ast.Add: ('+', 11), ast.Sub: ('-', 11), ast.Mult: ('*', 12), ast.Div: ('/', 12),
+                          ast.BitAnd: ('&', 7), ast.BitXor: ('^', 6), ast.BitOr: ('|', 5),
+                          ast.Eq: ('==', 8), ast.NotEq: ('!=', 8), ast.Lt: ('<', 9), ast.LtE: ('<=', 9),
+                          ast.Gt: ('>', 9), ast.GtE: ('>=', 9)}
+    _conditional_precedence, _unary_precedence, _atomic_precedence = 2, 13, 14
+
+    def _find_arrays(self, tree):
+        """
+        ({name key: (element type, dimensions)} for the variables that only ever hold one kind of NumPy array,
+        {function key: the same} for the functions hinted to return one). Hints of np.ndarray are of 1-D doubles
+        """
+        arrays, functions = {}, {}
+        bindings = []
+        bound = set()
+        for node in ast.walk(tree):
+            hint = getattr(node, 'returns', None) if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) \
+                else getattr(node, 'annotation', None) if isinstance(node, ast.arg) else None
+            if hint is not None and self._qualified_name(hint) == 'numpy.ndarray':
+                (functions if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) else arrays)[
+                    self._name_keys.get(id(node))] = ('double', 1)
+            elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                bindings.append((self._name_keys.get(id(node.targets[0])), node.value))
+                bound.add(id(node.targets[0]))
+            elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+                # In place, which keeps what it is
+                bound.add(id(node.target))
+        others = {self._name_keys.get(id(node)) for node in ast.walk(tree)
+                  if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store) and id(node) not in bound}
+        self._array_functions = functions
+        changed = True
+        while changed:
+            changed = False
+            for key, value in bindings:
+                if key not in arrays and key not in others and (kind := self._array_kind(value, arrays)) is not None:
+                    arrays[key] = kind
+                    changed = True
+        # Every value it gets has to be one, of the same kind
+        changed = True
+        while changed:
+            changed = False
+            for key, value in bindings:
+                if key in arrays and (key in others or self._array_kind(value, arrays) != arrays[key]):
+                    del arrays[key]
+                    changed = True
+        return arrays
+
+    def _numpy_function(self, node):
+        """What function of NumPy the call *node* is, like 'zeros' or 'linalg.norm' (or 'copy' for the method), or None"""
+        name = self._qualified_name(node.func) or ''
+        if name.startswith('numpy.'):
+            return name[len('numpy.'):]
+        if isinstance(node.func, ast.Attribute) and node.func.attr == 'copy' and not node.args and not node.keywords:
+            return 'copy'
+        return None
+
+    @staticmethod
+    def _numpy_arguments(node):
+        return [node.func.value] if isinstance(node.func, ast.Attribute) and node.func.attr == 'copy' \
+            and not node.args else node.args
+
+    def _numpy_dtype(self, node):
+        """'double', 'int' or 'boolean' for a dtype, None for none at all, or False for one we don't know"""
+        if node is None:
+            return None
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            name = node.value
+        else:
+            name = (self._qualified_name(node) or '').removeprefix('numpy.') \
+                or isinstance(node, ast.Name) and node.id
+        return self._numpy_dtypes.get(name, False)
+
+    def _checked_kind(self, element_type, dimensions):
+        return (element_type, dimensions) if (element_type, dimensions) in self._array_java_types else None
+
+    def _scalar_element_type(self, node):
+        """'double', 'int' or 'boolean' for a number that goes with every element of an array, or None if it isn't one"""
+        if isinstance(node, ast.Constant):
+            return {bool: 'boolean', int: 'int', float: 'double'}.get(type(node.value))
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set, ast.Dict, ast.ListComp, ast.SetComp, ast.DictComp,
+                             ast.GeneratorExp, ast.JoinedStr, ast.Slice)):
+            return None
+        if (reduction := self._array_reduction(node)) is not None:
+            return {'long': 'int'}.get(java_type := self._array_reduction_type(*reduction), java_type)
+        python_type = self._get_python_type(node)
+        if python_type in (bool, int, float):
+            return {bool: 'boolean', int: 'int', float: 'double'}[python_type]
+        if python_type is not object:
+            return None
+        # Where nothing says what it is, an integer is one the value ranges know of
+        return 'int' if self._range_of(node) is not None else 'double'
+
+    def _elementwise_kinds(self, operands, arrays):
+        """([the element type of each operand], dimensions) if the operands go together element by element, or None"""
+        kinds = [self._array_kind(operand, arrays) for operand in operands]
+        dimensions = {kind[1] for kind in kinds if kind}
+        if not dimensions:
+            return None
+        # Numbers go with every element, and a 1-D array with every row of a 2-D one
+        element_types = [kind[0] if kind else self._scalar_element_type(operand) for operand, kind in zip(operands, kinds)]
+        return None if None in element_types else (element_types, max(dimensions))
+
+    @staticmethod
+    def _arithmetic_type(element_types):
+        return None if 'boolean' in element_types else 'double' if 'double' in element_types else 'int'
+
+    @staticmethod
+    def _product_kind(left, right):
+        """What multiplying matrices (or a matrix and a vector) of these kinds makes"""
+        if not left or not right or left[0] != 'double' or right[0] != 'double':
+            return None
+        dimensions = {(2, 2): 2, (2, 1): 1, (1, 2): 1}.get((left[1], right[1]))
+        return dimensions and ('double', dimensions)
+
+    @staticmethod
+    def _is_full_slice(node):
+        return isinstance(node, ast.Slice) and node.lower is None and node.upper is None and node.step is None
+
+    def _array_kind(self, node, arrays=None):
+        """
+        (element type, dimensions) of the NumPy array *node* makes, if it's one that gets lowered. Names go by
+        *arrays*, or else by what _find_arrays found
+        """
+        if not self._uses_numpy:
+            return None
+        arrays = self._arrays if arrays is None else arrays
+        if isinstance(node, ast.Name):
+            return arrays.get(self._name_keys.get(id(node)))
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.MatMult):
+                return self._product_kind(self._array_kind(node.left, arrays), self._array_kind(node.right, arrays))
+            if (found := self._elementwise_kinds([node.left, node.right], arrays)) is None:
+                return None
+            element_types, dimensions = found
+            if isinstance(node.op, (ast.BitAnd, ast.BitOr, ast.BitXor)):
+                element_type = 'boolean' if set(element_types) == {'boolean'} else None
+            elif isinstance(node.op, ast.Div):
+                element_type = self._arithmetic_type(element_types) and 'double'
+            else:
+                element_type = self._arithmetic_type(element_types)
+            return self._checked_kind(element_type, dimensions)
+        if isinstance(node, ast.UnaryOp):
+            kind = self._array_kind(node.operand, arrays)
+            if kind is None or isinstance(node.op, ast.Not) or (kind[0] == 'boolean') != isinstance(node.op, ast.Invert):
+                return None
+            return kind
+        if isinstance(node, ast.Compare):
+            if len(node.ops) != 1 or isinstance(node.ops[0], (ast.In, ast.NotIn, ast.Is, ast.IsNot)):
+                return None
+            found = self._elementwise_kinds([node.left, node.comparators[0]], arrays)
+            return found and self._checked_kind('boolean', found[1])
+        if isinstance(node, ast.Subscript):
+            base = self._array_kind(node.value, arrays)
+            if base is None:
+                return None
+            if base[1] == 1:
+                if isinstance(node.slice, ast.Slice):
+                    return base if node.slice.step is None else None
+                # Only the elements the mask is True for
+                return base if self._array_kind(node.slice, arrays) == ('boolean', 1) else None
+            if isinstance(node.slice, ast.Tuple) and len(node.slice.elts) == 2:
+                # A column
+                row, column = node.slice.elts
+                return ('double', 1) if self._is_full_slice(row) and not isinstance(column, ast.Slice) \
+                    and self._array_kind(column, arrays) is None else None
+            # A row
+            return ('double', 1) if not isinstance(node.slice, (ast.Slice, ast.Tuple)) \
+                and self._array_kind(node.slice, arrays) is None else None
+        if isinstance(node, ast.Attribute) and node.attr == 'T':
+            # Transposed, which a 1-D array just is
+            return self._array_kind(node.value, arrays)
+        if isinstance(node, ast.Call):
+            return self._call_array_kind(node, arrays)
+        return None
+
+    def _call_array_kind(self, node, arrays):
+        if isinstance(node.func, ast.Name) and not node.keywords \
+                and (kind := self._array_functions.get(self._name_keys.get(id(node.func)))):
+            # One the program's own function is hinted to give back
+            return kind
+        function = self._numpy_function(node)
+        arguments = self._numpy_arguments(node)
+        keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+        dtype = self._numpy_dtype(keywords.pop('dtype', None))
+        if function is None or dtype is False or keywords or not arguments:
+            return None
+        if function in self._numpy_constructors:
+            shape = arguments[0]
+            dimensions = len(shape.elts) if isinstance(shape, (ast.Tuple, ast.List)) else 1
+            if len(arguments) != (2 if function == 'full' else 1) or any(
+                    self._scalar_element_type(size) != 'int' for size in getattr(shape, 'elts', [shape])):
+                return None
+            element_type = dtype or (self._scalar_element_type(arguments[1]) if function == 'full' else 'double')
+            return self._checked_kind(element_type, dimensions)
+        if function in self._numpy_like_constructors and (kind := self._array_kind(arguments[0], arrays)):
+            if len(arguments) != (2 if function == 'full_like' else 1):
+                return None
+            # Converting ints to doubles, at most
+            return kind if dtype in (None, kind[0]) else self._checked_kind('double', kind[1]) \
+                if (dtype, kind[0]) == ('double', 'int') else None
+        if function in ('array', 'asarray') and len(arguments) == 1:
+            source = arguments[0]
+            if isinstance(source, (ast.List, ast.Tuple)):
+                rows = source.elts
+                if rows and all(isinstance(row, (ast.List, ast.Tuple)) for row in rows):
+                    # Of doubles, whatever it's written with
+                    if len({len(row.elts) for row in rows}) != 1 or dtype not in (None, 'double') or any(
+                            self._scalar_element_type(element) in (None, 'boolean') for row in rows for element in row.elts):
+                        return None
+                    return 'double', 2
+                element_types = [self._scalar_element_type(element) for element in rows]
+                if None in element_types:
+                    return None
+                element_type = 'boolean' if element_types and set(element_types) == {'boolean'} \
+                    else self._arithmetic_type(element_types) if element_types else 'double'
+                return self._checked_kind(dtype or element_type, 1)
+            # A list, of numbers
+            if isinstance(source, ast.Name) and dtype in (None, 'double', 'int'):
+                return dtype or 'double', 1
+            return None
+        if function == 'arange' and len(arguments) <= 3:
+            element_types = [self._scalar_element_type(argument) for argument in arguments]
+            if None in element_types or 'boolean' in element_types:
+                return None
+            return self._checked_kind(dtype or self._arithmetic_type(element_types), 1)
+        if function == 'linspace' and len(arguments) == 3 and not dtype:
+            return 'double', 1
+        if dtype:
+            return None
+        if function in self._numpy_math_functions and len(arguments) == 1:
+            kind = self._array_kind(arguments[0], arrays)
+            if kind is None or kind[0] == 'boolean':
+                return None
+            return kind if function in ('abs', 'absolute') else ('double', kind[1])
+        if function == 'square' and len(arguments) == 1:
+            kind = self._array_kind(arguments[0], arrays)
+            return kind if kind and kind[0] != 'boolean' else None
+        if function in ('maximum', 'minimum') and len(arguments) == 2:
+            found = self._elementwise_kinds(arguments, arrays)
+            return found and self._checked_kind(self._arithmetic_type(found[0]), found[1])
+        if function == 'where' and len(arguments) == 3:
+            condition = self._array_kind(arguments[0], arrays)
+            kinds = [self._array_kind(argument, arrays) for argument in arguments[1:]]
+            if condition is None or condition[0] != 'boolean' or any(kind and kind != condition[:1] + kind[1:]
+                                                                    for kind in kinds if kind and kind[1] != condition[1]):
+                return None
+            element_types = [kind[0] if kind else self._scalar_element_type(argument)
+                             for kind, argument in zip(kinds, arguments[1:])]
+            if None in element_types:
+                return None
+            element_type = 'boolean' if set(element_types) == {'boolean'} else self._arithmetic_type(element_types)
+            return self._checked_kind(element_type, condition[1])
+        if function in ('dot', 'matmul') and len(arguments) == 2:
+            return self._product_kind(self._array_kind(arguments[0], arrays), self._array_kind(arguments[1], arrays))
+        if function == 'transpose' and len(arguments) == 1:
+            return self._array_kind(arguments[0], arrays)
+        return None
+
+    def _array_reduction(self, node):
+        """(reduction, [the arrays it reduces]) for *node* reducing NumPy arrays to a number, like ('dot', [a, b])"""
+        if not self._uses_numpy:
+            return None
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.MatMult):
+            operands = [node.left, node.right]
+        elif isinstance(node, ast.Call) and not node.keywords:
+            function = self._numpy_function(node)
+            if function in ('dot', 'vdot', 'inner', 'matmul') and len(node.args) == 2:
+                operands = node.args
+            elif function in self._numpy_reductions and len(node.args) == 1:
+                return self._checked_reduction(self._numpy_reductions[function], node.args[0])
+            elif isinstance(node.func, ast.Attribute) and node.func.attr in self._array_methods and not node.args:
+                return self._checked_reduction(node.func.attr, node.func.value)
+            elif isinstance(node.func, ast.Name) and node.func.id in ('sum', 'max', 'min') and len(node.args) == 1 \
+                    and node.func.id not in self._method_names and self._array_kind(node.args[0]) is not None \
+                    and self._array_kind(node.args[0])[1] == 1:
+                return self._checked_reduction(node.func.id, node.args[0])
+            else:
+                return None
+        else:
+            return None
+        kinds = [self._array_kind(operand) for operand in operands]
+        if any(kind is None or kind[1] != 1 or kind[0] == 'boolean' for kind in kinds):
+            return None
+        return 'dot', operands
+
+    def _checked_reduction(self, reduction, operand):
+        kind = self._array_kind(operand)
+        if kind is None or kind[0] == 'boolean' and reduction not in ('sum', 'mean', 'any', 'all', 'count_nonzero'):
+            return None
+        return reduction, [operand]
+
+    def _array_reduction_type(self, reduction, operands):
+        """The Java type a reduction (see _array_reduction) gives"""
+        element_types = {self._array_kind(operand)[0] for operand in operands}
+        if reduction in ('sum', 'prod', 'dot'):
+            return 'double' if 'double' in element_types else 'long'
+        if reduction in ('max', 'min'):
+            return element_types.pop()
+        return {'any': 'boolean', 'all': 'boolean', 'count_nonzero': 'int'}.get(reduction, 'double')
+
+    def _array_python_type(self, node):
+        """The Python type of a NumPy array (its Java type), of what it's reduced to, or of an element of one, or None"""
+        if (kind := self._array_kind(node)) is not None:
+            return self._array_java_types[kind]
+        if (reduction := self._array_reduction(node)) is not None:
+            return self._java_to_python_types.get(self._array_reduction_type(*reduction), int)
+        if isinstance(node, ast.Subscript) and (kind := self._array_kind(node.value)) is not None:
+            return self._java_to_python_types[kind[0]]
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Attribute) and node.value.attr == 'shape' \
+                and self._array_kind(node.value.value) is not None:
+            return int
+        return None
+
+    # Lowering, ahead of each statement
+
+    def _lower_arrays(self, statement):
+        """
+        Work out the NumPy arrays *statement* uses, and what they're reduced to, in loops ahead of it (see
+        _array_values). Returns whether that wrote all of it, as it does for arrays assigned to a name, which
+        get worked out straight into it, and for what's assigned to the elements of one
+        """
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+            target, value = statement.targets[0], statement.value
+            if isinstance(target, ast.Name) and not isinstance(value, ast.Name) \
+                    and (kind := self._array_kind(value)) is not None and self._fused_operands(value) is not None \
+                    and not self._mentions(value, self._name_keys.get(id(target))):
+                self._lower_fused(value)
+                self._write_array_assignment(statement, kind)
+                return True
+            if isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name) \
+                    and self._array_kind(target) is not None:
+                return self._write_region_assignment(target, value)
+        if isinstance(statement, ast.AugAssign) and isinstance(statement.target, ast.Name) \
+                and (kind := self._array_kind(statement.target)) is not None \
+                and self._array_kind(combined := ast.BinOp(left=statement.target, op=statement.op,
+                                                           right=statement.value)) == kind:
+            # In place
+            self._lower_fused(statement.value)
+            index = self._lambda_parameter('i')
+            data = self._array_element(self._render(statement.target), kind, index)
+            element = self._element(combined, index)[0]
+            self._write_shape_check(statement.target, statement.value)
+            self._write_elements(index, self._loop_bound(self._flat_length(statement.target)), f"{data} = {element};")
+            return True
+        for field, value in ast.iter_fields(statement):
+            # A loop's condition gets worked out again and again
+            if isinstance(statement, ast.While) and field == 'test':
+                continue
+            for expression in value if isinstance(value, list) else [value]:
+                if isinstance(expression, ast.expr):
+                    self._lower_expression(expression)
+        if isinstance(statement, ast.Expr) and self._is_builtin(statement.value, 'print'):
+            for argument in statement.value.args:
+                if (kind := self._array_kind(argument)) is not None and kind[1] == 1:
+                    self._array_values[id(argument)] = f"java.util.Arrays.toString({self._array_text(argument)})"
+        return False
+
+    def _lower_expression(self, node):
+        """Work out the arrays (and reductions of them) in *node* that can't be written where they are"""
+        if isinstance(node, (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            # Nothing in there can go anywhere else, since it can see variables of its own
+            return
+        if isinstance(node, (ast.IfExp, ast.BoolOp)):
+            # Nor can anything that might not get worked out at all
+            self._lower_expression(node.test if isinstance(node, ast.IfExp) else node.values[0])
+            return
+        if id(node) in self._array_values:
+            return
+        if (kind := self._array_kind(node)) is not None:
+            if isinstance(node, ast.Name):
+                return
+            if self._fused_operands(node) is not None:
+                self._lower_fused(node)
+                text = self._write_array(node, kind)
+            else:
+                text = self._write_array_producer(node, kind)
+            if text is not None:
+                self._array_values[id(node)] = text
+            return
+        if (reduction := self._array_reduction(node)) is not None:
+            self._array_values[id(node)] = self._write_array_reduction(*reduction)
+            return
+        if isinstance(node, (ast.BinOp, ast.Compare)) and not any(
+                isinstance(operator, (ast.In, ast.NotIn, ast.Is, ast.IsNot)) for operator in getattr(node, 'ops', [])) \
+                and any(self._array_kind(child) is not None for child in ast.iter_child_nodes(node)):
+            self._warn("Unsupported ATM: NumPy arrays that don't go together element by element", ast.unparse(node))
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Subscript) \
+                and self._array_element_access(node) is not None:
+            # m[i][j] reads the element straight out of m, not out of a copy of the row
+            self._lower_expression(node.value.value)
+            self._lower_expression(node.value.slice)
+            self._lower_expression(node.slice)
+            return
+        for child in ast.iter_child_nodes(node):
+            self._lower_expression(child)
+
+    def _lower_fused(self, node):
+        """Get *node* ready to be read element by element in a loop: anything it's made from that can't be, worked out first"""
+        if isinstance(node, ast.Name) or id(node) in self._array_values:
+            return
+        operands = self._fused_operands(node)
+        if operands is None:
+            self._lower_expression(node)
+            self._hold_array(node)
+            return
+        for operand in operands:
+            if self._array_kind(operand) is None:
+                self._lower_expression(operand)
+            elif isinstance(node, ast.Subscript) and operand is node.value:
+                # A part of what it's a part of
+                self._lower_expression(operand)
+            else:
+                self._lower_fused(operand)
+
+    def _hold_array(self, node):
+        """Keep the array *node* makes in a variable, if it isn't in one, so loops don't make it again for every element"""
+        text = self._array_values.get(id(node))
+        if text is None and not isinstance(node, ast.Name):
+            text = self._render(node)
+        if text is None or re.fullmatch(r'[\w.]+', text):
+            return
+        java_type = self._array_java_types[self._array_kind(node)]
+        name = self._unique_name('values')
+        self.fill(f"{java_type} {name} = {text};")
+        self.scopes[self.current_scopes[-1]][name] = java_type
+        self._array_values[id(node)] = name
+
+    def _fused_operands(self, node):
+        """
+        What the array *node* is made from, element by element, if it's written in one loop with them, or None if it
+        isn't. The arrays that aren't, and the numbers that are the same for every element, are worked out beforehand
+        """
+        if self._array_kind(node) is None:
+            return None
+        if isinstance(node, ast.Name):
+            return []
+        if isinstance(node, ast.BinOp):
+            return None if isinstance(node.op, ast.MatMult) else [node.left, node.right]
+        if isinstance(node, ast.UnaryOp):
+            return [node.operand]
+        if isinstance(node, ast.Compare):
+            return [node.left] + node.comparators
+        if isinstance(node, ast.Subscript):
+            index = node.slice
+            if isinstance(index, ast.Slice):
+                return [node.value] + [bound for bound in (index.lower, index.upper) if bound is not None]
+            if isinstance(index, ast.Tuple):
+                return [node.value, index.elts[1]]
+            return [node.value, index] if self._array_kind(node.value)[1] == 2 else None
+        if isinstance(node, ast.Call):
+            function = self._numpy_function(node)
+            arguments = self._numpy_arguments(node)
+            if function in ('array', 'asarray'):
+                return arguments if self._array_kind(arguments[0]) is not None else None
+            if function in self._numpy_constructors:
+                return [size for size in getattr(arguments[0], 'elts', [arguments[0]])] + arguments[1:]
+            if function is None or function in ('dot', 'matmul', 'transpose'):
+                return None
+            return arguments
+        return None
+
+    def _array_text(self, node):
+        """Java for an array that's in a variable, or worked out into one"""
+        return self._array_values.get(id(node)) or self._render(node)
+
+    @staticmethod
+    def _array_element(text, kind, index):
+        return f"{text}.data[{index}]" if kind[1] == 2 else f"{text}[{index}]"
+
+    @staticmethod
+    def _bound(text, precedence, needed, right=False):
+        """*text*, which binds as tightly as *precedence*, in parentheses if it has to be to bind as tightly as *needed*"""
+        return f"({text})" if precedence < needed or right and precedence == needed else text
+
+    def _scalar_operand(self, node):
+        """Java for a number that's the same for every element, and how tightly it binds. Worked out ahead of the loop"""
+        if id(node) in self._array_values:
+            return self._array_values[id(node)], self._atomic_precedence
+        text = self._render(node)
+        if isinstance(node, (ast.Constant, ast.Name)) or re.fullmatch(r'[\w.]+', text):
+            return text, self._atomic_precedence
+        if isinstance(node, ast.UnaryOp) and isinstance(node.operand, ast.Constant):
+            return text, self._unary_precedence
+        python_type = self._get_python_type(node)
+        name = self._unique_name('value')
+        self.fill(f"var {name} = {text};")
+        self.scopes[self.current_scopes[-1]][name] = python_type
+        self._array_values[id(node)] = name
+        return name, self._atomic_precedence
+
+    def _element_type(self, node):
+        kind = self._array_kind(node)
+        return kind[0] if kind else self._scalar_element_type(node)
+
+    def _element(self, node, index):
+        """
+        Java for element *index* of the array *node* (see _fused_operands), and how tightly it binds (see
+        _element_operators). Anything in it that's the same for every element is just a name, or a constant
+        """
+        kind = self._array_kind(node)
+        if kind is None:
+            return self._scalar_operand(node)
+        if isinstance(node, ast.Name) or id(node) in self._array_values:
+            return self._array_element(self._array_text(node), kind, index), self._atomic_precedence
+        if isinstance(node, ast.BinOp):
+            return self._binop_element(node, kind, index)
+        if isinstance(node, ast.Compare):
+            symbol, precedence = self._element_operators[type(node.ops[0])]
+            left, left_precedence = self._operand_element(node, node.left, index)
+            right, right_precedence = self._operand_element(node, node.comparators[0], index)
+            return f"{self._bound(left, left_precedence, precedence)} {symbol} " \
+                   f"{self._bound(right, right_precedence, precedence, right=True)}", precedence
+        if isinstance(node, ast.UnaryOp):
+            operand, precedence = self._element(node.operand, index)
+            if isinstance(node.op, ast.UAdd):
+                return operand, precedence
+            operand = self._bound(operand, precedence, self._unary_precedence)
+            if isinstance(node.op, ast.Invert):
+                return f"!{operand}", self._unary_precedence
+            return f"-{f'({operand})' if operand.startswith('-') else operand}", self._unary_precedence
+        if isinstance(node, ast.Subscript):
+            return self._subscript_element(node, kind, index), self._atomic_precedence
+        return self._call_element(node, kind, index)
+
+    def _operand_element(self, node, operand, index):
+        """Element *index* of the array *node* in *operand*, which a 1-D one has along every row of a 2-D *node*"""
+        kind, operand_kind = self._array_kind(node), self._array_kind(operand)
+        if operand_kind is not None and operand_kind[1] < kind[1]:
+            columns = self._array_shape(node)[1]
+            columns = columns if re.fullmatch(r'[\w.]+', columns) else f"({columns})"
+            index = f"{index} % {columns}"
+        return self._element(operand, index)
+
+    def _binop_element(self, node, kind, index):
+        left, left_precedence = self._operand_element(node, node.left, index)
+        right, right_precedence = self._operand_element(node, node.right, index)
+        integers = self._element_type(node.left) == self._element_type(node.right) == 'int'
+        if isinstance(node.op, ast.Div) and integers:
+            left, left_precedence = f"(double) {self._bound(left, left_precedence, self._unary_precedence)}", \
+                self._unary_precedence
+        elif isinstance(node.op, (ast.FloorDiv, ast.Mod)) and integers:
+            return f"Math.{'floorDiv' if isinstance(node.op, ast.FloorDiv) else 'floorMod'}({left}, {right})", \
+                self._atomic_precedence
+        elif isinstance(node.op, ast.FloorDiv):
+            return f"Math.floor({self._bound(left, left_precedence, 12)} / {self._bound(right, right_precedence, 12, True)})", \
+                self._atomic_precedence
+        elif isinstance(node.op, ast.Mod):
+            # Python's takes the sign of the divisor
+            left, right = self._bound(left, left_precedence, 12), self._bound(right, right_precedence, 12, True)
+            return f"{left} - Math.floor({left} / {right}) * {right}", 11
+        elif isinstance(node.op, ast.Pow):
+            if isinstance(node.right, ast.Constant) and node.right.value == 2:
+                return f"{self._bound(left, left_precedence, 12)} * {self._bound(left, left_precedence, 12, True)}", 12
+            if isinstance(node.right, ast.Constant) and node.right.value == 0.5:
+                return f"Math.sqrt({left})", self._atomic_precedence
+            power = f"Math.pow({left}, {right})"
+            return (f"(int) {power}", self._unary_precedence) if kind[0] == 'int' else (power, self._atomic_precedence)
+        symbol, precedence = self._element_operators[type(node.op)]
+        return f"{self._bound(left, left_precedence, precedence)} {symbol} " \
+               f"{self._bound(right, right_precedence, precedence, right=True)}", precedence
+
+    def _subscript_element(self, node, kind, index):
+        """An element of a slice of a 1-D array, or of a row or column of a 2-D one"""
+        text = self._array_text(node.value)
+        if isinstance(node.slice, ast.Slice):
+            start = self._slice_bound(node.slice.lower, text)
+            return f"{text}[{start} + {index}]" if start else f"{text}[{index}]"
+        if isinstance(node.slice, ast.Tuple):
+            column = self._bound(*self._scalar_operand(node.slice.elts[1]), 11)
+            return f"{text}.data[{index} * {text}.columns + {column}]"
+        row = self._bound(*self._scalar_operand(node.slice), 12)
+        return f"{text}.data[{row} * {text}.columns + {index}]"
+
+    def _slice_bound(self, node, text):
+        """Java for where a slice of the array *text* starts or stops (counting back from its end), or None for its ends"""
+        if node is None:
+            return None
+        if (back := self._negative_index(node)) is not None:
+            return f"{text}.length - {back}"
+        return self._bound(*self._scalar_operand(node), 11)
+
+    def _call_element(self, node, kind, index):
+        function = self._numpy_function(node)
+        arguments = self._numpy_arguments(node)
+        zero, one = {'double': ('0.0', '1.0'), 'int': ('0', '1'), 'boolean': ('false', 'true')}[kind[0]]
+        if function in ('zeros', 'empty', 'zeros_like'):
+            return zero, self._atomic_precedence
+        if function in ('ones', 'ones_like'):
+            return one, self._atomic_precedence
+        if function in ('full', 'full_like'):
+            return self._scalar_operand(arguments[1])
+        if function in ('copy', 'array', 'asarray'):
+            element, precedence = self._element(arguments[0], index)
+            if kind[0] == 'double' and self._element_type(arguments[0]) == 'int':
+                return f"(double) {self._bound(element, precedence, self._unary_precedence)}", self._unary_precedence
+            return element, precedence
+        if function == 'arange':
+            start, step = (arguments[0] if len(arguments) > 1 else None), (arguments[2] if len(arguments) > 2 else None)
+            element, precedence = index, self._atomic_precedence
+            if kind[0] == 'double' and 'double' not in {self._element_type(argument) for argument in (start, step)
+                                                        if argument is not None}:
+                # Counting in doubles
+                element, precedence = f"(double) {index}", self._unary_precedence
+            if step is not None:
+                element, precedence = f"{element} * {self._bound(*self._scalar_operand(step), 12, True)}", 12
+            if start is not None and not (isinstance(start, ast.Constant) and start.value == 0):
+                element, precedence = f"{self._bound(*self._scalar_operand(start), 11)} + {element}", 11
+            return element, precedence
+        if function == 'linspace':
+            start, stop, count = (self._bound(*self._scalar_operand(argument), 11) for argument in arguments)
+            step = self._unique_name('step')
+            self.fill(f"double {step} = ({stop} - {start}) / (double) ({count} - 1);")
+            self.scopes[self.current_scopes[-1]][step] = float
+            return f"{start} + {index} * {step}", 11
+        elements = [self._operand_element(node, argument, index) for argument in arguments]
+        if function in self._numpy_math_functions:
+            return f"{self._numpy_math_functions[function]}({elements[0][0]})", self._atomic_precedence
+        if function == 'square':
+            element = self._bound(elements[0][0], elements[0][1], 12)
+            return f"{element} * {self._bound(elements[0][0], elements[0][1], 12, True)}", 12
+        if function in ('maximum', 'minimum'):
+            return f"Math.{function[:3]}({elements[0][0]}, {elements[1][0]})", self._atomic_precedence
+        # where
+        (condition, condition_precedence), (chosen, chosen_precedence), (other, other_precedence) = elements
+        return f"{self._bound(condition, condition_precedence, 3)} ? {self._bound(chosen, chosen_precedence, 3)} : " \
+               f"{self._bound(other, other_precedence, 2)}", self._conditional_precedence
+
+    def _array_shape(self, node):
+        """Java for the length of the array *node* (see _fused_operands), or its rows and columns"""
+        kind = self._array_kind(node)
+        if isinstance(node, ast.Name) or id(node) in self._array_values:
+            text = self._array_text(node)
+            return [f"{text}.length"] if kind[1] == 1 else [f"{text}.rows", f"{text}.columns"]
+        if isinstance(node, ast.Subscript):
+            text = self._array_text(node.value)
+            if not isinstance(node.slice, ast.Slice):
+                return [f"{text}.rows" if isinstance(node.slice, ast.Tuple) else f"{text}.columns"]
+            start = self._slice_bound(node.slice.lower, text)
+            stop = self._slice_bound(node.slice.upper, text) or f"{text}.length"
+            return [f"{stop} - {start}" if start else stop]
+        if isinstance(node, ast.Call):
+            function = self._numpy_function(node)
+            arguments = self._numpy_arguments(node)
+            if function in self._numpy_constructors:
+                return [self._bound(*self._scalar_operand(size), 12)
+                        for size in getattr(arguments[0], 'elts', [arguments[0]])]
+            if function in self._numpy_like_constructors:
+                return self._array_shape(arguments[0])
+            if function == 'arange':
+                start, stop = (arguments[0], arguments[1]) if len(arguments) > 1 else (None, arguments[0])
+                stop = self._bound(*self._scalar_operand(stop), 11)
+                length = f"{stop} - {self._bound(*self._scalar_operand(start), 11, True)}" if start is not None else stop
+                if len(arguments) > 2:
+                    step = self._bound(*self._scalar_operand(arguments[2]), 12, True)
+                    return [f"(int) Math.ceil((double) ({length}) / {step})"]
+                if kind[0] == 'double':
+                    return [f"(int) Math.ceil({length})"]
+                return [f"Math.max(0, {length})" if start is not None else length]
+            if function == 'linspace':
+                return [self._scalar_operand(arguments[2])[0]]
+        for operand in self._fused_operands(node):
+            # Not a row that goes along every row of it
+            if (self._array_kind(operand) or (None, 0))[1] == kind[1]:
+                return self._array_shape(operand)
+
+    def _operand_shapes(self, node):
+        """The shapes (see _array_shape) of the arrays the array *node* is made from element by element"""
+        arrays = [] if isinstance(node, (ast.Name, ast.Subscript)) or id(node) in self._array_values \
+            else [operand for operand in self._fused_operands(node) or [] if self._array_kind(operand) is not None]
+        if not arrays:
+            return [self._array_shape(node)]
+        return [shape for operand in arrays for shape in self._operand_shapes(operand)]
+
+    def _write_shape_check(self, *nodes):
+        """Throw what NumPy does if the arrays *nodes* are made from don't go together, rows going with the last axis"""
+        shapes = [shape for node in nodes for shape in self._operand_shapes(node)]
+        widest = max(shapes, key=len)
+        conditions = []
+        for shape in shapes:
+            for size, other in zip(widest[len(widest) - len(shape):], shape):
+                constant = re.fullmatch(r'[\d +\-*]+', size) and re.fullmatch(r'[\d +\-*]+', other)
+                if size != other and not (constant and eval(size) == eval(other)) \
+                        and f"{size} != {other}" not in conditions:
+                    conditions.append(f"{size} != {other}")
+        if not conditions:
+            return
+        self.fill(f"if ({' || '.join(conditions)})")
+        with self.block():
+            self.fill('throw new IllegalArgumentException("operands could not be broadcast together");')
+
+    def _flat_length(self, node):
+        """Java for how many elements the array *node* has"""
+        shape = self._array_shape(node)
+        if len(shape) == 1:
+            return shape[0]
+        rows, columns = shape
+        if rows.endswith('.rows') and columns == rows[:-len('.rows')] + '.columns':
+            return rows[:-len('.rows')] + '.data.length'
+        return f"{rows} * {columns}"
+
+    def _loop_bound(self, text):
+        """*text*, or a variable worked out to it ahead of the loop if it isn't simple enough to be its bound"""
+        if re.fullmatch(r'[\w.]+', text):
+            return text
+        name = self._unique_name('length')
+        self.fill(f"int {name} = {text};")
+        self.scopes[self.current_scopes[-1]][name] = int
+        return name
+
+    def _write_elements(self, index, bound, statement, condition=None):
+        """A loop as simple as HotSpot needs it to be to vectorize, running *statement* for every element"""
+        self.fill(f"for (int {index} = 0; {index} < {bound}; {index}++)")
+        with self.block():
+            if condition is None:
+                self.fill(statement)
+                return
+            self.fill(f"if ({condition})")
+            with self.block():
+                self.fill(statement)
+
+    def _array_allocation(self, kind, shape):
+        if kind[1] == 2:
+            self._hoist(self._double_matrix_class)
+            return f"new DoubleMatrix({shape[0]}, {shape[1]})"
+        return f"new {kind[0]}[{shape[0]}]"
+
+    def _write_array(self, node, kind):
+        """Work the elementwise array *node* out into a new array. Returns its name"""
+        index = self._lambda_parameter('i')
+        element = self._element(node, index)[0]
+        self._write_shape_check(node)
+        java_type = self._array_java_types[kind]
+        name = self._unique_name('matrix' if kind[1] == 2 else 'array')
+        self.fill(f"{java_type} {name} = {self._array_allocation(kind, self._array_shape(node))};")
+        self.scopes[self.current_scopes[-1]][name] = java_type
+        data = f"{name}.data" if kind[1] == 2 else name
+        self._write_elements(index, f"{data}.length", f"{data}[{index}] = {element};")
+        return name
+
+    def _write_array_assignment(self, statement, kind):
+        """`a = <array made element by element>`, written straight into a new array for a"""
+        target, value = statement.targets[0], statement.value
+        index = self._lambda_parameter('i')
+        function = isinstance(value, ast.Call) and self._numpy_function(value)
+        # Java arrays start out as zeros
+        element = None if function in ('zeros', 'empty', 'zeros_like') else self._element(value, index)[0]
+        self._write_shape_check(value)
+        self._array_values[id(value)] = self._array_allocation(kind, self._array_shape(value))
+        ast.NodeVisitor.visit(self, statement)
+        data = self._render(target) + ('.data' if kind[1] == 2 else '')
+        if element is None:
+            return
+        if function in ('ones', 'full', 'ones_like', 'full_like'):
+            self.fill(f"java.util.Arrays.fill({data}, {element});")
+        else:
+            self._write_elements(index, f"{data}.length", f"{data}[{index}] = {element};")
+
+    def _write_region_assignment(self, target, value):
+        """
+        Assigning to the elements a mask or a slice picks out, or a row or column: a number, or an array that goes
+        with them element by element. Returns whether it could
+        """
+        kind = self._array_kind(target)
+        masked = not isinstance(target.slice, (ast.Slice, ast.Tuple)) and kind == self._array_kind(target.value)
+        source = value
+        if masked and self._array_kind(value) is not None:
+            # a[mask] = b[mask]
+            if not (isinstance(value, ast.Subscript) and ast.dump(value.slice) == ast.dump(target.slice)):
+                return False
+            source = value.value
+        if self._array_kind(source) is None and self._scalar_element_type(source) is None \
+                or self._array_kind(source) is not None and self._array_kind(source)[1] != 1:
+            return False
+        index = self._lambda_parameter('i')
+        self._lower_fused(source)
+        if masked:
+            self._lower_fused(target.slice)
+            condition = self._element(target.slice, index)[0]
+            element = self._element(source, index)[0]
+            self._write_shape_check(*(node for node in (target.value, target.slice, source)
+                                      if self._array_kind(node) is not None))
+            text = self._array_text(target.value)
+            self._write_elements(index, self._loop_bound(f"{text}.length"), f"{text}[{index}] = {element};", condition)
+            return True
+        self._lower_fused(target)
+        location = self._element(target, index)[0]
+        element = self._element(source, index)[0]
+        if self._array_kind(source) is not None:
+            self._write_shape_check(target, source)
+        self._write_elements(index, self._loop_bound(self._flat_length(target)), f"{location} = {element};")
+        return True
+
+    def _write_array_producer(self, node, kind):
+        """
+        Java for an array that isn't made element by element, writing what has to come ahead of it: a literal,
+        a product of matrices, the elements a mask picks out. Returns None for what just gets written as it is
+        """
+        function = isinstance(node, ast.Call) and self._numpy_function(node)
+        if isinstance(node, ast.Subscript):
+            return self._write_masked_elements(node, kind)
+        if isinstance(node, ast.Attribute) or function == 'transpose':
+            matrix = node.value if isinstance(node, ast.Attribute) else node.args[0]
+            self._lower_expression(matrix)
+            return f"{self._array_text(matrix)}.transpose()" if kind[1] == 2 else self._array_text(matrix)
+        if isinstance(node, ast.BinOp) or function in ('dot', 'matmul'):
+            return self._write_product(*((node.left, node.right) if isinstance(node, ast.BinOp) else node.args))
+        if function in ('array', 'asarray') and isinstance(node.args[0], (ast.List, ast.Tuple)):
+            for child in ast.iter_child_nodes(node.args[0]):
+                self._lower_expression(child)
+            if kind[1] == 2:
+                self._hoist(self._double_matrix_class)
+                rows = node.args[0].elts
+                elements = ', '.join(self._render(element) for row in rows for element in row.elts)
+                return f"new DoubleMatrix({len(rows)}, {len(rows[0].elts)}, new double[]{{{elements}}})"
+            return f"new {kind[0]}[]{{{', '.join(self._render(element) for element in node.args[0].elts)}}}"
+        if function in ('array', 'asarray'):
+            number = 'Double' if kind[0] == 'double' else 'Int'
+            return f"{self._render(node.args[0])}.stream().mapTo{number}(Number::{kind[0]}Value).toArray()"
+        for child in ast.iter_child_nodes(node):
+            self._lower_expression(child)
+        return None
+
+    def _write_masked_elements(self, node, kind):
+        """The elements of an array a mask picks out, into an array of just them. Returns its name"""
+        self._lower_fused(node.value)
+        self._lower_fused(node.slice)
+        index = self._lambda_parameter('i')
+        element = self._element(node.value, index)[0]
+        condition = self._element(node.slice, index)[0]
+        bound = self._loop_bound(self._flat_length(node.value))
+        name, size = self._unique_name('selected'), self._unique_name('size')
+        self.fill(f"{kind[0]}[] {name} = new {kind[0]}[{bound}];")
+        self.fill(f"int {size} = 0;")
+        self._write_elements(index, bound, f"{name}[{size}++] = {element};", condition)
+        self.fill(f"{name} = java.util.Arrays.copyOf({name}, {size});")
+        self.scopes[self.current_scopes[-1]][name] = self._array_java_types[kind]
+        return name
+
+    def _write_product(self, left, right):
+        """A matrix times a matrix (or a vector), with the innermost loop along the rows of what it writes. Returns its name"""
+        for operand in (left, right):
+            self._lower_expression(operand)
+            self._hold_array(operand)
+        a, b = self._array_text(left), self._array_text(right)
+        shape = (self._array_kind(left)[1], self._array_kind(right)[1])
+        row, k, column = self._lambda_parameter('row'), self._lambda_parameter('k'), self._lambda_parameter('column')
+        name = self._unique_name('product')
+        if shape == (2, 2):
+            self._hoist(self._double_matrix_class)
+            self.fill(f"DoubleMatrix {name} = new DoubleMatrix({a}.rows, {b}.columns);")
+            self.fill(f"for (int {row} = 0; {row} < {a}.rows; {row}++)")
+            with self.block():
+                self.fill(f"for (int {k} = 0; {k} < {a}.columns; {k}++)")
+                with self.block():
+                    scale = self._lambda_parameter('scale')
+                    self.fill(f"double {scale} = {a}.data[{row} * {a}.columns + {k}];")
+                    self.fill(f"for (int {column} = 0; {column} < {b}.columns; {column}++)")
+                    with self.block():
+                        self.fill(f"{name}.data[{row} * {name}.columns + {column}] += "
+                                  f"{scale} * {b}.data[{k} * {b}.columns + {column}];")
+            self.scopes[self.current_scopes[-1]][name] = 'DoubleMatrix'
+            return name
+        self.fill(f"double[] {name} = new double[{f'{a}.rows' if shape == (2, 1) else f'{b}.columns'}];")
+        if shape == (2, 1):
+            self.fill(f"for (int {row} = 0; {row} < {a}.rows; {row}++)")
+            with self.block():
+                total = self._lambda_parameter('total')
+                self.fill(f"double {total} = 0.0;")
+                self._write_elements(k, f"{a}.columns", f"{total} += {a}.data[{row} * {a}.columns + {k}] * {b}[{k}];")
+                self.fill(f"{name}[{row}] = {total};")
+        else:
+            self.fill(f"for (int {k} = 0; {k} < {a}.length; {k}++)")
+            with self.block():
+                scale = self._lambda_parameter('scale')
+                self.fill(f"double {scale} = {a}[{k}];")
+                self._write_elements(column, f"{b}.columns", f"{name}[{column}] += {scale} * {b}.data[{k} * {b}.columns + {column}];")
+        self.scopes[self.current_scopes[-1]][name] = 'double[]'
+        return name
+
+    def _write_array_reduction(self, reduction, operands):
+        """Reduce arrays (see _array_reduction) in a loop over their elements. Returns the name of what it comes to"""
+        condition = None
+        source = operands[0]
+        if isinstance(source, ast.Subscript) and self._array_kind(source.slice) == ('boolean', 1):
+            # Only the elements a mask picks out
+            source, condition = source.value, source.slice
+            self._lower_fused(condition)
+        for operand in [source] + operands[1:]:
+            self._lower_fused(operand)
+        index = self._lambda_parameter('i')
+        elements = [self._element(operand, index) for operand in [source] + operands[1:]]
+        self._write_shape_check(*[source] + operands[1:] + ([condition] if condition else []))
+        condition = condition and self._element(condition, index)[0]
+        element, precedence = elements[0]
+        element_type = self._array_kind(source)[0]
+        java_type = self._array_reduction_type(reduction, operands)
+        bound = self._loop_bound(self._flat_length(source))
+        name = self._unique_name(self._array_reduction_names[reduction])
+        if element_type == 'boolean' and reduction in ('sum', 'mean', 'count_nonzero'):
+            element, precedence = f"{self._bound(element, precedence, 3)} ? 1 : 0", self._conditional_precedence
+        elif reduction == 'count_nonzero':
+            element, precedence = f"{self._bound(element, precedence, 8)} != 0 ? 1 : 0", self._conditional_precedence
+        size = None
+        if condition and reduction in ('mean', 'std', 'var'):
+            # What to divide by
+            size = self._unique_name('size')
+            self.fill(f"int {size} = 0;")
+            self._write_elements(index, bound, f"{size}++;", condition)
+        if reduction in ('std', 'var'):
+            mean = self._unique_name('mean')
+            self.fill(f"double {mean} = 0.0;")
+            self._write_elements(index, bound, f"{mean} += {element};", condition)
+            self.fill(f"{mean} /= {size or bound};")
+            difference = self._lambda_parameter('difference')
+            self.fill(f"double {name} = 0.0;")
+            self.fill(f"for (int {index} = 0; {index} < {bound}; {index}++)")
+            with self.block():
+                lines = [f"double {difference} = {self._bound(element, precedence, 11)} - {mean};",
+                         f"{name} += {difference} * {difference};"]
+                if condition:
+                    self.fill(f"if ({condition})")
+                    with self.block():
+                        for line in lines:
+                            self.fill(line)
+                else:
+                    for line in lines:
+                        self.fill(line)
+            self.fill(f"{name} = {'Math.sqrt(' if reduction == 'std' else '('}{name} / {size or bound});")
+        elif reduction in ('any', 'all'):
+            self.fill(f"boolean {name} = {str(reduction == 'all').lower()};")
+            test = element if reduction == 'any' else f"!{self._bound(element, precedence, self._unary_precedence)}"
+            if condition:
+                test = f"{self._bound(condition, 14, 4)} && {self._bound(test, 14 if reduction == 'all' else precedence, 4)}"
+            self.fill(f"for (int {index} = 0; {index} < {bound}; {index}++)")
+            with self.block():
+                self.fill(f"if ({test})")
+                with self.block():
+                    self.fill(f"{name} = {str(reduction == 'any').lower()};")
+                    self.fill("break;")
+        else:
+            if reduction in ('max', 'min'):
+                limits = {'double': ('Double.NEGATIVE_INFINITY', 'Double.POSITIVE_INFINITY'),
+                          'int': ('Integer.MIN_VALUE', 'Integer.MAX_VALUE')}[java_type]
+                start = limits[reduction == 'min']
+                update = f"{name} = Math.{reduction}({name}, {element});"
+            elif reduction == 'prod':
+                start, update = '1', f"{name} *= {element};"
+            elif reduction == 'norm':
+                update = f"{name} += {self._bound(element, precedence, 12)} * {self._bound(element, precedence, 12, True)};"
+                start = '0.0'
+            elif reduction == 'dot':
+                other, other_precedence = elements[1]
+                start = '0'
+                update = f"{name} += {self._bound(element, precedence, 12)} * {self._bound(other, other_precedence, 12, True)};"
+            else:
+                start, update = '0', f"{name} += {element};"
+            if java_type == 'double' and start in ('0', '1'):
+                start += '.0'
+            self.fill(f"{java_type} {name} = {start};")
+            self._write_elements(index, bound, update, condition)
+            if reduction == 'mean':
+                self.fill(f"{name} /= {size or bound};")
+            elif reduction == 'norm':
+                self.fill(f"{name} = Math.sqrt({name});")
+        self.scopes[self.current_scopes[-1]][name] = self._java_to_python_types.get(java_type, int)
+        return name
+
+    def _array_element_access(self, node):
+        """Java for an element of a NumPy array, like `a[i]` or `m[i, j]` (or `m[i][j]`), or None if *node* isn't one"""
+        if not self._uses_numpy or (kind := self._array_kind(node.value)) is None or self._array_kind(node) is not None:
+            return None
+        if kind[1] == 2:
+            if not isinstance(node.slice, ast.Tuple) or len(node.slice.elts) != 2 \
+                    or any(isinstance(element, ast.Slice) for element in node.slice.elts):
+                return None
+            matrix, (row, column) = node.value, node.slice.elts
+        elif isinstance(node.value, ast.Subscript) and isinstance(node.value.slice, ast.expr) \
+                and not isinstance(node.value.slice, (ast.Slice, ast.Tuple)) \
+                and (self._array_kind(node.value.value) or (None, 1))[1] == 2:
+            matrix, row, column = node.value.value, node.value.slice, node.slice
+        else:
+            text = self._array_text(node.value)
+            if (back := self._negative_index(node.slice)) is not None:
+                return f"{text}[{text}.length - {back}]"
+            return f"{text}[{self._render(node.slice)}]"
+        text = self._array_text(matrix)
+        row, column = self._render(row), self._render(column)
+        row = row if re.fullmatch(r'[\w.]+', row) else f"({row})"
+        return f"{text}.data[{row} * {text}.columns + {column}]"
+
+    def _array_attribute(self, node):
+        """Java for the size or shape of a NumPy array, like `a.size` or `m.shape[1]`, or None if *node* isn't that"""
+        if not self._uses_numpy:
+            return None
+        if isinstance(node, ast.Attribute) and node.attr in ('size', 'ndim') \
+                and (kind := self._array_kind(node.value)) is not None:
+            if node.attr == 'ndim':
+                return str(kind[1])
+            return f"{self._array_text(node.value)}{'.data' if kind[1] == 2 else ''}.length"
+        if isinstance(node, ast.Attribute) and node.attr == 'shape' and (kind := self._array_kind(node.value)) is not None:
+            text = self._array_text(node.value)
+            return f"java.util.List.of({f'{text}.length' if kind[1] == 1 else f'{text}.rows, {text}.columns'})"
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Attribute) and node.value.attr == 'shape' \
+                and (kind := self._array_kind(node.value.value)) is not None \
+                and isinstance(node.slice, ast.Constant) and node.slice.value in range(kind[1]):
+            text = self._array_text(node.value.value)
+            return f"{text}.length" if kind[1] == 1 else f"{text}.{('rows', 'columns')[node.slice.value]}"
+        return None
+
+    def _write_call_of(self, function, arguments, keywords=()):
+        """Call *function* with these nodes, for running it somewhere else than where the Python did"""
+        call = ast.Call(func=function, args=list(arguments), keywords=list(keywords))
+        self._synthetic_nodes.append(call)
+        self.traverse(call)
+
+    def _concurrency_call_helper(self, node):
+        """
+        concurrent.futures, threading, multiprocessing and queue, on java.util.concurrent.
+        Returns whether it handled *node*
+        """
+        name = self._qualified_name(node.func)
+        if name in self._concurrency_constructors:
+            return self._write_concurrency_construction(node, name)
+        if name in ('os.cpu_count', 'multiprocessing.cpu_count') and not node.args:
+            self.write(self._available_processors)
+            return True
+        if name == 'concurrent.futures.as_completed' and len(node.args) == 1 and not node.keywords:
+            # Every future is done when it's joined, so the order they come in only matters for how long it takes
+            self.traverse(node.args[0])
+            return True
+        if not isinstance(node.func, ast.Attribute):
+            return False
+        method = node.func.attr
+        kind = self._concurrency_objects.get(self._dict_key(node.func.value))
+        if kind is None:
+            if method == 'result' and not node.args and not node.keywords and self._threaded:
+                # A future of a task submitted to a pool (see Concurrency.submit)
+                self.set_precedence(ast._Precedence.ATOM, node.func.value)
+                self.traverse(node.func.value)
+                self.write(".join()")
+                return True
+            return False
+        self.set_precedence(ast._Precedence.ATOM, node.func.value)
+        receiver = self._render(node.func.value)
+        if kind == 'executor' and method in ('submit', 'apply_async') and node.args:
+            self._hoist(self._concurrency_class)
+            self.write(f"Concurrency.submit({receiver}, () -> ")
+            if method == 'submit':
+                self._write_call_of(node.args[0], node.args[1:], node.keywords)
+            elif len(node.args) == 1 or isinstance(node.args[1], (ast.Tuple, ast.List)):
+                self._write_call_of(node.args[0], node.args[1].elts if len(node.args) > 1 else [])
+            else:
+                return False
+            self.write(")")
+            return True
+        if kind == 'executor' and method in ('map', 'imap') and len(node.args) == 2 \
+                and all(keyword.arg == 'chunksize' for keyword in node.keywords):
+            # Run on the pool, a task for each item, rather than the common pool a parallel stream would use
+            self._hoist(self._concurrency_class)
+            self.write(f"Concurrency.map({receiver}, ")
+            if isinstance(node.args[0], ast.Lambda):
+                self.traverse(node.args[0])
+            else:
+                item = self._unique_name('item')
+                self.write(f"{item} -> ")
+                self._write_call_of(node.args[0], [ast.Name(id=item, ctx=ast.Load())])
+            self.write(", ")
+            self.traverse(node.args[1])
+            self.write(")")
+            return True
+        if kind == 'executor' and method == 'shutdown' and not node.args and len(node.keywords) == 1 \
+                and node.keywords[0].arg == 'wait' and isinstance(node.keywords[0].value, ast.Constant) \
+                and not node.keywords[0].value.value:
+            self.write(f"{receiver}.shutdown()")
+            return True
+        template = self._concurrency_methods.get((kind, method))
+        if template is None or node.keywords or len(node.args) != template.count('{') - 1:
+            return False
+        if '{1}' in template:
+            self.set_precedence(ast._Precedence.TEST, node.args[0])
+        if template.startswith('Concurrency.'):
+            self._hoist(self._concurrency_class)
+        self.write(template.format(receiver, *(self._render(argument) for argument in node.args)))
+        return True
+
+    def _write_concurrency_construction(self, node, name):
+        kind = self._concurrency_constructors[name]
+        arguments = {keyword.arg: keyword.value for keyword in node.keywords}
+        first = node.args[0] if node.args else None
+        if kind == 'executor':
+            size = arguments.get('processes' if name.startswith('multiprocessing') else 'max_workers', first)
+            if 'Thread' in name:
+                # Python's own default, since threads that wait on I/O are what a thread pool is usually for
+                default = 'Math.min(32, Runtime.getRuntime().availableProcessors() + 4)' \
+                    if name.startswith('concurrent') else self._available_processors
+                self.write("java.util.concurrent.Executors.newFixedThreadPool(")
+                if size is None:
+                    self.write(default)
+                else:
+                    self.traverse(size)
+                self.write(")")
+            else:
+                # Work for processes is CPU bound, so one thread for each of them, by default as many as there are
+                self.write("new java.util.concurrent.ForkJoinPool(")
+                if size is not None:
+                    self.traverse(size)
+                self.write(")")
+            return True
+        if kind == 'thread':
+            target = arguments.get('target', node.args[1] if len(node.args) > 1 else None)
+            target_arguments = arguments.get('args', node.args[3] if len(node.args) > 3 else None)
+            if 'daemon' in arguments or 'kwargs' in arguments \
+                    or target_arguments is not None and not isinstance(target_arguments, (ast.Tuple, ast.List)):
+                self._warn("Unsupported ATM: Thread with daemon, kwargs or args that aren't a literal", ast.unparse(node))
+                return False
+            self.write("new Thread(")
+            if target is not None:
+                self.write("() -> ")
+                self._write_call_of(target, target_arguments.elts if target_arguments is not None else [])
+            if (thread_name := arguments.get('name')) is not None:
+                if target is not None:
+                    self.write(", ")
+                self.traverse(thread_name)
+            self.write(")")
+            return True
+        if kind == 'lock':
+            self.write("new java.util.concurrent.locks.ReentrantLock()")
+            return True
+        if kind == 'semaphore':
+            value = arguments.get('value', first)
+            self.write("new java.util.concurrent.Semaphore(")
+            if value is None:
+                self.write("1")
+            else:
+                self.traverse(value)
+            self.write(")")
+            return True
+        size = arguments.get('maxsize', first)
+        self.write("new java.util.concurrent.LinkedBlockingQueue<>(")
+        if isinstance(size, ast.Constant) and isinstance(size.value, int):
+            # Up to maxsize, or without a bound if it's 0 or less
+            if size.value > 0:
+                self.write(str(size.value))
+        elif size is not None:
+            self.set_precedence(ast._Precedence.CMP, size)
+            bound = self._render(size)
+            self.write(f"{bound} > 0 ? {bound} : Integer.MAX_VALUE")
+        self.write(")")
+        return True
+
+    def _write_heap_construction(self, node):
+        """Make what a heap starts out as, the list *node*, the queue it's used as instead"""
+        if self._heap_constructions[id(node)] == 'LongHeap':
+            self._hoist(self._long_heap_class)
+            self.write("new LongHeap()")
+            return
+        if self._heap_constructions[id(node)] == 'Tuples':
+            self._hoist(self._heap_tuples_class)
+            if isinstance(node, ast.List) and not node.elts:
+                self.write("new java.util.PriorityQueue<java.util.List<Object>>(Tuples::compare)")
+                return
+            self.write("Tuples.heap(")
+            if isinstance(node, ast.Call) and node.args:
+                self.traverse(node.args[0])
+            else:
+                self.write("java.util.List.of(")
+                self.interleave(lambda: self.write(", "), self._write_heap_entry, node.elts)
+                self.write(")")
+            self.write(")")
+            return
+        # A whole collection at once is heapified in linear time, like heapq.heapify
+        self.write("new java.util.PriorityQueue<>(")
+        if isinstance(node, ast.List) and node.elts:
+            self.write("java.util.List.of(")
+            self.interleave(lambda: self.write(", "), self.traverse, node.elts)
+            self.write(")")
+        elif isinstance(node, ast.Call) and node.args:
+            self.traverse(node.args[0])
+        self.write(")")
+
+    def _write_heap_entry(self, node):
+        """What's pushed onto a heap, where tuples are Tuples"""
+        if isinstance(node, ast.Tuple):
+            self._hoist(self._heap_tuples_class)
+            self.write("Tuples.of(")
+            self.interleave(lambda: self.write(", "), self.traverse, node.elts)
+            self.write(")")
+        else:
+            self.traverse(node)
+
+    def _is_heap_tuple(self, node):
+        """Whether *node* is a tuple out of a heap of them, heappop(h) or h[0]"""
+        if isinstance(node, ast.Call) and self._qualified_name(node.func) == 'heapq.heappop' and node.args:
+            heap = node.args[0]
+        elif isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Load) and isinstance(node.slice, ast.Constant) \
+                and node.slice.value == 0:
+            heap = node.value
+        else:
+            return False
+        return self._heaps.get(self._name_keys.get(id(heap))) == 'Tuples'
+
+    def visit_List(self, node):
+        if id(node) in self._heap_constructions:
+            self._write_heap_construction(node)
+            return
+        super().visit_List(node)
+
+    def _stdlib_call_helper(self, node):
+        """heapq, bisect and collections.deque, on their Java counterparts. Returns whether it handled *node*"""
+        name = self._qualified_name(node.func)
+        if name == 'collections.deque':
+            keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+            maxlen = node.args[1] if len(node.args) > 1 else keywords.get('maxlen')
+            if maxlen is not None and not (isinstance(maxlen, ast.Constant) and maxlen.value is None):
+                # Special case: Full deques drop an element off the other end for every one added
+                self._hoist(self._bounded_deque_class)
+                self.write("new BoundedDeque<>(")
+                iterable = node.args[0] if node.args else keywords.get('iterable')
+                if iterable is not None:
+                    self.traverse(iterable)
+                    self.write(", ")
+                self.traverse(maxlen)
+                self.write(")")
+                return True
+            self.write("new java.util.ArrayDeque<>(")
+            if node.args:
+                self.traverse(node.args[0])
+            self.write(")")
+            return True
+        if name in self._heap_functions and node.args:
+            heap = node.args[0]
+            kind = self._heaps.get(self._name_keys.get(id(heap)))
+            if kind is None:
+                self._warn("Unsupported ATM: heapq on a list that's used as more than a heap", ast.unparse(node))
+                return False
+            self.set_precedence(ast._Precedence.ATOM, heap)
+            self.traverse(heap)
+            if name == 'heapq.heappush':
+                self.write(".push(" if kind == 'LongHeap' else ".add(")
+                self._write_heap_entry(node.args[1])
+                self.write(")")
+            else:
+                self.write(".pop()" if kind == 'LongHeap' else ".remove()")
+            return True
+        if name in ('bisect.bisect_left', 'bisect.bisect_right', 'bisect.bisect',
+                    'bisect.insort', 'bisect.insort_left', 'bisect.insort_right') and 2 <= len(node.args) <= 4:
+            keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+            if not set(keywords) <= {'lo', 'hi'}:
+                self._warn("Unsupported ATM: bisect with keywords", ast.unparse(node))
+                return False
+            function = name.split('.')[1]
+            side = 'bisect_left' if function.endswith('_left') else 'bisect_right'
+            method = self._bisect_methods[side]
+            self._hoist(method)
+            method_name = re.search(r'int (\w+)\(', method).group(1)
+            sequence, value = node.args[:2]
+            low = node.args[2] if len(node.args) > 2 else keywords.get('lo', ast.Constant(value=0))
+            high = node.args[3] if len(node.args) > 3 else keywords.get('hi')
+            self.set_precedence(ast._Precedence.ATOM, sequence)
+            if function.startswith('insort'):
+                # Finding where is logarithmic, but making room there is linear, as it is in Python
+                self.traverse(sequence)
+                self.write(".add(")
+            self.write(f"{method_name}(")
+            self.interleave(lambda: self.write(", "), self.traverse, [sequence, value, low])
+            self.write(", ")
+            if high is None:
+                self.traverse(sequence)
+                self.write(".size()")
+            else:
+                self.traverse(high)
+            self.write(")")
+            if function.startswith('insort'):
+                self.write(", ")
+                self.traverse(value)
+                self.write(")")
+            return True
+        if isinstance(node.func, ast.Attribute) and self._dict_key(node.func.value) in self._deques \
+                and self._deque_methods.get(node.func.attr):
+            self.set_precedence(ast._Precedence.ATOM, node.func.value)
+            self.traverse(node.func.value)
+            self.write(f".{self._deque_methods[node.func.attr]}(")
+            self.interleave(lambda: self.write(", "), self.traverse, node.args)
+            self.write(")")
+            return True
+        return False
+
+    def _collection_call_helper(self, node):
+        """
+        Dict and set construction, and the dict methods with a single lookup version in Java.
+        Returns whether it handled *node*
+        """
+        name = self._dotted_name(node.func)
+        if name == 'set' and len(node.args) <= 1 and not node.keywords and not self._in_scope(name):
+            self.write("new java.util.HashSet<>(")
+            if node.args:
+                self.traverse(node.args[0])
+            self.write(")")
+            return True
+        if self._makes_dict(node) and not node.keywords:
+            if self._qualified_name(node.func) in self._default_dicts and len(node.args) <= 1 or not node.args:
+                self.write("new java.util.HashMap<>()")
+                return True
+            if name == 'dict' and len(node.args) == 1:
+                self.write("new java.util.HashMap<>(")
+                self.traverse(node.args[0])
+                self.write(")")
+                return True
+            return False
+        if not isinstance(node.func, ast.Attribute) or node.keywords or node.func.attr in self._method_names:
+            return False
+        method, arguments, receiver = node.func.attr, node.args, node.func.value
+        if method == 'get' and len(arguments) == 2 and (self._is_dict(receiver) or self._get_python_type(receiver) == dict):
+            method = 'getOrDefault'
+        elif method == 'setdefault' and len(arguments) == 2 \
+                and (self._is_dict(receiver) or self._get_python_type(receiver) == dict):
+            # Python works the default out even when it isn't needed, but it's only kept when it is
+            self._hoist(self._dicts_class)
+            self.write("Dicts.setDefault(")
+            self.traverse(node.func.value)
+            self.write(", ")
+            self.traverse(arguments[0])
+            self.write(", ")
+            if isinstance(arguments[1], ast.Constant) and arguments[1].value is None:
+                self.write("null")
+            else:
+                self.traverse(arguments[1])
+            self.write(")")
+            return True
+        elif method == 'append' and len(arguments) == 1 and not self._is_dict(receiver) \
+                and self._get_python_type(receiver) not in (dict, set, str, int, float, bool):
+            # (Lists, and whatever isn't known not to be one)
+            method = 'add'
+        else:
+            return False
+        self.set_precedence(ast._Precedence.ATOM, node.func.value)
+        self.traverse(node.func.value)
+        self.write(f".{method}(")
+        self.interleave(lambda: self.write(", "), self.traverse, arguments)
+        self.write(")")
+        return True
+
+    def _is_collection(self, node):
+        """Whether *node* is something Python tests for emptiness when it's tested for truth"""
+        return self._name_keys.get(id(node)) in self._heaps or self._dict_key(node) in self._deques \
+            or self._is_dict(node) or self._get_python_type(node) in (str, list, dict, set)
+
+    def _is_number(self, node):
+        """Whether *node* is an int or float, which Python takes as true when it isn't 0"""
+        return self._get_python_type(node) in (int, float)
+
+    def _write_nonzero(self, node, operator):
+        """*node* != 0, or == 0, as *operator* says"""
+        with self.require_parens(ast._Precedence.CMP, node):
+            if self._java_int_type(node) == self._big_integer:
+                self.set_precedence(ast._Precedence.ATOM, node)
+                self.traverse(node)
+                self.write(".signum()")
+            else:
+                self.set_precedence(ast._Precedence.CMP.next(), node)
+                self.traverse(node)
+            self.write(f" {operator} 0")
+
+    def _write_condition(self, test):
+        """
+        Write *test* as a Java boolean, where collections and strings are true when they aren't empty,
+        and numbers when they aren't 0
+        """
+        if isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not) and self._is_collection(test.operand):
+            self.set_precedence(ast._Precedence.ATOM, test.operand)
+            self.traverse(test.operand)
+            self.write(".isEmpty()")
+        elif isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not) and self._is_number(test.operand):
+            self._write_nonzero(test.operand, '==')
+        elif self._is_number(test):
+            self._write_nonzero(test, '!=')
+        elif self._is_collection(test):
+            with self.require_parens(ast._Precedence.NOT, test):
+                self.write("!")
+                self.set_precedence(ast._Precedence.ATOM, test)
+                self.traverse(test)
+                self.write(".isEmpty()")
+        elif isinstance(test, ast.BoolOp):
+            operator = self.boolops[test.op.__class__.__name__]
+            precedence = self.boolop_precedence[operator]
+            with self.require_parens(precedence, test):
+                for index, value in enumerate(test.values):
+                    if index:
+                        self.write(f" {operator} ")
+                    self.set_precedence(precedence.next(), value)
+                    self._write_condition(value)
+        else:
+            self.traverse(test)
+
+    def _write_lookup(self, container, key, body):
+        """
+        Get container[key] into a variable ahead of *body*, for its reads of container[key] to use instead,
+        if nothing in *body* could change what that is. Returns the variable, or None
+        """
+        if not isinstance(key, (ast.Name, ast.Constant)) or self._dict_key(container) is None:
+            return None
+        container_source, key_source = ast.unparse(container), ast.unparse(key)
+        reads = []
+        for child in self._walk_body(body):
+            if isinstance(child, ast.Subscript) and ast.unparse(child.value) == container_source:
+                if not isinstance(child.ctx, ast.Load):
+                    return None
+                if ast.unparse(child.slice) == key_source:
+                    reads.append(child)
+            elif isinstance(child, (ast.Name, ast.Attribute)) and not isinstance(child.ctx, ast.Load) \
+                    and ast.unparse(child) in (container_source, key_source):
+                return None
+            elif isinstance(child, ast.Call) and not (isinstance(child.func, ast.Name)
+                                                     and child.func.id in self._read_only_builtins):
+                # Anything else called could change the dict
+                return None
+        if not reads:
+            return None
+        value = self._unique_name(f"{key.id}Value" if isinstance(key, ast.Name) else 'value')
+        self.fill(f"var {value} = ")
+        self.set_precedence(ast._Precedence.ATOM, container)
+        self.traverse(container)
+        self.write(".get(")
+        self.traverse(key)
+        self.write(");")
+        self._looked_up.update((id(read), value) for read in reads)
+        return value
+
+    def visit_Try(self, node):
+        if len(node.handlers) == 1 and not node.orelse and not node.finalbody and node.body \
+                and isinstance(node.handlers[0].type, ast.Name) and node.handlers[0].type.id == 'KeyError' \
+                and not node.handlers[0].name:
+            # Special case: `try: ... d[k] ... except KeyError:` where only d[k] can raise it, and does so
+            #  before anything else happens. Looks it up once and checks for null, without any exception
+            reads = [child for child in ast.walk(node.body[0])
+                     if isinstance(child, ast.Subscript) and not isinstance(child.slice, ast.Slice)]
+            if reads and len({ast.unparse(read) for read in reads}) == 1 and self._is_dict(reads[0].value) \
+                    and self._dicts[self._dict_key(reads[0].value)] is None \
+                    and not any(isinstance(child, ast.Subscript) for child in self._walk_body(node.body[1:])):
+                lookup = self._write_lookup(reads[0].value, reads[0].slice, node.body)
+                if lookup is not None:
+                    self.fill(f"if ({lookup} != null || ")
+                    self._write_membership_check(reads[0].value, reads[0].slice)
+                    self.write(") ")
+                    with self.block():
+                        self.traverse(node.body)
+                    self.fill("else ")
+                    with self.block():
+                        self.traverse(node.handlers[0].body)
+                    return
+        super().visit_Try(node)
+
+    def visit_Subscript(self, node):
+        self.set_precedence(ast._Precedence.ATOM, node.value)
+        if (text := self._array_element_access(node) or self._array_attribute(node)) is not None:
+            # Special case: An element of a NumPy array, or how long it is
+            self.write(text)
+            return
+        if isinstance(node.slice, ast.Slice):
+            self._slice_helper(node)
+            return
+        if (record := self._record_of(node.value)) and (index := self._record_index(node.slice, record)) is not None:
+            # Special case: An element of a tuple a function returned, as a record
+            self.traverse(node.value)
+            self.write(f".{record[1][index]}()")
+            return
+        if (kind := self._heaps.get(self._name_keys.get(id(node.value)))) is not None:
+            # Special case: The top of a heap
+            self.traverse(node.value)
+            self.write(".peek()" if kind == 'LongHeap' else ".element()")
+            return
+        if self._dict_key(node.value) in self._deques:
+            # Special case: Deques get at their ends, and only walk to anywhere else
+            self.traverse(node.value)
+            if self._negative_index(node.slice) == 1 or isinstance(node.slice, ast.Constant) and node.slice.value == 0:
+                self.write(".getLast()" if self._negative_index(node.slice) == 1 else ".getFirst()")
+            else:
+                self.write(".stream().skip(")
+                self.traverse(node.slice)
+                self.write(").findFirst().get()")
+            return
+        if id(node) in self._looked_up:
+            # Special case: An earlier lookup already got it
+            self.write(self._looked_up[id(node)])
+            return
+        if self._is_dict(node.value) and (factory := self._dicts[self._dict_key(node.value)]) is not None:
+            # Special case: A missing key gets filled in, in the same lookup
+            self.traverse(node.value)
+            if isinstance(factory, ast.Constant):
+                self.write(".getOrDefault(")
+                self.traverse(node.slice)
+                self.write(", ")
+                self.traverse(factory)
+            else:
+                self.write(".computeIfAbsent(")
+                self.traverse(node.slice)
+                self.write(f", {self._lambda_parameter()} -> ")
+                self._write_default(factory)
+            self.write(")")
+            return
+        if self._get_python_type(node.value) == str:
+            # A string of one character, like Python's. Anything that wants a char asks _write_character
+            self.write("String.valueOf(")
+            self._write_character(node)
+            self.write(")")
+            return
+        checked = id(node) in self._checked_reads
+        if checked:
+            self.write("java.util.Objects.requireNonNull(")
+        self._write_sequence(node.value, self._negative_index(node.slice) is not None)
+        # Maps get by key, and lists by index, alike
+        self.write(".get(")
+        self._write_index(node.value, node.slice, False)
+        self.write(")")
+        if checked:
+            self.write(f', "KeyError")')
+
+    def _write_character(self, node):
+        """Write the char that indexing a string with *node* gets"""
+        self._write_sequence(node.value, self._negative_index(node.slice) is not None)
+        self.write(".charAt(")
+        self._write_index(node.value, node.slice, True)
+        self.write(")")
+
+    # What calling each of these with no arguments makes
+    _default_values = {'list': 'new java.util.ArrayList<>()', 'set': 'new java.util.HashSet<>()',
+                       'dict': 'new java.util.HashMap<>()', 'int': '0', 'float': '0.0', 'str': '""',
+                       'bool': 'false'}
+
+    def _write_default(self, factory):
+        """Write what calling a defaultdict's *factory* makes"""
+        if isinstance(factory, ast.Name) and factory.id in self._default_values and not self._in_scope(factory.id):
+            self.write(self._default_values[factory.id])
+        elif isinstance(factory, ast.Lambda):
+            self.set_precedence(ast._Precedence.TEST, factory.body)
+            self.traverse(factory.body)
+        else:
+            self.traverse(ast.Call(func=factory, args=[], keywords=[]))
+
+    def _lambda_parameter(self, base='key'):
+        """A name for a lambda's parameter that can't shadow anything, which Java doesn't allow"""
+        name = base
+        suffix = 0
+        while name in self._program_names or self._in_scope(name):
+            suffix += 1
+            name = f"{base}{suffix}"
+        return name
+
+    def _merge_function(self, node, value):
+        """The method reference that adds *value* to what the dict being indexed by *node* already has, if there is one"""
+        factory = self._dicts.get(self._dict_key(node.value))
+        python_type = self._get_python_type(value)
+        if python_type not in (int, float, str) and isinstance(factory, ast.Name):
+            python_type = {'int': int, 'float': float, 'str': str}.get(factory.id)
+        elif python_type not in (int, float, str) and isinstance(factory, ast.Constant):
+            python_type = int
+        if python_type == int:
+            return 'Long::sum' if self._java_int_type(value) == 'long' else 'Integer::sum'
+        return {float: 'Double::sum', str: 'String::concat'}.get(python_type)
+
+    def _subscript_store_helper(self, target, value):
+        """`d[k] = v` puts, `xs[i] = v` sets, and `d[k] = d[k] + v` merges"""
+        if (element := self._array_element_access(target)) is not None:
+            # Special case: An element of a NumPy array
+            self.fill(f"{element} = ")
+            self.traverse(value)
+            self.write(";")
+            return
+        container, index = target.value, target.slice
+        is_dict = self._is_dict(container)
+        if is_dict and isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add):
+            read = value.left
+            # Only a missing key that gets filled in can be started from nothing. In a plain dict it's a KeyError
+            defaulted = self._dicts[self._dict_key(container)] is not None
+            if isinstance(read, ast.Call) and isinstance(read.func, ast.Attribute) and read.func.attr == 'get' \
+                    and len(read.args) == 2 and self._is_zero(read.args[1]):
+                # d.get(k, 0) + v
+                read = ast.Subscript(value=read.func.value, slice=read.args[0], ctx=ast.Load())
+                defaulted = True
+            if defaulted and isinstance(read, ast.Subscript) and ast.unparse(read) == ast.unparse(target) \
+                    and (merge := self._merge_function(target, value.right)):
+                # Special case: Adding to what's there, or starting from nothing, in one lookup
+                self.fill()
+                self.set_precedence(ast._Precedence.ATOM, container)
+                self.traverse(container)
+                self.write(".merge(")
+                self.traverse(index)
+                self.write(", ")
+                self.traverse(value.right)
+                self.write(f", {merge});")
+                return
+        if is_dict and self._dicts[self._dict_key(container)] is None and isinstance(value, ast.BinOp) \
+                and isinstance(value.left, ast.Subscript) and ast.unparse(value.left) == ast.unparse(target):
+            # d[k] = d[k] + v, or d[k] += v, raises where the key's missing rather than adding to null
+            self._checked_reads.add(id(value.left))
+        self.fill()
+        self._write_sequence(container, self._negative_index(index) is not None)
+        # Only dicts put. Indexes of unknown type, like xs[k] or out[idx[i]], are more likely list indexes
+        #  than anything, but a key that can't index a list is a dict's
+        if is_dict or self._get_python_type(container) == dict \
+                or self._get_python_type(container) != list and self._get_python_type(index) in (str, float, tuple):
+            self.write(".put(")
+            self.traverse(index)
+        else:
+            self.write(".set(")
+            self._write_index(container, index, False)
+        self.write(", ")
+        self.traverse(value)
+        self.write(");")
+
+    @staticmethod
+    def _is_zero(node):
+        return isinstance(node, ast.Constant) and not isinstance(node.value, bool) and node.value in (0, '')
+
+    @staticmethod
+    def _negative_index(node):
+        """How far from the end *node* counts, if it's a negative constant like -1"""
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            node = node.operand
+            return node.value if isinstance(node, ast.Constant) and type(node.value) is int and node.value > 0 else None
+        if isinstance(node, ast.Constant) and type(node.value) is int and node.value < 0:
+            return -node.value
+        return None
+
+    @staticmethod
+    def _is_name_chain(node):
+        """Whether *node* is a name or constant, or attributes of one, like self.items. No harm evaluating twice"""
+        while isinstance(node, ast.Attribute):
+            node = node.value
+        return isinstance(node, (ast.Name, ast.Constant))
+
+    def _write_sequence(self, sequence, needs_length):
+        """
+        Write *sequence*, about to be indexed. If the index *needs_length* too, like xs[-1], anything more than
+        a name is put in a variable first rather than evaluated twice
+        """
+        self.set_precedence(ast._Precedence.ATOM, sequence)
+        if not needs_length or self._is_name_chain(sequence):
+            self.traverse(sequence)
+            return
+        name = self._sequence_variables[id(sequence)] = self._unique_name('sequence')
+        with self.delimit(f"<{self._move_up_tag}>", f"</{self._move_up_tag}>"):
+            self.write(f"var {name} = ")
+            self.set_precedence(ast._Precedence.TEST, sequence)
+            self.traverse(sequence)
+            self.write(";")
+        self.write(name)
+
+    def _write_length(self, sequence, is_string):
+        """sequence.length() or .size(), of the variable _write_sequence put *sequence* in if it did"""
+        if id(sequence) in self._sequence_variables:
+            self.write(self._sequence_variables[id(sequence)])
+        else:
+            self.set_precedence(ast._Precedence.ATOM, sequence)
+            self.traverse(sequence)
+        self.write(f".{'length' if is_string else 'size'}()")
+
+    def _write_index(self, sequence, index, is_string):
+        """Write *index* into *sequence*, counting negative constants from the end like Python does"""
+        if (from_end := self._negative_index(index)) is not None:
+            self._write_length(sequence, is_string)
+            self.write(f" - {from_end}")
+            return
+        self.set_precedence(ast._Precedence.TEST, index)
+        self.traverse(index)
+
+    # Slices with steps, which are copies whatever the step, and ones whose bounds aren't constants.
+    #  Bounds left out are null, and the rest get clamped to the sequence like slice.indices does
+    _slices_class = """final class Slices {
+    static <T> java.util.ArrayList<T> of(java.util.List<T> list, Integer start, Integer stop, int step) {
+        int[] range = indices(list.size(), start, stop, step);
+        java.util.ArrayList<T> result = new java.util.ArrayList<>();
+        for (int i = range[0]; step > 0 ? i < range[1] : i > range[1]; i += step) {
+            result.add(list.get(i));
+        }
+        return result;
+    }
+
+    static String of(String string, Integer start, Integer stop, int step) {
+        int[] range = indices(string.length(), start, stop, step);
+        StringBuilder result = new StringBuilder();
+        for (int i = range[0]; step > 0 ? i < range[1] : i > range[1]; i += step) {
+            result.append(string.charAt(i));
+        }
+        return result.toString();
+    }
+
+    static <T> java.util.List<T> view(java.util.List<T> list, Integer start, Integer stop) {
+        int[] range = indices(list.size(), start, stop, 1);
+        return list.subList(range[0], Math.max(range[0], range[1]));
+    }
+
+    static String substring(String string, Integer start, Integer stop) {
+        int[] range = indices(string.length(), start, stop, 1);
+        return string.substring(range[0], Math.max(range[0], range[1]));
+    }
+
+    private static int[] indices(int length, Integer start, Integer stop, int step) {
+        if (step == 0) {
+            throw new IllegalArgumentException("slice step cannot be zero");
+        }
+        int lower = step < 0 ? -1 : 0;
+        int upper = step < 0 ? length - 1 : length;
+        return new int[]{start == null ? (step < 0 ? upper : lower) : clamp(start, length, lower, upper),
+                stop == null ? (step < 0 ? lower : upper) : clamp(stop, length, lower, upper)};
+    }
+
+    private static int clamp(int index, int length, int lower, int upper) {
+        return index < 0 ? Math.max(index + length, lower) : Math.min(index, upper);
+    }
+}"""
+
+    def _slice_helper(self, node):
+        """
+        Lower `xs[a:b]`. Lists get a subList view when the slice is only read where it's made (a copy of the
+        view otherwise, since Python slices are copies), and strings a substring. Steps, and bounds that aren't
+        constants, go through Slices.
+        """
+        sequence, bounds = node.value, node.slice
+        is_string = self._get_python_type(sequence) == str
+        is_view = id(node) in self._slice_views
+        if bounds.step is not None:
+            if is_string and bounds.lower is None and bounds.upper is None and self._negative_index(bounds.step) == 1:
+                # Special case: s[::-1]
+                self.write("new StringBuilder(")
+                self.traverse(sequence)
+                self.write(").reverse().toString()")
+                return
+            # Special case: Every step-th element, worked out like Python does
+            self._hoist(self._slices_class)
+            self.write("Slices.of(")
+            self.traverse(sequence)
+            for bound in (bounds.lower, bounds.upper, bounds.step):
+                self.write(", ")
+                if bound is None:
+                    self.write("null")
+                else:
+                    self.set_precedence(ast._Precedence.TEST, bound)
+                    self.traverse(bound)
+            self.write(")")
+            return
+        if not is_string and bounds.lower is None and bounds.upper is None:
+            # xs[:], which is never a view
+            self.write("new java.util.ArrayList<>(")
+            self.traverse(sequence)
+            self.write(")")
+            return
+        if not is_string and not is_view:
+            self.write("new java.util.ArrayList<>(")
+        if not all(bound is None or self._negative_index(bound) is not None
+                   or isinstance(bound, ast.Constant) and type(bound.value) is int
+                   for bound in (bounds.lower, bounds.upper)):
+            # xs[:n] and xs[-k:] can be past either end, which Python clamps and subList throws for
+            self._hoist(self._slices_class)
+            self.write("Slices.substring(" if is_string else "Slices.view(")
+            self.traverse(sequence)
+            for bound in (bounds.lower, bounds.upper):
+                self.write(", ")
+                if bound is None:
+                    self.write("null")
+                else:
+                    self.set_precedence(ast._Precedence.TEST, bound)
+                    self.traverse(bound)
+            self.write(")")
+        else:
+            # Up to the end needs the length too
+            self._write_sequence(sequence, bounds.upper is None and not is_string or any(
+                self._negative_index(bound) is not None for bound in (bounds.lower, bounds.upper)))
+            self.write(".substring(" if is_string else ".subList(")
+            if bounds.lower is None:
+                self.write("0")
+            else:
+                self._write_index(sequence, bounds.lower, is_string)
+            if bounds.upper is not None:
+                self.write(", ")
+                self._write_index(sequence, bounds.upper, is_string)
+            elif not is_string:
+                self.write(", ")
+                self._write_length(sequence, is_string)
+            self.write(")")
+        if not is_string and not is_view:
+            self.write(")")
+
+    # def visit_Starred(self, node):
+    #     self.write("*")
+    #     self.set_precedence(_Precedence.EXPR, node.value)
+    #     self.traverse(node.value)
+    #
+    # def visit_Ellipsis(self, node):
+    #     self.write("...")
+    #
+    # def visit_Slice(self, node):
+    #     if node.lower:
+    #         self.traverse(node.lower)
+    #     self.write(":")
+    #     if node.upper:
+    #         self.traverse(node.upper)
+    #     if node.step:
+    #         self.write(":")
+    #         self.traverse(node.step)
+    #
+    def visit_arg(self, node):
+        type_hint = None
+        if node.annotation:
+            type_hint = self._process_type_hint(node.annotation)
+        if type_hint:
+            self.write(type_hint)
+            self.scopes[self.current_scopes[-1]][node.arg] = self._java_to_python_types.get(type_hint, 'Object')
+        else:
+            # TODO: Figure out function return type
+            self.write('Object')
+            self.scopes[self.current_scopes[-1]][node.arg] = self._java_to_python_types.get('Object', 'Object')
+        self.write(' ')
+        self.write(node.arg)
+    #
+    def visit_arguments(self, node):
+        first = True
+        # normal arguments
         all_args = node.posonlyargs + node.args
         defaults = [None] * (len(all_args) - len(node.defaults)) + node.defaults
         for index, elements in enumerate(zip(all_args, defaults), 1):
@@ -1411,13 +7737,13 @@ class _JavaUnparser(ast._Unparser):
     #         self.write("=")
     #     self.traverse(node.value)
     #
-    # def visit_Lambda(self, node):
-    #     with self.require_parens(_Precedence.TEST, node):
-    #         self.write("lambda ")
-    #         self.traverse(node.args)
-    #         self.write(": ")
-    #         self.set_precedence(_Precedence.TEST, node.body)
-    #         self.traverse(node.body)
+    def visit_Lambda(self, node):
+        with self.require_parens(ast._Precedence.TEST, node):
+            parameters = [argument.arg for argument in node.args.args]
+            self.write(parameters[0] if len(parameters) == 1 else f"({', '.join(parameters)})")
+            self.write(" -> ")
+            self.set_precedence(ast._Precedence.TEST, node.body)
+            self.traverse(node.body)
     #
     # def visit_alias(self, node):
     #     self.write(node.name)
@@ -1431,17 +7757,940 @@ class _JavaUnparser(ast._Unparser):
     #         self.traverse(node.optional_vars)
 
 
+class RewriteRules:
+    """
+    How calls and attributes get lowered, looked up by the type of node and what it resolves to (see
+    _JavaUnparser._callee): (ast.Call, 'random.randint'), (ast.Call, 'print'), (ast.Call, '.format') for
+    that method of anything, or (ast.Attribute, 'math.pi').
+
+    A rule is a function of the translator and the node, which writes the node and returns True,
+    or returns False to leave it to the next rule for the same thing, and in the end to the usual
+    translation. A string is a rule that writes it in place of the callee (or the attribute).
+    Counts how many times each rule fires.
+    """
+
+    def __init__(self):
+        self._rules = {}
+        # {(node type name, callee, rule name): times it fired}
+        self.fired = {}
+        # The files loaded into it, for worker processes to load too
+        self.paths = []
+
+    def register(self, node_type, callee, rule=None, first=False):
+        """
+        Add *rule* after the ones already there for *callee*, or before them if it comes *first*.
+        Without a *rule*, works as a decorator
+        """
+        if rule is None:
+            return lambda function: self.register(node_type, callee, function, first) or function
+        rules = self._rules.setdefault((node_type, callee), [])
+        rules.insert(0 if first else len(rules), rule)
+
+    def load(self, path):
+        """
+        Register the rules in a JSON file of {"Call": {callee: replacement}, "Attribute": {...}}, or
+        a Python file with a register(rules) function that registers its own
+        """
+        self.paths.append(path)
+        if path.endswith('.json'):
+            with open(path, 'r') as f:
+                mappings = json.load(f)
+            for node_type, replacements in mappings.items():
+                for callee, replacement in replacements.items():
+                    self.register(getattr(ast, node_type), callee, replacement)
+            return
+        namespace = {'__file__': path, '__name__': os.path.splitext(os.path.basename(path))[0]}
+        with open(path, 'r') as f:
+            exec(compile(f.read(), path, 'exec'), namespace)
+        namespace['register'](self)
+
+    def __contains__(self, key):
+        """Whether there are any rules for the (node type, callee) *key*"""
+        return key in self._rules
+
+    def apply(self, unparser, node):
+        """Lower *node* by the first of its rules that takes it. Returns whether one did"""
+        callee = unparser._callee(node)
+        for rule in self._rules.get((type(node), callee), ()):
+            if isinstance(rule, str):
+                unparser.write(rule)
+                if isinstance(node, ast.Call):
+                    unparser._write_arguments(node)
+            elif not rule(unparser, node):
+                continue
+            key = type(node).__name__, callee, rule if isinstance(rule, str) else rule.__name__
+            self.fired[key] = self.fired.get(key, 0) + 1
+            return True
+        return False
+
+    def report(self):
+        """How often each rule fired, most often first"""
+        return '\n'.join(f"{count:>8}  {node_type} {callee} -> {rule}" for (node_type, callee, rule), count
+                         in sorted(self.fired.items(), key=lambda item: (-item[1], item[0])))
+
+
+RULES = RewriteRules()
+for _function in _JavaUnparser._random_functions:
+    RULES.register(ast.Call, f'random.{_function}', _JavaUnparser._random_helper)
+for _callee in ('int', 'float', '.split', 'map', 'list'):
+    RULES.register(ast.Call, _callee, _JavaUnparser._fast_input_helper)
+for _callee in ('collections.deque', 'heapq.heappush', 'heapq.heappop', 'heapq.heapify', 'bisect.bisect_left',
+                'bisect.bisect_right', 'bisect.bisect', 'bisect.insort', 'bisect.insort_left', 'bisect.insort_right'):
+    RULES.register(ast.Call, _callee, _JavaUnparser._stdlib_call_helper)
+for _method in _JavaUnparser._deque_methods:
+    RULES.register(ast.Call, f'.{_method}', _JavaUnparser._stdlib_call_helper)
+for _callee in ('set', 'dict', 'collections.defaultdict', 'collections.Counter', '.get', '.setdefault', '.append'):
+    RULES.register(ast.Call, _callee, _JavaUnparser._collection_call_helper)
+for _callee in ('len', 'list', 'min', 'max', 'sum', 'any', 'all', 'sorted', '.sort'):
+    RULES.register(ast.Call, _callee, _JavaUnparser._builtin_helper)
+RULES.register(ast.Call, 'input', _JavaUnparser._input_helper)
+RULES.register(ast.Call, 'print', _JavaUnparser._print_helper)
+RULES.register(ast.Call, '.format', _JavaUnparser._format_helper)
+for _function in ('run', 'gather', 'sleep', 'create_task'):
+    RULES.register(ast.Call, f'asyncio.{_function}', _JavaUnparser._asyncio_helper)
+for _callee in [*_JavaUnparser._concurrency_constructors, 'os.cpu_count', 'multiprocessing.cpu_count',
+                'concurrent.futures.as_completed', '.result', '.submit', '.apply_async', '.map', '.imap',
+                *sorted({f'.{method}' for _, method in _JavaUnparser._concurrency_methods})]:
+    RULES.register(ast.Call, _callee, _JavaUnparser._concurrency_call_helper)
+RULES.register(ast.Attribute, 'math.pi', 'Math.PI')
+RULES.register(ast.Attribute, 'math.e', 'Math.E')
+RULES.register(ast.Attribute, 'math.inf', 'Double.POSITIVE_INFINITY')
+RULES.register(ast.Attribute, 'sys.maxsize', 'Long.MAX_VALUE')
+# NumPy's functions of a single number (its arrays are _array_kind's)
+for _function, _java in _JavaUnparser._numpy_math_functions.items():
+    RULES.register(ast.Call, f'numpy.{_function}', _java)
+RULES.register(ast.Attribute, 'numpy.pi', 'Math.PI')
+RULES.register(ast.Attribute, 'numpy.e', 'Math.E')
+RULES.register(ast.Attribute, 'numpy.inf', 'Double.POSITIVE_INFINITY')
+
+
+class SymbolIndex:
+    """
+    What every module of a package defines: its classes, and the Java signatures of its functions
+    and methods, with the return types translating the module works out for the unhinted ones.
+    Saved next to the package and brought up to date when loaded, so only the modules that changed
+    since (and the ones importing something whose signature changed with them) get looked at again.
+
+    Modules are translated after the ones they import, so they see their signatures. Each import
+    cycle goes through together, and cycles that don't depend on each other go through side by side
+    in worker processes.
+    """
+
+    FILE_NAME = '.java_symbols.json'
+    VERSION = 1
+    # How many times an import cycle gets translated in one update if its signatures never settle
+    _max_passes = 3
+
+    def __init__(self, root, path=None):
+        self.root = os.path.abspath(root)
+        # A package's modules are named from the directory it's in, a directory of packages' from itself
+        self.base = os.path.dirname(self.root) if os.path.isfile(os.path.join(self.root, '__init__.py')) \
+            else self.root
+        self.path = path or os.path.join(self.root, self.FILE_NAME)
+        self.modules = {}
+
+    @classmethod
+    def load(cls, root, path=None, jobs=None, output=None, options=None):
+        """
+        The index of the package at *root*, updated for whatever changed since it was saved, with up to
+        *jobs* worker processes. With an *output* directory, the whole package gets translated into it,
+        with the unparser *options* (buffered_output, optimize, ...)
+        """
+        index = cls(root, path)
+        try:
+            with open(index.path, 'r') as f:
+                saved = json.load(f)
+            if saved.get('version') == cls.VERSION:
+                index.modules = saved['modules']
+        except (OSError, ValueError, KeyError):
+            pass
+        if index.update(jobs, output, options):
+            index.save()
+        return index
+
+    def save(self):
+        # Written aside and then moved over, so a translation running alongside never reads half of it
+        temporary_path = f"{self.path}.{uuid4().hex}"
+        with open(temporary_path, 'w') as f:
+            json.dump({'version': self.VERSION, 'modules': self.modules}, f, indent=1, sort_keys=True)
+        os.replace(temporary_path, self.path)
+
+    def module_name(self, path):
+        """The dotted name of the module at *path*, or None if it isn't in the package"""
+        relative_path = os.path.relpath(os.path.abspath(path), self.base)
+        if relative_path.startswith(os.pardir) or not relative_path.endswith('.py'):
+            return None
+        parts = relative_path[:-len('.py')].split(os.sep)
+        if parts[-1] == '__init__':
+            parts.pop()
+        return '.'.join(parts) or None
+
+    def package_of(self, path):
+        """The package the module at *path* resolves relative imports from, or None if it isn't in the package"""
+        name = self.module_name(path)
+        if name is None or os.path.basename(path) == '__init__.py':
+            return name
+        return name.rpartition('.')[0] or None
+
+    def _module_files(self):
+        files = {}
+        for directory, directories, file_names in os.walk(self.root):
+            directories[:] = sorted(name for name in directories if not name.startswith('.') and name != '__pycache__')
+            for file_name in sorted(file_names):
+                if file_name.endswith('.py') and (name := self.module_name(os.path.join(directory, file_name))):
+                    files[name] = os.path.join(directory, file_name)
+        return files
+
+    @staticmethod
+    def _stamp(path):
+        status = os.stat(path)
+        return [status.st_mtime_ns, status.st_size]
+
+    def update(self, jobs=None, output=None, options=None):
+        """
+        Index the modules that are new or changed, and forget the ones that are gone. With an *output*
+        directory, every module gets translated into it (with the unparser *options*). Returns the names
+        of the modules indexed or forgotten
+        """
+        files = self._module_files()
+        removed = {name for name in self.modules if name not in files}
+        for name in removed:
+            del self.modules[name]
+        stale = {name for name, path in files.items()
+                 if output or name not in self.modules or self.modules[name]['stamp'] != self._stamp(path)}
+        imports = {name: self._read_imports(name, path) if name in stale else self.modules[name]['names']
+                   for name, path in files.items()}
+        # Whatever came from a module that's gone now doesn't have a type anymore
+        stale |= {name for name in files if any(self._module_of(imported, removed) for imported in imports[name].values())}
+        graph = {name: {dependency for imported in imports[name].values()
+                        if (dependency := self._module_of(imported, files)) and dependency != name}
+                 for name in files}
+
+        components = self._components(graph)
+        component_of = {name: number for number, component in enumerate(components) for name in component}
+        waiting_on = {number: {component_of[dependency] for name in component for dependency in graph[name]} - {number}
+                      for number, component in enumerate(components)}
+        dependents = {number: set() for number in waiting_on}
+        for number, dependencies in waiting_on.items():
+            for dependency in dependencies:
+                dependents[dependency].add(number)
+        ready = [number for number, dependencies in waiting_on.items() if not dependencies]
+        # The modules whose signatures came out different, which the ones importing them have to see
+        changed = set()
+        translated = set()
+
+        def finish(number, results):
+            for name, (module, succeeded) in results.items():
+                if name not in self.modules or self._signatures(self.modules[name]) != self._signatures(module):
+                    changed.add(name)
+                self.modules[name] = module
+                translated.add(name)
+                if output and not succeeded:
+                    print(f'WARNING, COULD NOT TRANSLATE {name}', file=sys.stderr)
+            for dependent in dependents[number]:
+                waiting_on[dependent].discard(number)
+                if not waiting_on[dependent]:
+                    ready.append(dependent)
+
+        def arguments(component):
+            # Everything the component can see through its imports, which is all the workers share
+            visible = set(component)
+            todo = list(component)
+            while todo:
+                for dependency in graph[todo.pop()] - visible:
+                    visible.add(dependency)
+                    todo.append(dependency)
+            return (self.root, self.path, [(name, files[name]) for name in component],
+                    {name: self.modules[name] for name in visible if name in self.modules}, output, options)
+
+        # Workers that don't start as a fork of this process have only the built-in rules, until they load the rest
+        with concurrent.futures.ProcessPoolExecutor(jobs, initializer=_load_rules, initargs=(RULES.paths,)) \
+                if jobs != 1 and len(stale) > 1 else _no_pool() as pool:
+            running = {}
+            while ready or running:
+                while ready:
+                    number = ready.pop()
+                    component = components[number]
+                    if stale.isdisjoint(component) \
+                            and changed.isdisjoint(dependency for name in component for dependency in graph[name]):
+                        finish(number, {})
+                    elif pool is None:
+                        finish(number, _translate_component(*arguments(component)))
+                    else:
+                        running[pool.submit(_translate_component, *arguments(component))] = number
+                if running:
+                    done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        finish(running.pop(future), future.result())
+        return removed | translated
+
+    def _read_imports(self, name, path):
+        with open(path, 'r') as f:
+            try:
+                tree = parse_python(f.read())
+            except SyntaxError:
+                return {}
+        return _JavaUnparser._resolve_imports(tree, self._package(name, path))
+
+    @staticmethod
+    def _package(name, path):
+        return name if os.path.basename(path) == '__init__.py' else name.rpartition('.')[0] or None
+
+    @staticmethod
+    def _components(graph):
+        """
+        The strongly connected components of *graph* (Tarjan's), each one coming after
+        all of the ones it has edges to
+        """
+        indexes = {}
+        lowlinks = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root in sorted(graph):
+            if root in indexes:
+                continue
+            indexes[root] = lowlinks[root] = len(indexes)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(sorted(graph[root])))]
+            while work:
+                node, successors = work[-1]
+                for successor in successors:
+                    if successor not in indexes:
+                        indexes[successor] = lowlinks[successor] = len(indexes)
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(sorted(graph[successor]))))
+                        break
+                    if successor in on_stack:
+                        lowlinks[node] = min(lowlinks[node], indexes[successor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlinks[parent] = min(lowlinks[parent], lowlinks[node])
+                    if lowlinks[node] == indexes[node]:
+                        component = []
+                        while not component or component[-1] != node:
+                            component.append(stack.pop())
+                            on_stack.discard(component[-1])
+                        components.append(sorted(component))
+        return components
+
+    @staticmethod
+    def _signatures(module):
+        return module['classes'], module['functions']
+
+    def _translate_module(self, name, path, options=None):
+        """
+        The index entry for the module at *path*, its translation (None if it didn't translate), and
+        what translating it had to say about the parts it couldn't handle
+        """
+        with open(path, 'r') as f:
+            source = f.read()
+        module = {'stamp': self._stamp(path), 'names': {}, 'classes': {}, 'functions': {}}
+        try:
+            tree = parse_python(source)
+        except SyntaxError as error:
+            return module, None, f"{error!r}\n"
+        package = self._package(name, path)
+        module['names'] = _JavaUnparser._resolve_imports(tree, package)
+        # Read off the tree first, since translating it changes some of it
+        definitions = []
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                definitions.append((None, node))
+            elif isinstance(node, ast.ClassDef):
+                module['classes'][node.name] = {'methods': {}}
+                definitions += [(node.name, child) for child in node.body
+                                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        # Whatever translation has to say about the parts it can't handle goes with the module, not out here
+        messages = io.StringIO()
+        unparser = _JavaUnparser(symbol_index=self, package=package, source=source, messages=messages,
+                                 **(options or {}))
+        signatures = [(class_name, function.name, self._parameters(unparser, class_name, function),
+                       function.returns and unparser._process_type_hint(function.returns))
+                      for class_name, function in definitions]
+        try:
+            java_source = unparser.visit(tree)
+            return_types = unparser.inferred_return_types()
+        except Exception as error:
+            # Then all there is to go on are the hints
+            messages.write(f"{error!r}\n")
+            java_source = None
+            return_types = {}
+        for class_name, function_name, parameters, type_hint in signatures:
+            signature = {'parameters': parameters,
+                         'returns': type_hint or return_types.get((class_name, function_name), 'Object')}
+            if class_name is None:
+                module['functions'][function_name] = signature
+            else:
+                module['classes'][class_name]['methods'][function_name] = signature
+        return module, java_source, messages.getvalue()
+
+    @staticmethod
+    def _parameters(unparser, class_name, function):
+        arguments = function.args.posonlyargs + function.args.args
+        static = class_name is None or any(isinstance(deco, ast.Name) and deco.id == 'staticmethod'
+                                           for deco in function.decorator_list)
+        if not static:
+            arguments = arguments[1:]
+        return [[argument.arg, argument.annotation and unparser._process_type_hint(argument.annotation) or 'Object']
+                for argument in arguments]
+
+    @staticmethod
+    def _module_of(qualified_name, modules):
+        """The longest prefix of *qualified_name* that names one of *modules*"""
+        parts = qualified_name.split('.')
+        for end in range(len(parts), 0, -1):
+            if '.'.join(parts[:end]) in modules:
+                return '.'.join(parts[:end])
+        return None
+
+    def lookup(self, qualified_name):
+        """
+        ('class', {'methods': ...}) or ('function', {'parameters': ..., 'returns': ...}) for the class
+        or function *qualified_name* names, following the imports that bring it into another module
+        """
+        for _ in range(len(self.modules) + 1):
+            module_name = self._module_of(qualified_name, self.modules)
+            if module_name is None:
+                return None
+            module = self.modules[module_name]
+            rest = qualified_name[len(module_name) + 1:]
+            if rest in module['functions']:
+                return 'function', module['functions'][rest]
+            if rest in module['classes']:
+                return 'class', module['classes'][rest]
+            if '.' in rest or rest not in module['names']:
+                return None
+            # Something the module imported from elsewhere itself
+            qualified_name = module['names'][rest]
+        return None
+
+
+@contextmanager
+def _no_pool():
+    yield None
+
+
+def _load_rules(paths):
+    """Load the rule files at *paths* into RULES, but not the ones it has already (as a fork would)"""
+    for path in paths:
+        if path not in RULES.paths:
+            RULES.load(path)
+
+
+def _translate_component(root, path, members, modules, output, options=None):
+    """
+    Index the (name, path) *members* of one import cycle, knowing the index entries *modules*, and with
+    an *output* directory translate them into it (with the unparser *options*), reporting what didn't
+    translate on stderr. {name: (index entry, whether it translated)}
+    """
+    index = SymbolIndex(root, path)
+    index.modules = dict(modules)
+    results = {}
+    # One module on its own knows all it can the first time around, a cycle has to go until it settles
+    for _ in range(index._max_passes if len(members) > 1 else 1):
+        settled = True
+        for name, file_path in members:
+            module, java_source, messages = index._translate_module(name, file_path, options)
+            if name not in index.modules or index._signatures(index.modules[name]) != index._signatures(module):
+                settled = False
+            index.modules[name] = module
+            results[name] = module, java_source, messages
+        if settled:
+            break
+    if output:
+        for name, (module, java_source, messages) in results.items():
+            for message in messages.splitlines():
+                print(f"{name}: {message}", file=sys.stderr)
+            # A module with nothing in it (like most __init__.py) doesn't get a file
+            if java_source is not None and java_source.strip():
+                java_path = os.path.join(output, *name.split('.')) + '.java'
+                os.makedirs(os.path.dirname(java_path), exist_ok=True)
+                with open(java_path, 'w') as f:
+                    f.write(java_source + '\n')
+    return {name: (module, java_source is not None) for name, (module, java_source, _) in results.items()}
+
+
+class SourceMap:
+    """
+    Which line of a Python file each line of its translation came from, and which Python function
+    that line is in, so a profile of the Java can be read in terms of the Python (see
+    tools/attribute_profile.py). Saved as JSON, or as the SMAP (JSR-45) that a class file's
+    SourceDebugExtension holds.
+    """
+
+    VERSION = 1
+
+    def __init__(self, python_file, lines, functions=(), classes=()):
+        self.python_file = python_file
+        # The Python line of each Java line (or None), Java line 1 first
+        self.lines = list(lines)
+        # (qualified name, first line, last line) of every function and class, outermost first
+        self.functions = [tuple(function) for function in functions]
+        # The Java classes the translation declares, for telling which map a profiled frame goes with
+        self.classes = list(classes)
+
+    @staticmethod
+    def functions_of(tree):
+        """The (qualified name, first line, last line) of every function and class in *tree*"""
+        functions = []
+        stack = [('', tree)]
+        while stack:
+            prefix, node = stack.pop()
+            for child in reversed(list(ast.iter_child_nodes(node))):
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    functions.append((prefix + child.name, child.lineno, getattr(child, 'end_lineno', child.lineno)))
+                    stack.append((f"{prefix}{child.name}.", child))
+                else:
+                    stack.append((prefix, child))
+        return sorted(functions, key=lambda function: (function[1], -function[2]))
+
+    @staticmethod
+    def classes_of(java_source):
+        return re.findall(r'\b(?:class|interface|enum|record)\s+(\w+)', java_source)
+
+    def python_line(self, java_line):
+        """The Python line Java line *java_line* (counting from 1) came from, or None"""
+        if 1 <= java_line <= len(self.lines):
+            return self.lines[java_line - 1]
+        return None
+
+    def function_at(self, python_line):
+        """The qualified name of the innermost function (or class) *python_line* is in, or '<module>'"""
+        name = '<module>'
+        for qualified_name, first_line, last_line in self.functions:
+            if first_line <= python_line <= last_line:
+                name = qualified_name
+        return name
+
+    def save(self, path):
+        if path.endswith('.smap'):
+            with open(path, 'w') as f:
+                f.write(self.to_smap())
+            return
+        with open(path, 'w') as f:
+            json.dump({'version': self.VERSION, 'python_file': self.python_file, 'classes': self.classes,
+                       'functions': self.functions, 'lines': self.lines}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"{path} is not a version {cls.VERSION} source map")
+        return cls(data['python_file'], data['lines'], data['functions'], data['classes'])
+
+    def to_smap(self, java_file=None):
+        """The map in JSR-45 form, one line section entry per run of Java lines from the same Python line"""
+        python_name = os.path.basename(self.python_file)
+        # A public class has to be in a file of its own name
+        java_file = java_file or (self.classes[0] if self.classes else os.path.splitext(python_name)[0]) + '.java'
+        entries = []
+        java_line = 1
+        while java_line <= len(self.lines):
+            python_line = self.lines[java_line - 1]
+            run = 1
+            while java_line + run <= len(self.lines) and self.lines[java_line + run - 1] == python_line:
+                run += 1
+            if python_line is not None:
+                entries.append(f"{python_line}#1:{java_line}" if run == 1 else
+                               f"{python_line}#1,1:{java_line},{run}")
+            java_line += run
+        return '\n'.join(['SMAP', java_file, 'Python', '*S Python', '*F', f"+ 1 {python_name}", self.python_file,
+                          '*L', *entries, '*E']) + '\n'
+
+
+class BenchmarkHarness:
+    """
+    A JMH benchmark class for the functions and methods of a Python file that there are example
+    arguments for, in doctests (`>>> fib(20)`, `>>> Solution().findItinerary([["JFK", "SFO"]])`) or in
+    an argument file of {"fib": [[20], [30]], "Solution.findItinerary": [[...]], "Human.__init__": [["Bob", 3]]}.
+    Each example becomes a @Benchmark, with its arguments as fields of the @State, built once per trial.
+    Each benchmark's comment has the timeit command that times the same call in Python.
+
+    Only arguments Java can be given as literals make it: numbers, booleans, strings, and lists, tuples,
+    sets and dicts of those. A parameter's type comes from its hint when that's a primitive or a String,
+    and from its example values otherwise. Functions outside of a class are called on a class named
+    after the module, for them to be wrapped in.
+    """
+
+    _hinted_types = {'int', 'long', 'double', 'boolean', 'String'}
+    _boxed_types = {'int': 'Integer', 'long': 'Long', 'double': 'Double', 'boolean': 'Boolean'}
+
+    def __init__(self, python_file, tree, arguments=None):
+        self.python_file = python_file
+        self.module = os.path.splitext(os.path.basename(python_file))[0]
+        self.class_name = ''.join(part[:1].upper() + part[1:] for part in self.module.split('_') if part) + 'Benchmark'
+        # Read off the tree before it gets translated, which changes some of it
+        unparser = _JavaUnparser()
+        # {(class name or None, function name): (Java parameters [[name, type]], static)}
+        self.functions = {}
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                definitions = [(None, node)]
+            elif isinstance(node, ast.ClassDef):
+                definitions = [(node.name, child) for child in node.body
+                               if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            else:
+                continue
+            for class_name, function in definitions:
+                static = class_name is None or any(isinstance(deco, ast.Name) and deco.id == 'staticmethod'
+                                                   for deco in function.decorator_list)
+                self.functions[class_name, function.name] = \
+                    SymbolIndex._parameters(unparser, class_name, function), static
+        # [(class name or None, function name, constructor arguments or None, arguments)]
+        self.examples = self._doctest_examples(tree)
+        for key, calls in (arguments or {}).items():
+            class_name, _, function_name = key.rpartition('.')
+            for call in calls:
+                self.examples.append((class_name or None, function_name, None, list(call)))
+        constructors = {class_name: arguments for class_name, function_name, _, arguments in self.examples
+                        if function_name == '__init__'}
+        self.examples = [(class_name, function_name, constructors.get(class_name, []) if arguments is None
+                          else arguments, call) for class_name, function_name, arguments, call in self.examples
+                         if function_name != '__init__' and (class_name, function_name) in self.functions]
+
+    def _doctest_examples(self, tree):
+        """The calls the doctests of the module, its classes and its functions make with literal arguments"""
+        examples = []
+        classes = {class_name for class_name, _ in self.functions if class_name}
+        for node in [tree] + [node for node in ast.walk(tree)
+                              if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]:
+            docstring = ast.get_docstring(node)
+            if not docstring:
+                continue
+            # {name: (class name, constructor arguments)} for `>>> s = Solution()`
+            instances = {}
+            for example in doctest.DocTestParser().get_examples(docstring):
+                try:
+                    statement, = ast.parse(example.source).body
+                except (SyntaxError, ValueError):
+                    continue
+                if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+                        and isinstance(statement.targets[0], ast.Name) and isinstance(statement.value, ast.Call) \
+                        and isinstance(statement.value.func, ast.Name) and statement.value.func.id in classes:
+                    arguments = self._literal_arguments(statement.value, statement.value.func.id, '__init__')
+                    if arguments is not None:
+                        instances[statement.targets[0].id] = statement.value.func.id, arguments
+                    continue
+                if not isinstance(statement, ast.Expr) or not isinstance(statement.value, ast.Call):
+                    continue
+                call = statement.value
+                if isinstance(call.func, ast.Name):
+                    class_name, constructor_arguments = None, None
+                elif not isinstance(call.func, ast.Attribute):
+                    continue
+                elif isinstance(call.func.value, ast.Name) and call.func.value.id in instances:
+                    class_name, constructor_arguments = instances[call.func.value.id]
+                elif isinstance(call.func.value, ast.Name) and call.func.value.id in classes:
+                    # A static method
+                    class_name, constructor_arguments = call.func.value.id, None
+                elif isinstance(call.func.value, ast.Call) and isinstance(call.func.value.func, ast.Name) \
+                        and call.func.value.func.id in classes:
+                    class_name = call.func.value.func.id
+                    constructor_arguments = self._literal_arguments(call.func.value, class_name, '__init__')
+                    if constructor_arguments is None:
+                        continue
+                else:
+                    continue
+                function_name = call.func.id if isinstance(call.func, ast.Name) else call.func.attr
+                arguments = self._literal_arguments(call, class_name, function_name)
+                if arguments is not None:
+                    examples.append((class_name, function_name, constructor_arguments, arguments))
+        return examples
+
+    def _literal_arguments(self, call, class_name, function_name):
+        """The values of the arguments of *call*, in the order of the parameters, or None if they aren't all literals"""
+        parameters, _ = self.functions.get((class_name, function_name), ([], True))
+        try:
+            arguments = [ast.literal_eval(argument) for argument in call.args]
+            keywords = {keyword.arg: ast.literal_eval(keyword.value) for keyword in call.keywords}
+        except ValueError:
+            return None
+        for name, _ in parameters[len(arguments):]:
+            if name not in keywords:
+                break
+            arguments.append(keywords.pop(name))
+        return None if keywords else arguments
+
+    @classmethod
+    def _java_type(cls, value, boxed=False):
+        """The Java type to give *value* as a literal, or None if it can't be"""
+        if isinstance(value, bool):
+            java_type = 'boolean'
+        elif isinstance(value, int):
+            java_type = 'int' if -2 ** 31 <= value < 2 ** 31 else 'long' if -2 ** 63 <= value < 2 ** 63 else None
+        elif isinstance(value, float):
+            java_type = 'double'
+        elif isinstance(value, str):
+            java_type = 'String'
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            element_type = cls._element_type(value)
+            java_type = element_type and \
+                f"java.util.{'Set' if isinstance(value, (set, frozenset)) else 'List'}<{element_type}>"
+        elif isinstance(value, dict):
+            key_type, value_type = cls._element_type(value.keys()), cls._element_type(value.values())
+            java_type = key_type and value_type and f"java.util.Map<{key_type}, {value_type}>"
+        else:
+            java_type = None
+        return cls._boxed_types.get(java_type, java_type) if boxed else java_type
+
+    @classmethod
+    def _element_type(cls, values):
+        java_types = {cls._java_type(value, boxed=True) for value in values}
+        if None in java_types:
+            return None
+        if not java_types:
+            return 'Object'
+        if len(java_types) == 1:
+            return java_types.pop()
+        if java_types == {'Integer', 'Long'}:
+            return 'Long'
+        if java_types <= {'Integer', 'Long', 'Double'}:
+            return 'Double'
+        return 'Object'
+
+    @staticmethod
+    def _type_arguments(java_type):
+        """['K', 'V'] for 'java.util.Map<K, V>'"""
+        arguments, depth, start = [], 0, java_type.index('<') + 1
+        for i, character in enumerate(java_type[start:-1], start):
+            depth += {'<': 1, '>': -1}.get(character, 0)
+            if character == ',' and depth == 0:
+                arguments.append(java_type[start:i].strip())
+                start = i + 1
+        return arguments + [java_type[start:-1].strip()]
+
+    @classmethod
+    def _literal(cls, value, java_type):
+        """*value* as Java source for a *java_type*"""
+        if java_type == 'Object':
+            java_type = cls._java_type(value, boxed=True)
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, (int, float)):
+            if java_type in ('double', 'Double'):
+                value = float(value)
+                if math.isinf(value):
+                    return f"Double.{'POSITIVE' if value > 0 else 'NEGATIVE'}_INFINITY"
+                return 'Double.NaN' if math.isnan(value) else repr(value)
+            return f"{value}L" if java_type in ('long', 'Long') else str(value)
+        if isinstance(value, str):
+            return json.dumps(value)
+        if isinstance(value, dict):
+            key_type, value_type = cls._type_arguments(java_type)
+            entries = ', '.join(f"java.util.Map.entry({cls._literal(key, key_type)}, {cls._literal(item, value_type)})"
+                                for key, item in value.items())
+            return f"new java.util.HashMap<>(java.util.Map.ofEntries({entries}))"
+        element_type, = cls._type_arguments(java_type)
+        collection, factory = ('HashSet', 'Set') if java_type.startswith('java.util.Set') else ('ArrayList', 'List')
+        elements = ', '.join(cls._literal(element, element_type) for element in value)
+        return f"new java.util.{collection}<>(java.util.{factory}.of({elements}))"
+
+    def _fields(self, prefix, parameters, arguments):
+        """[(Java type, field name, literal)] for passing *arguments*, or None if they can't all be"""
+        if len(arguments) != len(parameters):
+            return None
+        fields = []
+        for (name, hinted_type), value in zip(parameters, arguments):
+            java_type = self._java_type(value)
+            if hinted_type in self._hinted_types:
+                # The literal has to fit what the hint says
+                if java_type != hinted_type and not (java_type == 'int' and hinted_type in ('long', 'double')):
+                    return None
+                java_type = hinted_type
+            if java_type is None:
+                return None
+            fields.append((java_type, f"{prefix}_{name}", self._literal(value, java_type)))
+        return fields
+
+    @staticmethod
+    def _shell_quote(text):
+        # repr() goes for single quotes, so double ones read better when they'll do
+        return shlex.quote(text) if re.search(r'["$`\\!]', text) else f'"{text}"'
+
+    def source(self, return_types=None):
+        """
+        The benchmark class, or None if no example made it. *return_types* are the Java return types
+        translating the file worked out, {(class name or None, function name): type}
+        """
+        return_types = return_types or {}
+        examples = []
+        for class_name, function_name, constructor_arguments, arguments in self.examples:
+            parameters, static = self.functions[class_name, function_name]
+            if self._fields('', parameters, arguments) is None or not static and self._fields(
+                    '', self.functions.get((class_name, '__init__'), ([], True))[0], constructor_arguments) is None:
+                print(f"Can't benchmark {function_name} with {arguments!r}"
+                      f"{'' if static else f' on a {class_name} of {constructor_arguments!r}'}: "
+                      f"not as literals of Java types that fit its parameters", file=sys.stderr)
+                continue
+            examples.append((class_name, function_name, constructor_arguments, arguments))
+        functions = [(class_name, function_name) for class_name, function_name, _, _ in examples]
+        fields, benchmarks = [], []
+        for i, (class_name, function_name, constructor_arguments, arguments) in enumerate(examples):
+            parameters, static = self.functions[class_name, function_name]
+            # Named after the function, and after its class too if another class has one by that name
+            name = function_name
+            if any(other == function_name and other_class != class_name for other_class, other in functions):
+                name = f"{class_name or self.module}_{function_name}"
+            if functions.count((class_name, function_name)) > 1:
+                name += f"_{functions[:i + 1].count((class_name, function_name))}"
+            call_fields = self._fields(name, parameters, arguments)
+            if static:
+                receiver, python_receiver = class_name or self.module, class_name
+                constructor_fields = []
+            else:
+                constructor_parameters = self.functions.get((class_name, '__init__'), ([], True))[0]
+                constructor_fields = self._fields(f"{name}_new", constructor_parameters, constructor_arguments)
+                receiver = f"new {class_name}({', '.join(field for _, field, _ in constructor_fields)})"
+                python_receiver = f"{class_name}(*{name}_new_args)" if constructor_arguments else f"{class_name}()"
+            fields += constructor_fields + call_fields
+            python_call = f"{python_receiver}.{function_name}" if python_receiver else function_name
+            # Not named after the function alone, which the import brings in under that name
+            setup = f"from {self.module} import {class_name or function_name}; {name}_args = {arguments!r}"
+            if not static and constructor_arguments:
+                setup += f"; {name}_new_args = {constructor_arguments!r}"
+            timeit = f"python -m timeit -s {self._shell_quote(setup)} " \
+                     f"{self._shell_quote(f'{python_call}(*{name}_args)')}"
+            # Not ending the comment early
+            timeit = timeit.replace('*/', '*\\/')
+            call = f"{receiver}.{function_name}({', '.join(field for _, field, _ in call_fields)})"
+            return_type = return_types.get((class_name, function_name), 'Object')
+            if _JavaUnparser._type_replacmeent_tag_suffix in return_type:
+                return_type = 'Object'
+            benchmarks += ['',
+                           f"    /** In Python: {timeit} */",
+                           '    @Benchmark',
+                           f"    public {return_type} {name}() {{",
+                           f"        {'' if return_type == 'void' else 'return '}{call};",
+                           '    }']
+        if not benchmarks:
+            return None
+        return '\n'.join([
+            'import java.util.concurrent.TimeUnit;',
+            '',
+            'import org.openjdk.jmh.annotations.*;',
+            '',
+            '/**',
+            f" * JMH benchmarks for the examples of {os.path.basename(self.python_file)}, generated by main.py --jmh.",
+            ' * The arguments are built once per trial, like timeit -s does for the Python commands in the comments,',
+            ' * so a function that changes its arguments gets them changed on later calls on both sides.',
+            ' */',
+            '@BenchmarkMode(Mode.AverageTime)',
+            '@OutputTimeUnit(TimeUnit.MICROSECONDS)',
+            '@Warmup(iterations = 5, time = 1)',
+            '@Measurement(iterations = 5, time = 1)',
+            '@Fork(1)',
+            '@State(Scope.Thread)',
+            f"public class {self.class_name} {{",
+            *[f"    {java_type} {field};" for java_type, field, _ in fields],
+            '',
+            '    @Setup(Level.Trial)',
+            '    public void setUp() {',
+            *[f"        {field} = {literal};" for _, field, literal in fields],
+            '    }',
+            *benchmarks,
+            '}',
+        ]) + '\n'
+
+    def save(self, directory, return_types=None):
+        """Write the benchmark class into *directory*. Returns its path, or None if there was nothing to write"""
+        source = self.source(return_types)
+        if source is None:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.class_name}.java")
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+
 def main():
-    with open(EXAMPLE_FILE, 'r') as f:
-        tree = ast.parse(f.read())
-    result = java_unparse(tree)
+    parser = argparse.ArgumentParser(description='Translate a Python file to Java')
+    parser.add_argument('file', nargs='?', default=EXAMPLE_FILE)
+    parser.add_argument('--buffered-output', action='store_true', default=BUFFERED_OUTPUT,
+                        help='print through one buffered writer, flushed on input() and at exit')
+    parser.add_argument('--fast-input', action='store_true', default=FAST_INPUT,
+                        help='read input() through a byte-buffer tokenizer instead of java.util.Scanner')
+    parser.add_argument('--optimize', action=argparse.BooleanOptionalAction, default=OPTIMIZE,
+                        help='fold constants and drop dead branches and unused variables before translating')
+    parser.add_argument('--instrument', action='store_true', default=INSTRUMENT,
+                        help='time every function and print its calls, total and max time to stderr at exit')
+    parser.add_argument('--async-mode', choices=('futures', 'virtual-threads'), default=ASYNC_MODE,
+                        help='run async functions as CompletableFutures on virtual threads, which await '
+                             'blocks, or as plain blocking code (Java 21)')
+    parser.add_argument('--parallel-loops', action='store_true', default=PARALLEL_LOOPS,
+                        help='run every loop over a range with independent iterations in parallel, '
+                             'not just the ones marked with a `# parallel` comment')
+    parser.add_argument('--jmh', metavar='DIR',
+                        help='write a JMH benchmark class for the functions with example arguments into DIR '
+                             '(see BenchmarkHarness)')
+    parser.add_argument('--benchmark-args', metavar='PATH',
+                        help='example arguments for --jmh besides the doctests, a .json file of '
+                             '{"function" or "Class.method": [[argument, ...], ...]}')
+    parser.add_argument('--package', metavar='ROOT',
+                        help='index the package at ROOT, or bring its saved index up to date, '
+                             'and take the types of what the file imports from it')
+    parser.add_argument('--index-file', metavar='PATH',
+                        help=f'where the package index is kept (default: ROOT/{SymbolIndex.FILE_NAME})')
+    parser.add_argument('--build', metavar='OUT',
+                        help='translate every module of the --package into OUT instead of translating the one file')
+    parser.add_argument('--jobs', type=int, metavar='N',
+                        help='translate up to N modules of the package at once (default: one per CPU)')
+    parser.add_argument('--rules', action='append', default=[], metavar='PATH',
+                        help='add the call and attribute mappings in PATH, a .json file or a .py file with '
+                             'a register(rules) function (see RewriteRules)')
+    parser.add_argument('--rule-stats', action='store_true',
+                        help='report how often each rule fired to stderr')
+    parser.add_argument('--source-map', metavar='PATH',
+                        help='write which Python line each Java line came from to PATH, as JSON, '
+                             'or as a JSR-45 SMAP if PATH ends in .smap (see SourceMap)')
+    args = parser.parse_args()
+    for path in args.rules:
+        RULES.load(path)
+    translation_options = dict(buffered_output=args.buffered_output, fast_input=args.fast_input,
+                               optimize=args.optimize, instrument=args.instrument, async_mode=args.async_mode,
+                               parallel_loops=args.parallel_loops)
+    if args.build:
+        if not args.package:
+            parser.error('--build needs a --package to build')
+        SymbolIndex.load(args.package, args.index_file, args.jobs, args.build, translation_options)
+        return
+    with open(args.file, 'r') as f:
+        source = f.read()
+    tree = parse_python(source)
+    options = {}
+    if args.package:
+        symbol_index = SymbolIndex.load(args.package, args.index_file)
+        options.update(symbol_index=symbol_index, package=symbol_index.package_of(args.file))
+    # Before translating, which leaves the tree changed when it doesn't optimize a copy of it
+    functions = SourceMap.functions_of(tree) if args.source_map else ()
+    harness = None
+    if args.jmh:
+        benchmark_arguments = None
+        if args.benchmark_args:
+            with open(args.benchmark_args, 'r') as f:
+                benchmark_arguments = json.load(f)
+        harness = BenchmarkHarness(args.file, tree, benchmark_arguments)
+    unparser = _JavaUnparser(source=source, **translation_options, **options)
+    result = unparser.visit(tree)
+    if args.source_map:
+        SourceMap(args.file, unparser.line_map, functions, SourceMap.classes_of(result)).save(args.source_map)
+    if harness and not harness.save(args.jmh, unparser.inferred_return_types()):
+        print(f"No examples to benchmark in {args.file}", file=sys.stderr)
     if DEBUG:
         print('====== END DEBUG ======')
     print(result)
+    if args.rule_stats:
+        print(RULES.report(), file=sys.stderr)
 
 
-def java_unparse(ast_obj):
-    unparser = _JavaUnparser()
+def java_unparse(ast_obj, **options):
+    unparser = _JavaUnparser(**options)
     return unparser.visit(ast_obj)
 
 
@@ -0,0 +1,18 @@
+import os
+import sys
+import textwrap
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+@pytest.fixture
+def translate():
+    """Translate a snippet of Python (dedented) to Java, with the options the unparser takes"""
+    def translate(source, **options):
+        source = textwrap.dedent(source)
+        return main.java_unparse(main.parse_python(source), source=source, **options)
+    return translate
@@ -0,0 +1,58 @@
+PROGRAM = """
+    import asyncio
+
+
+    async def fetch(n: int) -> int:
+        await asyncio.sleep(0.1)
+        return n * 2
+
+
+    async def main():
+        a, b = await asyncio.gather(fetch(1), fetch(2))
+        task = asyncio.create_task(fetch(3))
+        c = await task
+        print(a + b + c)
+
+
+    asyncio.run(main())
+"""
+
+
+def test_futures_mode_returns_completable_futures(translate):
+    java = translate(PROGRAM)
+    assert 'java.util.concurrent.CompletableFuture<' in java and 'fetch(int n)' in java
+    assert 'return java.util.concurrent.CompletableFuture.supplyAsync(() -> ' in java
+    assert 'Coroutines.sleep(0.1).join();' in java
+    assert 'main().join();' in java
+
+
+def test_futures_run_on_virtual_threads(translate):
+    java = translate(PROGRAM)
+    # Awaiting joins, which parks a virtual thread rather than holding one of the common pool's
+    assert 'Executors.newVirtualThreadPerTaskExecutor()' in java
+    assert java.count('}, Coroutines.executor);') == 2
+    assert 'ForkJoinPool' not in java
+
+
+def test_gather_results_are_unpacked(translate, capsys):
+    for mode in ('futures', 'virtual-threads'):
+        java = translate(PROGRAM, async_mode=mode)
+        assert 'Unsupported' not in capsys.readouterr().out
+        assert 'var results = Coroutines.gather(' in java
+        assert 'a = results.get(0);' in java
+        assert 'b = results.get(1);' in java
+
+
+def test_virtual_threads_mode_blocks_and_gathers_on_threads(translate):
+    java = translate(PROGRAM, async_mode='virtual-threads')
+    assert 'CompletableFuture' not in java
+    assert 'Coroutines.gather(Coroutines.task(() -> fetch(1)), Coroutines.task(() -> fetch(2)))' in java
+    assert 'newVirtualThreadPerTaskExecutor' in java
+
+
+def test_virtual_threads_mode_starts_tasks(translate):
+    java = translate(PROGRAM, async_mode='virtual-threads')
+    assert 'asyncio' not in java
+    assert 'task = Coroutines.start(() -> fetch(3));' in java
+    assert 'c = Coroutines.join(task);' in java
+    assert 'Thread.ofVirtual().start(future);' in java
@@ -0,0 +1,106 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import textwrap
+
+import pytest
+
+import main
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+
+SCALING = '''\
+def scale(xs, factor: float):
+    """
+    >>> scale([[1, 2]], 2.5)
+    """
+    return [x * factor for x in xs]
+
+
+def add(a: int, b: int) -> int:
+    """
+    >>> add(1, 2)
+    3
+    """
+    return a + b
+'''
+
+# Only what translates to Java that compiles as it is
+ADDING = SCALING[SCALING.index('def add'):]
+
+# Just enough of JMH's annotations for a harness to compile against, where JMH itself isn't around
+JMH_STUBS = {
+    'Mode.java': 'public enum Mode { AverageTime }',
+    'Scope.java': 'public enum Scope { Thread }',
+    'Level.java': 'public enum Level { Trial }',
+    'Benchmark.java': 'public @interface Benchmark {}',
+    'BenchmarkMode.java': 'public @interface BenchmarkMode { Mode[] value(); }',
+    'OutputTimeUnit.java': 'public @interface OutputTimeUnit { java.util.concurrent.TimeUnit value(); }',
+    'Warmup.java': 'public @interface Warmup { int iterations(); int time(); }',
+    'Measurement.java': 'public @interface Measurement { int iterations(); int time(); }',
+    'Fork.java': 'public @interface Fork { int value(); }',
+    'State.java': 'public @interface State { Scope value(); }',
+    'Setup.java': 'public @interface Setup { Level value(); }',
+}
+
+
+def harness(path, source, arguments=None):
+    tree = main.parse_python(source)
+    benchmark = main.BenchmarkHarness(path, tree, arguments)
+    unparser = main._JavaUnparser()
+    java = unparser.visit(main.parse_python(source))
+    return benchmark.source(unparser.inferred_return_types()), java
+
+
+def test_doctest_harness(tmp_path):
+    java, _ = harness(str(tmp_path / 'scaling.py'), SCALING)
+    assert 'public class ScalingBenchmark {' in java
+    assert '@State(Scope.Thread)' in java
+    assert '    double scale_factor;' in java
+    assert 'scale_xs = new java.util.ArrayList<>(java.util.List.of(new java.util.ArrayList<>(java.util.List.of(1, 2))));' \
+        in java
+    assert 'add_a = 1;' in java and 'add_b = 2;' in java
+    assert java.count('    @Benchmark\n') == 2
+
+
+def test_timeit_arguments_do_not_shadow_the_function(tmp_path):
+    java, _ = harness(str(tmp_path / 'scaling.py'), SCALING)
+    assert '-s "from scaling import scale; scale_args = [[[1, 2]], 2.5]" "scale(*scale_args)"' in java
+    assert 'scale = [' not in java
+
+
+def test_benchmarks_return_the_inferred_type(tmp_path):
+    java, translation = harness(str(tmp_path / 'scaling.py'), SCALING)
+    return_type = re.search(r'public static (\w+) add\(', translation).group(1)
+    assert f'public {return_type} add() {{' in java
+    assert 'return scaling.add(add_a, add_b);' in java
+
+
+def test_itinerary_harness_from_an_argument_file():
+    path = os.path.join(ROOT, 'examples', 'leetcode_reconstruct_itinerary.py')
+    with open(path) as f:
+        source = f.read()
+    with open(os.path.join(ROOT, 'benchmarks', 'reconstruct_itinerary_args.json')) as f:
+        arguments = json.load(f)
+    java, _ = harness(path, source, arguments)
+    assert 'public class LeetcodeReconstructItineraryBenchmark {' in java
+    assert '    java.util.List<java.util.List<String>> findItinerary_1_tickets;' in java
+    assert 'return new Solution().findItinerary(findItinerary_2_tickets);' in java
+    assert '"Solution().findItinerary(*findItinerary_1_args)"' in java
+
+
+@pytest.mark.skipif(shutil.which('javac') is None, reason='needs a JDK')
+def test_harness_compiles(tmp_path):
+    java, translation = harness(str(tmp_path / 'scaling.py'), ADDING)
+    annotations = tmp_path / 'org' / 'openjdk' / 'jmh' / 'annotations'
+    annotations.mkdir(parents=True)
+    for name, stub in JMH_STUBS.items():
+        (annotations / name).write_text(f'package org.openjdk.jmh.annotations;\n{stub}\n')
+    # The translated module, in the class the harness calls it through
+    (tmp_path / 'scaling.java').write_text(f'public class scaling {{\n{textwrap.indent(translation, "    ")}\n}}\n')
+    (tmp_path / 'ScalingBenchmark.java').write_text(java)
+    sources = [str(path) for path in tmp_path.rglob('*.java')]
+    result = subprocess.run(['javac', '-d', str(tmp_path / 'classes'), *sources], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
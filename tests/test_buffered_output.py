@@ -0,0 +1,51 @@
+def test_prints_go_through_one_writer(translate):
+    java = translate("""
+        print("a")
+        print("b", 1)
+    """, buffered_output=True)
+    assert java.count('new java.io.PrintWriter(') == 1
+    assert 'stdout.println("a");' in java
+    assert java.rstrip().endswith('stdout.flush();')
+
+
+def test_classes_share_the_program_writer(translate):
+    java = translate("""
+        class Greeter:
+            def hello(self):
+                print("inside")
+
+
+        if __name__ == '__main__':
+            print("start")
+            Greeter().hello()
+            print("end")
+    """, buffered_output=True)
+    assert java.count('new java.io.PrintWriter(') == 1
+    assert 'static final java.io.PrintWriter' not in java
+    # The one flush at exit is the program writer's own
+    assert java.count('addShutdownHook') == 1
+    main = java[java.index('public static void main'):]
+    assert main.index('stdout.println("end");') < main.index('stdout.flush();')
+
+
+def test_writer_flushes_itself_at_exit(translate):
+    java = translate("""
+        import sys
+
+        print("before")
+        sys.exit(1)
+    """, buffered_output=True)
+    assert 'new java.io.PrintWriter(new java.io.FileOutputStream(java.io.FileDescriptor.out)) {{\n' \
+           '    Runtime.getRuntime().addShutdownHook(new Thread(this::flush));\n}};' in java
+
+
+def test_input_flushes_first(translate):
+    java = translate("""
+        print("name?")
+        name = input()
+    """, buffered_output=True)
+    assert java.index('stdout.flush();') < java.index('nextLine()')
+
+
+def test_unbuffered_prints_to_system_out(translate):
+    assert 'System.out.println("a");' in translate('print("a")')
@@ -0,0 +1,84 @@
+import os
+
+import main
+
+CONSTS = '''\
+LIMIT = 10
+
+
+def size(xs):
+    return len(xs)
+
+
+def label(n: int) -> str:
+    return "n=" + str(n)
+'''
+
+USE = '''\
+from mypkg.consts import LIMIT, size, label
+
+
+def check(xs):
+    return size(xs) < LIMIT
+
+
+print(label(LIMIT), check([1, 2]))
+'''
+
+
+def make_package(tmp_path, **modules):
+    package = tmp_path / 'mypkg'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    for name, source in modules.items():
+        (package / f'{name}.py').write_text(source)
+    return str(package)
+
+
+def read(out, *parts):
+    with open(os.path.join(out, *parts)) as f:
+        return f.read()
+
+
+def test_build_translates_every_module_after_its_imports(tmp_path):
+    package = make_package(tmp_path, consts=CONSTS, use=USE)
+    out = str(tmp_path / 'out')
+    index = main.SymbolIndex.load(package, None, 1, out)
+    assert index.modules['mypkg.consts']['functions']['label']['returns'] == 'String'
+    assert 'public static String label(int n)' in read(out, 'mypkg', 'consts.java')
+    assert os.path.exists(os.path.join(out, 'mypkg', 'use.java'))
+
+
+def test_empty_modules_get_no_file(tmp_path):
+    package = make_package(tmp_path, consts=CONSTS)
+    out = str(tmp_path / 'out')
+    main.SymbolIndex.load(package, None, 1, out)
+    assert not os.path.exists(os.path.join(out, 'mypkg.java'))
+
+
+def test_imported_names_are_qualified(tmp_path):
+    package = make_package(tmp_path, consts=CONSTS, use=USE)
+    out = str(tmp_path / 'out')
+    main.SymbolIndex.load(package, None, 1, out)
+    java = read(out, 'mypkg', 'use.java')
+    assert 'return mypkg.consts.size(xs) < mypkg.consts.LIMIT;' in java
+    assert 'mypkg.consts.label(mypkg.consts.LIMIT)' in java
+
+
+def test_options_are_passed_through(tmp_path):
+    package = make_package(tmp_path, consts=CONSTS, use=USE)
+    out = str(tmp_path / 'out')
+    main.SymbolIndex.load(package, None, 1, out, {'buffered_output': True})
+    java = read(out, 'mypkg', 'use.java')
+    assert 'stdout.println(' in java
+    assert 'stdout.flush();' in java
+
+
+def test_failures_are_reported_on_stderr(tmp_path, capsys):
+    package = make_package(tmp_path, consts=CONSTS, broken='def broken(:\n    pass\n')
+    out = str(tmp_path / 'out')
+    main.SymbolIndex.load(package, None, 1, out)
+    captured = capsys.readouterr()
+    assert 'mypkg.broken: SyntaxError' in captured.err
+    assert 'COULD NOT TRANSLATE mypkg.broken' in captured.err
+    assert captured.out == ''
@@ -0,0 +1,110 @@
+def test_sum_of_generator_becomes_a_primitive_loop(translate):
+    java = translate("""
+        def f(n: int) -> int:
+            total = sum(i * i for i in range(n))
+            return total
+    """)
+    assert 'long total1 = 0;' in java
+    assert 'total1 += i * i;' in java
+
+
+def test_reduction_loop_does_not_clobber_an_outer_variable(translate):
+    java = translate("""
+        def f(n: int) -> int:
+            i = 5
+            total = sum(i * i for i in range(n) if i % 2)
+            return total + i
+    """)
+    assert 'for (int i1 = 0; i1 != n; i1++)' in java
+    assert 'total1 += i1 * i1;' in java
+    assert 'return total + i;' in java
+
+
+def test_max_of_strings_compares_them_as_they_are(translate):
+    java = translate("""
+        words = ["b", "a"]
+        print(max(words), min(words))
+    """)
+    assert 'java.util.Collections.max(words)' in java
+    assert 'java.util.Collections.min(words)' in java
+    assert 'mapToLong' not in java
+
+
+def test_max_of_numbers_is_a_primitive_stream(translate):
+    java = translate("""
+        xs = [3, 1]
+        prices = [1.5, 2.0]
+        print(max(xs), sum(prices))
+    """)
+    assert 'xs.stream().mapToLong(value -> value).max().getAsLong()' in java
+    assert 'prices.stream().mapToDouble(value1 -> value1).sum()' in java
+
+
+def test_key_len_of_strings_is_their_length(translate):
+    java = translate("""
+        words = ["bb", "a"]
+        print(sorted(words, key=len), min(words, key=len))
+        words.sort(key=len)
+    """)
+    assert '.size()' not in java
+    assert 'java.util.Collections.min(words, java.util.Comparator.comparingInt(' in java
+    assert java.count('.length())') == 3
+
+
+def test_sort_key_method_reference(translate):
+    java = translate("""
+        words = ["b", "A"]
+        words.sort(key=str.lower, reverse=True)
+    """)
+    assert 'words.sort(java.util.Comparator.comparing(String::toLowerCase).reversed());' in java
+
+
+def test_all_and_any_test_truth_like_python(translate):
+    java = translate("""
+        def f(nums: list[int], words: list[str], n: int):
+            ok = all(nums)
+            print(any(words), all(x for x in nums))
+            if not n:
+                print(ok)
+    """)
+    assert 'if (value == 0) {' in java
+    assert 'anyMatch(value -> !value.isEmpty())' in java
+    assert 'allMatch(x -> x != 0)' in java
+    assert 'if (n == 0) {' in java
+
+
+def test_key_len_of_hinted_strings(translate):
+    java = translate("""
+        def longest(words: list[str]) -> str:
+            return max(words, key=len)
+    """)
+    assert 'java.util.Comparator.comparingInt(value -> value.length())' in java
+
+
+def test_tuple_key_compares_each_element_in_turn(translate, capsys):
+    java = translate("""
+        def order(words: list[str]):
+            print(sorted(words, key=lambda w: (len(w), w), reverse=True))
+    """)
+    assert 'java.util.Comparator.comparingInt((String w) -> w.length()).thenComparing((String w) -> w).reversed()' \
+        in java
+    assert 'Unsupported' not in capsys.readouterr().out
+
+
+def test_max_with_a_default(translate):
+    java = translate("""
+        def f(nums: list[int], words: list[str]):
+            print(max(nums, default=0), min(words, default=""), max(words, key=len, default=None))
+    """)
+    assert 'nums.stream().mapToLong(value -> value).max().orElse(0)' in java
+    assert 'words.stream().min(java.util.Comparator.naturalOrder()).orElse("")' in java
+    assert 'words.stream().max(java.util.Comparator.comparingInt(value1 -> value1.length())).orElse(null)' in java
+    assert 'default' not in java
+
+
+def test_sum_of_unknown_elements_is_reported(translate, capsys):
+    translate("""
+        def f(xs: list):
+            print(sum(xs))
+    """)
+    assert 'Unsupported ATM: sum of what might not be numbers' in capsys.readouterr().out
@@ -0,0 +1,104 @@
+def test_thread_pool_is_a_fixed_executor(translate):
+    java = translate("""
+        from concurrent.futures import ThreadPoolExecutor
+
+        def square(x):
+            return x * x
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            print(list(pool.map(square, [1, 2, 3])))
+    """)
+    assert 'var pool = java.util.concurrent.Executors.newFixedThreadPool(4);' in java
+    assert 'Concurrency.map(pool, ' in java
+    assert 'Concurrency.close(pool);' in java
+
+
+def test_thread_pool_defaults_to_pythons_size(translate):
+    java = translate("""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor() as pool:
+            pool.submit(print, 1)
+    """)
+    assert 'newFixedThreadPool(Math.min(32, Runtime.getRuntime().availableProcessors() + 4))' in java
+    assert 'Concurrency.submit(pool, () -> ' in java
+
+
+def test_lock_and_queue(translate):
+    java = translate("""
+        import queue
+        import threading
+
+        lock = threading.Lock()
+        q = queue.Queue()
+        with lock:
+            q.put(1)
+        print(q.get())
+    """)
+    assert 'new java.util.concurrent.locks.ReentrantLock()' in java
+    assert 'java.util.concurrent.LinkedBlockingQueue' in java
+    assert 'lock.lock();' in java
+    assert 'lock.unlock();' in java
+    assert 'Concurrency.put(q, 1);' in java
+    assert 'Concurrency.take(q)' in java
+
+
+def test_list_of_threads_joins_each_one(translate):
+    java = translate("""
+        import threading
+
+        def work(i):
+            print(i)
+
+        def main():
+            threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        main()
+    """)
+    assert 't.start();' in java
+    assert 'Concurrency.join(t);' in java
+    assert 't.join()' not in java
+
+
+def test_threads_appended_to_a_list(translate):
+    java = translate("""
+        import threading
+
+        def work(i):
+            print(i)
+
+        def main():
+            threads = []
+            for i in range(4):
+                threads.append(threading.Thread(target=work, args=(i,)))
+            for t in threads:
+                t.join()
+
+        main()
+    """)
+    assert 'Concurrency.join(t);' in java
+
+
+def test_list_of_futures(translate):
+    java = translate("""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        def work(i):
+            return i
+
+        def main():
+            with ThreadPoolExecutor(4) as pool:
+                futures = [pool.submit(work, i) for i in range(4)]
+                for f in as_completed(futures):
+                    if f.done():
+                        print(f.result())
+
+        main()
+    """)
+    assert 'f.isDone()' in java
+    assert 'f.join()' in java
+    assert 'f.done()' not in java and 'f.result()' not in java
@@ -0,0 +1,72 @@
+import sys
+
+
+def chain(operator, terms):
+    return f" {operator} ".join(["x"] * terms)
+
+
+def test_sum_deeper_than_the_recursion_limit(translate):
+    terms = sys.getrecursionlimit() * 3
+    java = translate(f"""
+        def f(x: int):
+            return {chain('+', terms)}
+    """)
+    assert java.count(' + x') == terms - 1
+
+
+def test_subtraction_keeps_its_order(translate):
+    java = translate(f"""
+        def f(x: int):
+            return {chain('-', 2000)}
+    """)
+    assert java.count(' - x') == 1999
+    assert '(x' not in java.replace('(int x)', '')
+
+
+def test_long_boolean_chain(translate):
+    java = translate(f"""
+        def f(x: int):
+            return {' and '.join(['x > 1'] * 2000)}
+    """)
+    assert java.count(' && ') == 1999
+
+
+def test_conditional_chain_deeper_than_the_recursion_limit(translate):
+    terms = sys.getrecursionlimit() * 3
+    java = translate(f"""
+        def f(x: int):
+            return {' if x > 0 else '.join(['x'] * terms)}
+    """)
+    assert java.count(' ? x : ') == terms - 1
+
+
+def test_unary_chain_deeper_than_the_recursion_limit(translate):
+    depth = sys.getrecursionlimit() * 3
+    java = translate(f"""
+        def f(x: int):
+            return {'-' * depth}x
+    """)
+    assert 'return ' + '- ' * (depth - 1) + '-x;' in java
+
+
+def test_attribute_and_subscript_chains_deeper_than_the_recursion_limit(translate):
+    depth = sys.getrecursionlimit() * 2
+    java = translate(f"""
+        def f(x):
+            return x{'.y' * depth}
+        def g(x):
+            return x{'[0]' * depth}
+    """)
+    assert 'x' + '.y' * depth + ';' in java
+    assert java.count('.get(0)') == depth
+
+
+def test_deeply_nested_ifs(translate):
+    depth = 90
+    source = "def g(x: int):\n"
+    for level in range(depth):
+        source += "    " * (level + 1) + f"if x > {level}:\n"
+    source += "    " * (depth + 1) + "return x\n" + "    return 0\n"
+    java = translate(source)
+    assert java.count('if (x > ') == depth
+    assert 'return x;' in java
@@ -0,0 +1,111 @@
+import os
+
+
+def test_defaultdict_of_lists_is_filled_in_one_lookup(translate):
+    path = os.path.join(os.path.dirname(__file__), os.pardir, 'examples', 'leetcode_reconstruct_itinerary.py')
+    with open(path) as f:
+        java = translate(f.read())
+    assert 'this.flightMap.computeIfAbsent(origin, key -> new java.util.ArrayList<>()).add(dest);' in java
+
+
+def test_get_with_a_default_only_on_dicts(translate):
+    java = translate("""
+        def f(k: str, counts: dict, xs):
+            print(counts.get(k, 5), xs.get(1, 2))
+    """)
+    assert 'counts.getOrDefault(k, 5)' in java
+    assert 'xs.get(1, 2)' in java
+
+
+def test_append_only_on_lists(translate):
+    java = translate("""
+        def f(xs, d: dict):
+            xs.append(3)
+            d.append(1)
+    """)
+    assert 'xs.add(3);' in java
+    assert 'd.append(1);' in java
+
+
+def test_membership_is_contains_key(translate):
+    java = translate("""
+        def f(k: str, d: dict):
+            print(k in d, k not in d)
+            if k in d:
+                print(d[k])
+    """)
+    assert 'd.containsKey(k) + " " + (!d.containsKey(k))' in java
+    assert 'var kValue = d.get(k);' in java
+    assert 'if (kValue != null || d.containsKey(k))' in java
+    assert 'System.out.println(kValue);' in java
+
+
+def test_key_error_handler_is_a_null_check(translate):
+    java = translate("""
+        def f(k: str, d: dict):
+            try:
+                print(d[k])
+            except KeyError:
+                print("missing")
+    """)
+    assert 'try' not in java
+    assert 'if (kValue != null || d.containsKey(k))' in java
+
+
+def test_adding_to_a_counter_merges(translate):
+    java = translate("""
+        from collections import Counter
+        def f(k: str, j: str, counts: dict):
+            c = Counter()
+            c[k] += 1
+            counts[j] = counts.get(j, 0) + 1
+    """)
+    assert 'c.merge(k, 1, Integer::sum);' in java
+    assert 'counts.merge(j, 1, Integer::sum);' in java
+
+
+def test_adding_to_a_plain_dict_needs_the_key(translate):
+    java = translate("""
+        def f(k: str, counts: dict):
+            counts[k] += 1
+            counts[k] = counts[k] + 1
+    """)
+    assert 'merge' not in java
+    assert java.count('counts.put(k, java.util.Objects.requireNonNull(counts.get(k), "KeyError") + 1);') == 2
+
+
+def test_dict_displays_allow_repeated_keys(translate):
+    java = translate("""
+        def f(k: str, j: str):
+            print({"a": 1, "b": 2}, {k: 1, j: 2}, {"a": 1, "a": 2})
+    """)
+    assert 'new java.util.HashMap<>(java.util.Map.of("a", 1, "b", 2))' in java
+    assert 'Dicts.of(Dicts.entry(k, 1), Dicts.entry(j, 2))' in java
+    assert 'Dicts.of(Dicts.entry("a", 1), Dicts.entry("a", 2))' in java
+    assert 'map.put(entry.getKey(), entry.getValue());' in java
+
+
+def test_lists_set_whatever_the_index(translate):
+    java = translate("""
+        def f(xs: list, k, idx: list, a: list):
+            xs[k] = 1
+            out = [0] * 3
+            for i in range(3):
+                out[idx[i]] = a[i]
+    """)
+    assert 'xs.set(k, 1);' in java
+    assert 'out.set(idx.get(i), a.get(i));' in java
+    assert '.put(' not in java
+
+
+def test_setdefault_keeps_a_none_thats_there(translate):
+    java = translate("""
+        def f(k):
+            groups = {}
+            groups.setdefault(k, None)
+            return groups.setdefault(k, 1)
+    """)
+    assert 'Dicts.setDefault(groups, k, null);' in java
+    assert 'return Dicts.setDefault(groups, k, 1);' in java
+    assert 'static <K, V> V setDefault(java.util.Map<K, V> map, K key, V value) {' in java
+    assert 'computeIfAbsent' not in java
@@ -0,0 +1,43 @@
+def test_scanner_without_the_option(translate):
+    java = translate("""
+        name = input()
+        print(name)
+    """)
+    assert 'java.util.Scanner scanner = new java.util.Scanner(System.in);' in java
+    assert 'scanner.nextLine()' in java
+    assert 'FastInput' not in java
+
+
+def test_numbers_are_parsed_out_of_the_buffer(translate):
+    java = translate("""
+        n = int(input())
+        x = float(input())
+        xs = list(map(int, input().split()))
+        words = input().split()
+        print(n, x, xs, words)
+    """, fast_input=True)
+    assert 'final FastInput stdin = new FastInput(System.in);' in java
+    assert 'int n = stdin.nextLineAsInt();' in java
+    assert 'stdin.nextLineAsDouble()' in java
+    assert 'var xs = stdin.nextLineInts();' in java
+    assert 'stdin.nextLineTokens()' in java
+    assert 'Scanner' not in java
+
+
+def test_unpacking_a_line_of_numbers(translate, capsys):
+    java = translate("""
+        a, b = map(int, input().split())
+        print(a + b)
+    """, fast_input=True)
+    assert 'var values = stdin.nextLineInts();' in java
+    assert 'var a = values.get(0);' in java
+    assert 'var b = values.get(1);' in java
+    assert 'Unsupported' not in capsys.readouterr().out
+
+
+def test_prompt_is_printed_first(translate):
+    java = translate("""
+        name = input("Name: ")
+    """, fast_input=True)
+    assert 'System.out.print("Name: ");' in java
+    assert 'stdin.nextLine()' in java
@@ -0,0 +1,28 @@
+def test_ints_that_can_be_negative_floor(translate):
+    java = translate("""
+        def f(a: int, b: int):
+            return a // b + a % b
+    """)
+    assert 'Math.floorDiv(a, b)' in java
+    assert 'Math.floorMod(a, b)' in java
+    assert 'Math.floor(' not in java
+
+
+def test_non_negative_ints_divide_plainly(translate):
+    java = translate("""
+        def g(n: int):
+            total = 0
+            for i in range(n):
+                total += i // 2 + i % 3
+            return total
+    """)
+    assert 'i / 2 + i % 3' in java
+    assert 'floorDiv' not in java and 'floorMod' not in java
+
+
+def test_floats_still_floor(translate):
+    java = translate("""
+        def h(x: float) -> float:
+            return x // 2
+    """)
+    assert 'Math.floor(x / 2)' in java
@@ -0,0 +1,37 @@
+PROGRAM = """
+    class Counter:
+        def add(self, n: int) -> int:
+            return n + 1
+
+
+    def hello():
+        print("hi")
+
+
+    print(Counter().add(1))
+    hello()
+"""
+
+
+def test_every_function_is_timed(translate):
+    java = translate(PROGRAM, instrument=True)
+    assert 'static final String[] FUNCTIONS = {"Counter.add", "hello"};' in java
+    assert 'java.util.concurrent.atomic.LongAdder[] CALLS = adders();' in java
+    assert 'Runtime.getRuntime().addShutdownHook(new Thread(PythonTimings::report));' in java
+    assert java.count('long start_nanos = System.nanoTime();') == 2
+    assert 'PythonTimings.record(0, start_nanos);' in java
+    assert 'PythonTimings.record(1, start_nanos);' in java
+
+
+def test_timing_covers_every_return(translate):
+    java = translate(PROGRAM, instrument=True)
+    assert 'try {\n            return (long) n + 1;\n        } finally {\n' \
+           '            PythonTimings.record(0, start_nanos);\n        }' in java
+
+
+def test_off_leaves_the_code_as_it_was(translate):
+    java = translate(PROGRAM)
+    assert java == translate(PROGRAM, instrument=False)
+    assert 'PythonTimings' not in java
+    assert 'nanoTime' not in java
+    assert 'try' not in java
@@ -0,0 +1,94 @@
+def test_augmented_assignment_widens_to_long(translate):
+    java = translate("""
+        def s(n: int) -> int:
+            total = 0
+            for i in range(100000):
+                total += i * i
+            return total
+    """)
+    assert 'total += (long) i * i;' in java
+    assert 'public static long s(int n)' in java
+
+
+def test_int_hint_widens_to_big_integer(translate):
+    java = translate("""
+        def fib(n: int) -> int:
+            a, b = 0, 1
+            for _ in range(n):
+                a, b = b, a + b
+            return a
+    """)
+    assert 'public static java.math.BigInteger fib(int n)' in java
+    assert 'a.add(b)' in java
+
+
+def test_int_hint_of_sum_returns_long(translate):
+    java = translate("""
+        def add(a: int, b: int) -> int:
+            return a + b
+    """)
+    assert 'public static long add(int a, int b)' in java
+    assert 'return (long) a + b;' in java
+
+
+def test_big_integer_floor_division_and_modulo(translate):
+    java = translate("""
+        def f(n: int, d: int) -> int:
+            x = 1
+            for _ in range(n):
+                x = x * 3
+            return x % d + x // d + x // 7
+    """)
+    assert 'BigIntegers.floorMod(x, java.math.BigInteger.valueOf(d))' in java
+    assert 'BigIntegers.floorDiv(x, java.math.BigInteger.valueOf(d))' in java
+    # Neither is negative
+    assert 'x.divide(java.math.BigInteger.valueOf(7))' in java
+    assert '.mod(' not in java
+
+
+def test_small_values_stay_int(translate):
+    java = translate("""
+        def f(n: int) -> int:
+            total = 0
+            for i in range(10):
+                total += i
+            return total
+    """)
+    assert 'public static int f(int n)' in java
+    assert 'total += i;' in java
+
+
+def test_int_products_are_widened_before_big_integer(translate):
+    java = translate("""
+        def sq(a: int, b: int):
+            c = a * b
+            d = c + a * b
+            return d
+
+
+        def cube(a: int, b: int):
+            return a * b * a * b * a
+    """)
+    assert 'java.math.BigInteger.valueOf((long) a * b)' in java
+    assert 'valueOf(a * b)' not in java
+
+
+def test_max_of_a_big_integer(translate):
+    java = translate("""
+        def big(n: int):
+            f = 1
+            for i in range(1, n + 1):
+                f = f * i
+            return max(f, 3)
+    """)
+    assert 'return f.max(java.math.BigInteger.valueOf(3));' in java
+    assert 'Math.max' not in java
+
+
+def test_widened_hint_changes_the_async_signature(translate):
+    java = translate("""
+        async def fetch(x: int) -> int:
+            return x * x
+    """)
+    assert 'public static java.util.concurrent.CompletableFuture<Long> fetch(int x)' in java
+    assert 'return (long) x * x;' in java
@@ -0,0 +1,72 @@
+def test_list_only_probed_and_appended_is_a_set(translate):
+    java = translate("""
+        def visited(items):
+            seen = []
+            out = 0
+            for item in items:
+                if item in seen:
+                    out += 1
+                seen.append(item)
+            return out
+    """)
+    assert 'seen = new java.util.HashSet<>();' in java
+    assert 'if (seen.contains(item))' in java
+    assert 'seen.add(item);' in java
+
+
+def test_list_whose_order_shows_keeps_a_mirror_set(translate):
+    java = translate("""
+        def dedupe(items):
+            seen = []
+            for item in items:
+                if item not in seen:
+                    seen.append(item)
+            return len(seen)
+    """)
+    assert 'seenSet = new java.util.HashSet<>(seen);' in java
+    assert 'if (!seenSet.contains(item))' in java
+    assert 'seen.add(item);\n            seenSet.add(item);' in java
+    assert 'return seen.size();' in java
+
+
+def test_few_string_constants_are_a_switch(translate):
+    java = translate("""
+        def vowel(c: str):
+            return c in ('a', 'e', 'i')
+    """)
+    assert 'switch (c) { case "a", "e", "i" -> true; case null, default -> false; }' in java
+
+
+def test_module_level_list_stays_a_list(translate):
+    java = translate("""
+        VOWELS = ['a', 'e', 'i', 'o', 'u']
+
+
+        def count(text: str):
+            n = 0
+            for c in text:
+                if c in VOWELS:
+                    n += 1
+            return n
+    """)
+    # Another module importing VOWELS still gets a list, and the probes a set beside it
+    assert 'var VOWELS = ["a", "e", "i", "o", "u"];' in java
+    assert 'VOWELSSet = new java.util.HashSet<>(VOWELS);' in java
+    assert 'VOWELSSet.contains(c)' in java
+
+
+def test_other_constants_are_a_hoisted_set(translate):
+    java = translate("""
+        def half(x: float):
+            return x in (1.5, 2.5)
+    """)
+    assert 'final java.util.Set<Double> X_VALUES = java.util.Set.of(1.5, 2.5);' in java
+    assert 'return X_VALUES.contains(x);' in java
+
+
+def test_range_is_a_bounds_check(translate):
+    java = translate("""
+        def between(n: int):
+            return n in range(3, 10)
+    """)
+    assert 'return 3 <= n && n < 10;' in java
@@ -0,0 +1,90 @@
+def test_unbounded_cache_is_a_hash_map(translate):
+    java = translate("""
+        import functools
+
+
+        @functools.cache
+        def fib(n: int) -> int:
+            return n if n < 2 else fib(n - 1) + fib(n - 2)
+    """)
+    assert 'final java.util.Map<Integer, ' in java
+    assert 'fibCache = new java.util.HashMap<>();' in java
+    assert 'private static ' in java and 'fibUncached(int n)' in java
+    assert '@' not in java
+
+
+def test_bounded_cache_evicts_least_recently_used(translate):
+    java = translate("""
+        from functools import lru_cache
+
+
+        @lru_cache(maxsize=100)
+        def paths(x: int, y: int) -> int:
+            return 1 if x == 0 or y == 0 else paths(x - 1, y) + paths(x, y - 1)
+    """)
+    assert 'new java.util.LinkedHashMap<>(16, 0.75f, true)' in java
+    assert 'return size() > 100;' in java
+    # Two ints are packed into one long key
+    assert 'Long key = ((long) x << 32) | (y & 0xffffffffL);' in java
+
+
+def test_none_results_are_cached(translate):
+    java = translate("""
+        from functools import cache
+
+
+        @cache
+        def find(n: int):
+            if n > 3:
+                return None
+            return n
+    """)
+    assert 'if (cached == null && !findCache.containsKey(key))' in java
+
+
+def test_functions_without_results_cache_calls_in_a_set(translate):
+    java = translate("""
+        from functools import lru_cache
+
+
+        @lru_cache(maxsize=None)
+        def visit(n: int):
+            print(n)
+
+
+        @lru_cache(maxsize=2)
+        def show(n: int):
+            print(n)
+    """)
+    assert 'Void' not in java
+    assert 'final java.util.Set<Integer> visitCache = new java.util.HashSet<>();' in java
+    assert 'java.util.Collections.newSetFromMap(new java.util.LinkedHashMap<Integer, Boolean>(16, 0.75f, true)' in java
+    assert 'if (!visitCache.contains(key))' in java
+    assert 'visitCache.add(key);' in java
+    assert 'cached = ' not in java and 'return cached' not in java
+
+
+def test_widened_return_type_reaches_the_wrapper_and_cache(translate):
+    java = translate("""
+        from functools import lru_cache
+
+
+        @lru_cache(maxsize=None)
+        def fib(n: int) -> int:
+            if n < 2:
+                return n
+            return fib(n - 1) + fib(n - 2)
+
+
+        @lru_cache(maxsize=None)
+        def grid(r: int, c: int) -> int:
+            if r == 0 or c == 0:
+                return 1
+            return grid(r - 1, c) + grid(r, c - 1)
+    """)
+    assert 'java.util.Map<Integer, java.math.BigInteger> fibCache' in java
+    assert 'private static java.math.BigInteger fibUncached(int n)' in java
+    assert 'public static java.math.BigInteger fib(int n)' in java
+    assert 'java.util.Map<Long, java.math.BigInteger> gridCache' in java
+    assert 'public static java.math.BigInteger grid(int r, int c)' in java
+    assert '    Integer cached' not in java
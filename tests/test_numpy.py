@@ -0,0 +1,116 @@
+def test_chained_elementwise_math_is_one_loop(translate):
+    java = translate("""
+        import numpy as np
+
+        def scale(n: int):
+            a = np.ones(n)
+            b = np.arange(n)
+            c = np.full(n, 2.0)
+            d = a * b + c
+            print(d)
+
+        scale(3)
+    """)
+    assert 'd = new double[a.length];' in java
+    assert 'd[i] = a[i] * b[i] + c[i];' in java
+    # No temporary for a * b
+    assert java.count('for (int i = 0;') == 2
+
+
+def test_sum_dot_and_mask_are_reductions(translate):
+    java = translate("""
+        import numpy as np
+
+        def stats(n: int):
+            a = np.ones(n)
+            b = np.ones(n)
+            print(np.sum(a), np.dot(a, b), a[a > 0.5].sum())
+
+        stats(3)
+    """)
+    assert 'total += a[i];' in java
+    assert 'dot += a[i] * b[i];' in java
+    assert 'if (a[i] > 0.5){' in java
+
+
+def test_arrays_of_different_lengths_throw(translate):
+    java = translate("""
+        import numpy as np
+
+        def add(n: int, m: int):
+            v = np.ones(n)
+            w = np.ones(m)
+            print(v + w)
+
+        add(3, 4)
+    """)
+    assert 'if (v.length != w.length){' in java
+    assert 'throw new IllegalArgumentException("operands could not be broadcast together");' in java
+
+
+def test_matrices_check_rows_and_columns(translate):
+    java = translate("""
+        import numpy as np
+
+        def add(n: int):
+            a = np.zeros((2, 3))
+            b = np.ones((n, 3))
+            c = a + b
+            print(c)
+
+        add(2)
+    """)
+    assert 'if (a.rows != b.rows || a.columns != b.columns){' in java
+
+
+def test_row_broadcasts_over_every_row(translate, capsys):
+    java = translate("""
+        import numpy as np
+
+        def shift():
+            a = np.zeros((2, 3))
+            b = a + np.array([1.0, 2.0, 3.0])
+            print(b)
+
+        shift()
+    """)
+    assert 'if (a.columns != values.length){' in java
+    assert 'b = new DoubleMatrix(a.rows, a.columns);' in java
+    assert 'b.data[i] = a.data[i] + values[i % a.columns];' in java
+    assert 'a + new double[]' not in java
+    assert 'Unsupported' not in capsys.readouterr().out
+
+
+def test_arrays_that_dont_go_together_are_reported(translate, capsys):
+    translate("""
+        import numpy as np
+
+        def shift():
+            a = np.zeros((2, 3))
+            print(a + [1.0, 2.0, 3.0])
+
+        shift()
+    """)
+    assert "Unsupported ATM: NumPy arrays that don't go together" in capsys.readouterr().out
+
+
+def test_transpose_and_shape(translate):
+    java = translate("""
+        import numpy as np
+
+        def flip():
+            m = np.zeros((2, 3))
+            t = m.T
+            u = np.transpose(m)
+            rows, columns = m.shape
+            print(t, u, m.shape, m.shape[1], rows, columns)
+
+        flip()
+    """)
+    assert 't = m.transpose();' in java
+    assert 'u = m.transpose();' in java
+    assert 'DoubleMatrix transpose() {' in java
+    assert 'rows = m.rows;' in java
+    assert 'columns = m.columns;' in java
+    assert 'java.util.List.of(m.rows, m.columns) + " " + m.columns' in java
+    assert 'm.T' not in java and 'm.shape' not in java
@@ -0,0 +1,86 @@
+def test_folds_constants_and_dead_branches(translate):
+    java = translate("""
+        def f(n):
+            if 2 * 3 > 5:
+                return n + 60 * 60
+            return 0
+    """)
+    assert 'return n + 3600;' in java
+    assert 'if (' not in java
+
+
+def test_local_shadowing_a_builtin_does_not_leak(translate):
+    java = translate("""
+        def f():
+            len = 3
+            return len
+
+
+        print(len("abc"), f())
+    """)
+    assert '"abc".length()' in java
+    assert '3("abc")' not in java
+    assert 'return 3;' in java
+
+
+def test_constants_propagate_only_within_their_scope(translate):
+    java = translate("""
+        x = 1
+
+
+        def g():
+            x = 2
+            return x
+
+
+        print(x, g())
+    """)
+    assert 'return 2;' in java
+    assert 'System.out.println(1 + " " + g());' in java
+
+
+def test_module_constants_are_kept(translate):
+    java = translate("""
+        LIMIT = 10
+
+
+        def size(xs):
+            unused = 5
+            return len(xs)
+    """)
+    assert 'LIMIT = 10;' in java
+    assert 'unused' not in java
+
+
+def test_unoptimized_keeps_everything(translate):
+    java = translate("""
+        def f():
+            unused = 2 * 3
+            return 1
+    """, optimize=False)
+    assert 'unused = 2 * 3;' in java
+
+
+def test_unused_values_that_can_raise_are_kept(translate):
+    java = translate("""
+        def f(a: int, xs):
+            quotient = a // 0
+            missing = undefined_name
+            copy = (a, xs)
+            return 1
+    """)
+    assert 'quotient' in java
+    assert 'missing' in java
+    assert 'copy' not in java
+
+
+def test_match_captures_are_bindings(translate):
+    java = translate("""
+        def f(v):
+            x = 1
+            match v:
+                case [x, *rest]:
+                    pass
+            return x
+    """)
+    assert 'return 1;' not in java
@@ -0,0 +1,48 @@
+SCALE = """
+    def scale(xs: list, n: int):
+        result = [0.0] * n
+        for i in range(n):{pragma}
+            result[i] = xs[i] * 2.0
+        return result
+"""
+
+
+def test_pragma_makes_an_independent_loop_parallel(translate):
+    java = translate(SCALE.format(pragma='  # parallel'))
+    assert 'ParallelLoops.range(0, n).forEach(i -> {\n        result.set(i, xs.get(i) * 2.0);\n    });' in java
+    # Only when there are enough iterations for it
+    assert 'static final int MIN_TRIPS = 10000;' in java
+    assert 'return (long) stop - start >= MIN_TRIPS ? range.parallel() : range;' in java
+
+
+def test_without_pragma_or_flag_loops_stay_sequential(translate):
+    java = translate(SCALE.format(pragma=''))
+    assert 'ParallelLoops' not in java
+    assert 'for (int i = 0; i != n; i++)' in java
+
+
+def test_flag_makes_every_independent_loop_parallel(translate):
+    java = translate(SCALE.format(pragma=''), parallel_loops=True)
+    assert 'ParallelLoops.range(0, n).forEach(i -> {' in java
+
+
+def test_reduction_sums_per_thread(translate):
+    java = translate("""
+        def total(xs: list, n: int):
+            s = 0.0
+            for i in range(n):  # parallel
+                s += xs[i] * xs[i]
+            return s
+    """)
+    assert 's += ParallelLoops.range(0, n).mapToDouble(i -> xs.get(i) * xs.get(i)).sum();' in java
+
+
+def test_loop_carried_dependency_stays_sequential(translate):
+    java = translate("""
+        def prefix(xs: list, n: int):
+            for i in range(1, n):  # parallel
+                xs[i] = xs[i - 1] + xs[i]
+            return xs
+    """)
+    assert 'ParallelLoops' not in java
+    assert 'xs.set(i, xs.get(i - 1) + xs.get(i));' in java
@@ -0,0 +1,93 @@
+def test_one_generator_shared_with_classes_and_seeded(translate):
+    java = translate("""
+        import random
+
+
+        class Dice:
+            def roll(self):
+                return random.randint(1, 6)
+
+
+        if __name__ == '__main__':
+            random.seed(42)
+            print(Dice().roll())
+    """)
+    assert java.count('new java.util.SplittableRandom()') == 1
+    assert 'static java.util.SplittableRandom' not in java
+    assert 'random = new java.util.SplittableRandom(42);' in java
+    assert 'return random.nextInt(1, 7);' in java
+
+
+def test_choice_evaluates_its_sequence_once(translate):
+    java = translate("""
+        import random
+
+
+        def make_list():
+            return [1, 2, 3]
+
+
+        xs = [4, 5]
+        print(random.choice(make_list()), random.choice(xs))
+    """)
+    assert 'RandomChoice.of(make_list(), random)' in java
+    assert java.count('make_list()') == 2  # The declaration, and the one call
+    assert 'xs.get(random.nextInt(xs.size()))' in java
+
+
+def test_declined_calls_hoist_nothing(translate):
+    java = translate("""
+        import random
+        print(random.sample([1, 2], 1))
+    """)
+    assert 'SplittableRandom' not in java
+
+
+def test_randint_up_to_max_int_does_not_overflow(translate):
+    java = translate("""
+        import random
+        print(random.randint(0, 2147483647))
+    """)
+    assert '(int) random.nextLong(0, (long) 2147483647 + 1)' in java
+
+
+def test_threaded_programs_use_thread_local_random(translate):
+    java = translate("""
+        import random
+        import threading
+        print(random.random())
+    """)
+    assert 'java.util.concurrent.ThreadLocalRandom.current().nextDouble()' in java
+
+
+def test_seeded_threads_split_their_own_generator(translate):
+    java = translate("""
+        import random
+        import threading
+        random.seed(1)
+        print(random.random())
+    """)
+    assert 'SeededRandom.seed(new java.util.SplittableRandom(1));' in java
+    assert 'SeededRandom.current().nextDouble()' in java
+    assert 'seeded.split()' in java
+    assert 'java.util.SplittableRandom random = ' not in java
+
+
+def test_shuffle_is_one_call(translate):
+    java = translate("""
+        import random
+        xs = [3, 1, 2]
+        random.shuffle(xs)
+        print(xs)
+    """)
+    assert 'RandomShuffle.of(xs, random);' in java
+    assert 'shuffleIndex' not in java
+
+
+def test_randint_up_to_a_length_stays_an_int(translate):
+    java = translate("""
+        import random
+        xs = [3, 1, 2]
+        print(random.randint(1, len(xs)))
+    """)
+    assert 'random.nextInt(1, xs.size() + 1)' in java
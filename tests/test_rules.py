@@ -0,0 +1,81 @@
+import ast
+import json
+
+import main
+
+SOURCE = """
+    import mylib
+    from mylib import fast_sqrt
+
+    def f(x: float):
+        return mylib.fast_sqrt(x) + fast_sqrt(x) + mylib.TAU
+"""
+
+
+def test_string_rules_replace_the_callee(translate):
+    rules = main.RewriteRules()
+    rules.register(ast.Call, 'mylib.fast_sqrt', 'Math.sqrt')
+    rules.register(ast.Attribute, 'mylib.TAU', '(2 * Math.PI)')
+    java = translate(SOURCE, rules=rules)
+    assert 'return Math.sqrt(x) + Math.sqrt(x) + (2 * Math.PI);' in java
+    assert rules.fired == {('Call', 'mylib.fast_sqrt', 'Math.sqrt'): 2,
+                           ('Attribute', 'mylib.TAU', '(2 * Math.PI)'): 1}
+    assert rules.report().split('\n')[0] == '       2  Call mylib.fast_sqrt -> Math.sqrt'
+
+
+def test_rule_that_declines_leaves_it_to_the_next(translate):
+    rules = main.RewriteRules()
+
+    @rules.register(ast.Call, 'mylib.fast_sqrt')
+    def declines(unparser, node):
+        return False
+
+    @rules.register(ast.Call, 'mylib.fast_sqrt')
+    def square_root(unparser, node):
+        unparser.write('Math.sqrt(')
+        unparser.traverse(node.args[0])
+        unparser.write(')')
+        return True
+
+    java = translate(SOURCE, rules=rules)
+    assert 'Math.sqrt(x) + Math.sqrt(x) + mylib.TAU' in java
+    assert ('Call', 'mylib.fast_sqrt', 'declines') not in rules.fired
+    assert rules.fired[('Call', 'mylib.fast_sqrt', 'square_root')] == 2
+
+
+def test_rules_load_from_json(translate, tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'Call': {'mylib.fast_sqrt': 'Math.sqrt'}, 'Attribute': {'mylib.TAU': 'Math.TAU'}}))
+    rules = main.RewriteRules()
+    rules.load(str(path))
+    java = translate(SOURCE, rules=rules)
+    assert 'Math.sqrt(x) + Math.sqrt(x) + Math.TAU' in java
+
+
+def test_rules_load_from_python(translate, tmp_path):
+    path = tmp_path / 'shop_rules.py'
+    path.write_text("import ast\n\n\ndef register(rules):\n"
+                    "    rules.register(ast.Call, 'mylib.fast_sqrt', 'StrictMath.sqrt')\n")
+    rules = main.RewriteRules()
+    rules.load(str(path))
+    assert 'StrictMath.sqrt(x) + StrictMath.sqrt(x)' in translate(SOURCE, rules=rules)
+
+
+def test_builtins_go_through_the_default_rules(translate):
+    java = translate("""
+        import random
+        print(random.randint(1, 6))
+    """)
+    assert 'System.out.println(random.nextInt(1, 7));' in java
+
+
+def test_worker_processes_load_the_rule_files_they_lack(tmp_path, monkeypatch):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'Call': {'mylib.fast_sqrt': 'Math.sqrt'}}))
+    rules = main.RewriteRules()
+    monkeypatch.setattr(main, 'RULES', rules)
+    main._load_rules([str(path)])
+    # A forked worker has them already
+    main._load_rules([str(path)])
+    assert rules.paths == [str(path)]
+    assert (ast.Call, 'mylib.fast_sqrt') in rules
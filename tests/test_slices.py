@@ -0,0 +1,101 @@
+import os
+
+
+def test_read_only_slice_is_a_view(translate):
+    java = translate("""
+        def total(xs: list) -> int:
+            return sum(xs[1:])
+    """)
+    assert 'xs.subList(1, xs.size())' in java
+    assert 'new java.util.ArrayList<>(xs.subList' not in java
+
+
+def test_stored_slice_is_a_copy(translate):
+    java = translate("""
+        xs = [1, 2, 3]
+        ys = xs[:2]
+        ys.append(4)
+    """)
+    assert 'new java.util.ArrayList<>(xs.subList(0, 2))' in java
+
+
+def test_string_slices_are_substrings(translate):
+    java = translate("""
+        def tail(s: str) -> str:
+            return s[1:-1] + s[::-1]
+    """)
+    assert 's.substring(1, s.length() - 1)' in java
+    assert 'new StringBuilder(s).reverse().toString()' in java
+
+
+def test_stepped_slices_are_stepped_copies(translate, capsys):
+    java = translate("""
+        def odds(xs: list, s: str):
+            print(xs[::2], xs[1::2], xs[4:0:-2], s[::2])
+    """)
+    assert 'Unsupported' not in capsys.readouterr().out
+    assert 'Slices.of(xs, null, null, 2)' in java
+    assert 'Slices.of(xs, 1, null, 2)' in java
+    assert 'Slices.of(xs, 4, 0, -2)' in java
+    assert 'Slices.of(s, null, null, 2)' in java
+    assert 'final class Slices' in java
+
+
+def test_string_indexing_gives_strings(translate):
+    java = translate("""
+        def f(s: str):
+            first = s[0]
+            print(s[0] + s[1], first == "x", s[-1] == "o")
+    """)
+    assert 'String.valueOf(s.charAt(0)) + String.valueOf(s.charAt(1))' in java
+    assert '"x".equals(first)' in java
+    # Compared with a one character constant, a char is enough
+    assert "s.charAt(s.length() - 1) == 'o'" in java
+
+
+def test_concatenation_feeding_recursion_is_backtracking(translate):
+    path = os.path.join(os.path.dirname(__file__), os.pardir, 'examples', 'leetcode_reconstruct_itinerary.py')
+    with open(path) as f:
+        java = translate(f.read())
+    assert 'route.add(nextDest);' in java
+    assert 'this.backtracking(nextDest, route);' in java
+    assert 'route.remove(route.size() - 1);' in java
+
+
+def test_slice_changed_in_the_loop_is_a_copy(translate):
+    java = translate("""
+        def drain(xs: list):
+            for x in xs[:]:
+                xs.remove(x)
+            for x in xs[1:]:
+                xs.append(x)
+            for x in xs[1:]:
+                print(x)
+    """)
+    assert 'for (var x: new java.util.ArrayList<>(xs)){' in java
+    assert 'for (var x: new java.util.ArrayList<>(xs.subList(1, xs.size()))){' in java
+    assert 'for (var x: xs.subList(1, xs.size())){' in java
+
+
+def test_bounds_that_arent_constants_are_clamped(translate):
+    java = translate("""
+        def ends(xs: list, s: str, n: int, k: int):
+            print(s[:n], xs[-k:], sum(xs[:n]))
+    """)
+    assert 'Slices.substring(s, null, n)' in java
+    assert 'Slices.view(xs, -k, null)' in java
+    assert 'Slices.view(xs, null, n)' in java
+    assert 'static <T> java.util.List<T> view(' in java
+
+
+def test_sequence_indexed_from_the_end_is_evaluated_once(translate):
+    java = translate("""
+        def make() -> list:
+            return [1, 2]
+
+        def last():
+            print(make()[-1])
+    """)
+    assert 'var sequence = make();' in java
+    assert 'sequence.get(sequence.size() - 1)' in java
+    assert java.count('make();') == 1
@@ -0,0 +1,73 @@
+import os
+import sys
+
+import main
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+
+import attribute_profile  # noqa: E402
+
+SCRIPT = '''class Counter:
+    def __init__(self):
+        self.n = 0
+
+    def add(self):
+        self.n += 1
+
+
+if __name__ == "__main__":
+    c = Counter()
+    c.add()
+    print(c.n)
+'''
+
+
+def translate_with_map(source, python_file='counter.py'):
+    tree = main.parse_python(source)
+    functions = main.SourceMap.functions_of(tree)
+    unparser = main._JavaUnparser(source=source)
+    java = unparser.visit(tree)
+    return java, main.SourceMap(python_file, unparser.line_map, functions, main.SourceMap.classes_of(java))
+
+
+def test_every_java_line_has_an_entry():
+    java, source_map = translate_with_map(SCRIPT)
+    assert len(source_map.lines) == len(java.split('\n'))
+
+
+def test_hoisted_declaration_is_on_its_own_line():
+    java, source_map = translate_with_map(SCRIPT)
+    lines = java.split('\n')
+    assert 'var c;' in lines
+    assert 'public static void main(String[] args){' in lines
+    assert 'var c;public static' not in java
+    # Each maps to the line it came from
+    assert source_map.python_line(lines.index('var c;') + 1) == 10
+    assert source_map.python_line(lines.index('public static void main(String[] args){') + 1) == 9
+
+
+def test_lines_map_to_their_functions():
+    java, source_map = translate_with_map(SCRIPT)
+    java_line = java.split('\n').index('        this.n += 1;') + 1
+    assert source_map.python_line(java_line) == 6
+    assert source_map.function_at(6) == 'Counter.add'
+    assert source_map.function_at(11) == '<module>'
+
+
+def test_smap_has_a_line_section(tmp_path):
+    _, source_map = translate_with_map(SCRIPT)
+    smap = source_map.to_smap()
+    assert smap.startswith('SMAP\nCounter.java\nPython\n*S Python\n*F\n+ 1 counter.py\ncounter.py\n*L\n')
+    assert smap.endswith('*E\n')
+    path = str(tmp_path / 'counter.json')
+    source_map.save(path)
+    assert main.SourceMap.load(path).lines == source_map.lines
+
+
+def test_profile_frames_go_back_to_python():
+    java, source_map = translate_with_map(SCRIPT)
+    java_line = java.split('\n').index('        this.n += 1;') + 1
+    maps = {'Counter': source_map}
+    assert attribute_profile.attribute(f"Counter.add:{java_line}", maps) == 'counter.py:Counter.add:6'
+    assert attribute_profile.attribute('Counter.add', maps) == 'counter.py:Counter.add'
+    assert attribute_profile.attribute('java/lang/Thread.run', maps) is None
@@ -0,0 +1,103 @@
+def test_heap_of_ints_is_a_primitive_heap(translate):
+    java = translate("""
+        import heapq
+        h = []
+        heapq.heappush(h, 5)
+        heapq.heappush(h, 1)
+        print(heapq.heappop(h), h[0])
+    """)
+    assert 'h = new LongHeap();' in java
+    assert 'h.push(5);' in java
+    assert 'h.pop() + " " + h.peek()' in java
+
+
+def test_heap_of_anything_else_is_a_priority_queue(translate):
+    java = translate("""
+        import heapq
+        names = []
+        heapq.heappush(names, "b")
+        print(heapq.heappop(names))
+    """)
+    assert 'new java.util.PriorityQueue<>()' in java
+    assert 'names.add("b");' in java
+    assert 'names.remove()' in java
+
+
+def test_heap_of_tuples_compares_them_element_by_element(translate, capsys):
+    java = translate("""
+        import heapq
+
+        def schedule(n: int):
+            pq = []
+            heapq.heappush(pq, (n, "b"))
+            heapq.heappush(pq, (1, "a"))
+            pri, name = heapq.heappop(pq)
+            print(pri, name, pq[0][1])
+            ready = [(2, "c"), (1, "d")]
+            heapq.heapify(ready)
+            print(heapq.heappop(ready))
+
+        schedule(3)
+    """)
+    assert 'Unsupported' not in capsys.readouterr().out
+    assert 'pq = new java.util.PriorityQueue<java.util.List<Object>>(Tuples::compare);' in java
+    assert 'pq.add(Tuples.of(n, "b"));' in java
+    assert 'var entry = pq.remove();' in java
+    assert 'pri = entry.get(0);' in java
+    assert 'name = entry.get(1);' in java
+    assert 'pq.element().get(1)' in java
+    assert 'ready = Tuples.heap(java.util.List.of(Tuples.of(2, "c"), Tuples.of(1, "d")));' in java
+    assert 'static int compare(java.util.List<Object> a, java.util.List<Object> b) {' in java
+    assert '.add((n, "b"))' not in java
+
+
+def test_deque_is_an_array_deque(translate):
+    java = translate("""
+        from collections import deque
+        q = deque()
+        q.append(1)
+        q.appendleft(0)
+        print(q.popleft(), q[-1])
+    """)
+    assert 'new java.util.ArrayDeque<>()' in java
+    assert 'q.addLast(1);' in java
+    assert 'q.addFirst(0);' in java
+    assert 'q.removeFirst() + " " + q.getLast()' in java
+
+
+def test_deque_maxlen_evicts_from_the_other_end(translate, capsys):
+    java = translate("""
+        from collections import deque
+        recent = deque([1, 2, 3], maxlen=3)
+        window = deque(maxlen=2)
+        recent.append(4)
+    """)
+    assert 'Unsupported' not in capsys.readouterr().out
+    assert 'new BoundedDeque<>(2)' in java
+    assert ', 3)' in java and 'new BoundedDeque<>(' in java
+    assert 'final class BoundedDeque<E> extends java.util.ArrayDeque<E>' in java
+    assert 'pollFirst();' in java
+
+
+def test_bisect_finds_the_first_and_last_place(translate):
+    java = translate("""
+        import bisect
+        xs = [1, 3, 5, 7]
+        print(bisect.bisect_left(xs, 5), bisect.bisect(xs, 5))
+        bisect.insort(xs, 4)
+    """)
+    assert 'bisectLeft(xs, 5, 0, xs.size())' in java
+    assert 'bisectRight(xs, 5, 0, xs.size())' in java
+    assert 'xs.add(bisectRight(xs, 4, 0, xs.size()), 4);' in java
+
+
+def test_bisect_honors_lo_and_hi(translate, capsys):
+    java = translate("""
+        import bisect
+        xs = [1, 3, 5, 7]
+        print(bisect.bisect_left(xs, 5, hi=3), bisect.bisect_right(xs, 3, lo=1), bisect.bisect_left(xs, 5, 1, hi=3))
+    """)
+    assert 'Unsupported' not in capsys.readouterr().out
+    assert 'bisectLeft(xs, 5, 0, 3)' in java
+    assert 'bisectRight(xs, 3, 1, xs.size())' in java
+    assert 'bisectLeft(xs, 5, 1, 3)' in java
@@ -0,0 +1,41 @@
+def test_accumulating_in_a_loop_uses_a_builder(translate):
+    java = translate("""
+        def report(rows):
+            s = ""
+            for row in rows:
+                s += row
+                s = s + ","
+            return s
+    """)
+    assert 'StringBuilder sBuilder = new StringBuilder(s);' in java
+    assert 'sBuilder.append(row);' in java
+    assert 'sBuilder.append(",");' in java
+    assert 's = sBuilder.toString();' in java
+    assert 's += ' not in java
+
+
+def test_reading_the_accumulator_in_the_loop(translate):
+    java = translate("""
+        def report(rows):
+            out = ""
+            for row in rows:
+                if len(out) > 10:
+                    break
+                out += row
+            return out
+    """)
+    assert 'if (outBuilder.toString().length() > 10)' in java
+    assert 'outBuilder.append(row);' in java
+    assert 'out = outBuilder.toString();' in java
+
+
+def test_numbers_are_not_accumulators(translate):
+    java = translate("""
+        def total(rows):
+            t = 0
+            for row in rows:
+                t += row
+            return t
+    """)
+    assert 'Builder' not in java
+    assert 't += row;' in java
@@ -0,0 +1,76 @@
+import os
+
+import main
+
+CONSTS = '''\
+def size(xs):
+    return len(xs)
+
+
+def label(n: int) -> str:
+    return "n=" + str(n)
+
+
+class Box:
+    def get(self) -> int:
+        return 1
+'''
+
+USE = '''\
+from mypkg.consts import label
+
+
+def describe():
+    text = label(3)
+    return text
+'''
+
+
+def make_package(tmp_path):
+    package = tmp_path / 'mypkg'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    (package / 'consts.py').write_text(CONSTS)
+    (package / 'use.py').write_text(USE)
+    return str(package)
+
+
+def test_index_records_signatures_and_inferred_returns(tmp_path):
+    index = main.SymbolIndex.load(make_package(tmp_path), None, 1)
+    consts = index.modules['mypkg.consts']
+    assert consts['functions']['label'] == {'parameters': [['n', 'int']], 'returns': 'String'}
+    # Inferred, since it isn't hinted
+    assert consts['functions']['size']['returns'] == 'int'
+    assert consts['classes']['Box']['methods']['get']['returns'] == 'int'
+
+
+def test_index_is_saved_and_only_changed_modules_are_indexed_again(tmp_path):
+    package = make_package(tmp_path)
+    main.SymbolIndex.load(package, None, 1)
+    assert os.path.isfile(os.path.join(package, main.SymbolIndex.FILE_NAME))
+    index = main.SymbolIndex.load(package, None, 1)
+    assert index.update(1) == set()
+    with open(os.path.join(package, 'use.py'), 'a') as f:
+        f.write('\n\nEXTRA = 1\n')
+    assert index.update(1) == {'mypkg.use'}
+
+
+def test_imported_return_type_is_looked_up(translate, tmp_path):
+    index = main.SymbolIndex.load(make_package(tmp_path), None, 1)
+    java = translate(USE, symbol_index=index, package='mypkg')
+    assert 'public static String describe()' in java
+    assert 'text = mypkg.consts.label(3);' in java
+    # Which it can't know without the index
+    assert 'public static Object describe()' in translate(USE)
+
+
+def test_what_doesnt_translate_comes_back_with_the_module(tmp_path, capsys):
+    package = make_package(tmp_path)
+    path = os.path.join(package, 'odd.py')
+    with open(path, 'w') as f:
+        f.write('def f(xs):\n    print(sum(xs))\n')
+    index = main.SymbolIndex(package)
+    _, java_source, messages = index._translate_module('mypkg.odd', path)
+    assert java_source is not None
+    assert messages.startswith('Unsupported ATM: sum of what might not be numbers')
+    assert capsys.readouterr().out == ''
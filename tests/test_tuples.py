@@ -0,0 +1,82 @@
+def test_swap_uses_one_temporary(translate):
+    java = translate("""
+        x = 5
+        y = 10
+        x, y = y, x
+        print(x, y)
+    """)
+    assert 'int yNext = x;\nx = y;\ny = yNext;' in java
+    assert 'Object[]' not in java
+
+
+def test_parallel_assignment_only_keeps_what_is_read_again(translate):
+    java = translate("""
+        def fib(n: int):
+            a, b = 0, 1
+            for _ in range(n):
+                a, b = b, a + b
+            return a
+    """)
+    assert 'bNext = a.add(b);' in java
+    assert 'a = b;' in java
+    assert 'b = bNext;' in java
+    assert 'aNext' not in java
+
+
+def test_returned_tuple_is_a_record(translate):
+    java = translate("""
+        def divmod2(a: int, b: int):
+            return a // b, a % b
+
+        q, r = divmod2(7, 2)
+        print(q, r)
+    """)
+    assert 'record Divmod2Result(long first, int second) {}' in java
+    assert 'return new Divmod2Result(Math.floorDiv(a, b), Math.floorMod(a, b));' in java
+    assert 'Divmod2Result divmod2Result = divmod2(7, 2);' in java
+    assert 'var q = divmod2Result.first();' in java
+    assert 'var r = divmod2Result.second();' in java
+
+
+def test_swapping_attributes_and_elements(translate):
+    java = translate("""
+        class Pair:
+            def __init__(self):
+                self.a = 1
+                self.b = 2
+
+            def flip(self, xs: list, i: int, j: int):
+                self.a, self.b = self.b, self.a
+                xs[i], xs[j] = xs[j], xs[i]
+    """)
+    assert 'var next = this.a;\n        this.a = this.b;\n        this.b = next;' in java
+    assert 'var next1 = xs.get(i);\n        xs.set(i, xs.get(j));\n        xs.set(j, next1);' in java
+
+
+def test_record_kept_in_a_variable(translate):
+    java = translate("""
+        def divmod2(a: int, b: int):
+            return a // b, a % b
+
+        x = divmod2(7, 2)
+        print(x[0], x[-1], divmod2(9, 4)[1])
+        q, r = x
+    """)
+    assert 'var x = divmod2(7, 2);' in java
+    assert 'x.first() + " " + x.second() + " " + divmod2(9, 4).second()' in java
+    assert 'var q = x.first();' in java
+    assert 'var r = x.second();' in java
+
+
+def test_tuples_used_as_tuples_arent_records(translate):
+    java = translate("""
+        def pair():
+            return 1, "x"
+
+        def bounds(xs: list):
+            return min(xs), max(xs)
+
+        p = pair()
+        print(p, len(p), bounds([1, 2]))
+    """)
+    assert 'record' not in java
@@ -0,0 +1,96 @@
+"""
+Reads collapsed stacks from a profiler of the translated Java (async-profiler's collapsed output,
+or jfr2flame's with --lines, one `frame;frame;... samples` per line) and puts the Python function
+and line each frame came from in its place, going by the source maps main.py wrote with --source-map.
+Frames from classes none of the maps declare are left as they are, unless there's only the one map.
+
+    python tools/attribute_profile.py MAP [MAP ...] < collapsed.txt > python_collapsed.txt
+    python tools/attribute_profile.py --summary MAP [MAP ...] < collapsed.txt
+
+With --summary, prints how many samples each Python function and line had on top of the stack instead.
+"""
+import argparse
+import os
+import re
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import SourceMap  # noqa: E402
+
+# package/Class$Inner.method:line_[j], where the line and the frame type suffix are optional
+FRAME = re.compile(r'^(?P<class>.*?)[./](?P<method>[^./]+?)(?::(?P<line>\d+))?(?P<suffix>_\[\w+\])?$')
+
+
+def frame_class(name):
+    """The simple name of the outermost class in a frame's class name"""
+    return re.split(r'[./]', name)[-1].split('$')[0]
+
+
+def attribute(frame, maps):
+    """*frame* as `file.py:function:line` (or `file.py:function` without a line), or None if it isn't ours"""
+    match = FRAME.match(frame)
+    if not match:
+        return None
+    source_map = maps.get(frame_class(match['class']))
+    if source_map is None:
+        # A translated script has no class until it's put in one, which won't be in a package
+        if len(set(maps.values())) != 1 or re.search(r'[./]', match['class']):
+            return None
+        source_map = next(iter(maps.values()))
+    python_file = os.path.basename(source_map.python_file)
+    if match['line']:
+        python_line = source_map.python_line(int(match['line']))
+        if python_line is not None:
+            return f"{python_file}:{source_map.function_at(python_line)}:{python_line}"
+    # Without a line, go by the name, which a function keeps when it's translated
+    for qualified_name, _, _ in source_map.functions:
+        if qualified_name.split('.')[-1] == match['method']:
+            return f"{python_file}:{qualified_name}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Attribute collapsed Java stacks to the Python they were translated from')
+    parser.add_argument('maps', nargs='+', metavar='MAP', help='a JSON source map written by main.py --source-map')
+    parser.add_argument('--summary', action='store_true',
+                        help='print the samples of each Python function and line on top of the stack')
+    args = parser.parse_args()
+    maps = {}
+    for path in args.maps:
+        source_map = SourceMap.load(path)
+        for name in source_map.classes or [os.path.splitext(os.path.basename(source_map.python_file))[0]]:
+            maps[name] = source_map
+
+    stacks = Counter()
+    for line in sys.stdin:
+        stack, _, samples = line.rstrip('\n').rpartition(' ')
+        if not stack or not samples.isdigit():
+            continue
+        stacks[tuple(attribute(frame, maps) or frame for frame in stack.split(';'))] += int(samples)
+
+    if not args.summary:
+        for stack, samples in stacks.items():
+            print(f"{';'.join(stack)} {samples}")
+        return
+
+    # Self samples go to the innermost Python frame, whatever Java it was calling at the time
+    functions, lines = Counter(), Counter()
+    total = sum(stacks.values())
+    for stack, samples in stacks.items():
+        python_frames = [frame for frame in stack if '.py:' in frame]
+        if not python_frames:
+            continue
+        python_file, function, *line = python_frames[-1].split(':')
+        functions[f"{python_file}:{function}"] += samples
+        if line:
+            lines[python_frames[-1]] += samples
+    for title, counts in (('function', functions), ('line', lines)):
+        print(f"{'samples':>8} {'share':>6}  {title}")
+        for name, samples in counts.most_common():
+            print(f"{samples:>8} {samples / total:>6.1%}  {name}")
+        print()
+
+
+if __name__ == '__main__':
+    main()